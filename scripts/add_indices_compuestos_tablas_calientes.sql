@@ -0,0 +1,80 @@
+-- ============================================================================
+-- MIGRACIÓN: Índices compuestos en tablas calientes de escalamiento y analytics
+-- Objetivo: Las consultas de escalamiento, get_solicitudes_paginated y
+--           /v1/solicitudes/metrics filtran por (asesor_id, fecha),
+--           (solicitud_id, nivel_entrega), (asesor_id, estado, created_at)...
+--           sin índice que las soporte (Seq Scan al crecer las tablas)
+-- Los nombres coinciden con los que genera Tortoise desde Meta.indexes, así
+-- generate_schemas(safe=True) los reconoce y no crea duplicados.
+-- CONCURRENTLY: no bloquea escrituras; ejecutar fuera de una transacción
+-- (psql -f en modo autocommit).
+-- Verificación: tests/test_planes_consulta.py (EXPLAIN sin Seq Scan)
+-- ============================================================================
+
+-- Paso 1: historial_respuestas_ofertas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_historial_r_asesor__4925e7"
+    ON historial_respuestas_ofertas (asesor_id, fecha_envio);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_historial_r_solicit_51e4ee"
+    ON historial_respuestas_ofertas (solicitud_id, asesor_id);
+
+-- Paso 2: ofertas_historicas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_ofertas_his_asesor__322666"
+    ON ofertas_historicas (asesor_id, fecha);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_ofertas_his_oferta__56634f"
+    ON ofertas_historicas (oferta_id);
+
+-- Paso 3: evaluaciones_asesores_temp
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_evaluacione_solicit_1aab7d"
+    ON evaluaciones_asesores_temp (solicitud_id, nivel_entrega);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_evaluacione_asesor__b0eae4"
+    ON evaluaciones_asesores_temp (asesor_id, solicitud_id);
+
+-- Paso 4: ofertas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_ofertas_asesor__1b4da1"
+    ON ofertas (asesor_id, estado, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_ofertas_solicit_a2f61a"
+    ON ofertas (solicitud_id, asesor_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_ofertas_estado_4d74fe"
+    ON ofertas (estado, created_at);
+
+-- Paso 5: adjudicaciones_repuesto
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_adjudicacio_oferta__6c1349"
+    ON adjudicaciones_repuesto (oferta_id, created_at);
+
+-- Paso 6: solicitudes y repuestos_solicitados
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_solicitudes_estado_e461cc"
+    ON solicitudes (estado, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_solicitudes_created_8f8c02"
+    ON solicitudes (created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_repuestos_s_solicit_c46173"
+    ON repuestos_solicitados (solicitud_id);
+
+-- Paso 7: Eliminar índices equivalentes creados a mano (init-db.sql y
+--         add_oferta_id_to_ofertas_historicas.sql) con otros nombres
+DROP INDEX CONCURRENTLY IF EXISTS idx_historial_respuestas_asesor_fecha;
+DROP INDEX CONCURRENTLY IF EXISTS idx_ofertas_historicas_asesor_fecha;
+DROP INDEX CONCURRENTLY IF EXISTS idx_ofertas_historicas_oferta;
+DROP INDEX CONCURRENTLY IF EXISTS idx_ofertas_solicitud_asesor;
+DROP INDEX CONCURRENTLY IF EXISTS idx_ofertas_estado_fecha;
+DROP INDEX CONCURRENTLY IF EXISTS idx_solicitudes_estado_fecha;
+DROP INDEX CONCURRENTLY IF EXISTS idx_repuestos_solicitud;
+-- (solicitud_id) queda cubierto por el prefijo de (solicitud_id, nivel_entrega)
+DROP INDEX CONCURRENTLY IF EXISTS idx_evaluaciones_asesores_temp_solicitud;
+
+-- Paso 8: Actualizar estadísticas para el planificador
+ANALYZE historial_respuestas_ofertas;
+ANALYZE ofertas_historicas;
+ANALYZE evaluaciones_asesores_temp;
+ANALYZE ofertas;
+ANALYZE adjudicaciones_repuesto;
+ANALYZE solicitudes;
+ANALYZE repuestos_solicitados;
+
+-- Paso 9: Verificación
+SELECT tablename, indexname, indexdef
+FROM pg_indexes
+WHERE tablename IN (
+    'historial_respuestas_ofertas', 'ofertas_historicas', 'evaluaciones_asesores_temp',
+    'ofertas', 'adjudicaciones_repuesto', 'solicitudes', 'repuestos_solicitados'
+)
+ORDER BY tablename, indexname;
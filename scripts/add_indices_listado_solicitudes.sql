@@ -0,0 +1,50 @@
+-- ============================================================================
+-- MIGRACIÓN: Índices del listado paginado de solicitudes (keyset y búsqueda)
+-- Objetivo: get_solicitudes_paginated pagina por cursor sobre (created_at, id)
+--           y busca con icontains en nombre/apellido/teléfono del cliente y
+--           ciudad_origen. Sin estos índices el cursor ordena en memoria y la
+--           búsqueda recorre usuarios y solicitudes completas (Seq Scan).
+-- (estado, created_at, id) y (created_at, id) reemplazan a los índices de
+-- add_indices_compuestos_tablas_calientes.sql; los nombres coinciden con los
+-- que genera Tortoise desde Meta.indexes.
+-- Trigramas: el ORM genera UPPER(CAST(col AS VARCHAR)) LIKE UPPER('%...%'),
+-- por eso los índices GIN son de expresión sobre esa misma forma.
+-- CONCURRENTLY: no bloquea escrituras; ejecutar fuera de una transacción
+-- (psql -f en modo autocommit).
+-- Verificación: tests/test_planes_consulta.py (EXPLAIN sin Seq Scan)
+-- ============================================================================
+
+-- Paso 1: Extensión de trigramas
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Paso 2: Keyset sobre (created_at, id) y solicitudes por cliente
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_solicitudes_estado_f5fb80"
+    ON solicitudes (estado, created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_solicitudes_created_2eefe6"
+    ON solicitudes (created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_solicitudes_cliente_310944"
+    ON solicitudes (cliente_id, created_at);
+
+-- Paso 3: Búsqueda por trigramas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_solicitudes_ciudad_trgm
+    ON solicitudes USING gin (UPPER(ciudad_origen::varchar) gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_usuarios_nombre_trgm
+    ON usuarios USING gin (UPPER(nombre::varchar) gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_usuarios_apellido_trgm
+    ON usuarios USING gin (UPPER(apellido::varchar) gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_usuarios_telefono_trgm
+    ON usuarios USING gin (UPPER(telefono::varchar) gin_trgm_ops);
+
+-- Paso 4: Eliminar los índices reemplazados (prefijos de los nuevos)
+DROP INDEX CONCURRENTLY IF EXISTS "idx_solicitudes_estado_e461cc";
+DROP INDEX CONCURRENTLY IF EXISTS "idx_solicitudes_created_8f8c02";
+
+-- Paso 5: Actualizar estadísticas para el planificador
+ANALYZE solicitudes;
+ANALYZE usuarios;
+
+-- Paso 6: Verificación
+SELECT tablename, indexname, indexdef
+FROM pg_indexes
+WHERE tablename IN ('solicitudes', 'usuarios')
+ORDER BY tablename, indexname;
@@ -0,0 +1,79 @@
+-- ============================================================================
+-- MIGRACIÓN: Tabla metricas_asesores (ventana móvil por asesor)
+-- Objetivo: El escalamiento lee una fila por asesor en lugar de recorrer
+--           30 días de historial_respuestas_ofertas y 6 meses de ofertas_historicas
+-- Mantenimiento: EventsService incrementa los contadores; el job nocturno
+--                compactar_metricas_asesores (3 AM) recalcula la ventana
+-- ============================================================================
+
+-- Paso 1: Crear tabla
+CREATE TABLE IF NOT EXISTS metricas_asesores (
+    id UUID PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    asesor_id UUID NOT NULL UNIQUE REFERENCES asesores(id) ON DELETE CASCADE,
+    respuestas_enviadas INT NOT NULL DEFAULT 0,
+    respuestas_respondidas INT NOT NULL DEFAULT 0,
+    ofertas_total INT NOT NULL DEFAULT 0,
+    ofertas_adjudicadas INT NOT NULL DEFAULT 0,
+    ofertas_aceptadas INT NOT NULL DEFAULT 0,
+    ofertas_exitosas INT NOT NULL DEFAULT 0,
+    suma_tiempo_respuesta_seg BIGINT NOT NULL DEFAULT 0,
+    ofertas_con_tiempo INT NOT NULL DEFAULT 0,
+    fecha_compactacion TIMESTAMPTZ NULL
+);
+
+COMMENT ON TABLE metricas_asesores IS 'Métricas móviles por asesor para escalamiento (actividad 30 días, desempeño 6 meses)';
+COMMENT ON COLUMN metricas_asesores.fecha_compactacion IS 'Última recalculación desde el historial; NULL = fila creada por eventos sin historial completo';
+
+-- Paso 2: Población inicial (equivalente a la primera compactación)
+INSERT INTO metricas_asesores (
+    id, asesor_id,
+    respuestas_enviadas, respuestas_respondidas,
+    ofertas_total, ofertas_adjudicadas, ofertas_aceptadas, ofertas_exitosas,
+    suma_tiempo_respuesta_seg, ofertas_con_tiempo,
+    fecha_compactacion
+)
+SELECT
+    gen_random_uuid(),
+    a.id,
+    COALESCE(act.enviadas, 0),
+    COALESCE(act.respondidas, 0),
+    COALESCE(des.total, 0),
+    COALESCE(des.adjudicadas, 0),
+    COALESCE(des.aceptadas, 0),
+    COALESCE(des.exitosas, 0),
+    COALESCE(des.suma_tiempos, 0),
+    COALESCE(des.con_tiempo, 0),
+    NOW()
+FROM asesores a
+LEFT JOIN (
+    SELECT
+        asesor_id,
+        COUNT(*) AS enviadas,
+        COUNT(*) FILTER (WHERE respondio) AS respondidas
+    FROM historial_respuestas_ofertas
+    WHERE fecha_envio >= NOW() - INTERVAL '30 days'
+    GROUP BY asesor_id
+) act ON act.asesor_id = a.id
+LEFT JOIN (
+    SELECT
+        asesor_id,
+        COUNT(*) AS total,
+        COUNT(*) FILTER (WHERE adjudicada) AS adjudicadas,
+        COUNT(*) FILTER (WHERE adjudicada AND aceptada_cliente) AS aceptadas,
+        COUNT(*) FILTER (WHERE adjudicada AND aceptada_cliente AND entrega_exitosa) AS exitosas,
+        SUM(tiempo_respuesta_seg) FILTER (WHERE tiempo_respuesta_seg <> 0) AS suma_tiempos,
+        COUNT(*) FILTER (WHERE tiempo_respuesta_seg <> 0) AS con_tiempo
+    FROM ofertas_historicas
+    WHERE fecha >= CURRENT_DATE - 180
+    GROUP BY asesor_id
+) des ON des.asesor_id = a.id
+ON CONFLICT (asesor_id) DO NOTHING;
+
+-- Paso 3: Verificación
+SELECT
+    COUNT(*) AS asesores_con_metricas,
+    SUM(respuestas_enviadas) AS total_enviadas,
+    SUM(ofertas_total) AS total_ofertas
+FROM metricas_asesores;
@@ -0,0 +1,33 @@
+-- ============================================================================
+-- MIGRACIÓN: Agregar oferta_id a tabla ofertas_historicas
+-- Objetivo: Los eventos de adjudicación y respuesta del cliente actualizan el
+--           histórico por clave indexada en lugar de recorrer la tabla
+--           buscando metadata_oferta->>'oferta_id'
+-- ============================================================================
+
+-- Paso 1: Agregar columna oferta_id (nullable: registros sin oferta asociada)
+ALTER TABLE ofertas_historicas
+ADD COLUMN IF NOT EXISTS oferta_id UUID REFERENCES ofertas(id) ON DELETE SET NULL;
+
+-- Paso 2: Crear índice para performance
+-- (mismo nombre que genera Tortoise para el campo con index=True)
+CREATE INDEX IF NOT EXISTS "idx_ofertas_his_oferta__56634f" ON ofertas_historicas(oferta_id);
+
+-- Paso 3: Backfill desde metadata_oferta (solo UUIDs válidos de ofertas existentes)
+UPDATE ofertas_historicas oh
+SET oferta_id = o.id
+FROM ofertas o
+WHERE oh.oferta_id IS NULL
+  AND oh.metadata_oferta->>'oferta_id' ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+  AND o.id = (oh.metadata_oferta->>'oferta_id')::uuid;
+
+-- Paso 4: Verificar cuántos registros NO se pudieron asociar
+SELECT
+    CASE
+        WHEN oferta_id IS NOT NULL THEN 'Asociados a oferta'
+        WHEN metadata_oferta ? 'oferta_id' THEN 'Oferta inexistente'
+        ELSE 'Sin oferta_id en metadata'
+    END AS status,
+    COUNT(*) AS total
+FROM ofertas_historicas
+GROUP BY 1;
@@ -3,6 +3,7 @@
 
 -- Create extensions
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 -- CREATE EXTENSION IF NOT EXISTS "pg_cron"; -- Commented out: not available in Alpine image
 
 -- Create schemas
@@ -234,6 +235,7 @@ CREATE TABLE IF NOT EXISTS ofertas_historicas (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     asesor_id UUID REFERENCES asesores(id) ON DELETE CASCADE,
     solicitud_id UUID REFERENCES solicitudes(id) ON DELETE CASCADE,
+    oferta_id UUID REFERENCES ofertas(id) ON DELETE SET NULL,
     fecha TIMESTAMP WITH TIME ZONE NOT NULL,
     adjudicada BOOLEAN DEFAULT false,
     aceptada_cliente BOOLEAN DEFAULT false,
@@ -336,15 +338,26 @@ CREATE TABLE IF NOT EXISTS logs_auditoria (
 );
 
 -- Create indexes for performance
-CREATE INDEX IF NOT EXISTS idx_solicitudes_estado_fecha ON solicitudes(estado, created_at);
-CREATE INDEX IF NOT EXISTS idx_ofertas_estado_fecha ON ofertas(estado, created_at);
-CREATE INDEX IF NOT EXISTS idx_ofertas_solicitud_asesor ON ofertas(solicitud_id, asesor_id);
-CREATE INDEX IF NOT EXISTS idx_repuestos_solicitud ON repuestos_solicitados(solicitud_id);
+CREATE INDEX IF NOT EXISTS "idx_solicitudes_estado_f5fb80" ON solicitudes(estado, created_at, id);
+CREATE INDEX IF NOT EXISTS "idx_solicitudes_created_2eefe6" ON solicitudes(created_at, id);
+CREATE INDEX IF NOT EXISTS "idx_solicitudes_cliente_310944" ON solicitudes(cliente_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_solicitudes_ciudad_trgm ON solicitudes USING gin (UPPER(ciudad_origen::varchar) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_usuarios_nombre_trgm ON usuarios USING gin (UPPER(nombre::varchar) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_usuarios_apellido_trgm ON usuarios USING gin (UPPER(apellido::varchar) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_usuarios_telefono_trgm ON usuarios USING gin (UPPER(telefono::varchar) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "idx_ofertas_estado_4d74fe" ON ofertas(estado, created_at);
+CREATE INDEX IF NOT EXISTS "idx_ofertas_asesor__1b4da1" ON ofertas(asesor_id, estado, created_at);
+CREATE INDEX IF NOT EXISTS "idx_ofertas_solicit_a2f61a" ON ofertas(solicitud_id, asesor_id);
+CREATE INDEX IF NOT EXISTS "idx_repuestos_s_solicit_c46173" ON repuestos_solicitados(solicitud_id);
+CREATE INDEX IF NOT EXISTS "idx_adjudicacio_oferta__6c1349" ON adjudicaciones_repuesto(oferta_id, created_at);
 CREATE INDEX IF NOT EXISTS idx_ofertas_detalle_oferta ON ofertas_detalle(oferta_id);
 CREATE INDEX IF NOT EXISTS idx_asesores_ciudad_estado ON asesores(ciudad, estado);
-CREATE INDEX IF NOT EXISTS idx_evaluaciones_asesores_temp_solicitud ON evaluaciones_asesores_temp(solicitud_id);
-CREATE INDEX IF NOT EXISTS idx_historial_respuestas_asesor_fecha ON historial_respuestas_ofertas(asesor_id, fecha_envio);
-CREATE INDEX IF NOT EXISTS idx_ofertas_historicas_asesor_fecha ON ofertas_historicas(asesor_id, fecha);
+CREATE INDEX IF NOT EXISTS "idx_evaluacione_solicit_1aab7d" ON evaluaciones_asesores_temp(solicitud_id, nivel_entrega);
+CREATE INDEX IF NOT EXISTS "idx_evaluacione_asesor__b0eae4" ON evaluaciones_asesores_temp(asesor_id, solicitud_id);
+CREATE INDEX IF NOT EXISTS "idx_historial_r_asesor__4925e7" ON historial_respuestas_ofertas(asesor_id, fecha_envio);
+CREATE INDEX IF NOT EXISTS "idx_historial_r_solicit_51e4ee" ON historial_respuestas_ofertas(solicitud_id, asesor_id);
+CREATE INDEX IF NOT EXISTS "idx_ofertas_his_asesor__322666" ON ofertas_historicas(asesor_id, fecha);
+CREATE INDEX IF NOT EXISTS "idx_ofertas_his_oferta__56634f" ON ofertas_historicas(oferta_id);
 CREATE INDEX IF NOT EXISTS idx_eventos_sistema_tipo_fecha ON eventos_sistema(tipo_evento, created_at);
 CREATE INDEX IF NOT EXISTS idx_metricas_calculadas_nombre_periodo ON metricas_calculadas(nombre_metrica, periodo, fecha_periodo);
 CREATE INDEX IF NOT EXISTS idx_municipios_norm ON municipios(municipio_norm);
@@ -4,7 +4,7 @@ Configuration settings for Agent IA Service
 
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
 
 
@@ -22,7 +22,14 @@ class Settings(BaseSettings):
     # Core API Integration
     core_api_url: str = "http://core-api:8000"
     core_api_timeout: int = 30
-    
+    core_api_max_retries: int = 2
+    core_api_retry_backoff_seconds: float = 0.2
+
+    # Shared HTTP client pools (core-api and external downloads)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+
     # Service Authentication
     service_name: str = "agent-ia"
     service_api_key: Optional[str] = None
@@ -79,10 +86,28 @@ class Settings(BaseSettings):
     nlp_timeout_seconds: int = 10
     nlp_max_retries: int = 3
     
+    # Hedged LLM calls: start the next provider of the chain when the current one
+    # is slower than its budget (ms per complexity level, capped by its observed p90)
+    llm_hedging_enabled: bool = False
+    llm_hedge_budget_ms: Dict[str, int] = {"simple": 4000, "complex": 8000, "structured": 12000, "multimedia": 15000}
+    llm_hedge_use_p90: bool = True
+    llm_hedge_max_parallel: int = 2
+    
     # Circuit Breaker Configuration
     circuit_breaker_failure_threshold: int = 3
     circuit_breaker_timeout_seconds: int = 300
     
+    # Message queue workers (per queue; messages of one conversation stay in order)
+    message_workers: int = 8
+    message_worker_max_buffered: int = 200
+    
+    # Reliable queue mode: leased entries, reclaim of stalled ones, retries and dead letters
+    reliable_queue_enabled: bool = True
+    queue_visibility_timeout_seconds: int = 300
+    queue_max_attempts: int = 3
+    queue_retry_backoff_seconds: float = 2.0
+    queue_reclaim_interval_seconds: int = 30
+    
     # Conversation Management
     conversation_ttl_hours: int = 1
     max_conversation_turns: int = 10
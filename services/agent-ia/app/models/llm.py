@@ -48,6 +48,7 @@ class ProcessedData(BaseModel):
     complexity_level: str
     confidence_score: float = 0.0
     processing_time_ms: int = 0
+    cost_usd: float = 0.0
     
     # Raw data
     raw_text: Optional[str] = None
@@ -88,6 +89,7 @@ class ProviderMetrics(BaseModel):
     failed_requests: int = 0
     total_latency_ms: int = 0
     total_cost_usd: float = 0.0
+    cancelled_requests: int = 0  # hedged calls that lost the race
     accuracy_score: float = 0.0
     availability_pct: float = 100.0
     last_used: Optional[datetime] = None
@@ -143,6 +145,8 @@ class CacheEntry(BaseModel):
     ttl_seconds: int
     provider_used: str
     hit_count: int = 0
+    cost_usd: float = 0.0
+    latency_ms: int = 0
 
 
 class ProviderConfig(BaseModel):
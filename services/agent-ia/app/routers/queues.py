@@ -0,0 +1,71 @@
+"""
+Queue administration endpoints
+Worker metrics and dead-letter inspection/replay for the bot message queues
+"""
+
+import logging
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/v1/queues", tags=["queues"])
+
+
+def _verify_admin_key(x_service_api_key: Optional[str]) -> None:
+    """Admin operations require this service's API key (X-Service-API-Key)"""
+    if not settings.service_api_key:
+        raise HTTPException(status_code=503, detail="Service API key not configured")
+    if not x_service_api_key or not secrets.compare_digest(x_service_api_key, settings.service_api_key):
+        raise HTTPException(status_code=401, detail="Invalid service API key")
+
+
+def _get_pool(queue: str):
+    if queue == "telegram":
+        from app.services.telegram_message_processor import telegram_message_processor
+        return telegram_message_processor.worker_pool
+    if queue == "whatsapp":
+        from app.services.whatsapp_message_processor import whatsapp_message_processor
+        return whatsapp_message_processor.worker_pool
+    raise HTTPException(status_code=404, detail=f"Unknown queue: {queue}")
+
+
+def _get_reliable_queue(queue: str):
+    pool = _get_pool(queue)
+    if not pool.queue:
+        raise HTTPException(status_code=409, detail="Reliable queue mode is disabled")
+    return pool.queue
+
+
+@router.get("/{queue}")
+async def get_queue_metrics(queue: str):
+    """Queue depth, worker load, retries, dead letters and per-stage latency"""
+    return await _get_pool(queue).get_metrics()
+
+
+@router.get("/{queue}/dead-letters")
+async def list_dead_letters(
+    queue: str,
+    limit: int = Query(50, ge=1, le=500),
+    x_service_api_key: Optional[str] = Header(None, alias="X-Service-API-Key")
+):
+    """Most recent dead-lettered entries with their last error"""
+    _verify_admin_key(x_service_api_key)
+    return {"queue": queue, "dead_letters": await _get_reliable_queue(queue).list_dead(limit)}
+
+
+@router.post("/{queue}/dead-letters/replay")
+async def replay_dead_letters(
+    queue: str,
+    limit: int = Query(50, ge=1, le=500),
+    x_service_api_key: Optional[str] = Header(None, alias="X-Service-API-Key")
+):
+    """Requeue the oldest dead-lettered entries (attempt count starts over)"""
+    _verify_admin_key(x_service_api_key)
+    replayed = await _get_reliable_queue(queue).replay_dead(limit)
+    logger.info(f"Dead-letter replay on {queue}: {replayed} entries")
+    return {"queue": queue, "replayed": replayed}
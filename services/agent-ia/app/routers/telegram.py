@@ -102,15 +102,18 @@ async def telegram_webhook(
 
 @router.get("/status")
 async def telegram_status():
-    """Get Telegram bot status and configuration"""
+    """Get Telegram bot status, configuration and queue worker metrics"""
     try:
+        from app.services.telegram_message_processor import telegram_message_processor
+        
         webhook_info = await telegram_service.get_webhook_info()
         
         return {
             "service": "Telegram Bot",
             "status": "active",
             "bot_token_configured": bool(settings.telegram_bot_token),
-            "webhook_info": webhook_info.get("result", {}) if webhook_info.get("ok") else None
+            "webhook_info": webhook_info.get("result", {}) if webhook_info.get("ok") else None,
+            "queue_info": await telegram_message_processor.worker_pool.get_metrics()
         }
     except Exception as e:
         logger.error(f"Error getting Telegram status: {e}")
@@ -151,7 +151,9 @@ async def whatsapp_webhook(
 
 @router.get("/whatsapp/status")
 async def webhook_status():
-    """Get webhook status and configuration"""
+    """Get webhook status, configuration and queue worker metrics"""
+    from app.services.whatsapp_message_processor import whatsapp_message_processor
+    
     return {
         "service": "WhatsApp Webhook",
         "status": "active",
@@ -161,7 +163,5 @@ async def webhook_status():
             "signature_verification": settings.webhook_signature_verification,
             "rate_limit_per_minute": settings.rate_limit_per_minute
         },
-        "queue_info": {
-            "queue_length": await redis_manager.llen("whatsapp:message_queue") if redis_manager.redis_client else 0
-        }
+        "queue_info": await whatsapp_message_processor.worker_pool.get_metrics()
     }
\ No newline at end of file
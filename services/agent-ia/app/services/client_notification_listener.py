@@ -7,9 +7,9 @@ import logging
 import json
 import asyncio
 from typing import Dict, Any
-import httpx
 
 from app.core.redis import redis_manager
+from app.services.http_client import core_api_client
 from app.services.telegram_service import telegram_service
 from app.services.whatsapp_service import whatsapp_service
 from app.core.config import settings
@@ -230,20 +230,13 @@ class ClientNotificationListener:
             PDF content as bytes or None if failed
         """
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.core_api_url}/v1/solicitudes/{solicitud_id}/pdf-ofertas",
-                    headers={
-                        "X-Service-API-Key": settings.service_api_key,
-                        "X-Service-Name": "agent-ia"
-                    }
-                )
+            response = await core_api_client.get(f"/v1/solicitudes/{solicitud_id}/pdf-ofertas")
                 
-                if response.status_code == 200:
-                    return response.content
-                else:
-                    logger.error(f"Failed to download PDF: HTTP {response.status_code}")
-                    return None
+            if response.status_code == 200:
+                return response.content
+            else:
+                logger.error(f"Failed to download PDF: HTTP {response.status_code}")
+                return None
         
         except Exception as e:
             logger.error(f"Error downloading PDF: {e}")
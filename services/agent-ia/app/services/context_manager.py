@@ -5,9 +5,9 @@ Maneja el contexto conversacional de cada usuario para interpretación inteligen
 import json
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
-import httpx
 import os
 from app.core.redis import get_redis
+from app.services.http_client import external_http_client
 
 import logging
 logger = logging.getLogger(__name__)
@@ -186,44 +186,43 @@ Responde SOLO con JSON válido (sin markdown):
             
             logger.info(f"🤖 Interpretando con GPT-4: '{message[:50]}...'")
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {openai_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "gpt-4o-mini",  # Más barato pero muy capaz
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "Eres un experto en interpretar intenciones de usuarios en conversaciones. Respondes SOLO con JSON válido."
-                            },
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ],
-                        "temperature": 0.3,
-                        "max_tokens": 300
-                    }
-                )
+            response = await external_http_client.post(
+                "https://api.openai.com/v1/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {openai_api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": "gpt-4o-mini",  # Más barato pero muy capaz
+                    "messages": [
+                        {
+                            "role": "system",
+                            "content": "Eres un experto en interpretar intenciones de usuarios en conversaciones. Respondes SOLO con JSON válido."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    "temperature": 0.3,
+                    "max_tokens": 300
+                }
+            )
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result['choices'][0]['message']['content'].strip()
+            if response.status_code == 200:
+                result = response.json()
+                content = result['choices'][0]['message']['content'].strip()
                     
-                    # Remove markdown if present
-                    content = content.replace('```json', '').replace('```', '').strip()
+                # Remove markdown if present
+                content = content.replace('```json', '').replace('```', '').strip()
                     
-                    interpretation = json.loads(content)
-                    logger.info(f"✅ Interpretación: {interpretation['intent']} - {interpretation['action']}")
+                interpretation = json.loads(content)
+                logger.info(f"✅ Interpretación: {interpretation['intent']} - {interpretation['action']}")
                     
-                    return interpretation
-                else:
-                    logger.error(f"OpenAI API error: {response.status_code}")
-                    return self._fallback_interpretation(message, pending)
+                return interpretation
+            else:
+                logger.error(f"OpenAI API error: {response.status_code}")
+                return self._fallback_interpretation(message, pending)
                     
         except Exception as e:
             logger.error(f"Error in context interpretation: {e}")
@@ -0,0 +1,216 @@
+"""
+Shared HTTP clients
+Application-scoped, connection-pooled httpx clients instead of an AsyncClient per
+call: `core_api_client` (service headers, per-endpoint timeouts, retries with
+jitter) and `external_http_client` for Telegram file downloads and direct OpenAI
+calls. Connections are kept alive between messages, so a message no longer pays
+a TCP/TLS handshake per request. Both are closed in the main.py lifespan.
+"""
+
+import asyncio
+import logging
+import random
+import re
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+from app.utils.latency import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+# Timeouts (seconds) for core-api endpoints that must answer faster than the default
+CORE_API_ENDPOINT_TIMEOUTS: Dict[str, float] = {
+    "/v1/solicitudes/services/municipio": 10.0,
+    "/health": 5.0,
+}
+
+# Responses worth retrying for idempotent requests (core-api restarting / overloaded)
+RETRY_STATUS_CODES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Failures where the request never reached the server: safe to retry for any method
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Path segments with digits (ids, uuids; not the API version) are grouped in the metrics
+_ID_SEGMENT = re.compile(r"/(?!v\d+(?:/|$))[^/]*\d[^/]*(?=/|$)")
+
+
+class PooledHTTPClient:
+    """
+    Lazily created httpx.AsyncClient shared by every caller, with per-endpoint
+    metrics. Idempotent requests are retried on transport errors and 502/503/504;
+    other methods only when the connection could not be established.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str = "",
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 30.0,
+        endpoint_timeouts: Optional[Dict[str, float]] = None,
+        max_retries: int = 0,
+        retry_backoff: float = 0.2,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.endpoint_timeouts = endpoint_timeouts or {}
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=settings.http_max_connections,
+                    max_keepalive_connections=settings.http_max_keepalive_connections,
+                    keepalive_expiry=settings.http_keepalive_expiry_seconds
+                ),
+                transport=self.transport
+            )
+        return self._client
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        timeout: Optional[float] = None,
+        retry: bool = True,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request through the shared pool
+
+        Args:
+            method: HTTP method
+            url: Path relative to the base URL, or an absolute URL
+            timeout: Overrides the endpoint/default timeout
+            retry: False to send the request exactly once
+        """
+        method = method.upper()
+        endpoint = self._endpoint_label(method, url)
+        kwargs["timeout"] = timeout if timeout is not None else self._timeout_for(url)
+        max_retries = self.max_retries if retry else 0
+        send = getattr(self.client, method.lower())
+
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                response = await send(url, **kwargs)
+            except httpx.TransportError as e:
+                self._record(endpoint, start, error=True)
+                retryable = isinstance(e, _NOT_SENT_ERRORS) or method in IDEMPOTENT_METHODS
+                if not retryable or attempt >= max_retries:
+                    raise
+                logger.warning(f"{self.name} {endpoint} failed ({type(e).__name__}), retrying")
+            else:
+                status_code = response.status_code
+                self._record(endpoint, start, error=status_code >= 500)
+                if (
+                    status_code not in RETRY_STATUS_CODES
+                    or method not in IDEMPOTENT_METHODS
+                    or attempt >= max_retries
+                ):
+                    return response
+                logger.warning(f"{self.name} {endpoint} returned {status_code}, retrying")
+
+            attempt += 1
+            self._metrics[endpoint]["retries"] += 1
+            # Full jitter: concurrent workers do not retry in lockstep
+            await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ------------------------------------------------------------------
+    # Helpers / metrics
+    # ------------------------------------------------------------------
+
+    def _timeout_for(self, url: str) -> float:
+        path = urlsplit(url).path
+        matches = [prefix for prefix in self.endpoint_timeouts if path.startswith(prefix)]
+        if not matches:
+            return self.timeout
+        return self.endpoint_timeouts[max(matches, key=len)]
+
+    def _endpoint_label(self, method: str, url: str) -> str:
+        parts = urlsplit(url)
+        # Paths of external hosts may carry secrets (Telegram bot token): label by host only
+        if not self.base_url or (parts.netloc and not self.base_url.startswith(f"{parts.scheme}://{parts.netloc}")):
+            return f"{method} {parts.netloc}"
+        return f"{method} {_ID_SEGMENT.sub('/{id}', parts.path)}"
+
+    def _record(self, endpoint: str, start: float, error: bool) -> None:
+        metrics = self._metrics.setdefault(
+            endpoint, {"requests": 0, "errors": 0, "retries": 0, "latency": LatencyStats()}
+        )
+        metrics["requests"] += 1
+        if error:
+            metrics["errors"] += 1
+        metrics["latency"].record((time.monotonic() - start) * 1000)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Requests, errors, retries and latency per endpoint"""
+        return {
+            endpoint: {**{k: v for k, v in metrics.items() if k != "latency"}, "latency": metrics["latency"].snapshot()}
+            for endpoint, metrics in self._metrics.items()
+        }
+
+
+def _service_headers() -> Dict[str, str]:
+    headers = {"X-Service-Name": settings.service_name}
+    if settings.service_api_key:
+        headers["X-Service-API-Key"] = settings.service_api_key
+    return headers
+
+
+# Global instances
+core_api_client = PooledHTTPClient(
+    "core-api",
+    base_url=settings.core_api_url,
+    headers=_service_headers(),
+    timeout=settings.core_api_timeout,
+    endpoint_timeouts=CORE_API_ENDPOINT_TIMEOUTS,
+    max_retries=settings.core_api_max_retries,
+    retry_backoff=settings.core_api_retry_backoff_seconds
+)
+external_http_client = PooledHTTPClient("external", timeout=30.0)
+
+
+async def close_http_clients():
+    """Close the shared pools (application shutdown)"""
+    await core_api_client.close()
+    await external_http_client.close()
+
+
+def get_http_client_metrics() -> Dict[str, Any]:
+    return {
+        core_api_client.name: core_api_client.get_metrics(),
+        external_http_client.name: external_http_client.get_metrics()
+    }
@@ -2,6 +2,7 @@
 Main LLM Provider Service that coordinates all providers
 """
 
+import asyncio
 import time
 import json
 import logging
@@ -26,9 +27,13 @@ from .anthropic_adapter import AnthropicAdapter
 from .llm_router import llm_router
 from .circuit_breaker import circuit_breaker_manager
 from .metrics_collector import metrics_collector
+from app.utils.latency import LatencyStats
 
 logger = logging.getLogger(__name__)
 
+# Samples needed before a provider's observed p90 replaces the configured hedge budget
+MIN_HEDGE_SAMPLES = 20
+
 
 class RegexProcessor:
     """Simple regex-based processor for fallback"""
@@ -177,6 +182,10 @@ class LLMProviderService:
         self.basic_processor = BasicProcessor()
         self.provider_configs: Dict[str, ProviderConfig] = {}
         
+        # Recent successful latencies per provider (hedge budgets) and hedging counters
+        self.latency_stats: Dict[str, LatencyStats] = {}
+        self.hedge_stats = {"hedged_requests": 0, "hedge_wins": 0, "cancelled_calls": 0}
+        
         # Initialize adapters
         self._initialize_adapters()
         self._load_provider_configs()
@@ -267,6 +276,16 @@ class LLMProviderService:
             
             logger.info(f"Processing request with complexity {complexity.value}, fallback chain: {[p.value for p in fallback_chain]}")
             
+            # Hedged mode: LLM providers race with a latency budget, regex/basic stay as fallbacks
+            llm_chain = [p.value for p in fallback_chain if p.value in self.adapters]
+            if settings.llm_hedging_enabled and len(llm_chain) > 1:
+                providers_tried.extend(llm_chain)
+                result = await self._process_hedged(llm_chain, request)
+                if result:
+                    await llm_router.cache_response(request, result)
+                    return result
+                fallback_chain = [p for p in fallback_chain if p in (LLMProvider.REGEX, LLMProvider.BASIC)]
+            
             for provider in fallback_chain:
                 providers_tried.append(provider.value)
                 
@@ -351,6 +370,7 @@ class LLMProviderService:
             
             # Record metrics
             processing_time = int((time.time() - start_time) * 1000)
+            self.latency_stats.setdefault(provider_name, LatencyStats()).record(processing_time)
             await metrics_collector.record_request(
                 provider=provider_name,
                 complexity=request.complexity_level,
@@ -362,6 +382,19 @@ class LLMProviderService:
             
             return processed_data
             
+        except asyncio.CancelledError:
+            # Lost a hedged race: the provider still bills the call, record its estimated cost
+            processing_time = int((time.time() - start_time) * 1000)
+            self.hedge_stats["cancelled_calls"] += 1
+            await metrics_collector.record_request(
+                provider=provider_name,
+                complexity=request.complexity_level,
+                latency_ms=processing_time,
+                cost_usd=self._estimate_cost(provider_name, request),
+                success=False,
+                cancelled=True
+            )
+            raise
         except Exception as e:
             # Record failed request
             processing_time = int((time.time() - start_time) * 1000)
@@ -374,6 +407,93 @@ class LLMProviderService:
             )
             raise e
     
+    async def _process_hedged(self, providers: List[str], request: LLMRequest) -> Optional[ProcessedData]:
+        """
+        Run the LLM part of the fallback chain as a hedged race
+        
+        The first provider starts alone; if it has not answered within its budget
+        the next one is started (up to llm_hedge_max_parallel in flight). A failure
+        starts the next provider right away. The first parsed response wins and the
+        other calls are cancelled. Returns None if every provider failed.
+        """
+        queue = list(providers)
+        pending: Dict[asyncio.Task, str] = {}
+        unparsed: Optional[ProcessedData] = None
+        first_provider: Optional[str] = None
+        hedged = False
+        
+        async def start_next() -> Optional[str]:
+            while queue:
+                provider = queue.pop(0)
+                circuit_breaker = circuit_breaker_manager.get_circuit_breaker(provider)
+                if not await circuit_breaker.is_available():
+                    logger.warning(f"Circuit breaker OPEN for {provider}, skipping")
+                    continue
+                logger.info(f"Attempting processing with {provider}")
+                pending[asyncio.create_task(self._process_with_provider(provider, request))] = provider
+                return provider
+            return None
+        
+        try:
+            current = first_provider = await start_next()
+            started_at = time.monotonic()
+            while pending:
+                timeout = None
+                if current and queue and len(pending) < settings.llm_hedge_max_parallel:
+                    budget = self._hedge_budget_seconds(current, request.complexity_level)
+                    timeout = max(budget - (time.monotonic() - started_at), 0)
+                
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    slow = current
+                    current = await start_next()
+                    started_at = time.monotonic()
+                    if current:
+                        hedged = True
+                        self.hedge_stats["hedged_requests"] += 1
+                        logger.info(f"{slow} over its latency budget, hedging with {current}")
+                    continue
+                
+                for task in done:
+                    provider = pending.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        logger.warning(f"Provider {provider} failed in hedged call, trying next: {error}")
+                        if len(pending) < settings.llm_hedge_max_parallel:
+                            current = await start_next() or current
+                            started_at = time.monotonic()
+                        continue
+                    
+                    result = task.result()
+                    if result.extracted_entities:
+                        if hedged and provider != first_provider:
+                            self.hedge_stats["hedge_wins"] += 1
+                        logger.info(f"Successfully processed with {provider}, confidence: {result.confidence_score:.2f}")
+                        return result
+                    # Unparsed answer: keep it unless a call still in flight does better
+                    unparsed = unparsed or result
+            
+            return unparsed
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    def _hedge_budget_seconds(self, provider: str, complexity: ComplexityLevel) -> float:
+        """Configured budget for the complexity, or the provider's p90 when lower"""
+        budget_ms = settings.llm_hedge_budget_ms.get(complexity.value, settings.nlp_timeout_seconds * 1000)
+        stats = self.latency_stats.get(provider)
+        if settings.llm_hedge_use_p90 and stats and len(stats.samples) >= MIN_HEDGE_SAMPLES:
+            budget_ms = min(budget_ms, stats.percentile(90))
+        return budget_ms / 1000
+    
+    def _estimate_cost(self, provider_name: str, request: LLMRequest) -> float:
+        try:
+            return self.adapters[provider_name].get_cost_estimate(len(request.text or ""))
+        except Exception:
+            return 0.0
+    
     def _parse_llm_response(self, llm_response: LLMResponse, complexity: ComplexityLevel) -> ProcessedData:
         """Parse LLM response to ProcessedData"""
         try:
@@ -428,6 +548,7 @@ class LLMProviderService:
                 complexity_level=complexity.value,
                 confidence_score=confidence_score,
                 processing_time_ms=llm_response.latency_ms,
+                cost_usd=llm_response.cost_usd or 0.0,
                 raw_text=content,
                 extracted_entities=data,
                 is_complete=is_complete,
@@ -447,6 +568,7 @@ class LLMProviderService:
                 complexity_level=complexity.value,
                 confidence_score=0.2,
                 processing_time_ms=llm_response.latency_ms,
+                cost_usd=llm_response.cost_usd or 0.0,
                 raw_text=llm_response.content,
                 is_complete=False,
                 missing_fields=["repuestos", "vehiculo", "cliente"]
@@ -461,7 +583,12 @@ class LLMProviderService:
             "available_providers": list(self.adapters.keys()),
             "circuit_breakers": await circuit_breaker_manager.get_all_states(),
             "metrics": await metrics_collector.get_all_provider_metrics(),
-            "routing_stats": await llm_router.get_routing_stats()
+            "routing_stats": await llm_router.get_routing_stats(),
+            "hedging": {
+                "enabled": settings.llm_hedging_enabled,
+                **self.hedge_stats,
+                "latency": {provider: stats.snapshot() for provider, stats in self.latency_stats.items()}
+            }
         }
         
         return status
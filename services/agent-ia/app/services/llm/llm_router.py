@@ -3,22 +3,18 @@ LLM Router for automatic provider selection
 """
 
 import logging
-import hashlib
-import json
 from typing import List, Optional, Dict, Any, Tuple
-from datetime import datetime
 
 from app.models.llm import (
     ComplexityLevel, 
     LLMProvider, 
     LLMRequest, 
-    ProcessedData,
-    CacheEntry
+    ProcessedData
 )
-from app.core.redis import redis_manager
 from app.core.config import settings
 from .circuit_breaker import circuit_breaker_manager
 from .metrics_collector import metrics_collector
+from .response_cache import llm_response_cache
 
 logger = logging.getLogger(__name__)
 
@@ -192,45 +188,13 @@ class LLMRouter:
         return None
     
     def generate_cache_key(self, request: LLMRequest) -> str:
-        """Generate cache key for request"""
-        # Create hash of request content
-        content_parts = []
-        if request.text:
-            content_parts.append(f"text:{request.text}")
-        if request.image_url:
-            content_parts.append(f"image:{request.image_url}")
-        if request.audio_url:
-            content_parts.append(f"audio:{request.audio_url}")
-        if request.document_url:
-            content_parts.append(f"document:{request.document_url}")
-        
-        content_str = "|".join(content_parts)
-        content_hash = hashlib.sha256(content_str.encode()).hexdigest()[:16]
-        
-        return f"llm_cache:{content_hash}"
+        """Generate cache key for request (canonical text, see response_cache)"""
+        return llm_response_cache.cache_key(request)
     
     async def get_cached_response(self, request: LLMRequest) -> Optional[ProcessedData]:
         """Get cached response if available"""
         try:
-            cache_key = self.generate_cache_key(request)
-            cached_data = await redis_manager.get(cache_key)
-            
-            if cached_data:
-                cache_entry = CacheEntry(**json.loads(cached_data))
-                
-                # Update hit count
-                cache_entry.hit_count += 1
-                await redis_manager.set(
-                    cache_key,
-                    cache_entry.model_dump_json(),
-                    ttl=self.cache_ttl
-                )
-                
-                logger.info(f"Cache hit for request (hits: {cache_entry.hit_count})")
-                return cache_entry.response
-            
-            return None
-            
+            return await llm_response_cache.get(request)
         except Exception as e:
             logger.error(f"Error getting cached response: {e}")
             return None
@@ -238,25 +202,7 @@ class LLMRouter:
     async def cache_response(self, request: LLMRequest, response: ProcessedData):
         """Cache response"""
         try:
-            cache_key = self.generate_cache_key(request)
-            
-            cache_entry = CacheEntry(
-                request_hash=cache_key,
-                response=response,
-                created_at=datetime.now(),
-                ttl_seconds=self.cache_ttl,
-                provider_used=response.provider_used,
-                hit_count=0
-            )
-            
-            await redis_manager.set(
-                cache_key,
-                cache_entry.model_dump_json(),
-                ttl=self.cache_ttl
-            )
-            
-            logger.info(f"Cached response from {response.provider_used}")
-            
+            await llm_response_cache.put(request, response)
         except Exception as e:
             logger.error(f"Error caching response: {e}")
     
@@ -313,7 +259,8 @@ class LLMRouter:
                 },
                 "circuit_breaker_states": await circuit_breaker_manager.get_all_states(),
                 "provider_metrics": await metrics_collector.get_all_provider_metrics(),
-                "cost_summary": await metrics_collector.get_cost_summary()
+                "cost_summary": await metrics_collector.get_cost_summary(),
+                "cache": await llm_response_cache.get_stats()
             }
             
             return stats
@@ -28,9 +28,13 @@ class MetricsCollector:
         latency_ms: int, 
         cost_usd: float, 
         success: bool,
-        accuracy_score: Optional[float] = None
+        accuracy_score: Optional[float] = None,
+        cancelled: bool = False
     ):
-        """Record metrics for a request"""
+        """
+        Record metrics for a request
+        A cancelled request (loser of a hedged call) only adds its estimated cost
+        """
         try:
             timestamp = datetime.now()
             date_key = timestamp.strftime("%Y-%m-%d")
@@ -62,10 +66,13 @@ class MetricsCollector:
                 }
             
             # Update metrics
-            metrics_data["total_requests"] += 1
             metrics_data["last_used"] = timestamp.isoformat()
             
-            if success:
+            if cancelled:
+                metrics_data["cancelled_requests"] = metrics_data.get("cancelled_requests", 0) + 1
+                metrics_data["total_cost_usd"] += cost_usd
+            elif success:
+                metrics_data["total_requests"] += 1
                 metrics_data["successful_requests"] += 1
                 metrics_data["total_latency_ms"] += latency_ms
                 metrics_data["total_cost_usd"] += cost_usd
@@ -73,6 +80,7 @@ class MetricsCollector:
                 if accuracy_score is not None:
                     metrics_data["accuracy_scores"].append(accuracy_score)
             else:
+                metrics_data["total_requests"] += 1
                 metrics_data["failed_requests"] += 1
             
             # Update complexity breakdown
@@ -111,6 +119,7 @@ class MetricsCollector:
             failed_requests = 0
             total_latency_ms = 0
             total_cost_usd = 0.0
+            cancelled_requests = 0
             accuracy_scores = []
             last_used = None
             
@@ -126,6 +135,7 @@ class MetricsCollector:
                     failed_requests += metrics_data.get("failed_requests", 0)
                     total_latency_ms += metrics_data.get("total_latency_ms", 0)
                     total_cost_usd += metrics_data.get("total_cost_usd", 0.0)
+                    cancelled_requests += metrics_data.get("cancelled_requests", 0)
                     accuracy_scores.extend(metrics_data.get("accuracy_scores", []))
                     
                     if metrics_data.get("last_used"):
@@ -150,6 +160,7 @@ class MetricsCollector:
                 failed_requests=failed_requests,
                 total_latency_ms=total_latency_ms,
                 total_cost_usd=total_cost_usd,
+                cancelled_requests=cancelled_requests,
                 accuracy_score=accuracy_score,
                 availability_pct=availability_pct,
                 last_used=last_used
@@ -0,0 +1,179 @@
+"""
+Cache for LLM extraction responses keyed by a canonical form of the text
+(lowercase, no accents or punctuation, "mazda3" -> "mazda 3", filler words
+dropped, slang mapped to the catalog term), so "Pastillas de freno Mazda 3 2015"
+and "pastillas freno mazda3 2015" share one entry. There is no nearest-neighbor
+level: word order carries meaning ("delantero derecho y trasero izquierdo"),
+and serving the wrong part position is worse than a miss.
+
+Hit counts, hit rate and the LLM cost/latency saved are kept in Redis counters
+instead of rewriting the cached entry on every hit.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.models.llm import CacheEntry, LLMRequest, ProcessedData
+from app.core.redis import redis_manager
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Slang / variants -> catalog term (same groups as the regex fallback processor)
+SYNONYMS: Dict[str, str] = {
+    "caucho": "llanta",
+    "cauchos": "llantas",
+    "neumatico": "llanta",
+    "neumaticos": "llantas",
+    "pluma": "amortiguador",
+    "plumas": "amortiguadores",
+    "junta": "empaque",
+    "juntas": "empaques",
+    "balata": "pastilla",
+    "balatas": "pastillas",
+}
+
+# Filler words that do not change what the customer is asking for
+STOPWORDS = {
+    "de", "del", "el", "la", "los", "las", "un", "una", "unos", "unas",
+    "para", "por", "al", "a", "y", "e"
+}
+
+
+def canonical_text(text: Optional[str]) -> str:
+    """
+    Canonical form of a customer message for cache lookups
+    "Pastillas de freno Mazda 3 2015!" -> "pastillas freno mazda 3 2015"
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    # "mazda3" / "3puertas" -> separate model names from numbers
+    text = re.sub(r"(?<=[a-z])(?=\d)|(?<=\d)(?=[a-z])", " ", text)
+    return " ".join(SYNONYMS.get(word, word) for word in text.split() if word not in STOPWORDS)
+
+
+class LLMResponseCache:
+    """Redis-backed LLM response cache shared by every agent-ia replica"""
+
+    KEY_PREFIX = "llm_cache"
+
+    def __init__(self):
+        self.ttl = settings.cache_ttl_hours * 3600
+        self.hit_counts_key = f"{self.KEY_PREFIX}:hit_counts"
+        self.stats_key = f"{self.KEY_PREFIX}:stats"
+
+    @property
+    def _client(self):
+        return redis_manager.redis_client
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+
+    def _key_for(self, content_parts: List[str]) -> str:
+        content_hash = hashlib.sha256("|".join(content_parts).encode()).hexdigest()[:16]
+        return f"{self.KEY_PREFIX}:{content_hash}"
+
+    def cache_key(self, request: LLMRequest) -> str:
+        """Cache key of the canonical request content"""
+        content_parts = []
+        if request.text:
+            content_parts.append(f"text:{canonical_text(request.text)}")
+        if request.image_url:
+            content_parts.append(f"image:{request.image_url}")
+        if request.audio_url:
+            content_parts.append(f"audio:{request.audio_url}")
+        if request.document_url:
+            content_parts.append(f"document:{request.document_url}")
+        return self._key_for(content_parts)
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    async def get(self, request: LLMRequest) -> Optional[ProcessedData]:
+        """Cached response for the canonical request content"""
+        if not self._client:
+            return None
+
+        start = time.monotonic()
+        key = self.cache_key(request)
+        cached_data = await self._client.get(key)
+
+        if not cached_data:
+            await self._client.hincrby(self.stats_key, "lookups", 1)
+            return None
+
+        entry = CacheEntry(**json.loads(cached_data))
+        saved_latency_ms = max(entry.latency_ms - (time.monotonic() - start) * 1000, 0)
+
+        pipe = self._client.pipeline(transaction=False)
+        pipe.hincrby(self.hit_counts_key, key, 1)
+        pipe.expire(self.hit_counts_key, self.ttl)
+        pipe.hincrby(self.stats_key, "lookups", 1)
+        pipe.hincrby(self.stats_key, "hits", 1)
+        pipe.hincrbyfloat(self.stats_key, "saved_cost_usd", entry.cost_usd)
+        pipe.hincrbyfloat(self.stats_key, "saved_latency_ms", saved_latency_ms)
+        hits = (await pipe.execute())[0]
+
+        logger.info(f"Cache hit for request (hits: {hits})")
+        response = entry.response
+        if request.text and response.raw_text is not None:
+            response = response.model_copy(update={"raw_text": request.text})
+        return response
+
+    async def put(self, request: LLMRequest, response: ProcessedData) -> None:
+        if not self._client:
+            return
+
+        key = self.cache_key(request)
+        entry = CacheEntry(
+            request_hash=key,
+            response=response,
+            created_at=datetime.now(),
+            ttl_seconds=self.ttl,
+            provider_used=response.provider_used,
+            cost_usd=response.cost_usd,
+            latency_ms=response.processing_time_ms
+        )
+
+        pipe = self._client.pipeline(transaction=False)
+        pipe.setex(key, self.ttl, entry.model_dump_json())
+        pipe.hdel(self.hit_counts_key, key)
+        await pipe.execute()
+
+        logger.info(f"Cached response from {response.provider_used}")
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Hit rate and the LLM cost and latency saved by cache hits"""
+        if not self._client:
+            return {}
+        stats = await self._client.hgetall(self.stats_key)
+        lookups = int(stats.get("lookups", 0))
+        hits = int(stats.get("hits", 0))
+        saved_latency_ms = float(stats.get("saved_latency_ms", 0))
+        return {
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "saved_cost_usd": round(float(stats.get("saved_cost_usd", 0)), 4),
+            "saved_latency_ms": round(saved_latency_ms),
+            "avg_saved_latency_ms": round(saved_latency_ms / hits, 1) if hits else 0.0
+        }
+
+
+# Global LLM response cache instance
+llm_response_cache = LLMResponseCache()
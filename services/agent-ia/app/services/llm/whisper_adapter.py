@@ -8,6 +8,7 @@ import time
 from typing import Dict, Any, Optional
 
 from app.core.config import settings
+from app.services.http_client import external_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -79,10 +80,9 @@ class WhisperAdapter:
     async def _download_audio(self, audio_url: str) -> Optional[bytes]:
         """Download audio file from URL"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(audio_url)
-                response.raise_for_status()
-                return response.content
+            response = await external_http_client.get(audio_url)
+            response.raise_for_status()
+            return response.content
         except Exception as e:
             logger.error(f"Error downloading audio: {e}")
             return None
@@ -118,23 +118,23 @@ class WhisperAdapter:
                 "response_format": "text"
             }
             
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    url, 
-                    headers=headers, 
-                    files=files,
-                    data=data
-                )
-                response.raise_for_status()
+            response = await external_http_client.post(
+                url, 
+                headers=headers, 
+                files=files,
+                data=data,
+                timeout=60.0
+            )
+            response.raise_for_status()
                 
-                # Whisper returns plain text when response_format=text
-                transcription = response.text.strip()
+            # Whisper returns plain text when response_format=text
+            transcription = response.text.strip()
                 
-                if not transcription:
-                    logger.warning("Whisper returned empty transcription")
-                    return ""
+            if not transcription:
+                logger.warning("Whisper returned empty transcription")
+                return ""
                 
-                return transcription
+            return transcription
                 
         except httpx.HTTPStatusError as e:
             logger.error(f"Whisper API HTTP error: {e.response.status_code} - {e.response.text}")
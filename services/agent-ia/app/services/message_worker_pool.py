@@ -0,0 +1,311 @@
+"""
+Worker pool for the bot message queues
+Consumes a Redis list with a configurable number of async workers. Messages are
+partitioned by conversation (chat_id / from_number): each conversation is processed
+strictly in order while different conversations run in parallel, so one slow LLM
+call no longer blocks every other customer.
+
+In reliable mode (default) entries are leased through ReliableQueue. A handler
+that returns (even with {"success": False}, e.g. after replying with an error)
+has handled the message and it is acked. Transient errors it raises (transport
+errors, timeouts, 5xx responses) are retried in the lane with backoff; other
+exceptions and messages that keep failing go to the dead-letter list. Entries
+of a crashed consumer are reclaimed.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+import httpx
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+from app.services.reliable_queue import ReliableQueue
+from app.utils.latency import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+# Cap for the retry backoff between attempts of one message
+MAX_RETRY_BACKOFF_SECONDS = 60
+
+# Errors that may succeed on a later attempt (HTTPStatusError is transient only for 5xx)
+TRANSIENT_ERRORS = (
+    httpx.TransportError, asyncio.TimeoutError, ConnectionError, TimeoutError,
+    RedisConnectionError, RedisTimeoutError
+)
+
+def is_transient(error: Exception) -> bool:
+    """Whether a handler error may succeed on a later attempt"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+# Pool whose worker is running the current task (for stage() inside the pipeline)
+_current_pool: ContextVar[Optional["MessageWorkerPool"]] = ContextVar("current_message_pool", default=None)
+
+
+@asynccontextmanager
+async def stage(name: str):
+    """
+    Measure a stage of the message pipeline (e.g. LLM interpretation)
+    Recorded in the pool that is processing the current message; no-op outside a worker
+    """
+    pool = _current_pool.get()
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        if pool is not None:
+            pool.record_stage(name, (time.monotonic() - start) * 1000)
+
+
+class MessageWorkerPool:
+    """
+    Consume a Redis queue with N workers, ordered per conversation
+
+    A single dispatcher pops messages (BRPOP, or BLMOVE in reliable mode) into
+    per-conversation lanes; a conversation is owned by at most one worker at a
+    time, which drains its lane in order. At most `max_buffered` popped messages
+    are held in memory, so a backlog stays in Redis (visible as queue depth)
+    instead of in the process. Leases of held messages are renewed on every
+    reclaim tick.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        queue_key: str,
+        partition_key: Callable[[Dict[str, Any]], str],
+        handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+        workers: Optional[int] = None,
+        max_buffered: Optional[int] = None,
+        pop_timeout: int = 5,
+        reliable: Optional[bool] = None
+    ):
+        self.name = name
+        self.queue_key = queue_key
+        self.partition_key = partition_key
+        self.handler = handler
+        self.workers = workers or settings.message_workers
+        self.max_buffered = max_buffered or settings.message_worker_max_buffered
+        self.pop_timeout = pop_timeout
+        reliable = settings.reliable_queue_enabled if reliable is None else reliable
+        self.queue: Optional[ReliableQueue] = ReliableQueue(queue_key) if reliable else None
+
+        self._lanes: Dict[str, Deque[Tuple[Dict[str, Any], float, str]]] = {}
+        self._held: Set[str] = set()
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_buffered)
+        self._buffered = 0
+        self._busy_workers = 0
+
+        self.processed = 0
+        self.failed = 0
+        self.retries = 0
+        self.dead_lettered = 0
+        self.stages: Dict[str, LatencyStats] = {}
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """Run the dispatcher and workers until cancelled"""
+        logger.info(f"🧵 {self.name} worker pool started: {self.workers} workers on {self.queue_key}")
+        tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.queue:
+            tasks.append(asyncio.create_task(self._reclaim_loop()))
+        try:
+            await self._dispatch_loop()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info(f"{self.name} worker pool stopped")
+
+    async def _dispatch_loop(self):
+        while True:
+            await self._slots.acquire()
+            started = time.monotonic()
+            try:
+                message_json = await self._pop()
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+            except Exception as e:
+                logger.error(f"Error popping from {self.queue_key}: {e}")
+                message_json = None
+
+            if not message_json:
+                self._slots.release()
+                # Pops return right away when Redis is down; avoid spinning
+                if time.monotonic() - started < 1:
+                    await asyncio.sleep(1)
+                continue
+
+            await self.submit(message_json)
+
+    async def _pop(self) -> Optional[str]:
+        if self.queue:
+            return await self.queue.pop(timeout=self.pop_timeout)
+        message_data = await redis_manager.brpop(self.queue_key, timeout=self.pop_timeout)
+        return message_data[1] if message_data else None
+
+    async def submit(self, message_json: str) -> None:
+        """
+        Place a popped message in its conversation lane (caller holds a buffer slot)
+        In reliable mode message_json is the queue envelope, kept as the handle for ack/dead_letter
+        """
+        try:
+            message = json.loads(self.queue.payload(message_json) if self.queue else message_json)
+            key = str(self.partition_key(message))
+        except Exception as e:
+            logger.error(f"Unreadable {self.name} queue entry: {e}")
+            self.failed += 1
+            self._slots.release()
+            if self.queue:
+                try:
+                    await self.queue.dead_letter(message_json, f"unreadable entry: {e}", 1)
+                    self.dead_lettered += 1
+                except Exception as redis_error:
+                    logger.error(f"Error dead-lettering {self.name} entry: {redis_error}")
+            return
+
+        self._record_queue_wait(message)
+        self._buffered += 1
+        self._held.add(message_json)
+
+        lane = self._lanes.get(key)
+        if lane is None:
+            self._lanes[key] = deque([(message, time.monotonic(), message_json)])
+            self._ready.put_nowait(key)
+        else:
+            lane.append((message, time.monotonic(), message_json))
+
+    async def _worker(self):
+        _current_pool.set(self)
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes[key]
+            self._busy_workers += 1
+            try:
+                while lane:
+                    message, received, message_json = lane.popleft()
+                    await self._process(message, received, message_json)
+            finally:
+                self._busy_workers -= 1
+                # No await between the last check and here: new messages either
+                # landed in this lane (and were drained) or will open a new one
+                del self._lanes[key]
+
+    async def _process(self, message: Dict[str, Any], received: float, message_json: str) -> None:
+        start = time.monotonic()
+        self.record_stage("local_wait", (start - received) * 1000)
+        try:
+            if self.queue:
+                await self._process_reliable(message, message_json)
+            else:
+                ok, _ = await self._attempt(message)
+                self._count(ok)
+        except Exception as e:
+            # Redis errors while acking: the lease expires and the entry is reclaimed
+            self.failed += 1
+            logger.error(f"Error settling {self.name} message: {e}")
+        finally:
+            self.record_stage("processing", (time.monotonic() - start) * 1000)
+            self._buffered -= 1
+            self._held.discard(message_json)
+            self._slots.release()
+
+    async def _process_reliable(self, message: Dict[str, Any], message_json: str) -> None:
+        """Retry transient errors in the lane (keeps the conversation ordered), then ack or dead-letter"""
+        attempt = await self.queue.previous_attempts(message_json)
+        while True:
+            attempt += 1
+            ok, error = await self._attempt(message)
+            if error is None:
+                # Handled, even if it reported a failure: a retry would answer the user twice
+                await self.queue.ack(message_json)
+                self._count(ok)
+                return
+            if not is_transient(error) or attempt >= self.queue.max_attempts:
+                await self.queue.dead_letter(message_json, str(error), attempt)
+                self.failed += 1
+                self.dead_lettered += 1
+                return
+
+            self.retries += 1
+            backoff = min(settings.queue_retry_backoff_seconds * 2 ** (attempt - 1), MAX_RETRY_BACKOFF_SECONDS)
+            logger.warning(f"Retrying {self.name} message in {backoff:.0f}s (attempt {attempt}): {error}")
+            await asyncio.sleep(backoff)
+
+    async def _attempt(self, message: Dict[str, Any]) -> Tuple[bool, Optional[Exception]]:
+        """Run the handler once; returns (success reported by the handler, exception it raised)"""
+        try:
+            result = await self.handler(message)
+        except Exception as e:
+            logger.error(f"Error processing {self.name} message: {e}", exc_info=True)
+            return False, e
+        if isinstance(result, dict) and result.get("success") is False:
+            logger.warning(f"{self.name} handler reported failure: {result.get('details') or result.get('error')}")
+            return False, None
+        return True, None
+
+    def _count(self, ok: bool) -> None:
+        if ok:
+            self.processed += 1
+        else:
+            self.failed += 1
+
+    async def _reclaim_loop(self):
+        """Keep held messages leased and return stalled entries of dead consumers"""
+        while True:
+            await asyncio.sleep(settings.queue_reclaim_interval_seconds)
+            try:
+                await self.queue.renew(list(self._held))
+                await self.queue.reclaim()
+            except Exception as e:
+                logger.error(f"Error reclaiming {self.queue_key} entries: {e}")
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def record_stage(self, name: str, ms: float) -> None:
+        self.stages.setdefault(name, LatencyStats()).record(ms)
+
+    def _record_queue_wait(self, message: Dict[str, Any]) -> None:
+        queued_at = message.get("queued_at")
+        if not queued_at:
+            return
+        try:
+            waited = datetime.now() - datetime.fromisoformat(queued_at)
+            self.record_stage("queue_wait", max(waited.total_seconds(), 0) * 1000)
+        except (TypeError, ValueError):
+            pass
+
+    async def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth, in-process load and per-stage latency"""
+        return {
+            "queue": self.queue_key,
+            "queue_depth": await redis_manager.llen(self.queue_key) if redis_manager.redis_client else 0,
+            "workers": self.workers,
+            "busy_workers": self._busy_workers,
+            "buffered": self._buffered,
+            "active_conversations": len(self._lanes),
+            "processed": self.processed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "dead_lettered": self.dead_lettered,
+            "reliable": await self.queue.get_stats() if self.queue and redis_manager.redis_client else None,
+            "latency": {name: stats.snapshot() for name, stats in self.stages.items()}
+        }
@@ -0,0 +1,223 @@
+"""
+Reliable Redis list queue with in-flight leasing and a dead-letter list
+Producers keep LPUSHing raw payloads to the same list; consumers BLMOVE each
+entry into `<queue>:processing`, where it is wrapped in an envelope with a
+unique id (`{"rq_id": ..., "payload": ...}`) and leased (`<queue>:leases`, a
+sorted set scored by lease deadline) until acked. Leases, attempt counters and
+removals use the envelope, so identical payloads never share them. Entries
+whose lease expires (the consumer crashed or stalled) are moved back to the
+queue by any consumer, and entries that exhaust their attempts go to
+`<queue>:dead` for inspection and replay.
+
+Every move between lists is a single Lua script or MULTI/EXEC, so a crash never
+leaves an entry in neither list. Delivery is at-least-once: a reclaimed entry
+may be processed twice.
+"""
+
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+
+logger = logging.getLogger(__name__)
+
+# Replace the entry just moved to the processing list by its envelope and lease it
+_SCRIPT_LEASE = """
+if ARGV[2] ~= '' then
+    if redis.call('lrem', KEYS[1], 1, ARGV[1]) == 0 then
+        return false
+    end
+    redis.call('lpush', KEYS[1], ARGV[2])
+    redis.call('zadd', KEYS[2], ARGV[3], ARGV[2])
+    return ARGV[2]
+end
+redis.call('zadd', KEYS[2], ARGV[3], ARGV[1])
+return ARGV[1]
+"""
+
+# Requeue (or dead-letter) every entry whose lease expired; ARGV[3] and ARGV[4] come JSON-encoded
+_SCRIPT_RECLAIM = """
+local function json_string(value)
+    return '"' .. (value:gsub('[%c"\\\\]', function(c) return string.format('\\\\u%04x', c:byte()) end)) .. '"'
+end
+
+local reclaimed, dead = 0, 0
+for _, entry in ipairs(redis.call('zrangebyscore', KEYS[1], 0, ARGV[1])) do
+    redis.call('zrem', KEYS[1], entry)
+    if redis.call('lrem', KEYS[2], 1, entry) > 0 then
+        local attempts = redis.call('hincrby', KEYS[3], entry, 1)
+        if attempts >= tonumber(ARGV[2]) then
+            redis.call('hdel', KEYS[3], entry)
+            redis.call('lpush', KEYS[5], '{"queue": ' .. ARGV[3] .. ', "entry": ' .. json_string(entry)
+                .. ', "error": "visibility timeout expired", "attempts": ' .. attempts
+                .. ', "failed_at": ' .. ARGV[4] .. '}')
+            dead = dead + 1
+        else
+            -- Back to the consuming end: it is the oldest pending entry
+            redis.call('rpush', KEYS[4], entry)
+            reclaimed = reclaimed + 1
+        end
+    end
+end
+return {reclaimed, dead}
+"""
+
+
+class ReliableQueue:
+    """
+    Lease-based consumer side of a Redis list queue (Redis >= 6.2 for BLMOVE)
+    """
+
+    def __init__(
+        self,
+        queue_key: str,
+        visibility_timeout: Optional[int] = None,
+        max_attempts: Optional[int] = None
+    ):
+        self.queue_key = queue_key
+        self.processing_key = f"{queue_key}:processing"
+        self.leases_key = f"{queue_key}:leases"
+        self.attempts_key = f"{queue_key}:attempts"
+        self.dead_key = f"{queue_key}:dead"
+        self.visibility_timeout = visibility_timeout or settings.queue_visibility_timeout_seconds
+        self.max_attempts = max_attempts or settings.queue_max_attempts
+
+    @property
+    def _client(self):
+        return redis_manager.redis_client
+
+    # ------------------------------------------------------------------
+    # Consumer
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _envelope(entry: str) -> Optional[Dict[str, Any]]:
+        try:
+            envelope = json.loads(entry)
+        except (TypeError, ValueError):
+            return None
+        return envelope if isinstance(envelope, dict) and "rq_id" in envelope else None
+
+    @classmethod
+    def payload(cls, entry: str) -> str:
+        """Producer payload of a popped (or dead-lettered) entry"""
+        envelope = cls._envelope(entry)
+        return envelope["payload"] if envelope else entry
+
+    async def pop(self, timeout: int = 5) -> Optional[str]:
+        """
+        Move the next entry to the processing list and lease it
+        Returns the envelope: the handle for renew/ack/dead_letter (payload() extracts the message)
+        """
+        entry = await self._client.blmove(self.queue_key, self.processing_key, timeout, "RIGHT", "LEFT")
+        if entry is None:
+            return None
+        # Requeued entries are already wrapped and keep their id (and attempt count)
+        envelope = "" if self._envelope(entry) else json.dumps({"rq_id": uuid.uuid4().hex, "payload": entry})
+        # If this consumer dies before the script, reclaim() leases the raw entry and requeues it
+        return await self._client.eval(
+            _SCRIPT_LEASE, 2, self.processing_key, self.leases_key,
+            entry, envelope, time.time() + self.visibility_timeout
+        )
+
+    async def renew(self, entries: Iterable[str]) -> None:
+        """Extend the lease of entries still held by this consumer"""
+        deadline = time.time() + self.visibility_timeout
+        leases = {entry: deadline for entry in entries}
+        if leases:
+            # xx: an entry reclaimed meanwhile is not leased again
+            await self._client.zadd(self.leases_key, leases, xx=True)
+
+    async def previous_attempts(self, entry: str) -> int:
+        """Deliveries of the entry that ended with an expired lease"""
+        return int(await self._client.hget(self.attempts_key, entry) or 0)
+
+    async def ack(self, entry: str) -> None:
+        """Remove a processed entry"""
+        pipe = self._client.pipeline(transaction=True)
+        pipe.lrem(self.processing_key, 1, entry)
+        pipe.zrem(self.leases_key, entry)
+        pipe.hdel(self.attempts_key, entry)
+        await pipe.execute()
+
+    async def dead_letter(self, entry: str, error: str, attempts: int) -> None:
+        """Move an entry that cannot be processed to the dead-letter list"""
+        record = {
+            "queue": self.queue_key,
+            "entry": entry,
+            "error": error,
+            "attempts": attempts,
+            "failed_at": datetime.now().isoformat()
+        }
+        pipe = self._client.pipeline(transaction=True)
+        pipe.lpush(self.dead_key, json.dumps(record))
+        pipe.lrem(self.processing_key, 1, entry)
+        pipe.zrem(self.leases_key, entry)
+        pipe.hdel(self.attempts_key, entry)
+        await pipe.execute()
+        logger.error(f"☠️ Entry dead-lettered from {self.queue_key} after {attempts} attempts: {error}")
+
+    async def reclaim(self) -> Dict[str, int]:
+        """
+        Return entries with an expired lease to the queue (or dead-letter them)
+        Safe to run from every consumer: each entry is moved inside one script
+        """
+        now = time.time()
+
+        # Entries moved but never leased (consumer died between BLMOVE and ZADD)
+        processing = await self._client.lrange(self.processing_key, 0, -1)
+        if processing:
+            await self._client.zadd(
+                self.leases_key, {entry: now + self.visibility_timeout for entry in processing}, nx=True
+            )
+
+        reclaimed, dead = await self._client.eval(
+            _SCRIPT_RECLAIM, 5,
+            self.leases_key, self.processing_key, self.attempts_key, self.queue_key, self.dead_key,
+            now, self.max_attempts, json.dumps(self.queue_key), json.dumps(datetime.now().isoformat())
+        )
+
+        if reclaimed or dead:
+            logger.warning(f"♻️ {self.queue_key}: {reclaimed} stalled entries requeued, {dead} dead-lettered")
+        return {"reclaimed": reclaimed, "dead_lettered": dead}
+
+    # ------------------------------------------------------------------
+    # Dead letters (admin)
+    # ------------------------------------------------------------------
+
+    async def list_dead(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent dead-lettered entries"""
+        records = [json.loads(record) for record in await self._client.lrange(self.dead_key, 0, limit - 1)]
+        for record in records:
+            record["entry"] = self.payload(record["entry"])
+        return records
+
+    async def replay_dead(self, limit: int = 50) -> int:
+        """Requeue the oldest dead-lettered entries with a fresh envelope and attempt count"""
+        async def move(pipe) -> int:
+            records = await pipe.lrange(self.dead_key, -limit, -1)
+            pipe.multi()
+            if records:
+                pipe.ltrim(self.dead_key, 0, -len(records) - 1)
+                # Oldest first, as they were originally queued
+                pipe.lpush(self.queue_key, *[self.payload(json.loads(r)["entry"]) for r in reversed(records)])
+            return len(records)
+
+        # WATCH/MULTI: the records leave the dead list only if they reach the queue
+        replayed = await self._client.transaction(move, self.dead_key, value_from_callable=True)
+
+        if replayed:
+            logger.info(f"🔁 {replayed} dead-lettered entries replayed into {self.queue_key}")
+        return replayed
+
+    async def get_stats(self) -> Dict[str, int]:
+        pipe = self._client.pipeline(transaction=False)
+        pipe.llen(self.processing_key)
+        pipe.llen(self.dead_key)
+        in_flight, dead = await pipe.execute()
+        return {"in_flight": in_flight, "dead_letter_depth": dead}
@@ -3,12 +3,12 @@ Service for sending evaluation results to clients via WhatsApp
 """
 
 import logging
-import httpx
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 from decimal import Decimal
 
 from app.core.config import settings
+from app.services.http_client import core_api_client
 from app.services.whatsapp_service import whatsapp_service
 
 logger = logging.getLogger(__name__)
@@ -21,12 +21,8 @@ class ResultsService:
         self.core_api_url = settings.core_api_url
         self.timeout = settings.core_api_timeout
         
-        self.client = httpx.AsyncClient(
-            timeout=httpx.Timeout(self.timeout),
-            headers={
-                "Content-Type": "application/json"
-            }
-        )
+        # Shared connection pool with the rest of the service
+        self.client = core_api_client
     
     async def enviar_resultado_evaluacion(self, solicitud_id: str) -> Dict[str, Any]:
         """
@@ -607,8 +603,7 @@ Simplemente envíanos los repuestos que necesitas y buscaremos nuevas opciones p
             return "Error formateando los detalles de la oferta."
     
     async def close(self):
-        """Close HTTP client"""
-        await self.client.aclose()
+        """The shared core-api client is closed in the application lifespan"""
 
 
 # Global results service instance
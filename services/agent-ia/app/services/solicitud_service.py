@@ -3,7 +3,6 @@ Service for creating solicitudes from WhatsApp conversations
 """
 
 import logging
-import httpx
 import json
 import unicodedata
 from typing import Dict, Any, Optional, List
@@ -13,6 +12,7 @@ import re
 from app.models.llm import ProcessedData
 from app.models.conversation import ConversationContext
 from app.core.config import settings
+from app.services.http_client import core_api_client
 from app.services.whatsapp_service import whatsapp_service
 
 logger = logging.getLogger(__name__)
@@ -91,12 +91,8 @@ class SolicitudService:
         self.core_api_url = settings.core_api_url
         self.timeout = settings.core_api_timeout
         
-        self.client = httpx.AsyncClient(
-            timeout=httpx.Timeout(self.timeout),
-            headers={
-                "Content-Type": "application/json"
-            }
-        )
+        # Shared connection pool with the rest of the service
+        self.client = core_api_client
     
     async def create_solicitud_from_whatsapp(self, solicitud_data: Dict[str, Any]) -> Optional[str]:
         """
@@ -530,8 +526,7 @@ Estamos buscando las mejores ofertas para ti. Te notificaremos cuando tengamos p
             return False
     
     async def close(self):
-        """Close HTTP client"""
-        await self.client.aclose()
+        """The shared core-api client is closed in the application lifespan"""
 
 
 # Global solicitud service instance
@@ -3,12 +3,15 @@ Telegram message processor
 Adapts Telegram messages to work with existing NLP pipeline
 """
 
+import asyncio
 import logging
 import json
 from typing import Dict, Any
 from datetime import datetime
 
 from app.core.redis import redis_manager
+from app.services.http_client import core_api_client, external_http_client
+from app.services.message_worker_pool import MessageWorkerPool, stage
 from app.services.telegram_service import telegram_service
 from app.services.conversation_service import conversation_service
 from app.services.nlp_service import nlp_service
@@ -16,7 +19,6 @@ from app.services.solicitud_service import solicitud_service
 from app.services.context_manager import get_context_manager
 from app.models.telegram import ProcessedTelegramMessage
 from app.models.whatsapp import ProcessedMessage  # Reuse WhatsApp model for compatibility
-import httpx
 import os
 
 logger = logging.getLogger(__name__)
@@ -77,36 +79,38 @@ class TelegramMessageProcessor:
     
     def __init__(self):
         self.queue_key = "telegram:message_queue"
+        self.worker_pool = MessageWorkerPool(
+            name="telegram",
+            queue_key=self.queue_key,
+            partition_key=lambda message: message["chat_id"],
+            handler=self._process_queued_entry
+        )
     
     async def process_queued_messages(self):
-        """Process messages from the Telegram queue"""
+        """Process messages from the Telegram queue with the worker pool (ordered per chat)"""
         try:
-            while True:
-                # Get message from queue (blocking with timeout)
-                message_data = await redis_manager.brpop(self.queue_key, timeout=5)
-                
-                if message_data:
-                    _, message_json = message_data
-                    message_dict = json.loads(message_json)
-                    
-                    # Convert to ProcessedTelegramMessage
-                    telegram_message = ProcessedTelegramMessage(
-                        message_id=message_dict["message_id"],
-                        chat_id=message_dict["chat_id"],
-                        user_id=message_dict["user_id"],
-                        username=message_dict.get("username"),
-                        timestamp=datetime.fromisoformat(message_dict["timestamp"]),
-                        message_type=message_dict["message_type"],
-                        text_content=message_dict.get("text_content"),
-                        media_file_id=message_dict.get("media_file_id"),
-                        media_type=message_dict.get("media_type")
-                    )
-                    
-                    await self.process_message(telegram_message)
-                
+            await self.worker_pool.start()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"Error processing queued Telegram messages: {e}")
     
+    async def _process_queued_entry(self, message_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a queue entry to ProcessedTelegramMessage and process it"""
+        telegram_message = ProcessedTelegramMessage(
+            message_id=message_dict["message_id"],
+            chat_id=message_dict["chat_id"],
+            user_id=message_dict["user_id"],
+            username=message_dict.get("username"),
+            timestamp=datetime.fromisoformat(message_dict["timestamp"]),
+            message_type=message_dict["message_type"],
+            text_content=message_dict.get("text_content"),
+            media_file_id=message_dict.get("media_file_id"),
+            media_type=message_dict.get("media_type")
+        )
+        
+        return await self.process_message(telegram_message)
+    
     async def process_message(self, telegram_message: ProcessedTelegramMessage) -> Dict[str, Any]:
         """
         Process a single Telegram message with context-aware interpretation
@@ -134,7 +138,8 @@ class TelegramMessageProcessor:
             # Interpret message with context using GPT-4
             interpretation = None
             if telegram_message.text_content:
-                interpretation = await context_mgr.interpret_with_context(user_id, telegram_message.text_content)
+                async with stage("llm_interpretation"):
+                    interpretation = await context_mgr.interpret_with_context(user_id, telegram_message.text_content)
                 logger.info(f"🎯 Intent: {interpretation.get('intent')} - {interpretation.get('action')}")
             
             # Convert Telegram message to WhatsApp-compatible format
@@ -173,7 +178,8 @@ class TelegramMessageProcessor:
                 return await self._handle_evaluation_response(telegram_message, conversation)
             
             # Process as new solicitud or continuation
-            return await self._handle_solicitud_message(telegram_message, conversation, whatsapp_message)
+            async with stage("solicitud_handling"):
+                return await self._handle_solicitud_message(telegram_message, conversation, whatsapp_message)
             
         except Exception as e:
             logger.error(f"Error processing Telegram message {telegram_message.message_id}: {e}")
@@ -236,46 +242,38 @@ class TelegramMessageProcessor:
             logger.info(f"Handling evaluation response from chat {telegram_message.chat_id}")
             
             # Call Core API to process client response
-            import httpx
-            from app.core.config import settings
-            
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{settings.core_api_url}/v1/solicitudes/{conversation.solicitud_id}/respuesta-cliente",
-                    json={
-                        "respuesta_texto": telegram_message.text_content,
-                        "usar_nlp": True  # ALWAYS use AI to interpret responses (handles typos, variations, natural language)
-                    },
-                    headers={
-                        "X-Service-API-Key": settings.service_api_key,
-                        "X-Service-Name": "agent-ia"
-                    }
-                )
+            response = await core_api_client.post(
+                f"/v1/solicitudes/{conversation.solicitud_id}/respuesta-cliente",
+                json={
+                    "respuesta_texto": telegram_message.text_content,
+                    "usar_nlp": True  # ALWAYS use AI to interpret responses (handles typos, variations, natural language)
+                }
+            )
                 
-                if response.status_code == 200:
-                    result = response.json()
+            if response.status_code == 200:
+                result = response.json()
                     
-                    if result.get("success"):
-                        # Send success message via Telegram
-                        response_message = result.get("mensaje", "Respuesta procesada correctamente")
-                        await telegram_service.send_message(telegram_message.chat_id, response_message)
+                if result.get("success"):
+                    # Send success message via Telegram
+                    response_message = result.get("mensaje", "Respuesta procesada correctamente")
+                    await telegram_service.send_message(telegram_message.chat_id, response_message)
                         
-                        # Clear solicitud_id from conversation
-                        await conversation_service.clear_solicitud_id(f"+tg{telegram_message.chat_id}")
+                    # Clear solicitud_id from conversation
+                    await conversation_service.clear_solicitud_id(f"+tg{telegram_message.chat_id}")
                         
-                        logger.info(f"Evaluation response processed: {result.get('tipo_respuesta')}")
-                        return result
-                    else:
-                        error_msg = result.get("error", "Error procesando respuesta")
-                        await telegram_service.send_message(telegram_message.chat_id, error_msg)
-                        return result
+                    logger.info(f"Evaluation response processed: {result.get('tipo_respuesta')}")
+                    return result
                 else:
-                    error_msg = "Error procesando respuesta del cliente"
+                    error_msg = result.get("error", "Error procesando respuesta")
                     await telegram_service.send_message(telegram_message.chat_id, error_msg)
-                    return {
-                        "success": False,
-                        "error": f"HTTP {response.status_code}"
-                    }
+                    return result
+            else:
+                error_msg = "Error procesando respuesta del cliente"
+                await telegram_service.send_message(telegram_message.chat_id, error_msg)
+                return {
+                    "success": False,
+                    "error": f"HTTP {response.status_code}"
+                }
             
             return result
             
@@ -385,7 +383,6 @@ class TelegramMessageProcessor:
             
             # TEMPORAL: Procesamiento simple con OpenAI para pruebas
             # TODO: Reemplazar con sistema WhatsApp completo cuando se implemente
-            import httpx
             from app.core.config import settings
             
             try:
@@ -442,26 +439,25 @@ class TelegramMessageProcessor:
                     
                     try:
                         # Descargar el archivo de audio desde Telegram
-                        async with httpx.AsyncClient(timeout=30.0) as client:
-                            audio_response = await client.get(whatsapp_message.media_url)
-                            if audio_response.status_code == 200:
-                                audio_content = audio_response.content
-                                logger.info(f"Audio file downloaded: {len(audio_content)} bytes")
+                        audio_response = await external_http_client.get(whatsapp_message.media_url)
+                        if audio_response.status_code == 200:
+                            audio_content = audio_response.content
+                            logger.info(f"Audio file downloaded: {len(audio_content)} bytes")
                                 
-                                # Transcribir directamente con Whisper adapter
-                                from app.services.llm.whisper_adapter import whisper_adapter
+                            # Transcribir directamente con Whisper adapter
+                            from app.services.llm.whisper_adapter import whisper_adapter
                                 
-                                # Llamar directamente al API de Whisper con los bytes
-                                transcription = await whisper_adapter._call_whisper_api(audio_content)
+                            # Llamar directamente al API de Whisper con los bytes
+                            transcription = await whisper_adapter._call_whisper_api(audio_content)
                                 
-                                if transcription:
-                                    logger.info(f"Audio transcribed successfully: {transcription[:100]}...")
-                                    message_content = transcription
-                                else:
-                                    logger.warning(f"Audio transcription returned empty")
-                                    message_content = "Audio recibido pero no se pudo transcribir"
+                            if transcription:
+                                logger.info(f"Audio transcribed successfully: {transcription[:100]}...")
+                                message_content = transcription
                             else:
-                                logger.error(f"Failed to download audio: HTTP {audio_response.status_code}")
+                                logger.warning(f"Audio transcription returned empty")
+                                message_content = "Audio recibido pero no se pudo transcribir"
+                        else:
+                            logger.error(f"Failed to download audio: HTTP {audio_response.status_code}")
                     except Exception as e:
                         logger.error(f"Error processing audio: {e}")
                 
@@ -471,31 +467,30 @@ class TelegramMessageProcessor:
                     
                     try:
                         # Descargar el archivo desde Telegram
-                        async with httpx.AsyncClient(timeout=30.0) as client:
-                            file_response = await client.get(whatsapp_message.media_url)
-                            if file_response.status_code == 200:
-                                file_content = file_response.content
-                                logger.info(f"Excel file downloaded: {len(file_content)} bytes")
+                        file_response = await external_http_client.get(whatsapp_message.media_url)
+                        if file_response.status_code == 200:
+                            file_content = file_response.content
+                            logger.info(f"Excel file downloaded: {len(file_content)} bytes")
                                 
-                                # Procesar con file_processor directamente
-                                from app.services.file_processor import file_processor
-                                file_result = await file_processor._process_excel(file_content, message_content)
+                            # Procesar con file_processor directamente
+                            from app.services.file_processor import file_processor
+                            file_result = await file_processor._process_excel(file_content, message_content)
                                 
-                                # Verificar si se extrajeron repuestos (ya sea en repuestos o extracted_entities)
-                                repuestos_list = file_result.repuestos or file_result.extracted_entities.get("repuestos", [])
+                            # Verificar si se extrajeron repuestos (ya sea en repuestos o extracted_entities)
+                            repuestos_list = file_result.repuestos or file_result.extracted_entities.get("repuestos", [])
                                 
-                                if repuestos_list and len(repuestos_list) > 0:
-                                    # Usar los repuestos extraídos del Excel
-                                    logger.info(f"Excel processed successfully: {len(repuestos_list)} repuestos found")
-                                    message_content = f"{message_content}\n\nRepuestos del Excel:\n"
-                                    for rep in repuestos_list:
-                                        nombre = rep.get('nombre', rep.get('name', 'Sin nombre'))
-                                        cantidad = rep.get('cantidad', rep.get('quantity', 1))
-                                        message_content += f"- {nombre} (cantidad: {cantidad})\n"
-                                else:
-                                    logger.warning(f"Excel processing completed but no repuestos found. Missing fields: {file_result.missing_fields}")
+                            if repuestos_list and len(repuestos_list) > 0:
+                                # Usar los repuestos extraídos del Excel
+                                logger.info(f"Excel processed successfully: {len(repuestos_list)} repuestos found")
+                                message_content = f"{message_content}\n\nRepuestos del Excel:\n"
+                                for rep in repuestos_list:
+                                    nombre = rep.get('nombre', rep.get('name', 'Sin nombre'))
+                                    cantidad = rep.get('cantidad', rep.get('quantity', 1))
+                                    message_content += f"- {nombre} (cantidad: {cantidad})\n"
                             else:
-                                logger.error(f"Failed to download Excel: HTTP {file_response.status_code}")
+                                logger.warning(f"Excel processing completed but no repuestos found. Missing fields: {file_result.missing_fields}")
+                        else:
+                            logger.error(f"Failed to download Excel: HTTP {file_response.status_code}")
                     except Exception as e:
                         logger.error(f"Error processing Excel file: {e}")
                 
@@ -529,15 +524,15 @@ class TelegramMessageProcessor:
                         last_repuesto_added = existing_draft["repuestos"][-1].get("nombre", "")
                     
                     # Usar GPT-4 para entender la intención del usuario
-                    async with httpx.AsyncClient(timeout=15.0) as client:
-                        intent_response = await client.post(
-                            "https://api.openai.com/v1/chat/completions",
-                            headers={"Authorization": f"Bearer {settings.openai_api_key}"},
-                            json={
-                                "model": "gpt-4o-mini",
-                                "messages": [{
-                                    "role": "system",
-                                    "content": """Analiza el mensaje del usuario y determina su intención. Responde SOLO con un JSON válido.
+                    intent_response = await external_http_client.post(
+                        "https://api.openai.com/v1/chat/completions",
+                        timeout=15.0,
+                        headers={"Authorization": f"Bearer {settings.openai_api_key}"},
+                        json={
+                            "model": "gpt-4o-mini",
+                            "messages": [{
+                                "role": "system",
+                                "content": """Analiza el mensaje del usuario y determina su intención. Responde SOLO con un JSON válido.
 
 DATOS ACTUALES:
 """ + json.dumps(draft_context, ensure_ascii=False) + """
@@ -618,13 +613,13 @@ Usuario: "los amortiguadores son delanteros"
 Usuario: "agrega pastillas de freno traseras"
 → intent: "correct", AGREGA el nuevo repuesto a la lista existente
 """
-                                }, {
-                                    "role": "user",
-                                    "content": message_content
-                                }],
-                                "temperature": 0.1
-                            }
-                        )
+                            }, {
+                                "role": "user",
+                                "content": message_content
+                            }],
+                            "temperature": 0.1
+                        }
+                    )
                     
                     if intent_response.status_code == 200:
                         intent_result = intent_response.json()
@@ -714,15 +709,10 @@ Usuario: "agrega pastillas de freno traseras"
                                 logger.info(f"📤 Payload a enviar: {json.dumps(solicitud_payload, indent=2, ensure_ascii=False)}")
                                 
                                 # Llamar al endpoint seguro del bot
-                                async with httpx.AsyncClient(timeout=30.0) as api_client:
-                                    api_response = await api_client.post(
-                                        f"{settings.core_api_url}/v1/solicitudes/services/bot",
-                                        json=solicitud_payload,
-                                        headers={
-                                            "X-Service-Name": settings.service_name,
-                                            "X-Service-API-Key": settings.service_api_key
-                                        }
-                                    )
+                                api_response = await core_api_client.post(
+                                    "/v1/solicitudes/services/bot",
+                                    json=solicitud_payload
+                                )
                                 
                                 if api_response.status_code == 201:
                                     solicitud_result = api_response.json()
@@ -862,15 +852,10 @@ Usuario: "agrega pastillas de freno traseras"
                                 ciudad_normalizada = limpiar_ciudad(ciudad_para_validar)
                                 
                                 # Buscar municipio en la base de datos
-                                async with httpx.AsyncClient(timeout=10.0) as geo_client:
-                                    geo_response = await geo_client.get(
-                                        f"{settings.core_api_url}/v1/solicitudes/services/municipio",
-                                        params={"ciudad": ciudad_normalizada},
-                                        headers={
-                                            "X-Service-Name": settings.service_name,
-                                            "X-Service-API-Key": settings.service_api_key
-                                        }
-                                    )
+                                geo_response = await core_api_client.get(
+                                    "/v1/solicitudes/services/municipio",
+                                    params={"ciudad": ciudad_normalizada}
+                                )
                                 
                                 if geo_response.status_code == 200:
                                     # Ciudad válida - obtener departamento
@@ -973,15 +958,14 @@ Usuario: "agrega pastillas de freno traseras"
                     else:
                         # Llamar a OpenAI para extraer información
                         try:
-                            async with httpx.AsyncClient(timeout=30.0) as client:
-                                response = await client.post(
-                                    "https://api.openai.com/v1/chat/completions",
-                                    headers={"Authorization": f"Bearer {settings.openai_api_key}"},
-                                    json={
-                                        "model": "gpt-4o-mini",
-                                        "messages": [{
-                                            "role": "system",
-                                            "content": """Extrae información del mensaje y responde SOLO con JSON válido (sin markdown):
+                            response = await external_http_client.post(
+                                "https://api.openai.com/v1/chat/completions",
+                                headers={"Authorization": f"Bearer {settings.openai_api_key}"},
+                                json={
+                                    "model": "gpt-4o-mini",
+                                    "messages": [{
+                                        "role": "system",
+                                        "content": """Extrae información del mensaje y responde SOLO con JSON válido (sin markdown):
 {
   "repuestos": [{"nombre": "kit de arrastre", "cantidad": 1}],
   "vehiculo": {"marca": "", "linea": "", "anio": ""},
@@ -1003,13 +987,13 @@ Mensaje: "necesito kit de arrastre y filtro de aire"
 
 Mensaje: "para una Yamaha FZ 2.0 del 2018"
 → {"repuestos": [], "vehiculo": {"marca": "Yamaha", "linea": "FZ 2.0", "anio": "2018"}, "cliente": {"telefono": "", "nombre": "", "ciudad": ""}}"""
-                                        }, {
-                                            "role": "user",
-                                            "content": message_content
-                                        }],
-                                        "temperature": 0.3
-                                    }
-                                )
+                                    }, {
+                                        "role": "user",
+                                        "content": message_content
+                                    }],
+                                    "temperature": 0.3
+                                }
+                            )
                             
                             if response.status_code == 200:
                                 result = response.json()
@@ -1182,15 +1166,10 @@ Mensaje: "para una Yamaha FZ 2.0 del 2018"
                 ciudad_normalizada = limpiar_ciudad(cliente["ciudad"])
                 
                 # Buscar municipio en la base de datos
-                async with httpx.AsyncClient(timeout=10.0) as geo_client:
-                    geo_response = await geo_client.get(
-                        f"{settings.core_api_url}/v1/solicitudes/services/municipio",
-                        params={"ciudad": ciudad_normalizada},
-                        headers={
-                            "X-Service-Name": settings.service_name,
-                            "X-Service-API-Key": settings.service_api_key
-                        }
-                    )
+                geo_response = await core_api_client.get(
+                    "/v1/solicitudes/services/municipio",
+                    params={"ciudad": ciudad_normalizada}
+                )
                 
                 if geo_response.status_code == 200:
                     # Ciudad válida - obtener departamento
@@ -1366,15 +1345,10 @@ Mensaje: "para una Yamaha FZ 2.0 del 2018"
                 }
                 
                 # Llamar al endpoint seguro del bot
-                async with httpx.AsyncClient(timeout=30.0) as api_client:
-                    api_response = await api_client.post(
-                        f"{settings.core_api_url}/v1/solicitudes/services/bot",
-                        json=solicitud_payload,
-                        headers={
-                            "X-Service-Name": settings.service_name,
-                            "X-Service-API-Key": settings.service_api_key
-                        }
-                    )
+                api_response = await core_api_client.post(
+                    "/v1/solicitudes/services/bot",
+                    json=solicitud_payload
+                )
                 
                 if api_response.status_code == 201:
                     solicitud_result = api_response.json()
@@ -160,8 +160,9 @@ class TelegramPollingService:
                 elif "document" in message:
                     logger.info(f"📄 Document from @{username}")
                 
-                # Procesar mensaje con IA
+                # Encolar para el pool de workers (orden por chat), igual que el webhook
                 from app.services.telegram_message_processor import telegram_message_processor
+                from app.services.telegram_service import telegram_service
                 from app.models.telegram import ProcessedTelegramMessage
                 from datetime import datetime
                 
@@ -196,8 +197,10 @@ class TelegramPollingService:
                     media_type=media_type
                 )
                 
-                # Procesar con IA
-                await telegram_message_processor.process_message(telegram_msg)
+                # El offset ya avanzó: si no se puede encolar se procesa aquí para no perderlo
+                if not await telegram_service.queue_message_for_processing(telegram_msg):
+                    logger.warning(f"Could not queue message {telegram_msg.message_id}, processing inline")
+                    await telegram_message_processor.process_message(telegram_msg)
             
             # Procesar callback query (botones)
             elif "callback_query" in update:
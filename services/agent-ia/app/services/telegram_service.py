@@ -277,7 +277,8 @@ class TelegramService:
                 "message_type": message.message_type,
                 "text_content": message.text_content,
                 "media_file_id": message.media_file_id,
-                "media_type": message.media_type
+                "media_type": message.media_type,
+                "queued_at": datetime.now().isoformat()
             }
             
             await redis_manager.lpush(queue_key, json.dumps(message_data))
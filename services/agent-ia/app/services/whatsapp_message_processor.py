@@ -4,17 +4,19 @@ Adapts WhatsApp messages to work with existing NLP pipeline
 Based on proven Telegram implementation
 """
 
+import asyncio
 import logging
 import json
 from typing import Dict, Any, Optional
 from datetime import datetime
 
 from app.core.redis import redis_manager
+from app.services.http_client import core_api_client
+from app.services.message_worker_pool import MessageWorkerPool, stage
 from app.services.whatsapp_service import whatsapp_service
 from app.services.conversation_service import conversation_service
 from app.services.context_manager import get_context_manager
 from app.models.whatsapp import ProcessedMessage
-import httpx
 import os
 
 logger = logging.getLogger(__name__)
@@ -56,35 +58,37 @@ class WhatsAppMessageProcessor:
     
     def __init__(self):
         self.queue_key = "whatsapp:message_queue"
+        self.worker_pool = MessageWorkerPool(
+            name="whatsapp",
+            queue_key=self.queue_key,
+            partition_key=lambda message: message["from_number"],
+            handler=self._process_queued_entry
+        )
     
     async def process_queued_messages(self):
-        """Process messages from the WhatsApp queue"""
+        """Process messages from the WhatsApp queue with the worker pool (ordered per sender)"""
         try:
-            while True:
-                # Get message from queue (blocking with timeout)
-                message_data = await redis_manager.brpop(self.queue_key, timeout=5)
-                
-                if message_data:
-                    _, message_json = message_data
-                    message_dict = json.loads(message_json)
-                    
-                    # Convert to ProcessedMessage
-                    whatsapp_message = ProcessedMessage(
-                        message_id=message_dict["message_id"],
-                        from_number=message_dict["from_number"],
-                        timestamp=datetime.fromisoformat(message_dict["timestamp"]),
-                        message_type=message_dict["message_type"],
-                        text_content=message_dict.get("text_content"),
-                        media_url=message_dict.get("media_url"),
-                        media_type=message_dict.get("media_type"),
-                        context_message_id=message_dict.get("context_message_id")
-                    )
-                    
-                    await self.process_message(whatsapp_message)
-                
+            await self.worker_pool.start()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"Error processing queued WhatsApp messages: {e}")
     
+    async def _process_queued_entry(self, message_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a queue entry to ProcessedMessage and process it"""
+        whatsapp_message = ProcessedMessage(
+            message_id=message_dict["message_id"],
+            from_number=message_dict["from_number"],
+            timestamp=datetime.fromisoformat(message_dict["timestamp"]),
+            message_type=message_dict["message_type"],
+            text_content=message_dict.get("text_content"),
+            media_url=message_dict.get("media_url"),
+            media_type=message_dict.get("media_type"),
+            context_message_id=message_dict.get("context_message_id")
+        )
+        
+        return await self.process_message(whatsapp_message)
+    
     async def process_message(self, whatsapp_message: ProcessedMessage) -> Dict[str, Any]:
         """
         Process a single WhatsApp message with context-aware interpretation
@@ -112,7 +116,8 @@ class WhatsAppMessageProcessor:
             # Interpret message with context using GPT-4
             interpretation = None
             if whatsapp_message.text_content:
-                interpretation = await context_mgr.interpret_with_context(user_id, whatsapp_message.text_content)
+                async with stage("llm_interpretation"):
+                    interpretation = await context_mgr.interpret_with_context(user_id, whatsapp_message.text_content)
                 logger.info(f"🎯 Intent: {interpretation.get('intent')} - {interpretation.get('action')}")
             
             # Get or create conversation context
@@ -147,7 +152,8 @@ class WhatsAppMessageProcessor:
                 return await self._handle_evaluation_response(whatsapp_message, conversation)
             
             # Process as new solicitud or continuation
-            return await self._handle_solicitud_message(whatsapp_message, conversation)
+            async with stage("solicitud_handling"):
+                return await self._handle_solicitud_message(whatsapp_message, conversation)
             
         except Exception as e:
             logger.error(f"Error processing WhatsApp message {whatsapp_message.message_id}: {e}")
@@ -183,45 +189,38 @@ class WhatsAppMessageProcessor:
             logger.info(f"Handling evaluation response from {whatsapp_message.from_number}")
             
             # Call Core API to process client response
-            from app.core.config import settings
-            
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{settings.core_api_url}/v1/solicitudes/{conversation.solicitud_id}/respuesta-cliente",
-                    json={
-                        "respuesta_texto": whatsapp_message.text_content,
-                        "usar_nlp": True  # ALWAYS use AI to interpret responses (handles typos, variations, natural language)
-                    },
-                    headers={
-                        "X-Service-API-Key": settings.service_api_key,
-                        "X-Service-Name": "agent-ia"
-                    }
-                )
+            response = await core_api_client.post(
+                f"/v1/solicitudes/{conversation.solicitud_id}/respuesta-cliente",
+                json={
+                    "respuesta_texto": whatsapp_message.text_content,
+                    "usar_nlp": True  # ALWAYS use AI to interpret responses (handles typos, variations, natural language)
+                }
+            )
                 
-                if response.status_code == 200:
-                    result = response.json()
+            if response.status_code == 200:
+                result = response.json()
                     
-                    if result.get("success"):
-                        # Send success message via WhatsApp
-                        response_message = result.get("mensaje", "Respuesta procesada correctamente")
-                        await whatsapp_service.send_text_message(whatsapp_message.from_number, response_message)
+                if result.get("success"):
+                    # Send success message via WhatsApp
+                    response_message = result.get("mensaje", "Respuesta procesada correctamente")
+                    await whatsapp_service.send_text_message(whatsapp_message.from_number, response_message)
                         
-                        # Clear solicitud_id from conversation
-                        await conversation_service.clear_solicitud_id(whatsapp_message.from_number)
+                    # Clear solicitud_id from conversation
+                    await conversation_service.clear_solicitud_id(whatsapp_message.from_number)
                         
-                        logger.info(f"Evaluation response processed: {result.get('tipo_respuesta')}")
-                        return result
-                    else:
-                        error_msg = result.get("error", "Error procesando respuesta")
-                        await whatsapp_service.send_text_message(whatsapp_message.from_number, error_msg)
-                        return result
+                    logger.info(f"Evaluation response processed: {result.get('tipo_respuesta')}")
+                    return result
                 else:
-                    error_msg = "Error procesando respuesta del cliente"
+                    error_msg = result.get("error", "Error procesando respuesta")
                     await whatsapp_service.send_text_message(whatsapp_message.from_number, error_msg)
-                    return {
-                        "success": False,
-                        "error": f"HTTP {response.status_code}"
-                    }
+                    return result
+            else:
+                error_msg = "Error procesando respuesta del cliente"
+                await whatsapp_service.send_text_message(whatsapp_message.from_number, error_msg)
+                return {
+                    "success": False,
+                    "error": f"HTTP {response.status_code}"
+                }
             
         except Exception as e:
             logger.error(f"Error handling evaluation response: {e}")
@@ -0,0 +1,39 @@
+"""
+Latency Stats Utility
+Rolling latency samples with percentiles, shared by the worker pool, the HTTP
+clients and the LLM providers
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# Latency samples kept per series for percentiles
+MAX_LATENCY_SAMPLES = 1000
+
+
+class LatencyStats:
+    """Rolling latency samples for one stage, endpoint or provider"""
+
+    def __init__(self, max_samples: int = MAX_LATENCY_SAMPLES):
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+        self.count = 0
+
+    def record(self, ms: float) -> None:
+        self.samples.append(ms)
+        self.count += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {"count": self.count, "p50_ms": None, "p95_ms": None, "max_ms": None}
+        return {
+            "count": self.count,
+            "p50_ms": round(self.percentile(50), 1),
+            "p95_ms": round(self.percentile(95), 1),
+            "max_ms": round(max(self.samples), 1)
+        }
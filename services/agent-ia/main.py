@@ -13,6 +13,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.redis import redis_manager
 from app.routers import webhooks
+from app.services.http_client import close_http_clients, core_api_client, get_http_client_metrics
 from app.services.whatsapp_service import whatsapp_service
 
 # Configure logging
@@ -54,6 +55,15 @@ async def lifespan(app: FastAPI):
         else:
             logger.info("Telegram polling disabled or token not configured")
         
+        # Start queue worker pools (webhook messages are consumed from Redis)
+        from app.services.telegram_message_processor import telegram_message_processor
+        from app.services.whatsapp_message_processor import whatsapp_message_processor
+        
+        queue_tasks = [asyncio.create_task(whatsapp_message_processor.process_queued_messages())]
+        if settings.telegram_enabled:
+            queue_tasks.append(asyncio.create_task(telegram_message_processor.process_queued_messages()))
+        logger.info(f"Queue worker pools started ({settings.message_workers} workers per queue)")
+        
         logger.info("Agent IA Service started successfully")
         yield
         
@@ -72,6 +82,13 @@ async def lifespan(app: FastAPI):
             except asyncio.CancelledError:
                 pass
         
+        # Cancel queue worker pools
+        if 'queue_tasks' in locals():
+            for task in queue_tasks:
+                task.cancel()
+            await asyncio.gather(*queue_tasks, return_exceptions=True)
+            logger.info("Queue worker pools stopped")
+        
         # Cancel telegram task
         if 'telegram_task' in locals() and telegram_task:
             telegram_task.cancel()
@@ -84,6 +101,7 @@ async def lifespan(app: FastAPI):
         # Close connections
         await redis_manager.disconnect()
         await whatsapp_service.close()
+        await close_http_clients()
         
         logger.info("Agent IA Service shutdown complete")
 
@@ -139,6 +157,10 @@ app.include_router(results.router)
 from app.routers import telegram
 app.include_router(telegram.router)
 
+# Import and include queue administration router
+from app.routers import queues
+app.include_router(queues.router)
+
 
 @app.get("/")
 async def root():
@@ -161,7 +183,6 @@ async def health_check():
     from fastapi import status
     from fastapi.responses import JSONResponse
     from datetime import datetime
-    import httpx
     
     health_status = {
         "status": "healthy",
@@ -197,18 +218,17 @@ async def health_check():
     
     # Check Core API connection
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{settings.core_api_url}/health/live")
-            if response.status_code == 200:
-                health_status["checks"]["core_api"] = {
-                    "status": "healthy",
-                    "message": "Core API reachable"
-                }
-            else:
-                health_status["checks"]["core_api"] = {
-                    "status": "degraded",
-                    "message": f"Core API returned status {response.status_code}"
-                }
+        response = await core_api_client.get("/health/live", retry=False)
+        if response.status_code == 200:
+            health_status["checks"]["core_api"] = {
+                "status": "healthy",
+                "message": "Core API reachable"
+            }
+        else:
+            health_status["checks"]["core_api"] = {
+                "status": "degraded",
+                "message": f"Core API returned status {response.status_code}"
+            }
     except Exception as e:
         health_status["checks"]["core_api"] = {
             "status": "degraded",
@@ -228,6 +248,8 @@ async def health_check():
             "message": f"WhatsApp check failed: {str(e)}"
         }
     
+    health_status["http_clients"] = get_http_client_metrics()
+    
     # Set overall status
     health_status["timestamp"] = datetime.utcnow().isoformat()
     health_status["status"] = "healthy" if all_healthy else "unhealthy"
@@ -0,0 +1,141 @@
+"""
+Benchmark del pool de workers de las colas de mensajes (LLM simulado)
+Encola mensajes de varias conversaciones en una cola en memoria (BRPOP simulado),
+los procesa con un LLM simulado (sleep de latencia fija) y reporta mensajes por
+segundo y latencia p95 según el número de workers. Verifica además que cada
+conversación se procese en orden.
+
+Después mide el modo de cola confiable (BLMOVE + leases) con varios consumidores
+("pods", un pool de 8 workers cada uno) sobre el mismo Redis: el throughput por
+pod debe mantenerse al agregar pods. Usa BENCHMARK_REDIS_URL si está definida
+(la cola de benchmark se borra, NO usar el Redis de producción) o fakeredis.
+
+Uso:
+    python scripts/benchmark_message_workers.py                 # 200 mensajes, 50 chats, 100ms por mensaje
+    python scripts/benchmark_message_workers.py 1000 100 0.5
+    BENCHMARK_REDIS_URL=redis://localhost:6379/15 python scripts/benchmark_message_workers.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.message_worker_pool import MessageWorkerPool, stage
+
+WORKERS = [1, 2, 4, 8, 16, 32]
+PODS = [1, 2, 4, 8]
+WORKERS_POR_POD = 8
+COLA_BENCHMARK = "benchmark:message_queue"
+
+
+async def medir(workers: int, n_mensajes: int, n_chats: int, latencia_llm: float) -> dict:
+    entradas = [
+        json.dumps({"chat_id": f"chat-{i % n_chats}", "seq": i // n_chats})
+        for i in range(n_mensajes)
+    ]
+    vistos = {}
+
+    async def brpop(key, timeout=0):
+        if entradas:
+            return key, entradas.pop(0)
+        await asyncio.sleep(timeout)
+        return None
+
+    async def llm_simulado(mensaje):
+        async with stage("llm_interpretation"):
+            await asyncio.sleep(latencia_llm)
+        vistos.setdefault(mensaje["chat_id"], []).append(mensaje["seq"])
+        return {"success": True}
+
+    pool = MessageWorkerPool(
+        "benchmark", "benchmark:queue", lambda m: m["chat_id"], llm_simulado,
+        workers=workers, max_buffered=max(200, workers * 4), reliable=False
+    )
+
+    with patch("app.services.message_worker_pool.redis_manager.brpop", brpop):
+        inicio = time.perf_counter()
+        tarea = asyncio.create_task(pool.start())
+        while pool.processed < n_mensajes:
+            await asyncio.sleep(0.005)
+        duracion = time.perf_counter() - inicio
+        tarea.cancel()
+        await asyncio.gather(tarea, return_exceptions=True)
+
+    metricas = await pool.get_metrics()
+    return {
+        "msg_s": n_mensajes / duracion,
+        "p95_ms": metricas["latency"]["local_wait"]["p95_ms"] + metricas["latency"]["processing"]["p95_ms"],
+        "ordenado": all(seqs == sorted(seqs) for seqs in vistos.values())
+    }
+
+
+def crear_redis():
+    url = os.getenv("BENCHMARK_REDIS_URL")
+    if url:
+        import redis.asyncio as redis
+        return redis.from_url(url, decode_responses=True)
+    import fakeredis
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+async def medir_pods(cliente, pods: int, n_mensajes: int, n_chats: int, latencia_llm: float) -> dict:
+    await cliente.delete(COLA_BENCHMARK, *(f"{COLA_BENCHMARK}:{s}" for s in ("processing", "leases", "attempts", "dead")))
+    for i in range(n_mensajes):
+        await cliente.lpush(COLA_BENCHMARK, json.dumps({"chat_id": f"chat-{i % n_chats}", "seq": i}))
+
+    async def llm_simulado(mensaje):
+        await asyncio.sleep(latencia_llm)
+        return {"success": True}
+
+    pools = [
+        MessageWorkerPool(
+            f"pod-{i}", COLA_BENCHMARK, lambda m: m["chat_id"], llm_simulado,
+            workers=WORKERS_POR_POD, pop_timeout=1, reliable=True
+        )
+        for i in range(pods)
+    ]
+
+    with patch("app.core.redis.redis_manager.redis_client", cliente):
+        inicio = time.perf_counter()
+        tareas = [asyncio.create_task(pool.start()) for pool in pools]
+        while sum(pool.processed for pool in pools) < n_mensajes:
+            await asyncio.sleep(0.005)
+        duracion = time.perf_counter() - inicio
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        en_vuelo = await cliente.llen(f"{COLA_BENCHMARK}:processing")
+
+    return {"msg_s": n_mensajes / duracion, "msg_s_pod": n_mensajes / duracion / pods, "en_vuelo": en_vuelo}
+
+
+async def main():
+    n_mensajes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_chats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    latencia_llm = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+    print(f"{n_mensajes} mensajes, {n_chats} conversaciones, LLM simulado de {latencia_llm * 1000:.0f}ms\n")
+    print(f"{'workers':>8} | {'msg/s':>8} | {'p95 ms':>8} | {'orden por chat':>14}")
+    print("-" * 48)
+    for workers in WORKERS:
+        r = await medir(workers, n_mensajes, n_chats, latencia_llm)
+        print(f"{workers:>8} | {r['msg_s']:>8.1f} | {r['p95_ms']:>8.0f} | {'ok' if r['ordenado'] else 'ROTO':>14}")
+
+    cliente = crear_redis()
+    print(f"\nCola confiable, {WORKERS_POR_POD} workers por pod ({'Redis' if os.getenv('BENCHMARK_REDIS_URL') else 'fakeredis'})\n")
+    print(f"{'pods':>8} | {'msg/s':>8} | {'msg/s por pod':>13} | {'en vuelo al final':>17}")
+    print("-" * 56)
+    for pods in PODS:
+        r = await medir_pods(cliente, pods, n_mensajes, n_chats, latencia_llm)
+        print(f"{pods:>8} | {r['msg_s']:>8.1f} | {r['msg_s_pod']:>13.1f} | {r['en_vuelo']:>17}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
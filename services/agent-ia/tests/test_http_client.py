@@ -0,0 +1,95 @@
+"""
+Tests for the shared pooled HTTP client
+"""
+
+import httpx
+import pytest
+
+from app.services.http_client import PooledHTTPClient
+
+BASE_URL = "http://core-api:8000"
+
+
+def _client(handler, **kwargs) -> PooledHTTPClient:
+    return PooledHTTPClient(
+        "core-api",
+        base_url=BASE_URL,
+        headers={"X-Service-Name": "agent-ia"},
+        endpoint_timeouts={"/v1/solicitudes/services/municipio": 10.0},
+        max_retries=2,
+        retry_backoff=0,
+        transport=httpx.MockTransport(handler),
+        **kwargs
+    )
+
+
+class TestPooledHTTPClient:
+    """Test retries, timeouts and metrics of the shared client"""
+
+    @pytest.mark.asyncio
+    async def test_idempotent_request_retried_on_unavailable(self):
+        """Test that a GET is retried on 503 and reuses one pooled client"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503 if len(calls) < 3 else 200, json={"departamento": "ANTIOQUIA"})
+
+        client = _client(handler)
+        pool = client.client
+        response = await client.get("/v1/solicitudes/services/municipio", params={"ciudad": "BELLO"})
+
+        assert response.status_code == 200
+        assert len(calls) == 3
+        assert client.client is pool
+        assert calls[0].headers["X-Service-Name"] == "agent-ia"
+        assert calls[0].extensions["timeout"]["read"] == 10.0
+
+        metrics = client.get_metrics()["GET /v1/solicitudes/services/municipio"]
+        assert metrics["requests"] == 3
+        assert metrics["errors"] == 2
+        assert metrics["retries"] == 2
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_post_only_retried_when_not_sent(self):
+        """Test that a POST is not repeated after a 503 but is after a connection error"""
+        calls = []
+
+        def unavailable(request):
+            calls.append(request)
+            return httpx.Response(503)
+
+        client = _client(unavailable)
+        response = await client.post("/v1/solicitudes/services/bot", json={})
+        assert response.status_code == 503
+        assert len(calls) == 1
+        await client.close()
+
+        attempts = []
+
+        def refuses_once(request):
+            attempts.append(request)
+            if len(attempts) == 1:
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(201, json={"id": "sol-1"})
+
+        client = _client(refuses_once)
+        response = await client.post("/v1/solicitudes/services/bot", json={})
+        assert response.status_code == 201
+        assert len(attempts) == 2
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_metrics_group_ids_and_hide_external_paths(self):
+        """Test that ids are grouped and external URLs are labelled by host only"""
+        client = _client(lambda request: httpx.Response(200))
+        await client.get(f"{BASE_URL}/v1/solicitudes/3f2a-11/pdf-ofertas")
+        await client.get("/v1/solicitudes/9c1b-22/pdf-ofertas")
+        await client.get("https://api.telegram.org/file/bot123:SECRET/voice.ogg")
+
+        metrics = client.get_metrics()
+        assert metrics["GET /v1/solicitudes/{id}/pdf-ofertas"]["requests"] == 2
+        assert "GET api.telegram.org" in metrics
+        assert not any("SECRET" in endpoint for endpoint in metrics)
+        await client.close()
@@ -0,0 +1,99 @@
+"""
+Tests for hedged provider calls in LLMProviderService.process_content
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.models.llm import LLMResponse
+from app.services.llm.llm_provider_service import LLMProviderService
+
+SETTINGS = "app.services.llm.llm_provider_service.settings"
+
+
+class FakeAdapter:
+    """Adapter that answers after a fixed delay (or fails)"""
+
+    def __init__(self, name: str, delay: float, fail: bool = False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def process_request(self, request):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} down")
+        return LLMResponse(
+            content=json.dumps({"repuestos": [{"nombre": "pastillas de freno", "cantidad": 1}]}),
+            model="test",
+            provider=self.name,
+            latency_ms=int(self.delay * 1000),
+            cost_usd=0.003
+        )
+
+    def get_cost_estimate(self, input_size: int) -> float:
+        return 0.001
+
+
+@pytest.fixture
+def record_request():
+    with patch("app.services.llm.llm_provider_service.metrics_collector.record_request", new=AsyncMock()) as record:
+        yield record
+
+
+@pytest.fixture
+def service(record_request):
+    with patch(f"{SETTINGS}.llm_hedging_enabled", True), patch(f"{SETTINGS}.llm_hedge_budget_ms", {"simple": 50}):
+        yield LLMProviderService()
+
+
+class TestHedgedProcessing:
+    """Test the hedged race between providers of the fallback chain"""
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_is_hedged_and_cancelled(self, service, record_request):
+        """Test that the next provider starts after the budget and the loser is cancelled and costed"""
+        service.adapters = {"deepseek": FakeAdapter("deepseek", 5), "gemini": FakeAdapter("gemini", 0.01)}
+
+        async with asyncio.timeout(2):
+            result = await service.process_content(text="pastillas de freno")
+
+        assert result.provider_used == "gemini"
+        assert service.hedge_stats == {"hedged_requests": 1, "hedge_wins": 1, "cancelled_calls": 1}
+
+        costs = {call.kwargs["provider"]: call.kwargs for call in record_request.await_args_list}
+        assert costs["gemini"]["cost_usd"] == 0.003
+        assert costs["deepseek"]["cancelled"] is True
+        assert costs["deepseek"]["cost_usd"] == 0.001
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_is_not_hedged(self, service):
+        """Test that no second call is made when the primary answers within its budget"""
+        secondary = FakeAdapter("gemini", 0.01)
+        service.adapters = {"deepseek": FakeAdapter("deepseek", 0.001), "gemini": secondary}
+
+        result = await service.process_content(text="pastillas de freno")
+
+        assert result.provider_used == "deepseek"
+        assert secondary.calls == 0
+        assert service.hedge_stats["hedged_requests"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failure_starts_next_provider_immediately(self, service):
+        """Test that a failed primary does not wait for the budget before falling back"""
+        service.adapters = {
+            "deepseek": FakeAdapter("deepseek", 0, fail=True),
+            "gemini": FakeAdapter("gemini", 0.01)
+        }
+
+        with patch(f"{SETTINGS}.llm_hedge_budget_ms", {"simple": 10000}):
+            async with asyncio.timeout(2):
+                result = await service.process_content(text="pastillas de freno")
+
+        assert result.provider_used == "gemini"
+        assert service.hedge_stats["hedged_requests"] == 0
@@ -0,0 +1,91 @@
+"""
+Tests for the normalized LLM response cache
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.models.llm import ComplexityLevel, LLMRequest, ProcessedData
+from app.services.llm.response_cache import LLMResponseCache, canonical_text
+
+
+def _request(text: str) -> LLMRequest:
+    return LLMRequest(text=text, complexity_level=ComplexityLevel.SIMPLE)
+
+
+def _response() -> ProcessedData:
+    return ProcessedData(
+        repuestos=[{"nombre": "pastillas de freno", "cantidad": 1}],
+        vehiculo={"marca": "Mazda", "linea": "3", "anio": "2015"},
+        provider_used="openai",
+        complexity_level="simple",
+        processing_time_ms=1800,
+        cost_usd=0.002,
+        raw_text="Pastillas de freno Mazda 3 2015"
+    )
+
+
+@pytest_asyncio.fixture
+async def redis_client():
+    client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    with patch("app.core.redis.redis_manager.redis_client", client):
+        yield client
+    await client.aclose()
+
+
+class TestLLMResponseCache:
+    """Test canonical keys and cache stats"""
+
+    def test_canonical_text(self):
+        """Test that case, accents, punctuation, filler words and slang are normalized"""
+        assert canonical_text("Pastillas de freno Mazda 3 2015") == "pastillas freno mazda 3 2015"
+        assert canonical_text("pastillas  freno, mazda3 2015!") == "pastillas freno mazda 3 2015"
+        assert canonical_text("Cauchos para la Pulsar") == canonical_text("llantas pulsar")
+        assert canonical_text("Batería") == "bateria"
+
+    @pytest.mark.asyncio
+    async def test_normalized_hit_counts_without_rewriting_entry(self, redis_client):
+        """Test that text variants share an entry and hits go to separate counters"""
+        cache = LLMResponseCache()
+        await cache.put(_request("Pastillas de freno Mazda 3 2015"), _response())
+        key = cache.cache_key(_request("Pastillas de freno Mazda 3 2015"))
+        stored = await redis_client.get(key)
+
+        hit = await cache.get(_request("pastillas freno mazda3 2015"))
+        await cache.get(_request("PASTILLAS DE FRENO MAZDA 3 2015"))
+        assert await cache.get(_request("pastillas freno mazda 3 2016")) is None
+
+        assert hit.repuestos == _response().repuestos
+        assert hit.raw_text == "pastillas freno mazda3 2015"
+        assert await redis_client.get(key) == stored
+        assert json.loads(stored)["hit_count"] == 0
+        assert await redis_client.hget(cache.hit_counts_key, key) == "2"
+
+        stats = await cache.get_stats()
+        assert stats["lookups"] == 3
+        assert stats["hits"] == 2
+        assert stats["hit_rate"] == pytest.approx(0.6667)
+        assert stats["saved_cost_usd"] == pytest.approx(0.004)
+        assert stats["saved_latency_ms"] > 3000
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("cached, query", [
+        ("amortiguador delantero derecho y trasero izquierdo spark 2015",
+         "amortiguador delantero izquierdo y trasero derecho spark 2015"),
+        ("2 pastillas de freno y 1 filtro de aceite mazda 3 2015",
+         "1 pastillas de freno y 2 filtro de aceite mazda 3 2015"),
+        ("filtro de aceite y filtro de aire toyota hilux 2018",
+         "filtro de aire y filtro de aceite toyota hilux 2018"),
+    ])
+    async def test_reordered_words_are_a_miss(self, redis_client, cached, query):
+        """Test that a message with the same words in another order never gets the cached answer"""
+        cache = LLMResponseCache()
+        await cache.put(_request(cached), _response())
+
+        assert await cache.get(_request(query)) is None
+        assert (await cache.get_stats())["hits"] == 0
@@ -0,0 +1,98 @@
+"""
+Tests for the message queue worker pool
+"""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.services.message_worker_pool import MessageWorkerPool, stage
+
+
+def _fake_brpop(entries):
+    """BRPOP over an in-memory list; blocks (like an empty queue) once drained"""
+    async def brpop(key, timeout=0):
+        if entries:
+            return key, entries.pop(0)
+        await asyncio.sleep(timeout)
+        return None
+    return brpop
+
+
+async def _run_until(pool, condition, timeout=5):
+    task = asyncio.create_task(pool.start())
+    try:
+        async with asyncio.timeout(timeout):
+            while not condition():
+                await asyncio.sleep(0.01)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+class TestMessageWorkerPool:
+    """Test ordering, parallelism and metrics of the worker pool"""
+
+    @pytest.mark.asyncio
+    async def test_ordered_per_chat_parallel_across_chats(self):
+        """Messages of one chat run in order; different chats overlap"""
+        entries = [json.dumps({"chat_id": chat, "seq": seq}) for seq in range(5) for chat in ("a", "b", "c")]
+        seen = {"a": [], "b": [], "c": []}
+        running = {"now": 0, "max": 0}
+
+        async def handler(message):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            async with stage("llm_interpretation"):
+                await asyncio.sleep(0.02)
+            seen[message["chat_id"]].append(message["seq"])
+            running["now"] -= 1
+            return {"success": True}
+
+        pool = MessageWorkerPool("test", "test:queue", lambda m: m["chat_id"], handler, workers=4, max_buffered=50, reliable=False)
+        with patch("app.services.message_worker_pool.redis_manager.brpop", _fake_brpop(entries)):
+            await _run_until(pool, lambda: pool.processed == 15)
+
+        assert all(seqs == list(range(5)) for seqs in seen.values())
+        # Never two messages of the same chat at once, so at most 3 chats in flight
+        assert running["max"] == 3
+        metrics = await pool.get_metrics()
+        assert metrics["processed"] == 15
+        assert metrics["latency"]["llm_interpretation"]["count"] == 15
+        assert metrics["latency"]["processing"]["p50_ms"] >= 20
+
+    @pytest.mark.asyncio
+    async def test_slow_chat_does_not_block_others(self):
+        """A slow conversation only delays its own messages"""
+        entries = [json.dumps({"chat_id": "slow"})] + [json.dumps({"chat_id": f"c{i}"}) for i in range(10)]
+        done = []
+
+        async def handler(message):
+            await asyncio.sleep(1 if message["chat_id"] == "slow" else 0)
+            done.append(message["chat_id"])
+
+        pool = MessageWorkerPool("test", "test:queue", lambda m: m["chat_id"], handler, workers=2, max_buffered=50, reliable=False)
+        with patch("app.services.message_worker_pool.redis_manager.brpop", _fake_brpop(entries)):
+            await _run_until(pool, lambda: len(done) == 10)
+
+        assert "slow" not in done
+
+    @pytest.mark.asyncio
+    async def test_failures_are_counted_and_do_not_stop_the_pool(self):
+        """Unreadable entries, handler errors and failed results are counted"""
+        entries = ["not json", json.dumps({"chat_id": "a", "boom": True}), json.dumps({"chat_id": "a", "ok": False}),
+                   json.dumps({"chat_id": "a"})]
+
+        async def handler(message):
+            if message.get("boom"):
+                raise RuntimeError("boom")
+            return {"success": message.get("ok", True)}
+
+        pool = MessageWorkerPool("test", "test:queue", lambda m: m["chat_id"], handler, workers=1, max_buffered=10, reliable=False)
+        with patch("app.services.message_worker_pool.redis_manager.brpop", _fake_brpop(entries)):
+            await _run_until(pool, lambda: pool.processed + pool.failed == 4)
+
+        assert (pool.processed, pool.failed) == (1, 3)
+        assert pool._buffered == 0
@@ -0,0 +1,175 @@
+"""
+Tests for the reliable queue mode (leases, reclaim, retries and dead letters)
+"""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import httpx
+import pytest
+import pytest_asyncio
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.services.message_worker_pool import MessageWorkerPool
+from app.services.reliable_queue import ReliableQueue
+
+QUEUE = "test:message_queue"
+
+
+@pytest_asyncio.fixture
+async def redis_client():
+    client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    with patch("app.core.redis.redis_manager.redis_client", client):
+        yield client
+    await client.aclose()
+
+
+async def _run_until(pool, condition, timeout=5):
+    task = asyncio.create_task(pool.start())
+    try:
+        async with asyncio.timeout(timeout):
+            while not condition():
+                await asyncio.sleep(0.01)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+class TestReliableQueue:
+    """Test leasing and reclaim of in-flight entries"""
+
+    @pytest.mark.asyncio
+    async def test_pop_leases_and_ack_clears(self, redis_client):
+        """A popped entry stays in the processing list, wrapped in an envelope, until acked"""
+        queue = ReliableQueue(QUEUE, visibility_timeout=60, max_attempts=3)
+        await redis_client.lpush(QUEUE, "m1")
+
+        entry = await queue.pop(timeout=1)
+        assert ReliableQueue.payload(entry) == "m1"
+        assert await redis_client.lrange(queue.processing_key, 0, -1) == [entry]
+        assert await redis_client.zscore(queue.leases_key, entry) is not None
+
+        await queue.ack(entry)
+        assert await redis_client.llen(queue.processing_key) == 0
+        assert await redis_client.zcard(queue.leases_key) == 0
+
+    @pytest.mark.asyncio
+    async def test_identical_payloads_get_their_own_lease(self, redis_client):
+        """Two equal payloads are leased, counted and acked separately"""
+        queue = ReliableQueue(QUEUE, visibility_timeout=60, max_attempts=3)
+        await redis_client.lpush(QUEUE, "m1", "m1")
+
+        first = await queue.pop(timeout=1)
+        second = await queue.pop(timeout=1)
+        assert first != second
+        assert ReliableQueue.payload(first) == ReliableQueue.payload(second) == "m1"
+
+        await redis_client.zadd(queue.leases_key, {first: 0})
+        assert await queue.reclaim() == {"reclaimed": 1, "dead_lettered": 0}
+        assert await queue.previous_attempts(first) == 1
+        assert await queue.previous_attempts(second) == 0
+
+        await queue.ack(second)
+        assert await redis_client.lrange(QUEUE, 0, -1) == [first]
+        assert await redis_client.llen(queue.processing_key) == 0
+
+    @pytest.mark.asyncio
+    async def test_reclaim_requeues_then_dead_letters(self, redis_client):
+        """Entries of a crashed consumer return to the queue until attempts run out"""
+        queue = ReliableQueue(QUEUE, visibility_timeout=60, max_attempts=2)
+        await redis_client.lpush(QUEUE, "m1")
+        entry = await queue.pop(timeout=1)
+
+        # Lease not expired yet: nothing to reclaim
+        assert await queue.reclaim() == {"reclaimed": 0, "dead_lettered": 0}
+
+        await redis_client.zadd(queue.leases_key, {entry: 0})
+        assert await queue.reclaim() == {"reclaimed": 1, "dead_lettered": 0}
+        assert await redis_client.lrange(QUEUE, 0, -1) == [entry]
+        assert await queue.previous_attempts(entry) == 1
+
+        # The requeued envelope keeps its identity and attempt count
+        assert await queue.pop(timeout=1) == entry
+        await redis_client.zadd(queue.leases_key, {entry: 0})
+        assert await queue.reclaim() == {"reclaimed": 0, "dead_lettered": 1}
+        dead = await queue.list_dead()
+        assert dead[0]["entry"] == "m1" and dead[0]["attempts"] == 2
+        assert await redis_client.llen(queue.processing_key) == 0
+        assert await queue.previous_attempts(entry) == 0
+
+        assert await queue.replay_dead() == 1
+        assert await redis_client.lrange(QUEUE, 0, -1) == ["m1"]
+        assert await redis_client.llen(queue.dead_key) == 0
+
+    @pytest.mark.asyncio
+    async def test_reclaim_recovers_entry_moved_but_not_leased(self, redis_client):
+        """A raw entry left in processing by a consumer that died after BLMOVE is requeued"""
+        queue = ReliableQueue(QUEUE, visibility_timeout=60, max_attempts=3)
+        await redis_client.lpush(queue.processing_key, "m1")
+
+        # First pass leases it, so a consumer that is only slow keeps its grace period
+        assert await queue.reclaim() == {"reclaimed": 0, "dead_lettered": 0}
+        await redis_client.zadd(queue.leases_key, {"m1": 0})
+        assert await queue.reclaim() == {"reclaimed": 1, "dead_lettered": 0}
+        assert await redis_client.lrange(QUEUE, 0, -1) == ["m1"]
+        assert ReliableQueue.payload(await queue.pop(timeout=1)) == "m1"
+
+
+class TestReliableWorkerPool:
+    """Test retries and dead letters through the worker pool"""
+
+    @pytest.mark.asyncio
+    async def test_retries_in_order_then_dead_letters(self, redis_client, monkeypatch):
+        """A transient error is retried before later messages of its chat, then dead-lettered"""
+        monkeypatch.setattr("app.core.config.settings.queue_retry_backoff_seconds", 0.01)
+        calls = []
+
+        async def handler(message):
+            calls.append(message["seq"])
+            if message["seq"] == 0:
+                raise httpx.ConnectError("llm down")
+            return {"success": True}
+
+        for seq in range(3):
+            await redis_client.lpush(QUEUE, json.dumps({"chat_id": "a", "seq": seq}))
+        await redis_client.lpush(QUEUE, "not json")
+
+        pool = MessageWorkerPool("test", QUEUE, lambda m: m["chat_id"], handler, workers=2, pop_timeout=1, reliable=True)
+        pool.queue.max_attempts = 3
+        await _run_until(pool, lambda: pool.processed == 2 and pool.dead_lettered == 2)
+
+        assert calls == [0, 0, 0, 1, 2]
+        assert pool.retries == 2
+        dead = await pool.queue.list_dead()
+        assert {d["error"] for d in dead} == {"llm down", "unreadable entry: Expecting value: line 1 column 1 (char 0)"}
+        assert await redis_client.llen(pool.queue.processing_key) == 0
+        assert await redis_client.zcard(pool.queue.leases_key) == 0
+
+    @pytest.mark.asyncio
+    async def test_reported_failures_are_acked_and_permanent_errors_not_retried(self, redis_client, monkeypatch):
+        """A handler that returns a failure is acked; a non-transient exception is dead-lettered at once"""
+        monkeypatch.setattr("app.core.config.settings.queue_retry_backoff_seconds", 0.01)
+        calls = []
+
+        async def handler(message):
+            calls.append(message["seq"])
+            if message["seq"] == 0:
+                return {"success": False, "error": "no entendí el mensaje"}
+            if message["seq"] == 1:
+                raise ValueError("bad payload")
+            return {"success": True}
+
+        for seq in range(3):
+            await redis_client.lpush(QUEUE, json.dumps({"chat_id": "a", "seq": seq}))
+
+        pool = MessageWorkerPool("test", QUEUE, lambda m: m["chat_id"], handler, workers=1, pop_timeout=1, reliable=True)
+        pool.queue.max_attempts = 3
+        await _run_until(pool, lambda: pool.processed + pool.failed == 3)
+
+        assert calls == [0, 1, 2]
+        assert (pool.processed, pool.failed, pool.retries, pool.dead_lettered) == (1, 2, 0, 1)
+        dead = await pool.queue.list_dead()
+        assert [d["error"] for d in dead] == ["bad payload"]
+        assert await redis_client.llen(pool.queue.processing_key) == 0
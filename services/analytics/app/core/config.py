@@ -20,6 +20,9 @@ class Settings(BaseSettings):
     
     # Analytics específico
     METRICS_CACHE_TTL: int = int(os.getenv("METRICS_CACHE_TTL", "300"))  # 5 minutos
+    METRICS_LRU_MAX_ENTRIES: int = int(os.getenv("METRICS_LRU_MAX_ENTRIES", "256"))  # Cache en proceso
+    METRICS_TAG_INDEX_TTL: int = int(os.getenv("METRICS_TAG_INDEX_TTL", "86400"))  # Índices de tags en Redis
+    METRICS_MAX_CONSULTAS_CONCURRENTES: int = int(os.getenv("METRICS_MAX_CONSULTAS_CONCURRENTES", "4"))  # Pool asyncpg: maxsize 5
     BATCH_JOB_HOUR: int = int(os.getenv("BATCH_JOB_HOUR", "2"))  # 2 AM
     ALERT_THRESHOLDS: dict = {
         "error_rate": float(os.getenv("ALERT_ERROR_RATE", "0.05")),  # 5%
@@ -6,6 +6,9 @@ import json
 from typing import Any, Dict, Optional
 from app.core.config import settings
 
+# Canales publicados directamente por core-api (sin prefijo teloo:events:)
+CANALES_INVALIDACION_METRICAS = ("solicitud.*", "oferta.*", "evaluacion.*")
+
 class RedisManager:
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
@@ -78,8 +81,9 @@ class RedisManager:
             
         self.pubsub = self.redis_client.pubsub()
         
-        # Suscribirse a todos los eventos del sistema
-        await self.pubsub.psubscribe("teloo:events:*")
+        # Suscribirse a todos los eventos del sistema y a los canales de dominio
+        # que publica core-api (invalidan el cache de métricas)
+        await self.pubsub.psubscribe("teloo:events:*", *CANALES_INVALIDACION_METRICAS)
         
         return self.pubsub
     
@@ -10,6 +10,7 @@ from typing import Dict, Any, Optional
 from app.core.redis import redis_manager
 from app.models.events import EventoSistema, EventoMetrica
 from app.services.metrics_calculator import MetricsCalculator
+from app.services.metrics_cache import metrics_cache
 
 logger = logging.getLogger(__name__)
 
@@ -58,12 +59,22 @@ class EventCollector:
         try:
             # Extraer información del mensaje
             channel = message["channel"]
-            data = json.loads(message["data"])
             
             # Parsear el tipo de evento del canal
             # Formato: teloo:events:solicitud.created
             event_type = channel.replace("teloo:events:", "")
             
+            # Invalidar solo las métricas que dependen de la entidad del evento
+            # (antes de parsear: algunos publicadores no envían JSON)
+            await metrics_cache.invalidar(metrics_cache.tags_para_evento(event_type))
+            
+            # Canales de dominio de core-api (solicitud.*, oferta.*, evaluacion.*):
+            # solo invalidan cache, no forman parte del contrato teloo:events
+            if not channel.startswith("teloo:events:"):
+                return
+            
+            data = json.loads(message["data"])
+            
             logger.debug(f"Procesando evento: {event_type}")
             
             # Guardar evento en base de datos
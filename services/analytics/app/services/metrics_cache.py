@@ -0,0 +1,242 @@
+"""
+Metrics Cache Service
+Cache en dos niveles para los dashboards: LRU en proceso delante de Redis,
+cálculo single-flight (cargas concurrentes comparten una sola ejecución de
+queries) e invalidación por etiquetas de dependencia disparada por eventos
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+
+logger = logging.getLogger(__name__)
+
+# Etiquetas de dependencia: datos de origen que alimentan cada métrica
+TAG_SOLICITUDES = "solicitudes"
+TAG_OFERTAS = "ofertas"
+TAG_EVALUACIONES = "evaluaciones"
+TAG_ASESORES = "asesores"
+
+TAGS_POR_METRICA: Dict[str, Set[str]] = {
+    "kpis_principales": {TAG_SOLICITUDES, TAG_OFERTAS},
+    "embudo_operativo": {TAG_SOLICITUDES, TAG_OFERTAS, TAG_EVALUACIONES},
+    "salud_marketplace": {TAG_SOLICITUDES, TAG_OFERTAS, TAG_EVALUACIONES, TAG_ASESORES},
+    "dashboard_financiero": {TAG_SOLICITUDES, TAG_OFERTAS, TAG_EVALUACIONES},
+    "advisor_scorecards_rfm": {TAG_OFERTAS, TAG_EVALUACIONES, TAG_ASESORES},
+}
+
+# Entidad del evento (prefijo antes del punto) -> etiquetas afectadas
+# La evaluación adjudica ofertas y cambia el estado de la solicitud
+TAGS_POR_ENTIDAD: Dict[str, Set[str]] = {
+    "solicitud": {TAG_SOLICITUDES},
+    "oferta": {TAG_OFERTAS},
+    "evaluacion": {TAG_EVALUACIONES, TAG_OFERTAS, TAG_SOLICITUDES},
+    "asesor": {TAG_ASESORES},
+}
+
+PREFIJO_TAG_REDIS = "metrics:tag:"
+
+# Estado del cálculo en curso; las subtareas de asyncio.gather comparten el mismo dict
+_calculo_actual: ContextVar[Optional[Dict[str, bool]]] = ContextVar("calculo_metricas", default=None)
+
+
+def marcar_calculo_fallido():
+    """
+    Una consulta falló y el cálculo continúa con un valor por defecto:
+    el resultado se devuelve pero no se cachea
+    """
+    calculo = _calculo_actual.get()
+    if calculo is not None:
+        calculo["fallido"] = True
+
+
+class MetricsCache:
+    """
+    Cache compartido por todas las instancias de MetricsCalculator del proceso
+    """
+
+    def __init__(self, max_entradas: int = None):
+        self.max_entradas = max_entradas or settings.METRICS_LRU_MAX_ENTRIES
+        # clave -> (expira_en monotónico, tags, JSON serializado)
+        self._lru: "OrderedDict[str, Tuple[float, Set[str], str]]" = OrderedDict()
+        self._en_vuelo: Dict[str, asyncio.Future] = {}
+        # Generación por etiqueta: un cálculo iniciado antes de una invalidación no se guarda
+        self._generaciones: Dict[str, int] = {}
+        self._stats = {"hits_lru": 0, "hits_redis": 0, "calculos": 0, "compartidos": 0, "invalidaciones": 0, "fallidos": 0}
+
+    @staticmethod
+    def tags_para_metrica(metrica: str) -> Set[str]:
+        return TAGS_POR_METRICA.get(metrica, set())
+
+    @staticmethod
+    def tags_para_evento(event_type: str) -> Set[str]:
+        """Etiquetas afectadas por un evento 'entidad.accion'"""
+        entidad = event_type.split(".", 1)[0]
+        return TAGS_POR_ENTIDAD.get(entidad, set())
+
+    async def obtener(
+        self,
+        metrica: str,
+        clave: str,
+        calcular: Callable[[], Awaitable[Any]],
+        ttl: int
+    ) -> Any:
+        """
+        Retorna la métrica desde el LRU, Redis o calculándola (una sola vez por clave
+        aunque lleguen varias peticiones concurrentes). Si calcular() falla, la
+        excepción se propaga a todos los que esperaban y no se cachea nada; lo mismo
+        si alguna de sus consultas llamó a marcar_calculo_fallido().
+        """
+        serializado = self._lru_get(clave)
+        if serializado is not None:
+            self._stats["hits_lru"] += 1
+            return json.loads(serializado)
+
+        tarea = self._en_vuelo.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(self._cargar(metrica, clave, calcular, ttl))
+            self._en_vuelo[clave] = tarea
+            tarea.add_done_callback(lambda t: self._liberar_vuelo(clave, t))
+        else:
+            self._stats["compartidos"] += 1
+
+        # shield: si una petición se cancela, el cálculo sigue para las demás
+        serializado = await asyncio.shield(tarea)
+        return json.loads(serializado)
+
+    async def invalidar(self, tags: Iterable[str]) -> int:
+        """
+        Descarta las entradas que dependen de alguna de las etiquetas (LRU y Redis)
+
+        Returns:
+            int: Entradas descartadas del LRU local
+        """
+        tags = set(tags)
+        if not tags:
+            return 0
+
+        for tag in tags:
+            self._generaciones[tag] = self._generaciones.get(tag, 0) + 1
+
+        claves = [clave for clave, (_, tags_entrada, _) in self._lru.items() if tags_entrada & tags]
+        for clave in claves:
+            del self._lru[clave]
+        self._stats["invalidaciones"] += 1
+
+        if redis_manager.redis_client:
+            try:
+                pipe = redis_manager.redis_client.pipeline(transaction=False)
+                for tag in tags:
+                    pipe.smembers(f"{PREFIJO_TAG_REDIS}{tag}")
+                miembros = await pipe.execute()
+
+                claves_redis = set().union(*miembros)
+                pipe = redis_manager.redis_client.pipeline(transaction=False)
+                if claves_redis:
+                    pipe.delete(*claves_redis)
+                pipe.delete(*[f"{PREFIJO_TAG_REDIS}{tag}" for tag in tags])
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Error invalidando cache en Redis para {sorted(tags)}: {e}")
+
+        logger.debug(f"Cache invalidado para {sorted(tags)}: {len(claves)} entradas locales")
+        return len(claves)
+
+    def get_estadisticas(self) -> Dict[str, Any]:
+        return {**self._stats, "entradas_lru": len(self._lru), "en_vuelo": len(self._en_vuelo)}
+
+    def limpiar(self):
+        """Vacía el LRU local (tests y reinicios)"""
+        self._lru.clear()
+        self._generaciones.clear()
+
+    # Internos
+
+    def _liberar_vuelo(self, clave: str, tarea: asyncio.Future):
+        if self._en_vuelo.get(clave) is tarea:
+            del self._en_vuelo[clave]
+
+    def _lru_get(self, clave: str) -> Optional[str]:
+        entrada = self._lru.get(clave)
+        if entrada is None:
+            return None
+        expira_en, _, serializado = entrada
+        if expira_en <= time.monotonic():
+            del self._lru[clave]
+            return None
+        self._lru.move_to_end(clave)
+        return serializado
+
+    def _lru_set(self, clave: str, tags: Set[str], serializado: str, ttl: int):
+        self._lru[clave] = (time.monotonic() + ttl, tags, serializado)
+        self._lru.move_to_end(clave)
+        while len(self._lru) > self.max_entradas:
+            self._lru.popitem(last=False)
+
+    def _generaciones_de(self, tags: Set[str]) -> Tuple[int, ...]:
+        return tuple(self._generaciones.get(tag, 0) for tag in sorted(tags))
+
+    async def _cargar(
+        self,
+        metrica: str,
+        clave: str,
+        calcular: Callable[[], Awaitable[Any]],
+        ttl: int
+    ) -> str:
+        tags = self.tags_para_metrica(metrica)
+        generaciones = self._generaciones_de(tags)
+
+        # Nivel 2: Redis (compartido entre réplicas)
+        if redis_manager.redis_client:
+            try:
+                pipe = redis_manager.redis_client.pipeline(transaction=False)
+                pipe.get(clave)
+                pipe.ttl(clave)
+                serializado, ttl_restante = await pipe.execute()
+                if serializado:
+                    self._stats["hits_redis"] += 1
+                    if ttl_restante and ttl_restante > 0:
+                        self._lru_set(clave, tags, serializado, min(ttl, ttl_restante))
+                    return serializado
+            except Exception as e:
+                logger.warning(f"Error accediendo al cache: {e}")
+
+        self._stats["calculos"] += 1
+        calculo = {"fallido": False}
+        _calculo_actual.set(calculo)  # _cargar corre en su propia tarea: no afecta al llamador
+        valor = await calcular()
+        serializado = json.dumps(valor, default=str)
+
+        if calculo["fallido"]:
+            self._stats["fallidos"] += 1
+            logger.warning(f"Métrica {clave} calculada con consultas fallidas, no se cachea")
+            return serializado
+
+        # Un evento llegó mientras se calculaba: el resultado puede estar desactualizado
+        if self._generaciones_de(tags) != generaciones:
+            logger.debug(f"Métrica {clave} invalidada durante el cálculo, no se cachea")
+            return serializado
+
+        self._lru_set(clave, tags, serializado, ttl)
+        if redis_manager.redis_client:
+            try:
+                pipe = redis_manager.redis_client.pipeline(transaction=False)
+                pipe.setex(clave, ttl, serializado)
+                for tag in tags:
+                    pipe.sadd(f"{PREFIJO_TAG_REDIS}{tag}", clave)
+                    pipe.expire(f"{PREFIJO_TAG_REDIS}{tag}", settings.METRICS_TAG_INDEX_TTL)
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Error guardando en cache: {e}")
+
+        return serializado
+
+
+# Instancia global del cache de métricas
+metrics_cache = MetricsCache()
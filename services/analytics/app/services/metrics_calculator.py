@@ -2,16 +2,28 @@
 Metrics Calculator Service
 Calcula KPIs y métricas del sistema
 """
+import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Awaitable, List, Optional
 from tortoise import connections
-from app.core.redis import redis_manager
+from app.services.metrics_cache import marcar_calculo_fallido, metrics_cache
 from app.models.metrics import MetricaCalculada, TipoMetrica
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Limita las queries concurrentes del proceso para no agotar el pool de conexiones
+_semaforo_consultas: Optional[asyncio.Semaphore] = None
+
+
+def _semaforo() -> asyncio.Semaphore:
+    global _semaforo_consultas
+    if _semaforo_consultas is None:
+        _semaforo_consultas = asyncio.Semaphore(settings.METRICS_MAX_CONSULTAS_CONCURRENTES)
+    return _semaforo_consultas
+
+
 class MetricsCalculator:
     """
     Calculadora de métricas y KPIs del sistema
@@ -43,13 +55,15 @@ class MetricsCalculator:
         try:
             conn = connections.get("default")
             # Usar el método correcto de Tortoise que retorna diccionarios
-            results = await conn.execute_query_dict(query, params or [])
+            async with _semaforo():
+                results = await conn.execute_query_dict(query, params or [])
             # Convertir Decimals a float
             return self._convert_decimals(results) if results else []
         except AttributeError:
             # Si execute_query_dict no existe, usar execute_query y convertir manualmente
             try:
-                results = await conn.execute_query(query, params or [])
+                async with _semaforo():
+                    results = await conn.execute_query(query, params or [])
                 if not results or len(results) < 2:
                     return []
                 # results[0] = columnas, results[1] = filas
@@ -60,10 +74,20 @@ class MetricsCalculator:
                 return self._convert_decimals(data)
             except Exception as e2:
                 logger.error(f"Error en fallback de query: {e2}")
+                marcar_calculo_fallido()
                 return []
         except Exception as e:
             logger.error(f"Error ejecutando query: {e}\nQuery: {query[:100]}...")
+            marcar_calculo_fallido()
             return []
+
+    async def _en_paralelo(self, consultas: Dict[str, Awaitable[Any]]) -> Dict[str, Any]:
+        """
+        Ejecutar cálculos independientes de forma concurrente (acotados por el semáforo
+        de _execute_query) y retornar sus resultados con las mismas claves
+        """
+        resultados = await asyncio.gather(*consultas.values())
+        return dict(zip(consultas.keys(), resultados))
         
     async def get_kpis_principales(self, fecha_inicio: datetime = None, fecha_fin: datetime = None) -> Dict[str, Any]:
         """
@@ -76,70 +100,13 @@ class MetricsCalculator:
             
         cache_key = f"{self.cache_prefix}kpis_principales:{fecha_inicio.date()}:{fecha_fin.date()}"
         
-        # Intentar obtener del cache
-        try:
-            cached_data = await redis_manager.get_cache(cache_key)
-            if cached_data:
-                return cached_data
-        except Exception as e:
-            logger.warning(f"Error accediendo al cache: {e}")
-            
         try:
-            # Calcular período anterior para comparación
-            duracion = fecha_fin - fecha_inicio
-            fecha_inicio_anterior = fecha_inicio - duracion
-            fecha_fin_anterior = fecha_inicio
-            
-            # Calcular KPIs del período actual
-            solicitudes_data = await self._calcular_solicitudes_mes(fecha_inicio, fecha_fin)
-            conversion_data = await self._calcular_tasa_conversion(fecha_inicio, fecha_fin)
-            valor_data = await self._calcular_valor_promedio_transaccion(fecha_inicio, fecha_fin)
-            ofertas_data = await self._calcular_ofertas_totales(fecha_inicio, fecha_fin)
-            
-            # Calcular KPIs del período anterior para cambios porcentuales
-            solicitudes_anterior = await self._calcular_solicitudes_mes(fecha_inicio_anterior, fecha_fin_anterior)
-            conversion_anterior = await self._calcular_tasa_conversion(fecha_inicio_anterior, fecha_fin_anterior)
-            valor_anterior = await self._calcular_valor_promedio_transaccion(fecha_inicio_anterior, fecha_fin_anterior)
-            ofertas_anterior = await self._calcular_ofertas_totales(fecha_inicio_anterior, fecha_fin_anterior)
-            
-            # Calcular cambios porcentuales
-            ofertas_cambio = self._calcular_cambio_porcentual(
-                ofertas_data.get("total", 0),
-                ofertas_anterior.get("total", 0)
-            )
-            monto_cambio = self._calcular_cambio_porcentual(
-                valor_data.get("valor_total", 0),
-                valor_anterior.get("valor_total", 0)
-            )
-            solicitudes_cambio = self._calcular_cambio_porcentual(
-                solicitudes_data.get("abiertas", 0),
-                solicitudes_anterior.get("abiertas", 0)
-            )
-            conversion_cambio = self._calcular_cambio_porcentual(
-                conversion_data.get("tasa_conversion", 0),
-                conversion_anterior.get("tasa_conversion", 0)
+            return await metrics_cache.obtener(
+                "kpis_principales", cache_key,
+                lambda: self._calcular_kpis_principales(fecha_inicio, fecha_fin),
+                ttl=300  # 5 minutes
             )
             
-            # Estructurar respuesta
-            kpis = {
-                "ofertas_totales": ofertas_data.get("total", 0),
-                "ofertas_cambio": ofertas_cambio,
-                "monto_total": valor_data.get("valor_total", 0),
-                "monto_cambio": monto_cambio,
-                "solicitudes_abiertas": solicitudes_data.get("abiertas", 0),
-                "solicitudes_cambio": solicitudes_cambio,
-                "tasa_conversion": conversion_data.get("tasa_conversion", 0),
-                "conversion_cambio": conversion_cambio,
-            }
-            
-            # Guardar en cache
-            try:
-                await redis_manager.set_cache(cache_key, kpis, ttl=300)  # 5 minutes
-            except Exception as e:
-                logger.warning(f"Error guardando en cache: {e}")
-            
-            return kpis
-            
         except Exception as e:
             logger.error(f"Error calculando KPIs principales: {e}", exc_info=True)
             # Return zeros instead of mock data
@@ -153,7 +120,90 @@ class MetricsCalculator:
                 "tasa_conversion": 0,
                 "conversion_cambio": 0,
             }
+
+    async def _calcular_kpis_principales(self, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, Any]:
+        """
+        Calcula los 4 KPIs principales (sin cache)
+        Período actual y anterior en una sola sentencia: cada métrica se separa con
+        FILTER sobre el rango completo, con los mismos límites BETWEEN que las
+        consultas por período (_calcular_solicitudes_mes, _calcular_tasa_conversion,
+        _calcular_valor_promedio_transaccion y _calcular_ofertas_totales)
+        """
+        # Calcular período anterior para comparación
+        duracion = fecha_fin - fecha_inicio
+        fecha_inicio_anterior = fecha_inicio - duracion
+        
+        query = """
+        WITH sol AS (
+            SELECT
+                COUNT(*) FILTER (WHERE estado = 'ABIERTA' AND created_at BETWEEN $2 AND $3) as abiertas,
+                COUNT(*) FILTER (WHERE estado = 'ABIERTA' AND created_at BETWEEN $1 AND $2) as abiertas_anterior,
+                COUNT(*) FILTER (WHERE created_at BETWEEN $2 AND $3) as total,
+                COUNT(*) FILTER (WHERE cliente_acepto = true AND created_at BETWEEN $2 AND $3) as aceptadas,
+                COUNT(*) FILTER (WHERE created_at BETWEEN $1 AND $2) as total_anterior,
+                COUNT(*) FILTER (WHERE cliente_acepto = true AND created_at BETWEEN $1 AND $2) as aceptadas_anterior
+            FROM solicitudes
+            WHERE created_at BETWEEN $1 AND $3
+        ),
+        ofe AS (
+            SELECT
+                COUNT(*) FILTER (WHERE created_at BETWEEN $2 AND $3) as ofertas,
+                COUNT(*) FILTER (WHERE created_at BETWEEN $1 AND $2) as ofertas_anterior
+            FROM ofertas
+            WHERE created_at BETWEEN $1 AND $3
+        ),
+        val AS (
+            SELECT
+                SUM(od.precio_unitario * od.cantidad) FILTER (WHERE o.created_at BETWEEN $2 AND $3) as valor_total,
+                SUM(od.precio_unitario * od.cantidad) FILTER (WHERE o.created_at BETWEEN $1 AND $2) as valor_total_anterior
+            FROM ofertas o
+            JOIN ofertas_detalle od ON o.id = od.oferta_id
+            WHERE o.estado = 'GANADORA'
+            AND o.created_at BETWEEN $1 AND $3
+        )
+        SELECT
+            sol.abiertas, sol.abiertas_anterior,
+            CASE WHEN sol.total > 0 THEN
+                ROUND(CAST((sol.aceptadas::float / sol.total) * 100 AS numeric), 2)
+            ELSE 0 END as tasa_conversion,
+            CASE WHEN sol.total_anterior > 0 THEN
+                ROUND(CAST((sol.aceptadas_anterior::float / sol.total_anterior) * 100 AS numeric), 2)
+            ELSE 0 END as tasa_conversion_anterior,
+            ofe.ofertas, ofe.ofertas_anterior,
+            val.valor_total, val.valor_total_anterior
+        FROM sol, ofe, val
+        """
+        
+        result = await self._execute_query(query, [fecha_inicio_anterior, fecha_inicio, fecha_fin])
+        data = result[0] if result else {}
         
+        def valor(clave: str) -> float:
+            return round(float(data.get(clave) or 0), 0)
+        
+        tasa_conversion = float(data.get("tasa_conversion") or 0)
+        
+        # Estructurar respuesta
+        kpis = {
+            "ofertas_totales": data.get("ofertas", 0),
+            "ofertas_cambio": self._calcular_cambio_porcentual(
+                data.get("ofertas", 0), data.get("ofertas_anterior", 0)
+            ),
+            "monto_total": valor("valor_total"),
+            "monto_cambio": self._calcular_cambio_porcentual(
+                valor("valor_total"), valor("valor_total_anterior")
+            ),
+            "solicitudes_abiertas": data.get("abiertas", 0),
+            "solicitudes_cambio": self._calcular_cambio_porcentual(
+                data.get("abiertas", 0), data.get("abiertas_anterior", 0)
+            ),
+            "tasa_conversion": tasa_conversion,
+            "conversion_cambio": self._calcular_cambio_porcentual(
+                tasa_conversion, float(data.get("tasa_conversion_anterior") or 0)
+            ),
+        }
+
+        return kpis
+
     async def get_embudo_operativo(self, fecha_inicio: datetime = None, fecha_fin: datetime = None, nivel: str = "solicitud") -> Dict[str, Any]:
         """
         Obtener métricas del embudo operativo (11 KPIs alineados con Indicadores.txt)
@@ -170,87 +220,11 @@ class MetricsCalculator:
         cache_key = f"{self.cache_prefix}embudo_operativo:{nivel}:{fecha_inicio.date()}:{fecha_fin.date()}"
         
         try:
-            cached_data = await redis_manager.get_cache(cache_key)
-            if cached_data:
-                return cached_data
-        except Exception as e:
-            logger.warning(f"Error accediendo al cache: {e}")
-            
-        try:
-            # Seleccionar métodos según nivel
-            if nivel == "repuesto":
-                # Calcular volúmenes del embudo
-                volumenes = await self._calcular_volumenes_embudo_repuesto(fecha_inicio, fecha_fin)
-                
-                # Calcular todos los KPIs del embudo a nivel de repuesto
-                embudo = {
-                    # Volúmenes (cantidades) para el embudo
-                    "volumenes": volumenes,
-                    
-                    # 1. Tasa de Entrada
-                    "tasa_entrada": await self._calcular_tasa_entrada(fecha_inicio, fecha_fin),
-                    
-                    # 2-5. Tasas de Conversión (nivel repuesto)
-                    "conversiones": {
-                        "abierta_a_evaluacion": await self._calcular_conversion_abierta_evaluacion(fecha_inicio, fecha_fin),
-                        "evaluacion_a_adjudicada": await self._calcular_conversion_evaluacion_adjudicada(fecha_inicio, fecha_fin),
-                        "adjudicada_a_aceptada": await self._calcular_conversion_adjudicada_aceptada(fecha_inicio, fecha_fin),
-                        "conversion_general": await self._calcular_conversion_general(fecha_inicio, fecha_fin)
-                    },
-                    
-                    # 6-8. Métricas de Tiempo
-                    "tiempos": {
-                        "ttfo": await self._calcular_ttfo(fecha_inicio, fecha_fin),
-                        "tta": await self._calcular_tta(fecha_inicio, fecha_fin),
-                        "ttcd": await self._calcular_ttcd(fecha_inicio, fecha_fin)
-                    },
-                    
-                    # 9-10. Métricas de Fallo
-                    "fallos": {
-                        "tasa_escalamiento": await self._calcular_tasa_escalamiento(fecha_inicio, fecha_fin),
-                        "fallo_por_nivel": await self._calcular_fallo_por_nivel(fecha_inicio, fecha_fin)
-                    }
-                }
-            else:  # nivel == "solicitud"
-                # Calcular volúmenes del embudo
-                volumenes_embudo = await self._calcular_volumenes_embudo_solicitud(fecha_inicio, fecha_fin)
-                
-                # Calcular todos los KPIs del embudo a nivel de solicitud
-                embudo = {
-                    # Volúmenes del embudo (para gráfica)
-                    "embudo": volumenes_embudo,
-                    
-                    # 1. Tasa de Entrada
-                    "tasa_entrada": await self._calcular_tasa_entrada(fecha_inicio, fecha_fin),
-                    
-                    # 2-5. Tasas de Conversión (nivel solicitud)
-                    "conversiones": {
-                        "abierta_a_evaluacion": await self._calcular_conversion_abierta_evaluacion_solicitud(fecha_inicio, fecha_fin),
-                        "evaluacion_a_adjudicada": await self._calcular_conversion_evaluacion_adjudicada_solicitud(fecha_inicio, fecha_fin),
-                        "adjudicada_a_aceptada": await self._calcular_conversion_adjudicada_aceptada_solicitud(fecha_inicio, fecha_fin),
-                        "conversion_general": await self._calcular_conversion_general_solicitud(fecha_inicio, fecha_fin)
-                    },
-                    
-                    # 6-8. Métricas de Tiempo
-                    "tiempos": {
-                        "ttfo": await self._calcular_ttfo(fecha_inicio, fecha_fin),
-                        "tta": await self._calcular_tta(fecha_inicio, fecha_fin),
-                        "ttcd": await self._calcular_ttcd(fecha_inicio, fecha_fin)
-                    },
-                    
-                    # 9-10. Métricas de Fallo
-                    "fallos": {
-                        "tasa_escalamiento": await self._calcular_tasa_escalamiento(fecha_inicio, fecha_fin),
-                        "fallo_por_nivel": await self._calcular_fallo_por_nivel(fecha_inicio, fecha_fin)
-                    }
-                }
-            
-            try:
-                await redis_manager.set_cache(cache_key, embudo, ttl=900)  # 15 minutos
-            except Exception as e:
-                logger.warning(f"Error guardando en cache: {e}")
-                
-            return embudo
+            return await metrics_cache.obtener(
+                "embudo_operativo", cache_key,
+                lambda: self._calcular_embudo_operativo(fecha_inicio, fecha_fin, nivel),
+                ttl=900  # 15 minutos
+            )
         except Exception as e:
             logger.error(f"Error calculando embudo operativo: {e}", exc_info=True)
             return {
@@ -275,7 +249,60 @@ class MetricsCalculator:
                     "fallo_por_nivel": {}
                 }
             }
+
+    async def _calcular_embudo_operativo(self, fecha_inicio: datetime, fecha_fin: datetime, nivel: str = "solicitud") -> Dict[str, Any]:
+        """Calcula el embudo operativo del nivel indicado (sin cache, KPIs en paralelo)"""
+        # Seleccionar métodos según nivel
+        if nivel == "repuesto":
+            volumenes = self._calcular_volumenes_embudo_repuesto
+            conversiones = {
+                "abierta_a_evaluacion": self._calcular_conversion_abierta_evaluacion,
+                "evaluacion_a_adjudicada": self._calcular_conversion_evaluacion_adjudicada,
+                "adjudicada_a_aceptada": self._calcular_conversion_adjudicada_aceptada,
+                "conversion_general": self._calcular_conversion_general
+            }
+        else:  # nivel == "solicitud"
+            volumenes = self._calcular_volumenes_embudo_solicitud
+            conversiones = {
+                "abierta_a_evaluacion": self._calcular_conversion_abierta_evaluacion_solicitud,
+                "evaluacion_a_adjudicada": self._calcular_conversion_evaluacion_adjudicada_solicitud,
+                "adjudicada_a_aceptada": self._calcular_conversion_adjudicada_aceptada_solicitud,
+                "conversion_general": self._calcular_conversion_general_solicitud
+            }
         
+        r = await self._en_paralelo({
+            "volumenes": volumenes(fecha_inicio, fecha_fin),
+            # 1. Tasa de Entrada
+            "tasa_entrada": self._calcular_tasa_entrada(fecha_inicio, fecha_fin),
+            # 2-5. Tasas de Conversión
+            **{nombre: calcular(fecha_inicio, fecha_fin) for nombre, calcular in conversiones.items()},
+            # 6-8. Métricas de Tiempo
+            "ttfo": self._calcular_ttfo(fecha_inicio, fecha_fin),
+            "tta": self._calcular_tta(fecha_inicio, fecha_fin),
+            "ttcd": self._calcular_ttcd(fecha_inicio, fecha_fin),
+            # 9-10. Métricas de Fallo
+            "tasa_escalamiento": self._calcular_tasa_escalamiento(fecha_inicio, fecha_fin),
+            "fallo_por_nivel": self._calcular_fallo_por_nivel(fecha_inicio, fecha_fin)
+        })
+        
+        embudo = {
+            # Volúmenes del embudo: "volumenes" a nivel repuesto, "embudo" (gráfica) a nivel solicitud
+            ("volumenes" if nivel == "repuesto" else "embudo"): r["volumenes"],
+            "tasa_entrada": r["tasa_entrada"],
+            "conversiones": {nombre: r[nombre] for nombre in conversiones},
+            "tiempos": {
+                "ttfo": r["ttfo"],
+                "tta": r["tta"],
+                "ttcd": r["ttcd"]
+            },
+            "fallos": {
+                "tasa_escalamiento": r["tasa_escalamiento"],
+                "fallo_por_nivel": r["fallo_por_nivel"]
+            }
+        }
+
+        return embudo
+
     async def get_salud_marketplace(self, fecha_inicio: datetime = None, fecha_fin: datetime = None) -> Dict[str, Any]:
         """
         Obtener métricas de salud del marketplace (5 KPIs alineados con Indicadores.txt)
@@ -288,27 +315,11 @@ class MetricsCalculator:
         cache_key = f"{self.cache_prefix}salud_marketplace:{fecha_inicio.date()}:{fecha_fin.date()}"
         
         try:
-            cached_data = await redis_manager.get_cache(cache_key)
-            if cached_data:
-                return cached_data
-        except Exception as e:
-            logger.warning(f"Error accediendo al cache: {e}")
-            
-        try:
-            salud = {
-                "ratio_oferta_demanda": await self._calcular_ratio_oferta_demanda(fecha_inicio, fecha_fin),
-                "densidad_ofertas": await self._calcular_densidad_ofertas(fecha_inicio, fecha_fin),
-                "tasa_participacion_asesores": await self._calcular_tasa_participacion_asesores(fecha_inicio, fecha_fin),
-                "tasa_adjudicacion_promedio": await self._calcular_tasa_adjudicacion_promedio(fecha_inicio, fecha_fin),
-                "tasa_aceptacion_cliente": await self._calcular_tasa_aceptacion_cliente_marketplace(fecha_inicio, fecha_fin)
-            }
-            
-            try:
-                await redis_manager.set_cache(cache_key, salud, ttl=600)  # 10 minutos
-            except Exception as e:
-                logger.warning(f"Error guardando en cache: {e}")
-                
-            return salud
+            return await metrics_cache.obtener(
+                "salud_marketplace", cache_key,
+                lambda: self._calcular_salud_marketplace(fecha_inicio, fecha_fin),
+                ttl=600  # 10 minutos
+            )
         except Exception as e:
             logger.error(f"Error calculando salud del marketplace: {e}", exc_info=True)
             return {
@@ -318,7 +329,19 @@ class MetricsCalculator:
                 "tasa_adjudicacion_promedio": {"tasa_promedio": 0.0},
                 "tasa_aceptacion_cliente": {"tasa_aceptacion": 0.0}
             }
-        
+
+    async def _calcular_salud_marketplace(self, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, Any]:
+        """Calcula los KPIs de salud del marketplace (sin cache, KPIs en paralelo)"""
+        salud = await self._en_paralelo({
+            "ratio_oferta_demanda": self._calcular_ratio_oferta_demanda(fecha_inicio, fecha_fin),
+            "densidad_ofertas": self._calcular_densidad_ofertas(fecha_inicio, fecha_fin),
+            "tasa_participacion_asesores": self._calcular_tasa_participacion_asesores(fecha_inicio, fecha_fin),
+            "tasa_adjudicacion_promedio": self._calcular_tasa_adjudicacion_promedio(fecha_inicio, fecha_fin),
+            "tasa_aceptacion_cliente": self._calcular_tasa_aceptacion_cliente_marketplace(fecha_inicio, fecha_fin)
+        })
+
+        return salud
+
     async def update_realtime_metric(self, metric_name: str, value: float, dimensions: Dict[str, Any]):
         """
         Actualizar métrica en tiempo real
@@ -336,9 +359,7 @@ class MetricsCalculator:
                 periodo_fin=now,
                 expira_en=now + timedelta(hours=1)  # Expira en 1 hora
             )
-            
-            # Invalidar cache relacionado
-            await self._invalidate_related_cache(metric_name)
+            # El cache de dashboards lo invalida EventCollector por etiquetas del evento
             
         except Exception as e:
             logger.error(f"Error actualizando métrica en tiempo real: {e}")
@@ -450,11 +471,6 @@ class MetricsCalculator:
         result = await self._execute_query(query, [fecha_inicio, fecha_fin])
         return result[0]["total"] if result else 0
         
-    async def _invalidate_related_cache(self, metric_name: str):
-        """Invalidar cache relacionado con una métrica"""
-        # Implementar lógica para invalidar cache relacionado
-        pass
-        
     async def _calcular_ofertas_totales(self, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, Any]:
         """Calcular ofertas totales asignadas en el período"""
         query = """
@@ -1352,39 +1368,11 @@ class MetricsCalculator:
         cache_key = f"{self.cache_prefix}dashboard_financiero:{fecha_inicio.date()}:{fecha_fin.date()}"
         
         try:
-            cached_data = await redis_manager.get_cache(cache_key)
-            if cached_data:
-                return cached_data
-        except Exception as e:
-            logger.warning(f"Error accediendo al cache: {e}")
-            
-        try:
-            financiero = {
-                "valor_bruto_ofertado": await self._calcular_valor_bruto_ofertado(fecha_inicio, fecha_fin),
-                "valor_bruto_adjudicado": await self._calcular_valor_bruto_adjudicado(fecha_inicio, fecha_fin),
-                "valor_bruto_aceptado": await self._calcular_valor_bruto_aceptado(fecha_inicio, fecha_fin),
-                "valor_promedio_solicitud": await self._calcular_valor_promedio_solicitud(fecha_inicio, fecha_fin),
-                "tasa_fuga_valor": await self._calcular_tasa_fuga_valor(fecha_inicio, fecha_fin)
-            }
-            
-            # Calcular métricas derivadas
-            gov = financiero["valor_bruto_ofertado"].get("valor_total", 0)
-            gav_adj = financiero["valor_bruto_adjudicado"].get("valor_total", 0)
-            gav_acc = financiero["valor_bruto_aceptado"].get("valor_total", 0)
-            
-            financiero["resumen_financiero"] = {
-                "conversion_oferta_adjudicacion": round((gav_adj / gov * 100) if gov > 0 else 0, 2),
-                "conversion_adjudicacion_aceptacion": round((gav_acc / gav_adj * 100) if gav_adj > 0 else 0, 2),
-                "conversion_general_financiera": round((gav_acc / gov * 100) if gov > 0 else 0, 2),
-                "ticket_promedio_marketplace": financiero["valor_promedio_solicitud"].get("valor_promedio_por_solicitud", 0)
-            }
-            
-            try:
-                await redis_manager.set_cache(cache_key, financiero, ttl=1800)  # 30 minutos
-            except Exception as e:
-                logger.warning(f"Error guardando en cache: {e}")
-                
-            return financiero
+            return await metrics_cache.obtener(
+                "dashboard_financiero", cache_key,
+                lambda: self._calcular_dashboard_financiero(fecha_inicio, fecha_fin),
+                ttl=1800  # 30 minutos
+            )
         except Exception as e:
             logger.error(f"Error calculando dashboard financiero: {e}", exc_info=True)
             return {
@@ -1400,11 +1388,35 @@ class MetricsCalculator:
                     "ticket_promedio_marketplace": 0
                 }
             }
+
+    async def _calcular_dashboard_financiero(self, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, Any]:
+        """Calcula los KPIs del dashboard financiero (sin cache, KPIs en paralelo)"""
+        financiero = await self._en_paralelo({
+            "valor_bruto_ofertado": self._calcular_valor_bruto_ofertado(fecha_inicio, fecha_fin),
+            "valor_bruto_adjudicado": self._calcular_valor_bruto_adjudicado(fecha_inicio, fecha_fin),
+            "valor_bruto_aceptado": self._calcular_valor_bruto_aceptado(fecha_inicio, fecha_fin),
+            "valor_promedio_solicitud": self._calcular_valor_promedio_solicitud(fecha_inicio, fecha_fin),
+            "tasa_fuga_valor": self._calcular_tasa_fuga_valor(fecha_inicio, fecha_fin)
+        })
+        
+        # Calcular métricas derivadas
+        gov = financiero["valor_bruto_ofertado"].get("valor_total", 0)
+        gav_adj = financiero["valor_bruto_adjudicado"].get("valor_total", 0)
+        gav_acc = financiero["valor_bruto_aceptado"].get("valor_total", 0)
+        
+        financiero["resumen_financiero"] = {
+            "conversion_oferta_adjudicacion": round((gav_adj / gov * 100) if gov > 0 else 0, 2),
+            "conversion_adjudicacion_aceptacion": round((gav_acc / gav_adj * 100) if gav_adj > 0 else 0, 2),
+            "conversion_general_financiera": round((gav_acc / gov * 100) if gov > 0 else 0, 2),
+            "ticket_promedio_marketplace": financiero["valor_promedio_solicitud"].get("valor_promedio_por_solicitud", 0)
+        }
+
+        return financiero
     
     # ============================================================================
     # MÉTODOS PARA DASHBOARD FINANCIERO (5 KPIs)
     # ============================================================================
-    
+
     async def _calcular_valor_bruto_ofertado(self, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, Any]:
         """KPI 1: Valor Bruto Ofertado (GOV) - Suma de todas las ofertas"""
         query = """
@@ -1593,38 +1605,11 @@ class MetricsCalculator:
         cache_key = f"{self.cache_prefix}advisor_scorecards_rfm:{fecha_inicio.date()}:{fecha_fin.date()}:{ciudad or 'all'}"
         
         try:
-            cached_data = await redis_manager.get_cache(cache_key)
-            if cached_data:
-                return cached_data
-        except Exception as e:
-            logger.warning(f"Error accediendo al cache: {e}")
-            
-        try:
-            # 3.1 Cuadros de Mando: Calcular métricas por asesor
-            scorecards = await self._calcular_advisor_scorecards(fecha_inicio, fecha_fin, ciudad)
-            
-            # 3.2 Segmentación RFM: Clasificar asesores en segmentos
-            segmentacion_rfm = await self._calcular_segmentacion_rfm(fecha_inicio, fecha_fin, ciudad)
-            
-            result = {
-                "advisor_scorecards": scorecards,
-                "segmentacion_rfm": segmentacion_rfm,
-                "resumen_ejecutivo": {
-                    "total_asesores_analizados": len(scorecards.get("asesores", [])),
-                    "periodo_analisis": {
-                        "inicio": fecha_inicio.isoformat(),
-                        "fin": fecha_fin.isoformat()
-                    },
-                    "filtro_ciudad": ciudad
-                }
-            }
-            
-            try:
-                await redis_manager.set_cache(cache_key, result, ttl=900)  # 15 minutos
-            except Exception as e:
-                logger.warning(f"Error guardando en cache: {e}")
-                
-            return result
+            return await metrics_cache.obtener(
+                "advisor_scorecards_rfm", cache_key,
+                lambda: self._calcular_analisis_asesores(fecha_inicio, fecha_fin, ciudad),
+                ttl=900  # 15 minutos
+            )
         except Exception as e:
             logger.error(f"Error calculando análisis de asesores: {e}", exc_info=True)
             return {
@@ -1640,11 +1625,35 @@ class MetricsCalculator:
                 }
             }
 
+    async def _calcular_analisis_asesores(self, fecha_inicio: datetime, fecha_fin: datetime, ciudad: str) -> Dict[str, Any]:
+        """Calcula scorecards y segmentación RFM (sin cache, en paralelo)"""
+        r = await self._en_paralelo({
+            # 3.1 Cuadros de Mando: Calcular métricas por asesor
+            "scorecards": self._calcular_advisor_scorecards(fecha_inicio, fecha_fin, ciudad),
+            # 3.2 Segmentación RFM: Clasificar asesores en segmentos
+            "segmentacion_rfm": self._calcular_segmentacion_rfm(fecha_inicio, fecha_fin, ciudad)
+        })
+        scorecards, segmentacion_rfm = r["scorecards"], r["segmentacion_rfm"]
+        
+        result = {
+            "advisor_scorecards": scorecards,
+            "segmentacion_rfm": segmentacion_rfm,
+            "resumen_ejecutivo": {
+                "total_asesores_analizados": len(scorecards.get("asesores", [])),
+                "periodo_analisis": {
+                    "inicio": fecha_inicio.isoformat(),
+                    "fin": fecha_fin.isoformat()
+                },
+                "filtro_ciudad": ciudad
+            }
+        }
+
+        return result
     
     # ============================================================================
     # 3.1 CUADROS DE MANDO DE RENDIMIENTO DEL ASESOR (ADVISOR SCORECARDS)
     # ============================================================================
-    
+
     async def _calcular_advisor_scorecards(self, fecha_inicio: datetime, fecha_fin: datetime, ciudad: str = None) -> Dict[str, Any]:
         """
         Calcula las 5 métricas de rendimiento por asesor según especificación 3.1
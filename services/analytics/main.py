@@ -19,6 +19,7 @@ load_dotenv()
 from app.core.database import init_db, close_db
 from app.core.redis import redis_manager
 from app.services.event_collector import event_collector
+from app.services.metrics_cache import metrics_cache
 from app.services.scheduler import analytics_scheduler
 from app.services.mv_scheduler import mv_scheduler
 from app.routers import dashboards, materialized_views, alerts
@@ -213,7 +214,8 @@ async def health_check():
         collector_running = event_collector.running
         health_status["checks"]["event_collector"] = {
             "status": "healthy" if collector_running else "degraded",
-            "message": "Event collector running" if collector_running else "Event collector stopped"
+            "message": "Event collector running" if collector_running else "Event collector stopped",
+            "metrics_cache": metrics_cache.get_estadisticas()
         }
     except Exception as e:
         health_status["checks"]["event_collector"] = {
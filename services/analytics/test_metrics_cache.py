@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Unit tests for MetricsCache
+Tests del cache de métricas en proceso (sin Redis ni base de datos)
+"""
+import asyncio
+import os
+import sys
+import pytest
+from unittest.mock import patch
+
+# Add the app directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+
+from app.services.metrics_cache import MetricsCache
+
+
+def _contador(valor):
+    llamadas = []
+
+    async def calcular():
+        llamadas.append(1)
+        await asyncio.sleep(0.01)
+        return valor
+
+    return calcular, llamadas
+
+
+@pytest.mark.asyncio
+async def test_single_flight_y_lru():
+    """Cargas concurrentes comparten un solo cálculo y las siguientes salen del LRU"""
+    with patch("app.services.metrics_cache.redis_manager") as redis_manager:
+        redis_manager.redis_client = None
+        cache = MetricsCache(max_entradas=10)
+        calcular, llamadas = _contador({"total": 5})
+
+        resultados = await asyncio.gather(*[
+            cache.obtener("kpis_principales", "metrics:kpis", calcular, ttl=60) for _ in range(5)
+        ])
+        assert resultados == [{"total": 5}] * 5
+        assert len(llamadas) == 1
+
+        assert await cache.obtener("kpis_principales", "metrics:kpis", calcular, ttl=60) == {"total": 5}
+        assert len(llamadas) == 1
+        assert cache.get_estadisticas()["hits_lru"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidacion_por_etiquetas_del_evento():
+    """Un evento solo descarta las métricas que dependen de su entidad"""
+    with patch("app.services.metrics_cache.redis_manager") as redis_manager:
+        redis_manager.redis_client = None
+        cache = MetricsCache(max_entradas=10)
+        calcular_kpis, llamadas_kpis = _contador({"kpis": 1})
+        calcular_asesores, llamadas_asesores = _contador({"asesores": 1})
+
+        await cache.obtener("kpis_principales", "k", calcular_kpis, ttl=60)
+        await cache.obtener("advisor_scorecards_rfm", "a", calcular_asesores, ttl=60)
+
+        # kpis_principales no depende de asesores
+        await cache.invalidar(cache.tags_para_evento("asesor.updated"))
+        await cache.obtener("kpis_principales", "k", calcular_kpis, ttl=60)
+        await cache.obtener("advisor_scorecards_rfm", "a", calcular_asesores, ttl=60)
+        assert (len(llamadas_kpis), len(llamadas_asesores)) == (1, 2)
+
+        # solicitud.* afecta KPIs pero no scorecards
+        await cache.invalidar(cache.tags_para_evento("solicitud.created"))
+        await cache.obtener("kpis_principales", "k", calcular_kpis, ttl=60)
+        await cache.obtener("advisor_scorecards_rfm", "a", calcular_asesores, ttl=60)
+        assert (len(llamadas_kpis), len(llamadas_asesores)) == (2, 2)
+
+
+@pytest.mark.asyncio
+async def test_no_cachea_calculo_invalidado_ni_errores():
+    """Un resultado calculado durante una invalidación o un error no quedan en cache"""
+    with patch("app.services.metrics_cache.redis_manager") as redis_manager:
+        redis_manager.redis_client = None
+        cache = MetricsCache(max_entradas=10)
+        calcular, llamadas = _contador({"total": 1})
+
+        tarea = asyncio.ensure_future(cache.obtener("kpis_principales", "k", calcular, ttl=60))
+        while not llamadas:
+            await asyncio.sleep(0)
+        await cache.invalidar({"ofertas"})
+        assert await tarea == {"total": 1}
+        await cache.obtener("kpis_principales", "k", calcular, ttl=60)
+        assert len(llamadas) == 2
+
+        async def fallar():
+            raise RuntimeError("db caída")
+
+        with pytest.raises(RuntimeError):
+            await cache.obtener("salud_marketplace", "s", fallar, ttl=60)
+        calcular_salud, llamadas_salud = _contador({"ok": True})
+        assert await cache.obtener("salud_marketplace", "s", calcular_salud, ttl=60) == {"ok": True}
+        assert len(llamadas_salud) == 1
+
+
+@pytest.mark.asyncio
+async def test_no_cachea_si_una_consulta_fallo():
+    """_execute_query devuelve [] ante un error de base: ese resultado no se cachea"""
+    from app.services.metrics_calculator import MetricsCalculator
+
+    with patch("app.services.metrics_cache.redis_manager") as redis_manager, \
+         patch("app.services.metrics_calculator.connections") as connections:
+        redis_manager.redis_client = None
+        connections.get.return_value.execute_query_dict.side_effect = ConnectionError("db caída")
+        cache = MetricsCache(max_entradas=10)
+        calculator = MetricsCalculator()
+        llamadas = []
+
+        async def calcular():
+            llamadas.append(1)
+            # Consultas en subtareas, como _en_paralelo
+            resultados = await asyncio.gather(calculator._execute_query("SELECT 1"), asyncio.sleep(0, []))
+            return {"filas": resultados[0]}
+
+        assert await cache.obtener("kpis_principales", "k", calcular, ttl=60) == {"filas": []}
+        await cache.obtener("kpis_principales", "k", calcular, ttl=60)
+        assert len(llamadas) == 2
+        assert cache.get_estadisticas()["fallidos"] == 2
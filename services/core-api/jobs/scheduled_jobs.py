@@ -4,8 +4,8 @@ Standalone functions for background processing
 """
 
 import logging
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 import asyncio
 import json
 import redis.asyncio as redis
@@ -15,6 +15,77 @@ from services.configuracion_service import ConfiguracionService
 
 logger = logging.getLogger(__name__)
 
+# Nivel de escalamiento a partir del cual la solicitud se evalúa o se cierra al vencer
+NIVEL_MAXIMO = 5
+
+
+def _solicitudes_sin_notificar():
+    """Solicitudes EVALUADAS pendientes de notificar al cliente"""
+    from models.solicitud import Solicitud
+    from models.enums import EstadoSolicitud
+    
+    return Solicitud.filter(
+        estado=EstadoSolicitud.EVALUADA,
+        fecha_evaluacion__isnull=False,
+        fecha_notificacion_cliente__isnull=True
+    )
+
+
+def _solicitudes_esperando_respuesta():
+    """Solicitudes EVALUADAS notificadas que esperan respuesta del cliente"""
+    from models.solicitud import Solicitud
+    from models.enums import EstadoSolicitud
+    
+    return Solicitud.filter(
+        estado=EstadoSolicitud.EVALUADA,
+        fecha_notificacion_cliente__isnull=False,
+        fecha_respuesta_cliente__isnull=True  # No response yet
+    )
+
+
+def _filtrar_shard(query, shard: Optional[Tuple[int, int]]):
+    """Restringe la query a las solicitudes del shard (indice, total)"""
+    if not shard:
+        return query
+    
+    from services.coordinacion_scheduler_service import expresion_shard
+    
+    indice, total = shard
+    return query.annotate(shard=expresion_shard(total)).filter(shard=indice)
+
+
+async def _invalidar_dashboard_nivel(solicitud_id, nivel: int) -> None:
+    """Los asesores del nuevo nivel ahora ven la solicitud como pendiente en su dashboard"""
+    from models.geografia import EvaluacionAsesorTemp
+    from services.dashboard_asesor_service import DashboardAsesorService
+    
+    try:
+        asesor_ids = await EvaluacionAsesorTemp.filter(
+            solicitud_id=solicitud_id,
+            nivel_entrega=nivel
+        ).values_list('asesor_id', flat=True)
+        await DashboardAsesorService.invalidar(asesor_ids)
+    except Exception as e:
+        # La cache del dashboard vence sola por TTL
+        logger.error(f"Error invalidando dashboard de asesores del nivel {nivel}: {e}")
+
+
+async def contar_backlog(job_name: str) -> int:
+    """
+    Solicitudes pendientes de un job particionable por solicitud_id
+    
+    Args:
+        job_name: notificar_clientes_ofertas_ganadoras o enviar_recordatorios_cliente
+        
+    Returns:
+        int: Cantidad de solicitudes que procesaría el job
+    """
+    if job_name == 'notificar_clientes_ofertas_ganadoras':
+        return await _solicitudes_sin_notificar().count()
+    if job_name == 'enviar_recordatorios_cliente':
+        return await _solicitudes_esperando_respuesta().count()
+    raise ValueError(f"Job no particionable: {job_name}")
+
 
 async def procesar_expiracion_ofertas(
     timeout_horas: Optional[int] = None,
@@ -267,6 +338,74 @@ async def limpiar_datos_temporales() -> Dict[str, Any]:
         }
 
 
+async def compactar_metricas_asesores() -> Dict[str, Any]:
+    """
+    Recalcula la tabla metricas_asesores desde el historial
+    Descarta eventos fuera de la ventana (30 días / 6 meses) y corrige la deriva
+    de los incrementos hechos por EventsService
+    
+    Returns:
+        Dict con resultado de la compactación
+    """
+    try:
+        logger.info("Iniciando compactación de métricas de asesores")
+        
+        from services.metricas_asesor_service import MetricasAsesorService
+        result = await MetricasAsesorService.compactar()
+        
+        return {
+            'success': True,
+            'asesores_compactados': result['asesores_compactados'],
+            'asesores_con_datos': result['asesores_con_datos'],
+            'duracion_ms': result['duracion_ms'],
+            'timestamp': datetime.now().isoformat(),
+            'message': f'Compactación completada: {result["asesores_compactados"]} asesores'
+        }
+        
+    except Exception as e:
+        logger.error(f"Error compactando métricas de asesores: {e}")
+        return {
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat(),
+            'message': 'Error compactando métricas de asesores'
+        }
+
+
+async def sincronizar_temporizadores_escalamiento(
+    redis_client: Optional[redis.Redis] = None
+) -> Dict[str, Any]:
+    """
+    Reconstruye la agenda de temporizadores de escalamiento desde la base de datos
+    Respaldo de los eventos: agrega solicitudes abiertas que falten (p. ej. tras
+    reiniciar Redis), aplica cambios en tiempos_espera_nivel y quita las cerradas
+    
+    Args:
+        redis_client: Cliente Redis de la agenda (opcional si ya está configurada)
+        
+    Returns:
+        Dict con resultado de la sincronización
+    """
+    try:
+        from services.temporizador_escalamiento_service import temporizador_escalamiento_service
+        
+        if redis_client and not temporizador_escalamiento_service.configurado:
+            temporizador_escalamiento_service.configurar(redis_client)
+        
+        result = await temporizador_escalamiento_service.sincronizar()
+        result['timestamp'] = datetime.now().isoformat()
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error sincronizando temporizadores de escalamiento: {e}")
+        return {
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat(),
+            'message': 'Error sincronizando temporizadores de escalamiento'
+        }
+
+
 # Convenience function for manual execution
 async def ejecutar_job_manual(job_name: str, **kwargs) -> Dict[str, Any]:
     """
@@ -288,6 +427,10 @@ async def ejecutar_job_manual(job_name: str, **kwargs) -> Dict[str, Any]:
             return await limpiar_datos_temporales()
         elif job_name == 'verificar_timeouts_escalamiento':
             return await verificar_timeouts_escalamiento(**kwargs)
+        elif job_name == 'compactar_metricas_asesores':
+            return await compactar_metricas_asesores()
+        elif job_name == 'sincronizar_temporizadores_escalamiento':
+            return await sincronizar_temporizadores_escalamiento(**kwargs)
         else:
             raise ValueError(f"Job desconocido: {job_name}")
             
@@ -344,338 +487,262 @@ async def _publicar_evento_evaluacion_completada(
         logger.error(traceback.format_exc())
 
 
+async def _reclamar_solicitudes_vencidas(temporizador) -> Optional[List[str]]:
+    """
+    IDs vencidos de la agenda, o de la base si la agenda no está disponible
+    None si no se puede consultar ninguna en este tick (respaldo limitado al líder)
+    """
+    if temporizador.configurado:
+        try:
+            return await temporizador.reclamar_vencidas()
+        except Exception as e:
+            logger.error(f"Error leyendo agenda de escalamiento, usando base de datos: {e}")
+
+    if not temporizador.respaldo_bd_disponible():
+        return None
+    return await temporizador.vencidas_desde_bd(await temporizador.obtener_tiempos_nivel())
+
+
+async def _contar_ofertas_completas(solicitud) -> Tuple[List[Any], int]:
+    """Ofertas de la solicitud y cuántas cubren el 100% de los repuestos"""
+    from models.oferta import Oferta
+    from models.solicitud import RepuestoSolicitado
+
+    total_repuestos = await RepuestoSolicitado.filter(solicitud_id=solicitud.id).count()
+    ofertas = await Oferta.filter(solicitud_id=solicitud.id).prefetch_related('detalles')
+    ofertas_completas = sum(
+        1 for oferta in ofertas
+        if len({detalle.repuesto_solicitado_id for detalle in oferta.detalles}) == total_repuestos
+    )
+
+    logger.info(f"📊 Ofertas completas (100% cobertura): {ofertas_completas}/{len(ofertas)} ofertas totales")
+    return list(ofertas), ofertas_completas
+
+
+async def _publicar_cierre_sin_ofertas(solicitud, redis_client, ofertas_recibidas: int, razon: str) -> None:
+    if not redis_client:
+        return
+    try:
+        event_data = {
+            'tipo_evento': 'solicitud.cerrada_sin_ofertas',
+            'solicitud_id': str(solicitud.id),
+            'nivel_final': solicitud.nivel_actual,
+            'ofertas_recibidas': ofertas_recibidas,
+            'razon': razon,
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+        await redis_client.publish('solicitud.cerrada_sin_ofertas', json.dumps(event_data))
+    except Exception as e:
+        logger.error(f"Error publicando evento: {e}")
+
+
+async def _evaluar_solicitud_vencida(
+    solicitud,
+    redis_client,
+    estado_sin_adjudicar: str,
+    exigir_adjudicaciones: bool = True,
+    ofertas_recibidas: Optional[int] = None
+) -> None:
+    """
+    Evalúa la solicitud y la deja cerrada (EVALUADA o estado_sin_adjudicar)
+
+    Args:
+        estado_sin_adjudicar: Estado si la evaluación falla o no adjudica
+        exigir_adjudicaciones: Si False, una evaluación exitosa sin adjudicaciones cuenta como evaluada
+        ofertas_recibidas: Si se indica, publica solicitud.cerrada_sin_ofertas cuando no hay adjudicaciones
+    """
+    from models.enums import EstadoSolicitud
+    from models.oferta import AdjudicacionRepuesto
+    from services.evaluacion_service import EvaluacionService
+
+    # Ya evaluada (evitar duplicaciones): se cierra para que salga de la agenda
+    if await AdjudicacionRepuesto.filter(solicitud_id=solicitud.id).exists():
+        logger.info(f"⚠️ Solicitud {solicitud.id} ya tiene adjudicaciones, omitiendo evaluación")
+        solicitud.estado = EstadoSolicitud.EVALUADA
+        await solicitud.save()
+        return
+
+    try:
+        await solicitud.fetch_related('cliente__usuario')
+        resultado_eval = await EvaluacionService.evaluar_solicitud(str(solicitud.id))
+    except Exception as e:
+        logger.error(f"❌ Error en evaluación automática: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        solicitud.estado = estado_sin_adjudicar
+        await solicitud.save()
+        return
+
+    if resultado_eval['success'] and (resultado_eval['repuestos_adjudicados'] > 0 or not exigir_adjudicaciones):
+        logger.info(f"✅ Evaluación automática exitosa: {resultado_eval['repuestos_adjudicados']}/{resultado_eval['repuestos_totales']} adjudicados")
+        if redis_client:
+            await _publicar_evento_evaluacion_completada(solicitud, resultado_eval, redis_client)
+        return
+
+    logger.warning(f"⚠️ Evaluación sin adjudicaciones: {resultado_eval.get('message')}")
+    solicitud.estado = estado_sin_adjudicar
+    await solicitud.save()
+    if ofertas_recibidas is not None:
+        await _publicar_cierre_sin_ofertas(
+            solicitud, redis_client, ofertas_recibidas, 'Evaluación sin adjudicaciones exitosas'
+        )
+
+
+async def _escalar_solicitud(solicitud, redis_client, ofertas: List[Any], ofertas_completas: int) -> None:
+    """Pasa la solicitud al siguiente nivel y reinicia su tiempo de espera"""
+    nivel_anterior = solicitud.nivel_actual
+    solicitud.nivel_actual = nivel_anterior + 1
+    solicitud.fecha_escalamiento = datetime.now(timezone.utc)
+    await solicitud.save()
+    await _invalidar_dashboard_nivel(solicitud.id, solicitud.nivel_actual)
+
+    if redis_client:
+        try:
+            event_data = {
+                'tipo_evento': 'solicitud.escalada',
+                'solicitud_id': str(solicitud.id),
+                'nivel_anterior': nivel_anterior,
+                'nivel_nuevo': solicitud.nivel_actual,
+                'ofertas_actuales': len(ofertas),
+                'ofertas_completas': ofertas_completas,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            }
+            await redis_client.publish('solicitud.escalada', str(event_data))
+        except Exception as e:
+            logger.error(f"Error publicando evento: {e}")
+
+    logger.info(f"✅ Solicitud {solicitud.id} escalada exitosamente a Nivel {solicitud.nivel_actual}")
+
+
+async def _procesar_solicitud_vencida(solicitud, tiempos_nivel: Dict[int, int], temporizador, redis_client) -> Optional[str]:
+    """
+    Cierre anticipado, escalamiento o cierre en nivel máximo de una solicitud vencida
+
+    Returns:
+        'cerrada', 'escalada' o None si solo se reagendó
+    """
+    from models.enums import EstadoSolicitud
+
+    ofertas, ofertas_completas = await _contar_ofertas_completas(solicitud)
+    minimo_alcanzado = ofertas_completas >= solicitud.ofertas_minimas_deseadas
+
+    # Cierre anticipado: se alcanzó el mínimo de ofertas completas
+    if minimo_alcanzado:
+        logger.info(f"✅ Ofertas mínimas completas alcanzadas: {ofertas_completas} >= {solicitud.ofertas_minimas_deseadas}")
+        await _evaluar_solicitud_vencida(
+            solicitud, redis_client, EstadoSolicitud.EVALUADA, exigir_adjudicaciones=False
+        )
+        return 'cerrada'
+
+    # Adelantada por ofertas que ya no cuentan o agenda desactualizada: esperar el vencimiento real
+    ahora = datetime.now(timezone.utc)
+    if ahora < temporizador.calcular_vencimiento(solicitud.fecha_escalamiento, solicitud.nivel_actual, tiempos_nivel):
+        await temporizador.programar(solicitud, tiempos_nivel)
+        return None
+
+    minutos_transcurridos = int((ahora - solicitud.fecha_escalamiento).total_seconds() / 60)
+    logger.info(f"⏰ Timeout alcanzado para solicitud {solicitud.id}: {minutos_transcurridos} min (nivel {solicitud.nivel_actual})")
+
+    # Nivel máximo: se evalúa con al menos una oferta (aunque no sea completa)
+    if solicitud.nivel_actual >= NIVEL_MAXIMO:
+        logger.info(f"⚠️ Solicitud {solicitud.id} en nivel máximo: {len(ofertas)} ofertas, {ofertas_completas} completas")
+        if ofertas:
+            await _evaluar_solicitud_vencida(
+                solicitud, redis_client, EstadoSolicitud.CERRADA_SIN_OFERTAS, ofertas_recibidas=len(ofertas)
+            )
+        else:
+            logger.warning(f"❌ Sin ofertas en nivel máximo, cerrando solicitud {solicitud.id}")
+            solicitud.estado = EstadoSolicitud.CERRADA_SIN_OFERTAS
+            await solicitud.save()
+            await _publicar_cierre_sin_ofertas(solicitud, redis_client, 0, 'Sin ofertas en nivel máximo')
+        return 'cerrada'
+
+    logger.info(f"📈 Escalando solicitud {solicitud.id} de Nivel {solicitud.nivel_actual} → Nivel {solicitud.nivel_actual + 1}")
+    await _escalar_solicitud(solicitud, redis_client, ofertas, ofertas_completas)
+    return 'escalada'
+
+
 async def verificar_timeouts_escalamiento(
     redis_client: Optional[redis.Redis] = None
 ) -> Dict[str, Any]:
     """
-    Verifica timeouts de escalamiento y ejecuta siguiente oleada si es necesario
-    
-    Este job se ejecuta cada minuto y verifica:
-    1. Si han pasado los minutos configurados desde el último escalamiento
-    2. Si no se han alcanzado las ofertas mínimas
+    Procesa las solicitudes cuyo tiempo de espera del nivel actual venció
+
+    Las solicitudes salen de la agenda de temporizadores (sorted set en Redis con
+    vencimiento = fecha_escalamiento + tiempo de espera del nivel), que el scheduler
+    consulta cada segundo y que se adelanta cuando una oferta completa el mínimo.
+    Para cada solicitud vencida:
+    1. Si se alcanzaron las ofertas mínimas completas, evalúa (cierre anticipado)
+    2. Si el nivel aún no vence (agenda desactualizada), la reagenda
     3. Escala al siguiente nivel o cierra la solicitud
-    
+
+    Sin Redis los vencimientos se calculan desde la base de datos (cada minuto, en el líder).
+
     Args:
         redis_client: Cliente Redis para eventos (opcional)
-        
+
     Returns:
         Dict con resultado del procesamiento
     """
     try:
-        logger.debug("🔍 Verificando timeouts de escalamiento...")
-        
         from models.solicitud import Solicitud
         from models.enums import EstadoSolicitud
-        from models.oferta import Oferta
-        from services.escalamiento_service import EscalamientoService
-        
-        # Obtener configuración de tiempos por nivel
-        config = await ConfiguracionService.get_config('tiempos_espera_nivel')
-        
-        # Convertir claves de string a int si es necesario
-        if config and isinstance(config, dict):
-            tiempos_nivel = {int(k): v for k, v in config.items()}
-            logger.info(f"⚙️ Tiempos configurados por nivel: {tiempos_nivel}")
-        else:
-            tiempos_nivel = {
-                1: 15,  # minutos (fallback)
-                2: 20,
-                3: 25,
-                4: 30,
-                5: 35
+        from services.temporizador_escalamiento_service import temporizador_escalamiento_service as temporizador
+
+        if redis_client and not temporizador.configurado:
+            temporizador.configurar(redis_client)
+
+        solicitud_ids = await _reclamar_solicitudes_vencidas(temporizador)
+        if not solicitud_ids:
+            return {
+                'success': True,
+                'solicitudes_escaladas': 0,
+                'solicitudes_cerradas': 0,
+                'timestamp': datetime.now().isoformat(),
+                'message': 'Sin solicitudes vencidas'
             }
-            logger.warning(f"⚠️ Usando tiempos por defecto: {tiempos_nivel}")
-        
-        # Buscar solicitudes ABIERTAS que puedan necesitar escalamiento
-        solicitudes_abiertas = await Solicitud.filter(
-            estado=EstadoSolicitud.ABIERTA,
-            fecha_escalamiento__isnull=False  # Solo las que ya tienen escalamiento inicial
-        ).all()
-        
-        logger.info(f"📋 Encontradas {len(solicitudes_abiertas)} solicitudes abiertas con escalamiento")
-        
+
         solicitudes_escaladas = 0
         solicitudes_cerradas = 0
-        
-        for solicitud in solicitudes_abiertas:
-            try:
-                # Calcular tiempo transcurrido desde último escalamiento
-                from datetime import timezone
-                ahora = datetime.now(timezone.utc)
-                tiempo_transcurrido = ahora - solicitud.fecha_escalamiento
-                minutos_transcurridos = int(tiempo_transcurrido.total_seconds() / 60)
-                
-                # Obtener tiempo de espera para el nivel actual
-                tiempo_espera_nivel = tiempos_nivel.get(solicitud.nivel_actual, 30)
-                
-                logger.debug(f"🔍 Solicitud {str(solicitud.id)[:8]}: Nivel {solicitud.nivel_actual}, {minutos_transcurridos} min / {tiempo_espera_nivel} min")
-                
-                # Verificar si ya pasó el timeout
-                if minutos_transcurridos < tiempo_espera_nivel:
-                    continue  # Aún no ha expirado el timeout
-                
-                logger.info(f"⏰ Timeout alcanzado para solicitud {solicitud.id}: {minutos_transcurridos} min >= {tiempo_espera_nivel} min")
-                
-                # Contar ofertas con cobertura 100% (ofertas completas)
-                from models.solicitud import RepuestoSolicitado
-                from models.oferta import OfertaDetalle
-                
-                # Obtener total de repuestos solicitados
-                total_repuestos = await RepuestoSolicitado.filter(solicitud_id=solicitud.id).count()
-                
-                # Contar ofertas que cubren el 100% de los repuestos
-                ofertas = await Oferta.filter(solicitud_id=solicitud.id).prefetch_related('detalles')
-                ofertas_completas = 0
-                
-                for oferta in ofertas:
-                    # Contar cuántos repuestos diferentes cubre esta oferta
-                    repuestos_cubiertos = len(set([detalle.repuesto_solicitado_id for detalle in oferta.detalles]))
-                    if repuestos_cubiertos == total_repuestos:
-                        ofertas_completas += 1
-                
-                logger.info(f"📊 Ofertas completas (100% cobertura): {ofertas_completas}/{len(ofertas)} ofertas totales")
-                
-                # Verificar si se alcanzó el mínimo de ofertas COMPLETAS (cierre anticipado con evaluación)
-                if ofertas_completas >= solicitud.ofertas_minimas_deseadas:
-                    logger.info(f"✅ Ofertas mínimas completas alcanzadas: {ofertas_completas} >= {solicitud.ofertas_minimas_deseadas}")
-                    
-                    # Verificar si ya fue evaluada (evitar duplicaciones)
-                    from models.oferta import AdjudicacionRepuesto
-                    adjudicaciones_existentes = await AdjudicacionRepuesto.filter(solicitud_id=solicitud.id).count()
-                    if adjudicaciones_existentes > 0:
-                        logger.info(f"⚠️ Solicitud {solicitud.id} ya tiene adjudicaciones, omitiendo evaluación")
-                        continue
-                    
-                    # EJECUTAR EVALUACIÓN AUTOMÁTICA
-                    try:
-                        from services.evaluacion_service import EvaluacionService
-                        await solicitud.fetch_related('cliente__usuario')
-                        
-                        resultado_eval = await EvaluacionService.evaluar_solicitud(str(solicitud.id))
-                        
-                        if resultado_eval['success']:
-                            logger.info(f"✅ Evaluación automática exitosa: {resultado_eval['repuestos_adjudicados']}/{resultado_eval['repuestos_totales']} adjudicados")
-                            
-                            # Publicar evento de evaluación completada
-                            if redis_client:
-                                await _publicar_evento_evaluacion_completada(solicitud, resultado_eval, redis_client)
-                            
-                            solicitudes_cerradas += 1
-                        else:
-                            logger.error(f"❌ Evaluación automática falló: {resultado_eval.get('message')}")
-                            # Marcar como evaluada de todas formas
-                            solicitud.estado = EstadoSolicitud.EVALUADA
-                            await solicitud.save()
-                            solicitudes_cerradas += 1
-                            
-                    except Exception as e:
-                        logger.error(f"❌ Error en evaluación automática: {e}")
-                        import traceback
-                        logger.error(traceback.format_exc())
-                        # No fallar el job, solo registrar el error y marcar como evaluada
-                        solicitud.estado = EstadoSolicitud.EVALUADA
-                        await solicitud.save()
-                        solicitudes_cerradas += 1
-                    
-                    continue
-                
-                # Verificar si hay siguiente nivel disponible (máximo nivel 5)
-                NIVEL_MAXIMO = 5
-                
-                if solicitud.nivel_actual >= NIVEL_MAXIMO:
-                    # Ya está en el nivel máximo
-                    logger.info(f"⚠️ Solicitud {solicitud.id} en nivel máximo ({solicitud.nivel_actual})")
-                    logger.info(f"📊 Ofertas: {len(ofertas)} totales, {ofertas_completas} completas")
-                    
-                    # Si hay AL MENOS 1 oferta, evaluar (aunque no sea completa)
-                    if len(ofertas) > 0:
-                        logger.info(f"✅ Hay {len(ofertas)} oferta(s) para evaluar")
-                        
-                        # Verificar si ya fue evaluada (evitar duplicaciones)
-                        from models.oferta import AdjudicacionRepuesto
-                        adjudicaciones_existentes = await AdjudicacionRepuesto.filter(solicitud_id=solicitud.id).count()
-                        if adjudicaciones_existentes > 0:
-                            logger.info(f"⚠️ Solicitud {solicitud.id} ya tiene adjudicaciones, omitiendo evaluación")
-                            continue
-                        
-                        # EJECUTAR EVALUACIÓN AUTOMÁTICA
-                        try:
-                            from services.evaluacion_service import EvaluacionService
-                            await solicitud.fetch_related('cliente__usuario')
-                            
-                            resultado_eval = await EvaluacionService.evaluar_solicitud(str(solicitud.id))
-                            
-                            if resultado_eval['success'] and resultado_eval['repuestos_adjudicados'] > 0:
-                                logger.info(f"✅ Evaluación exitosa: {resultado_eval['repuestos_adjudicados']} repuestos adjudicados")
-                                
-                                # Publicar evento de evaluación completada
-                                if redis_client:
-                                    await _publicar_evento_evaluacion_completada(solicitud, resultado_eval, redis_client)
-                                
-                                solicitudes_cerradas += 1
-                            else:
-                                logger.warning(f"⚠️ Evaluación sin adjudicaciones, cerrando sin ofertas")
-                                solicitud.estado = EstadoSolicitud.CERRADA_SIN_OFERTAS
-                                await solicitud.save()
-                                solicitudes_cerradas += 1
-                                
-                                if redis_client:
-                                    try:
-                                        event_data = {
-                                            'tipo_evento': 'solicitud.cerrada_sin_ofertas',
-                                            'solicitud_id': str(solicitud.id),
-                                            'nivel_final': solicitud.nivel_actual,
-                                            'ofertas_recibidas': len(ofertas),
-                                            'razon': 'Evaluación sin adjudicaciones exitosas',
-                                            'timestamp': datetime.now(timezone.utc).isoformat()
-                                        }
-                                        await redis_client.publish('solicitud.cerrada_sin_ofertas', json.dumps(event_data))
-                                    except Exception as e:
-                                        logger.error(f"Error publicando evento: {e}")
-                                
-                        except Exception as e:
-                            logger.error(f"❌ Error evaluando en nivel máximo: {e}")
-                            import traceback
-                            logger.error(traceback.format_exc())
-                            solicitud.estado = EstadoSolicitud.CERRADA_SIN_OFERTAS
-                            await solicitud.save()
-                            solicitudes_cerradas += 1
-                    else:
-                        # Sin ofertas, cerrar directamente
-                        logger.warning(f"❌ Sin ofertas en nivel máximo, cerrando solicitud {solicitud.id}")
-                        solicitud.estado = EstadoSolicitud.CERRADA_SIN_OFERTAS
-                        await solicitud.save()
-                        solicitudes_cerradas += 1
-                        
-                        # Publicar evento
-                        if redis_client:
-                            try:
-                                event_data = {
-                                    'tipo_evento': 'solicitud.cerrada_sin_ofertas',
-                                    'solicitud_id': str(solicitud.id),
-                                    'nivel_final': solicitud.nivel_actual,
-                                    'ofertas_recibidas': 0,
-                                    'razon': 'Sin ofertas en nivel máximo',
-                                    'timestamp': datetime.now(timezone.utc).isoformat()
-                                }
-                                await redis_client.publish('solicitud.cerrada_sin_ofertas', json.dumps(event_data))
-                            except Exception as e:
-                                logger.error(f"Error publicando evento: {e}")
-                    
+        tiempos_nivel = await temporizador.obtener_tiempos_nivel()
+
+        temporizador.marcar_en_proceso(solicitud_ids)
+        try:
+            solicitudes_vencidas = await Solicitud.filter(
+                id__in=solicitud_ids,
+                estado=EstadoSolicitud.ABIERTA,
+                fecha_escalamiento__isnull=False
+            ).all()
+
+            # Las que ya no están abiertas salen de la agenda junto con su contador
+            abiertas = {str(solicitud.id) for solicitud in solicitudes_vencidas}
+            for solicitud_id in solicitud_ids:
+                if solicitud_id not in abiertas:
+                    await temporizador.cancelar(solicitud_id)
+
+            logger.info(f"📋 {len(solicitudes_vencidas)} solicitudes con vencimiento de escalamiento")
+
+            for solicitud in solicitudes_vencidas:
+                try:
+                    resultado = await _procesar_solicitud_vencida(solicitud, tiempos_nivel, temporizador, redis_client)
+                except Exception as e:
+                    logger.error(f"Error procesando solicitud {solicitud.id}: {e}")
+                    await temporizador.reintentar(solicitud.id)
                     continue
-                
-                # Escalar al siguiente nivel
-                siguiente_nivel = solicitud.nivel_actual + 1
-                logger.info(f"📈 Intentando escalar solicitud {solicitud.id} de Nivel {solicitud.nivel_actual} → Nivel {siguiente_nivel}")
-                
-                # Verificar si el siguiente nivel es el máximo
-                if siguiente_nivel >= NIVEL_MAXIMO:
-                    logger.info(f"⚠️ Siguiente nivel ({siguiente_nivel}) es el nivel máximo")
-                    
-                    # Verificar si hay suficientes ofertas COMPLETAS para evaluar
-                    if ofertas_completas >= solicitud.ofertas_minimas_deseadas:
-                        logger.info(f"✅ Ofertas completas suficientes: {ofertas_completas} >= {solicitud.ofertas_minimas_deseadas}")
-                        
-                        # Verificar si ya fue evaluada (evitar duplicaciones)
-                        from models.oferta import AdjudicacionRepuesto
-                        adjudicaciones_existentes = await AdjudicacionRepuesto.filter(solicitud_id=solicitud.id).count()
-                        if adjudicaciones_existentes > 0:
-                            logger.info(f"⚠️ Solicitud {solicitud.id} ya tiene adjudicaciones, omitiendo evaluación")
-                            continue
-                        
-                        # EVALUAR con ofertas completas
-                        try:
-                            from services.evaluacion_service import EvaluacionService
-                            await solicitud.fetch_related('cliente__usuario')
-                            
-                            resultado_eval = await EvaluacionService.evaluar_solicitud(str(solicitud.id))
-                            
-                            if resultado_eval['success'] and resultado_eval['repuestos_adjudicados'] > 0:
-                                logger.info(f"✅ Evaluación exitosa: {resultado_eval['repuestos_adjudicados']} repuestos adjudicados")
-                                
-                                # Publicar evento de evaluación completada
-                                if redis_client:
-                                    await _publicar_evento_evaluacion_completada(solicitud, resultado_eval, redis_client)
-                                
-                                solicitudes_cerradas += 1
-                            else:
-                                logger.warning(f"⚠️ Evaluación sin adjudicaciones exitosas")
-                                solicitud.estado = EstadoSolicitud.CERRADA_SIN_OFERTAS
-                                await solicitud.save()
-                                solicitudes_cerradas += 1
-                                
-                        except Exception as e:
-                            logger.error(f"❌ Error en evaluación: {e}")
-                            import traceback
-                            logger.error(traceback.format_exc())
-                            solicitud.estado = EstadoSolicitud.CERRADA_SIN_OFERTAS
-                            await solicitud.save()
-                            solicitudes_cerradas += 1
-                        
-                        continue
-                    
-                    else:
-                        # No hay ofertas completas suficientes, escalar al nivel máximo y esperar timeout
-                        logger.info(f"⚠️ Ofertas completas insuficientes: {ofertas_completas} < {solicitud.ofertas_minimas_deseadas}")
-                        logger.info(f"📈 Escalando a nivel máximo {siguiente_nivel} para esperar más ofertas")
-                        
-                        solicitud.nivel_actual = siguiente_nivel
-                        solicitud.fecha_escalamiento = datetime.now(timezone.utc)
-                        await solicitud.save()
-                        solicitudes_escaladas += 1
-                        
-                        # Publicar evento de escalamiento
-                        if redis_client:
-                            try:
-                                event_data = {
-                                    'tipo_evento': 'solicitud.escalada',
-                                    'solicitud_id': str(solicitud.id),
-                                    'nivel_anterior': solicitud.nivel_actual - 1,
-                                    'nivel_nuevo': siguiente_nivel,
-                                    'ofertas_actuales': len(ofertas),
-                                    'ofertas_completas': ofertas_completas,
-                                    'timestamp': datetime.now(timezone.utc).isoformat()
-                                }
-                                await redis_client.publish('solicitud.escalada', str(event_data))
-                            except Exception as e:
-                                logger.error(f"Error publicando evento: {e}")
-                        
-                        logger.info(f"✅ Solicitud {solicitud.id} escalada a nivel máximo {siguiente_nivel}")
-                        continue
-                
-                # No es el nivel máximo, escalar normalmente
-                logger.info(f"📈 Escalando a nivel intermedio {siguiente_nivel}")
-                solicitud.nivel_actual = siguiente_nivel
-                solicitud.fecha_escalamiento = datetime.now(timezone.utc)
-                await solicitud.save()
-                
-                solicitudes_escaladas += 1
-                
-                # Publicar evento de escalamiento
-                if redis_client:
-                    try:
-                        event_data = {
-                            'tipo_evento': 'solicitud.escalada',
-                            'solicitud_id': str(solicitud.id),
-                            'nivel_anterior': solicitud.nivel_actual - 1,
-                            'nivel_nuevo': siguiente_nivel,
-                            'ofertas_actuales': len(ofertas),
-                            'timestamp': datetime.now().isoformat()
-                        }
-                        await redis_client.publish('solicitud.escalada', str(event_data))
-                    except Exception as e:
-                        logger.error(f"Error publicando evento: {e}")
-                
-                logger.info(f"✅ Solicitud {solicitud.id} escalada exitosamente a Nivel {siguiente_nivel}")
-                
-            except Exception as e:
-                logger.error(f"Error procesando solicitud {solicitud.id}: {e}")
-                continue
-        
-        # Log resumen
+
+                # Cerrada: sale de la agenda; escalada: se agenda el vencimiento del nuevo nivel
+                if resultado == 'cerrada':
+                    solicitudes_cerradas += 1
+                    await temporizador.cancelar(solicitud.id)
+                elif resultado == 'escalada':
+                    solicitudes_escaladas += 1
+                    await temporizador.programar(solicitud, tiempos_nivel)
+        finally:
+            await temporizador.liberar(solicitud_ids)
+
         if solicitudes_escaladas > 0 or solicitudes_cerradas > 0:
             logger.info(f"📊 Resumen: {solicitudes_escaladas} escaladas, {solicitudes_cerradas} cerradas")
-        
+
         return {
             'success': True,
             'solicitudes_escaladas': solicitudes_escaladas,
@@ -683,7 +750,7 @@ async def verificar_timeouts_escalamiento(
             'timestamp': datetime.now().isoformat(),
             'message': f'Verificación completada: {solicitudes_escaladas} escaladas, {solicitudes_cerradas} cerradas'
         }
-        
+
     except Exception as e:
         logger.error(f"❌ Error en verificación de timeouts de escalamiento: {e}")
         import traceback
@@ -696,9 +763,9 @@ async def verificar_timeouts_escalamiento(
         }
 
 
-
 async def enviar_recordatorios_cliente(
-    redis_client: Optional[redis.Redis] = None
+    redis_client: Optional[redis.Redis] = None,
+    shard: Optional[Tuple[int, int]] = None
 ) -> Dict[str, Any]:
     """
     Send reminders to clients about pending offer responses
@@ -710,6 +777,7 @@ async def enviar_recordatorios_cliente(
     
     Args:
         redis_client: Redis client for publishing events
+        shard: (indice, total) to process only that shard of solicitudes
         
     Returns:
         Dict with result
@@ -717,8 +785,6 @@ async def enviar_recordatorios_cliente(
     try:
         logger.debug("🔍 Verificando solicitudes con respuestas pendientes...")
         
-        from models.solicitud import Solicitud
-        from models.enums import EstadoSolicitud
         from services.notificacion_cliente_service import NotificacionClienteService
         from services.configuracion_service import ConfiguracionService
         from datetime import timezone, timedelta
@@ -728,11 +794,8 @@ async def enviar_recordatorios_cliente(
         timeout_horas = config.get('timeout_ofertas_horas', 20)
         
         # Find solicitudes EVALUADAS waiting for client response
-        solicitudes_pendientes = await Solicitud.filter(
-            estado=EstadoSolicitud.EVALUADA,
-            fecha_notificacion_cliente__isnull=False,
-            fecha_respuesta_cliente__isnull=True  # No response yet
-        ).prefetch_related('cliente__usuario')
+        query = _filtrar_shard(_solicitudes_esperando_respuesta(), shard)
+        solicitudes_pendientes = await query.prefetch_related('cliente__usuario')
         
         logger.info(f"📋 Encontradas {len(solicitudes_pendientes)} solicitudes esperando respuesta")
         
@@ -864,7 +927,8 @@ async def enviar_recordatorios_cliente(
 
 
 async def notificar_clientes_ofertas_ganadoras(
-    redis_client: Optional[redis.Redis] = None
+    redis_client: Optional[redis.Redis] = None,
+    shard: Optional[Tuple[int, int]] = None
 ) -> Dict[str, Any]:
     """
     Notify clients about winning offers after evaluation
@@ -875,6 +939,7 @@ async def notificar_clientes_ofertas_ganadoras(
     
     Args:
         redis_client: Redis client for publishing events
+        shard: (indice, total) to process only that shard of solicitudes
         
     Returns:
         Dict with result
@@ -882,16 +947,11 @@ async def notificar_clientes_ofertas_ganadoras(
     try:
         logger.debug("🔍 Buscando solicitudes evaluadas sin notificar...")
         
-        from models.solicitud import Solicitud
-        from models.enums import EstadoSolicitud
         from services.notificacion_cliente_service import NotificacionClienteService
         
         # Find solicitudes EVALUADAS that haven't been notified yet
-        solicitudes_sin_notificar = await Solicitud.filter(
-            estado=EstadoSolicitud.EVALUADA,
-            fecha_evaluacion__isnull=False,
-            fecha_notificacion_cliente__isnull=True
-        ).prefetch_related('cliente__usuario', 'adjudicaciones')
+        query = _filtrar_shard(_solicitudes_sin_notificar(), shard)
+        solicitudes_sin_notificar = await query.prefetch_related('cliente__usuario', 'adjudicaciones')
         
         logger.info(f"📋 Encontradas {len(solicitudes_sin_notificar)} solicitudes para notificar")
         
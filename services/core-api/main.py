@@ -282,8 +282,17 @@ async def startup_event():
         await InitService.initialize_default_data()
         logger.info("Default data initialized")
         
-        # Initialize scheduler
+        # Initialize in-process cache invalidation across replicas (one Redis pub/sub
+        # subscription for the configuration, user, advisor dashboard and geographic index caches)
         redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        import services.configuracion_service  # noqa: F401 - registers its channel
+        import services.auth_service  # noqa: F401
+        import services.dashboard_asesor_service  # noqa: F401
+        import services.indice_geografico_service  # noqa: F401
+        from utils.sincronizacion_cache import sincronizacion_cache
+        await sincronizacion_cache.iniciar(redis_url)
+        
+        # Initialize scheduler
         await scheduler_service.initialize(redis_url)
         await scheduler_service.start()
         logger.info("Scheduler service started successfully")
@@ -299,6 +308,10 @@ async def shutdown_event():
         logger.info("Shutting down Core API service")
         await scheduler_service.shutdown()
         logger.info("Scheduler service shutdown successfully")
+        from utils.sincronizacion_cache import sincronizacion_cache
+        await sincronizacion_cache.detener()
+        from services.notification_service import notification_service
+        await notification_service.close()
         logger.info("Core API service shutdown complete")
     except Exception as e:
         logger.error(f"Error shutting down scheduler service: {str(e)}", error=str(e))
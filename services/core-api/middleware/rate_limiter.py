@@ -1,94 +1,230 @@
 """
 Rate Limiting Middleware
 Protege los endpoints de abuso mediante límites de peticiones
+
+El límite se comparte entre todas las réplicas de core-api con una ventana
+deslizante en Redis (un script Lua atómico por verificación). Si Redis no está
+disponible se usa temporalmente el limitador en memoria del proceso.
 """
 
+import os
 import time
-from fastapi import HTTPException, status, Request
-from typing import Dict, Tuple
+import uuid
+from fastapi import Depends, HTTPException, status, Request
+from typing import Dict, Optional, Tuple
 import logging
 
+from middleware.service_auth import verify_service_api_key
+
 logger = logging.getLogger(__name__)
 
+# (max_requests, window_seconds)
+Cuota = Tuple[int, int]
+
+CUOTA_DEFAULT: Cuota = (60, 60)  # 60 peticiones por minuto
+
+# Cuotas por ruta (path de la ruta de FastAPI, por identificador)
+CUOTAS_POR_RUTA: Dict[str, Cuota] = {
+    "/v1/solicitudes/services/bot": (int(os.getenv("RATE_LIMIT_BOT_POR_MINUTO", "120")), 60),
+}
+
+# Cuotas por servicio interno (tienen prioridad sobre la de la ruta)
+CUOTAS_POR_SERVICIO: Dict[str, Cuota] = {
+    "agent-ia": (int(os.getenv("RATE_LIMIT_AGENT_IA_POR_MINUTO", "300")), 60),
+}
+
+PREFIJO_CLAVE = "ratelimit:"
+
+# Tras un error de Redis se usa el limitador en memoria durante este tiempo
+ESPERA_REINTENTO_REDIS_SEGUNDOS = 5
+
+# Ventana deslizante (log en sorted set): limpia, cuenta y registra en un solo paso.
+# Usa el reloj de Redis para que todas las réplicas compartan la misma ventana.
+# Retorna {permitida, ms hasta que se libere un cupo}
+_SCRIPT_VENTANA_DESLIZANTE = """
+local tiempo = redis.call('TIME')
+local ahora = tonumber(tiempo[1]) * 1000 + math.floor(tonumber(tiempo[2]) / 1000)
+local ventana = tonumber(ARGV[1])
+local limite = tonumber(ARGV[2])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ahora - ventana)
+if redis.call('ZCARD', KEYS[1]) < limite then
+    redis.call('ZADD', KEYS[1], ahora, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], ventana)
+    return {1, 0}
+end
+
+local primera = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {0, tonumber(primera[2]) + ventana - ahora}
+"""
+
 
 class InMemoryRateLimiter:
     """
-    Rate limiter simple en memoria
-    Para producción con múltiples instancias, usar Redis
+    Rate limiter simple en memoria (respaldo por proceso cuando Redis no responde)
     """
-    
+
     def __init__(self):
         # {key: (count, window_start_time)}
         self.requests: Dict[str, Tuple[int, float]] = {}
-        self.window_seconds = 60  # Ventana de 1 minuto
-        self.max_requests = 60  # 60 peticiones por minuto
-    
-    def is_allowed(self, key: str) -> bool:
+        self.window_seconds = CUOTA_DEFAULT[1]
+        self.max_requests = CUOTA_DEFAULT[0]
+        self._next_cleanup = 0.0
+
+    def is_allowed(self, key: str, max_requests: Optional[int] = None, window_seconds: Optional[int] = None) -> bool:
         """
         Verifica si una petición está permitida
-        
+
         Args:
             key: Identificador único (IP, service_name, etc.)
-            
+            max_requests: Límite de la ventana (default max_requests)
+            window_seconds: Duración de la ventana (default window_seconds)
+
         Returns:
             bool: True si está permitida, False si excede el límite
         """
+        max_requests = max_requests or self.max_requests
+        window_seconds = window_seconds or self.window_seconds
         current_time = time.time()
-        
-        # Limpiar entradas antiguas
-        self._cleanup_old_entries(current_time)
-        
+
+        # Limpiar entradas antiguas (a lo sumo una vez por ventana, no en cada petición)
+        if current_time >= self._next_cleanup:
+            self._cleanup_old_entries(current_time)
+
         # Obtener contador actual
         if key not in self.requests:
             self.requests[key] = (1, current_time)
             return True
-        
+
         count, window_start = self.requests[key]
-        
+
         # Si estamos en la misma ventana
-        if current_time - window_start < self.window_seconds:
-            if count >= self.max_requests:
-                logger.warning(f"Rate limit exceeded for: {key}")
+        if current_time - window_start < window_seconds:
+            if count >= max_requests:
                 return False
-            
+
             self.requests[key] = (count + 1, window_start)
             return True
-        
+
         # Nueva ventana
         self.requests[key] = (1, current_time)
         return True
-    
+
     def _cleanup_old_entries(self, current_time: float):
         """Limpia entradas antiguas para liberar memoria"""
+        max_window = max([self.window_seconds, *(window for _, window in CUOTAS_POR_RUTA.values()),
+                          *(window for _, window in CUOTAS_POR_SERVICIO.values())])
         keys_to_delete = [
             key for key, (_, window_start) in self.requests.items()
-            if current_time - window_start > self.window_seconds * 2
+            if current_time - window_start > max_window * 2
         ]
         for key in keys_to_delete:
             del self.requests[key]
+        self._next_cleanup = current_time + self.window_seconds
+
+
+class RedisRateLimiter:
+    """
+    Rate limiter de ventana deslizante en Redis compartido por todas las réplicas
+    """
+
+    def __init__(self):
+        self._redis = None
+        self._script = None
+        self._redis_no_disponible_hasta = 0.0
+
+    def configurar(self, redis_client) -> None:
+        """Asigna el cliente Redis (por defecto se crea uno desde REDIS_URL)"""
+        self._redis = redis_client
+        self._script = redis_client.register_script(_SCRIPT_VENTANA_DESLIZANTE)
+
+    @property
+    def disponible(self) -> bool:
+        return time.monotonic() >= self._redis_no_disponible_hasta
+
+    async def is_allowed(self, key: str, max_requests: int, window_seconds: int) -> Tuple[bool, int]:
+        """
+        Verifica y registra la petición en la ventana de la clave
+
+        Returns:
+            Tuple[bool, int]: (permitida, segundos hasta que se libere un cupo)
+
+        Raises:
+            Exception: Si Redis falla (el llamador usa el respaldo en memoria)
+        """
+        if self._redis is None:
+            import redis.asyncio as redis
+            self.configurar(redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"), decode_responses=True))
+
+        try:
+            permitida, espera_ms = await self._script(
+                keys=[f"{PREFIJO_CLAVE}{key}"],
+                args=[window_seconds * 1000, max_requests, uuid.uuid4().hex]
+            )
+        except Exception:
+            self._redis_no_disponible_hasta = time.monotonic() + ESPERA_REINTENTO_REDIS_SEGUNDOS
+            raise
 
+        return bool(permitida), max(1, -(-int(espera_ms) // 1000))
 
-# Instancia global del rate limiter
+
+# Instancias globales del rate limiter
 rate_limiter = InMemoryRateLimiter()
+redis_rate_limiter = RedisRateLimiter()
+
+
+def _ruta(request: Request) -> str:
+    """Path de la ruta de FastAPI (sin parámetros resueltos) o el path de la URL"""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or request.url.path
 
 
-async def check_rate_limit(request: Request, identifier: str = None):
+async def check_rate_limit(request: Request, identifier: str = None, cuota: Optional[Cuota] = None):
     """
     Middleware para verificar rate limiting
-    
+
     Args:
         request: Request de FastAPI
         identifier: Identificador personalizado (opcional, usa IP por defecto)
-        
+        cuota: (max_requests, window_seconds) (opcional, usa la cuota de la ruta)
+
     Raises:
         HTTPException: Si se excede el límite de peticiones
     """
     # Usar identificador personalizado o IP del cliente
-    key = identifier or request.client.host
-    
-    if not rate_limiter.is_allowed(key):
+    ruta = _ruta(request)
+    key = f"{ruta}:{identifier or request.client.host}"
+    max_requests, window_seconds = cuota or CUOTAS_POR_RUTA.get(ruta, CUOTA_DEFAULT)
+
+    retry_after = window_seconds
+    if redis_rate_limiter.disponible:
+        try:
+            allowed, retry_after = await redis_rate_limiter.is_allowed(key, max_requests, window_seconds)
+        except Exception as e:
+            logger.warning(f"Rate limiter en Redis no disponible, usando límite en memoria: {e}")
+            allowed = rate_limiter.is_allowed(key, max_requests, window_seconds)
+    else:
+        allowed = rate_limiter.is_allowed(key, max_requests, window_seconds)
+
+    if not allowed:
+        logger.warning(f"Rate limit exceeded for: {key}")
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Rate limit exceeded. Please try again later.",
-            headers={"Retry-After": "60"}
+            headers={"Retry-After": str(retry_after)}
         )
+
+
+async def rate_limit_servicio(
+    request: Request,
+    service_name: str = Depends(verify_service_api_key)
+) -> str:
+    """
+    Dependencia para endpoints de servicios internos: autentica y aplica la cuota del servicio
+
+    Returns:
+        str: Nombre del servicio autenticado
+    """
+    cuota = CUOTAS_POR_SERVICIO.get(service_name)
+    await check_rate_limit(request, identifier=f"service:{service_name}", cuota=cuota)
+    return service_name
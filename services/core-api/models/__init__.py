@@ -12,6 +12,7 @@ from .geografia import Municipio, EvaluacionAsesorTemp
 from .analytics import (
     HistorialRespuestaOferta,
     OfertaHistorica,
+    MetricaAsesor,
     AuditoriaTienda,
     EventoSistema,
     MetricaCalculada,
@@ -54,6 +55,7 @@ __all__ = [
     # Analytics
     "HistorialRespuestaOferta",
     "OfertaHistorica",
+    "MetricaAsesor",
     "AuditoriaTienda",
     "EventoSistema",
     "MetricaCalculada",
@@ -45,6 +45,10 @@ class HistorialRespuestaOferta(BaseModel):
     
     class Meta:
         table = "historial_respuestas_ofertas"
+        indexes = (
+            ("asesor_id", "fecha_envio"),  # Actividad reciente por asesor
+            ("solicitud_id", "asesor_id"),  # Respuesta del asesor a una solicitud
+        )
         
     def __str__(self):
         return f"Respuesta {self.asesor.usuario.nombre_completo} - {self.solicitud.codigo_solicitud}"
@@ -78,6 +82,13 @@ class OfertaHistorica(BaseModel):
         related_name="ofertas_historicas",
         on_delete=fields.CASCADE
     )
+    oferta = fields.ForeignKeyField(
+        "models.Oferta",
+        related_name="historicos",
+        null=True,
+        index=True,
+        on_delete=fields.SET_NULL
+    )  # Búsqueda indexada desde los eventos (antes solo en metadata_oferta)
     
     # Información de la oferta
     fecha = fields.DateField()
@@ -99,6 +110,9 @@ class OfertaHistorica(BaseModel):
     
     class Meta:
         table = "ofertas_historicas"
+        indexes = (
+            ("asesor_id", "fecha"),  # Desempeño histórico por asesor
+        )
         
     def __str__(self):
         return f"Histórica {self.asesor.usuario.nombre_completo} - {self.fecha}"
@@ -109,6 +123,45 @@ class OfertaHistorica(BaseModel):
         return self.adjudicada and self.aceptada_cliente and self.entrega_exitosa
 
 
+class MetricaAsesor(BaseModel):
+    """
+    Métricas acumuladas por asesor en ventana móvil para escalamiento
+    Se actualiza incrementalmente desde EventsService y se compacta cada noche
+    recalculando desde historial_respuestas_ofertas y ofertas_historicas
+    """
+    
+    asesor = fields.OneToOneField(
+        "models.Asesor",
+        related_name="metricas",
+        on_delete=fields.CASCADE
+    )
+    
+    # Actividad reciente (ventana de 30 días)
+    respuestas_enviadas = fields.IntField(default=0)
+    respuestas_respondidas = fields.IntField(default=0)
+    
+    # Desempeño histórico (ventana de 6 meses)
+    ofertas_total = fields.IntField(default=0)
+    ofertas_adjudicadas = fields.IntField(default=0)
+    ofertas_aceptadas = fields.IntField(default=0)  # Adjudicadas y aceptadas por el cliente
+    ofertas_exitosas = fields.IntField(default=0)  # Aceptadas con entrega exitosa
+    suma_tiempo_respuesta_seg = fields.BigIntField(default=0)
+    ofertas_con_tiempo = fields.IntField(default=0)  # Ofertas con tiempo_respuesta_seg > 0
+    
+    # Última compactación (NULL = fila creada por eventos, aún sin historial completo)
+    fecha_compactacion = fields.DatetimeField(null=True)
+    
+    class Meta:
+        table = "metricas_asesores"
+        
+    def __str__(self):
+        return f"Métricas asesor {self.asesor_id} - compactadas {self.fecha_compactacion}"
+        
+    def is_compactada(self) -> bool:
+        """Verifica si la fila refleja el historial completo de la ventana"""
+        return self.fecha_compactacion is not None
+
+
 class AuditoriaTienda(BaseModel):
     """
     Auditorías de tiendas/asesores para nivel de confianza
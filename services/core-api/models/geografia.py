@@ -144,6 +144,10 @@ class EvaluacionAsesorTemp(BaseModel):
     class Meta:
         table = "evaluaciones_asesores_temp"
         unique_together = (("solicitud", "asesor"),)
+        indexes = (
+            ("solicitud_id", "nivel_entrega"),  # Asesores de una oleada
+            ("asesor_id", "solicitud_id"),  # Solicitudes asignadas a un asesor
+        )
         
     def __str__(self):
         return f"Eval {self.asesor.usuario.nombre_completo} - Nivel {self.nivel_entrega} - Puntaje {self.puntaje_total}"
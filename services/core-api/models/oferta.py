@@ -84,6 +84,11 @@ class Oferta(BaseModel):
     
     class Meta:
         table = "ofertas"
+        indexes = (
+            ("asesor_id", "estado", "created_at"),  # Ofertas del asesor por estado y mes
+            ("solicitud_id", "asesor_id"),  # Ofertas de una solicitud / oferta del asesor
+            ("estado", "created_at"),  # Expiración y listados por estado
+        )
         
     def __str__(self):
         return f"Oferta {self.id} - {self.asesor.usuario.nombre_completo} - {self.estado}"
@@ -257,6 +262,9 @@ class AdjudicacionRepuesto(BaseModel):
     class Meta:
         table = "adjudicaciones_repuesto"
         unique_together = (("solicitud", "repuesto_solicitado"),)
+        indexes = (
+            ("oferta_id", "created_at"),  # Adjudicaciones ganadas por oferta/asesor
+        )
         
     def __str__(self):
         return f"Adjudicación: {self.repuesto_solicitado.nombre} → {self.oferta.asesor.usuario.nombre_completo}"
@@ -84,6 +84,11 @@ class Solicitud(BaseModel):
     
     class Meta:
         table = "solicitudes"
+        indexes = (
+            ("estado", "created_at", "id"),  # Listado paginado filtrado por estado (keyset)
+            ("created_at", "id"),  # Listado paginado más reciente primero (keyset)
+            ("cliente_id", "created_at"),  # Búsqueda del listado por cliente
+        )
         
     def __str__(self):
         return f"Solicitud {self.id} - {self.estado} - {self.ciudad_origen}"
@@ -156,6 +161,9 @@ class RepuestoSolicitado(BaseModel):
     
     class Meta:
         table = "repuestos_solicitados"
+        indexes = (
+            ("solicitud_id",),
+        )
         
     def __str__(self):
         return f"{self.nombre} - {self.marca_vehiculo} {self.linea_vehiculo} {self.anio_vehiculo}"
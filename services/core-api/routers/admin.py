@@ -9,6 +9,7 @@ import logging
 from services.geografia_service import GeografiaService
 from services.configuracion_service import ConfiguracionService
 from services.scheduler_service import scheduler_service
+from services.indice_geografico_service import indice_geografico_service
 from middleware.auth_middleware import RequireAdmin, RequireSystemManagement, get_current_active_user
 from models.user import Usuario
 
@@ -142,6 +143,25 @@ async def buscar_municipios(
     }
 
 
+@router.get("/geografia/indice")
+async def get_estado_indice_geografico(
+    reconstruir: bool = Query(False, description="Forzar reconstrucción del índice"),
+    current_user: Usuario = RequireSystemManagement
+) -> Dict:
+    """
+    Estado del índice geográfico en memoria usado por el escalamiento
+    Reporta tamaño (municipios, asesores, áreas, hubs) y fecha de la última reconstrucción
+    """
+    if reconstruir:
+        await indice_geografico_service.invalidar(f"reconstrucción manual por {current_user.email}")
+        await indice_geografico_service.obtener()
+    
+    return {
+        "success": True,
+        "indice": indice_geografico_service.get_estado()
+    }
+
+
 @router.get("/geografia/validar-ciudad")
 async def validar_ciudad(
     ciudad: str = Query(..., description="Nombre de la ciudad a validar"),
@@ -502,7 +522,7 @@ async def create_usuario(
             raise HTTPException(status_code=400, detail="El email ya está registrado")
         
         # Crear usuario
-        password_hash = AuthService.get_password_hash(usuario_data['password'])
+        password_hash = await AuthService.get_password_hash_async(usuario_data['password'])
         usuario = await Usuario.create(
             email=usuario_data['email'],
             password_hash=password_hash,
@@ -561,10 +581,13 @@ async def update_usuario(
             usuario.estado = EstadoUsuario(usuario_data['estado'])
         if 'password' in usuario_data:
             from services.auth_service import AuthService
-            usuario.password_hash = AuthService.get_password_hash(usuario_data['password'])
+            usuario.password_hash = await AuthService.get_password_hash_async(usuario_data['password'])
         
         await usuario.save()
         
+        if usuario.rol == RolUsuario.ADVISOR or 'rol' in usuario_data:
+            await indice_geografico_service.invalidar(f"usuario asesor {usuario.id} actualizado")
+        
         return {
             "success": True,
             "usuario": {
@@ -602,6 +625,9 @@ async def delete_usuario(
         
         await usuario.delete()
         
+        if usuario.rol.value == 'ADVISOR':
+            await indice_geografico_service.invalidar(f"usuario asesor {usuario_id} eliminado")
+        
         return {"success": True, "message": "Usuario eliminado correctamente"}
     except HTTPException:
         raise
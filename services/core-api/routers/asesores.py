@@ -15,6 +15,7 @@ from models.user import Usuario, Asesor
 from models.enums import EstadoAsesor, EstadoUsuario, RolUsuario
 from middleware.auth_middleware import RequireAdmin, get_current_active_user
 from services.auth_service import AuthService
+from services.indice_geografico_service import indice_geografico_service
 
 router = APIRouter(prefix="/asesores", tags=["Asesores"])
 
@@ -171,7 +172,7 @@ async def create_asesor(
             raise HTTPException(status_code=400, detail="El email ya está registrado")
         
         # Create user
-        password_hash = AuthService.get_password_hash(asesor_data.password)
+        password_hash = await AuthService.get_password_hash_async(asesor_data.password)
         
         usuario = await Usuario.create(
             email=asesor_data.email,
@@ -198,6 +199,7 @@ async def create_asesor(
         )
         
         await asesor.fetch_related('usuario')
+        await indice_geografico_service.invalidar(f"asesor {asesor.id} creado")
         
         return {
             "success": True,
@@ -288,6 +290,9 @@ async def update_asesor(
         if asesor_updated:
             await asesor.save()
         
+        if usuario_updated or asesor_updated:
+            await indice_geografico_service.invalidar(f"asesor {asesor.id} actualizado")
+        
         return {
             "success": True,
             "data": {
@@ -319,6 +324,7 @@ async def update_asesor_estado(
         
         asesor.estado = estado_data["estado"]
         await asesor.save()
+        await indice_geografico_service.invalidar(f"estado de asesor {asesor.id} actualizado")
         
         return {
             "success": True,
@@ -353,6 +359,7 @@ async def delete_asesor(
         usuario_id = asesor.usuario.id
         await asesor.delete()
         await asesor.usuario.delete()
+        await indice_geografico_service.invalidar(f"asesor {asesor_id} eliminado")
         
         return {
             "success": True,
@@ -528,6 +535,7 @@ async def bulk_update_estado(
     """
     try:
         updated_count = await Asesor.filter(id__in=bulk_data.asesor_ids).update(estado=bulk_data.estado)
+        await indice_geografico_service.invalidar(f"estado masivo de {updated_count} asesores")
         
         return {
             "success": True,
@@ -556,7 +564,9 @@ async def import_asesores_excel(
         raise HTTPException(status_code=400, detail="Archivo debe ser Excel (.xlsx o .xls)")
     
     from services.asesores_service import AsesoresService
-    return await AsesoresService.import_asesores_excel(file)
+    resultado = await AsesoresService.import_asesores_excel(file)
+    await indice_geografico_service.invalidar("importación de asesores desde Excel")
+    return resultado
 
 
 @router.get("/export/excel", summary="Exportar asesores a Excel")
@@ -612,7 +622,7 @@ async def get_asesor_metrics(
     Obtiene métricas detalladas de un asesor específico
     """
     try:
-        asesor = await Asesor.get_or_none(id=asesor_id).prefetch_related('usuario', 'ofertas')
+        asesor = await Asesor.get_or_none(id=asesor_id).prefetch_related('usuario')
         
         if not asesor:
             raise HTTPException(status_code=404, detail="Asesor no encontrado")
@@ -628,31 +638,9 @@ async def get_asesor_metrics(
         else:
             fecha_inicio = datetime.fromisoformat(fecha_inicio)
         
-        # Get ofertas in date range
-        from models.oferta import Oferta
-        ofertas_periodo = await Oferta.filter(
-            asesor=asesor,
-            created_at__gte=fecha_inicio,
-            created_at__lte=fecha_fin
-        ).prefetch_related('solicitud')
-        
-        # Calculate metrics
-        total_ofertas_periodo = len(ofertas_periodo)
-        ofertas_ganadoras_periodo = len([o for o in ofertas_periodo if o.estado.value == 'GANADORA'])
-        monto_total_periodo = sum([float(o.monto_total) for o in ofertas_periodo])
-        
-        tasa_adjudicacion_periodo = 0
-        if total_ofertas_periodo > 0:
-            tasa_adjudicacion_periodo = (ofertas_ganadoras_periodo / total_ofertas_periodo) * 100
-        
-        # Response time metrics
-        tiempos_respuesta = []
-        for oferta in ofertas_periodo:
-            if oferta.solicitud and oferta.solicitud.created_at:
-                tiempo_respuesta = (oferta.created_at - oferta.solicitud.created_at).total_seconds() / 3600
-                tiempos_respuesta.append(tiempo_respuesta)
-        
-        tiempo_respuesta_promedio = sum(tiempos_respuesta) / len(tiempos_respuesta) if tiempos_respuesta else 0
+        # Aggregate the offers in the range in the database
+        from services.dashboard_asesor_service import DashboardAsesorService
+        metricas_periodo = await DashboardAsesorService.get_metricas_periodo(asesor.id, fecha_inicio, fecha_fin)
         
         return {
             "success": True,
@@ -667,11 +655,7 @@ async def get_asesor_metrics(
                 "metricas_periodo": {
                     "fecha_inicio": fecha_inicio.isoformat(),
                     "fecha_fin": fecha_fin.isoformat(),
-                    "total_ofertas": total_ofertas_periodo,
-                    "ofertas_ganadoras": ofertas_ganadoras_periodo,
-                    "monto_total": monto_total_periodo,
-                    "tasa_adjudicacion": round(tasa_adjudicacion_periodo, 2),
-                    "tiempo_respuesta_promedio_horas": round(tiempo_respuesta_promedio, 2)
+                    **metricas_periodo
                 },
                 "metricas_historicas": {
                     "total_ofertas": asesor.total_ofertas,
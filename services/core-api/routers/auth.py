@@ -37,7 +37,7 @@ async def login(login_data: LoginRequest):
     # Update last login
     from utils.datetime_utils import now_utc
     user.ultimo_login = now_utc()
-    await user.save()
+    await user.save(update_fields=['ultimo_login'])
     
     # Create token pair
     tokens = AuthService.create_token_pair(user)
@@ -3,10 +3,11 @@ Ofertas Router for TeLOO V3
 Handles offer creation, bulk upload, and state management
 """
 
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query
 from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field, validator
+from datetime import date, datetime
 from decimal import Decimal
 import logging
 import io
@@ -444,33 +445,43 @@ async def update_oferta_estado(
 @router.get("/estado/{estado}")
 async def get_ofertas_by_estado(
     estado: EstadoOferta,
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    limit: int = Query(100, ge=1, le=100, description="Items per page"),
     current_user: Usuario = Depends(get_current_user)
 ):
     """
     Get offers by state
     
     - **estado**: State to filter by
+    - **cursor**: next_cursor of the previous page
+    - **limit**: Items per page (max 100)
     
-    Returns list of offers in the specified state
+    Returns a page of offers in the specified state
     """
     try:
-        # Check permissions - advisors can only see their own offers
-        ofertas = await OfertasService.get_ofertas_by_estado(estado)
-        
-        # Filter by asesor if user is advisor
+        # Check permissions - advisors can only see their own offers, other roles none
+        asesor_id = None
         if current_user.rol == "ADVISOR":
             asesor = await current_user.asesor
-            if asesor:
-                ofertas = [o for o in ofertas if str(o.asesor.id) == str(asesor.id)]
+            if not asesor:
+                raise HTTPException(status_code=403, detail="No tiene permisos para ver ofertas")
+            asesor_id = str(asesor.id)
+        elif current_user.rol != "ADMIN":
+            raise HTTPException(status_code=403, detail="No tiene permisos para ver ofertas")
+        
+        resultado = await OfertasService.listar_ofertas(
+            asesor_id=asesor_id, estado=estado, cursor=cursor, limit=limit
+        )
         
         return {
             "estado": estado,
-            "total": len(ofertas),
+            "total": resultado["total"],
+            "next_cursor": resultado["next_cursor"],
             "ofertas": [
                 {
                     "id": str(oferta.id),
                     "codigo_oferta": oferta.codigo_oferta,
-                    "solicitud_id": str(oferta.solicitud.id),
+                    "solicitud_id": str(oferta.solicitud_id),
                     "asesor": {
                         "id": str(oferta.asesor.id),
                         "nombre": oferta.asesor.usuario.nombre_completo
@@ -482,10 +493,14 @@ async def get_ofertas_by_estado(
                     "created_at": oferta.created_at.isoformat(),
                     "updated_at": oferta.updated_at.isoformat()
                 }
-                for oferta in ofertas
+                for oferta in resultado["ofertas"]
             ]
         }
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error obteniendo ofertas por estado {estado}: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
@@ -537,9 +552,13 @@ async def marcar_ofertas_expiradas(
 async def get_ofertas(
     solicitud_id: Optional[str] = None,
     asesor_id: Optional[str] = None,
-    estado: Optional[str] = None,
-    page: int = 1,
-    limit: int = 20,
+    estado: Optional[EstadoOferta] = None,
+    fecha_desde: Optional[datetime] = Query(None, description="Fecha desde"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha hasta (YYYY-MM-DD, incluye el día completo)"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior (reemplaza a page)"),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    incluir_total: bool = Query(True, description="Calcular total y pages"),
     current_user: Usuario = Depends(get_current_user)
 ):
     """
@@ -548,55 +567,49 @@ async def get_ofertas(
     - **solicitud_id**: Filter by solicitud
     - **asesor_id**: Filter by asesor (admins only, or current asesor)
     - **estado**: Filter by estado
-    - **page**: Page number (1-based)
+    - **fecha_desde** / **fecha_hasta**: Filter by creation date (fecha_hasta is a day, included)
+    - **cursor**: next_cursor of the previous page (constant cost per page)
+    - **page**: Page number (1-based), used when there is no cursor
     - **limit**: Items per page (max 100)
+    
+    Admins can list any offers, advisors only their own, and other roles only
+    the offers of a solicitud they own (solicitud_id is required)
     """
     try:
-        # Validate pagination
-        if page < 1:
-            page = 1
-        if limit > 100:
-            limit = 100
-        
-        # Build query
-        query = {}
-        
-        if solicitud_id:
-            query['solicitud_id'] = solicitud_id
-        
-        if asesor_id:
-            # Check permissions
-            user_asesor = await current_user.asesor
-            if current_user.rol != "ADMIN":
-                if not user_asesor or str(user_asesor.id) != asesor_id:
-                    raise HTTPException(status_code=403, detail="No tiene permisos para ver ofertas de otros asesores")
-            query['asesor_id'] = asesor_id
-        elif current_user.rol == "ADVISOR":
-            # If user is advisor and no asesor_id specified, show only their offers
+        # Check permissions - only admins can list offers without scope
+        if current_user.rol == "ADVISOR":
+            # Advisors only see their own offers
             user_asesor = await current_user.asesor
-            if user_asesor:
-                query['asesor_id'] = str(user_asesor.id)
-        
-        if estado:
-            query['estado'] = estado
-        
-        # Get offers (simplified response for list)
-        if solicitud_id:
-            ofertas = await OfertasService.get_ofertas_by_solicitud(solicitud_id)
-        else:
-            # TODO: Implement general filtering in service
-            ofertas = []
-        
-        # Apply pagination
-        offset = (page - 1) * limit
-        ofertas_page = ofertas[offset:offset + limit]
+            if not user_asesor or (asesor_id and str(user_asesor.id) != asesor_id):
+                raise HTTPException(status_code=403, detail="No tiene permisos para ver ofertas de otros asesores")
+            asesor_id = str(user_asesor.id)
+        elif current_user.rol != "ADMIN":
+            # Other roles only see the offers of a solicitud they own
+            if asesor_id or not solicitud_id:
+                raise HTTPException(status_code=403, detail="No tiene permisos para listar estas ofertas")
+            propia = await Solicitud.filter(id=solicitud_id, cliente__usuario_id=current_user.id).exists()
+            if not propia:
+                raise HTTPException(status_code=403, detail="No tiene permisos para ver ofertas de esta solicitud")
+        
+        resultado = await OfertasService.listar_ofertas(
+            asesor_id=asesor_id,
+            estado=estado,
+            solicitud_id=solicitud_id,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+            cursor=cursor,
+            page=page,
+            limit=limit,
+            incluir_total=incluir_total
+        )
+        total = resultado["total"]
         
         return {
             "ofertas": [
                 {
                     "id": str(oferta.id),
                     "codigo_oferta": oferta.codigo_oferta,
-                    "solicitud_id": str(oferta.solicitud.id),
+                    "solicitud_id": str(oferta.solicitud_id),
                     "asesor": {
                         "id": str(oferta.asesor.id),
                         "nombre": oferta.asesor.usuario.nombre_completo
@@ -607,18 +620,21 @@ async def get_ofertas(
                     "cobertura_porcentaje": float(oferta.cobertura_porcentaje),
                     "created_at": oferta.created_at.isoformat()
                 }
-                for oferta in ofertas_page
+                for oferta in resultado["ofertas"]
             ],
             "pagination": {
                 "page": page,
                 "limit": limit,
-                "total": len(ofertas),
-                "pages": (len(ofertas) + limit - 1) // limit
+                "total": total,
+                "pages": (total + limit - 1) // limit if total is not None else None,
+                "next_cursor": resultado["next_cursor"]
             }
         }
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error obteniendo ofertas: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
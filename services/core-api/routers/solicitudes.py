@@ -12,6 +12,7 @@ from models.enums import EstadoSolicitud
 from models.user import Usuario
 from middleware.auth_middleware import get_current_user
 from middleware.service_auth import verify_service_api_key
+from middleware.rate_limiter import rate_limit_servicio
 from services.solicitudes_service import SolicitudesService
 from pydantic import BaseModel, Field
 from datetime import datetime
@@ -92,10 +93,11 @@ class SolicitudResponse(BaseModel):
 class SolicitudesPaginatedResponse(BaseModel):
     """Paginated response for solicitudes"""
     items: List[SolicitudResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class SolicitudesStatsResponse(BaseModel):
@@ -107,6 +109,12 @@ class SolicitudesStatsResponse(BaseModel):
     rechazadas_expiradas: int
 
 
+class BuscarMunicipiosRequest(BaseModel):
+    """Request model for batch municipio lookup by services"""
+    ciudades: List[str] = Field(..., min_length=1, max_length=100)
+    limite: int = Field(1, ge=1, le=20)
+
+
 class ClienteSearchResponse(BaseModel):
     """Response model for cliente search by phone"""
     found: bool
@@ -193,134 +201,16 @@ async def get_advisor_metrics(
     """
     try:
         from models.user import Asesor
-        from models.oferta import Oferta, AdjudicacionRepuesto
-        from models.enums import EstadoOferta
-        from models.geografia import EvaluacionAsesorTemp
-        from utils.datetime_utils import now_utc
-        from datetime import datetime
-        import logging
-        
-        logger = logging.getLogger(__name__)
-        logger.info(f"🔍 Calculando métricas para: {current_user.email}")
+        from services.dashboard_asesor_service import DashboardAsesorService, METRICAS_VACIAS
         
         # Get asesor
         asesor = await Asesor.get_or_none(usuario_id=current_user.id)
         if not asesor:
             logger.warning(f"⚠️ No se encontró asesor para usuario {current_user.email}")
-            return {
-                "repuestos_adjudicados": 0,
-                "monto_total_ganado": 0.0,
-                "pendientes_por_oferta": 0,
-                "tasa_conversion": 0.0,
-                "tasa_oferta": 0.0
-            }
+            return dict(METRICAS_VACIAS)
         
-        # Obtener fecha de inicio del mes actual
-        now = now_utc()
-        inicio_mes = datetime(now.year, now.month, 1, tzinfo=now.tzinfo)
-        
-        logger.info(f"📅 Calculando métricas del mes: {inicio_mes.strftime('%Y-%m')}")
-        
-        # 1. REPUESTOS ASIGNADOS (mes actual)
-        # Total de repuestos en TODAS las solicitudes asignadas al asesor
-        from tortoise import connections
-        conn = connections.get("default")
-        
-        repuestos_query = """
-            SELECT COALESCE(SUM(rs.cantidad), 0) as total_repuestos
-            FROM solicitudes s
-            JOIN evaluaciones_asesores_temp e ON e.solicitud_id = s.id
-            JOIN repuestos_solicitados rs ON rs.solicitud_id = s.id
-            WHERE e.asesor_id = $1
-              AND s.created_at >= $2
-        """
-        
-        result = await conn.execute_query_dict(repuestos_query, [str(asesor.id), inicio_mes])
-        repuestos_adjudicados = result[0]['total_repuestos'] if result else 0
-        
-        # 2. MONTO TOTAL GANADO (mes actual)
-        # Suma de montos de adjudicaciones donde la oferta fue ACEPTADA
-        adjudicaciones_aceptadas = await AdjudicacionRepuesto.filter(
-            oferta__asesor_id=asesor.id,
-            oferta__estado=EstadoOferta.ACEPTADA,
-            created_at__gte=inicio_mes
-        ).all()
-        
-        monto_total_ganado = sum(
-            float(adj.precio_adjudicado) * adj.cantidad_adjudicada 
-            for adj in adjudicaciones_aceptadas
-        )
-        
-        # 3. PENDIENTES POR OFERTA (mes actual)
-        # Solicitudes ABIERTAS asignadas al asesor que NO tienen oferta aún
-        from tortoise import connections
-        conn = connections.get("default")
-        
-        pendientes_query = """
-            SELECT COUNT(DISTINCT s.id)
-            FROM solicitudes s
-            JOIN evaluaciones_asesores_temp e ON e.solicitud_id = s.id
-            WHERE e.asesor_id = $1
-              AND s.estado = 'ABIERTA'
-              AND s.nivel_actual >= e.nivel_entrega
-              AND s.created_at >= $2
-              AND NOT EXISTS (
-                SELECT 1 FROM ofertas o 
-                WHERE o.solicitud_id = s.id 
-                AND o.asesor_id = $1
-              )
-        """
-        
-        result = await conn.execute_query_dict(pendientes_query, [str(asesor.id), inicio_mes])
-        pendientes_por_oferta = result[0]['count'] if result else 0
-        
-        # 4. TASA DE CONVERSIÓN (mes actual)
-        # Porcentaje de monto aceptado vs monto ofertado
-        ofertas_mes = await Oferta.filter(
-            asesor_id=asesor.id,
-            created_at__gte=inicio_mes
-        ).all()
-        
-        monto_ofertado = sum(float(o.monto_total) for o in ofertas_mes)
-        
-        ofertas_aceptadas_mes = await Oferta.filter(
-            asesor_id=asesor.id,
-            estado=EstadoOferta.ACEPTADA,
-            created_at__gte=inicio_mes
-        ).all()
-        
-        monto_aceptado = sum(float(o.monto_total) for o in ofertas_aceptadas_mes)
-        
-        tasa_conversion = 0.0
-        if monto_ofertado > 0:
-            tasa_conversion = (monto_aceptado / monto_ofertado) * 100
-        
-        # 5. TASA DE OFERTA (mes actual)
-        # Porcentaje de repuestos ofertados vs repuestos asignados
-        repuestos_ofertados_query = """
-            SELECT COALESCE(SUM(od.cantidad), 0) as total_ofertados
-            FROM ofertas o
-            JOIN ofertas_detalle od ON od.oferta_id = o.id
-            WHERE o.asesor_id = $1
-              AND o.created_at >= $2
-        """
-        
-        result = await conn.execute_query_dict(repuestos_ofertados_query, [str(asesor.id), inicio_mes])
-        repuestos_ofertados = result[0]['total_ofertados'] if result else 0
-        
-        tasa_oferta = 0.0
-        if repuestos_adjudicados > 0:
-            tasa_oferta = (repuestos_ofertados / repuestos_adjudicados) * 100
-        
-        logger.info(f"✅ Métricas calculadas - Asignados: {repuestos_adjudicados}, Ofertados: {repuestos_ofertados}, Tasa Oferta: {tasa_oferta:.1f}%, Monto: ${monto_total_ganado:,.0f}, Pendientes: {pendientes_por_oferta}, Conversión: {tasa_conversion:.1f}%")
-        
-        return {
-            "repuestos_adjudicados": repuestos_adjudicados,
-            "monto_total_ganado": round(monto_total_ganado, 2),
-            "pendientes_por_oferta": pendientes_por_oferta,
-            "tasa_conversion": round(tasa_conversion, 2),
-            "tasa_oferta": round(tasa_oferta, 2)
-        }
+        # Una consulta agregada, cacheada por asesor e invalidada por los eventos de ofertas
+        return await DashboardAsesorService.get_metricas_mes(asesor.id)
         
     except Exception as e:
         import traceback
@@ -342,6 +232,8 @@ async def get_solicitudes(
     fecha_hasta: Optional[datetime] = Query(None, description="Fecha hasta"),
     ciudad: Optional[str] = Query(None, description="Filtrar por ciudad"),
     departamento: Optional[str] = Query(None, description="Filtrar por departamento"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior (reemplaza a page)"),
+    incluir_total: bool = Query(True, description="Calcular total y total_pages"),
     current_user: Usuario = Depends(get_current_user)
 ):
     """
@@ -349,6 +241,10 @@ async def get_solicitudes(
     
     Para ASESORES: Solo muestra solicitudes donde fueron evaluados/notificados O hicieron oferta
     Para ADMIN: Muestra todas las solicitudes
+    
+    Para recorrer páginas siguientes enviar `cursor` con el `next_cursor` recibido
+    (latencia constante aunque crezca la tabla) e `incluir_total=false` si no se
+    necesita el total.
     """
     try:
         # Get asesor_id if user is an asesor
@@ -369,11 +265,18 @@ async def get_solicitudes(
             ciudad=ciudad,
             departamento=departamento,
             user_rol=current_user.rol.value,
-            asesor_id=asesor_id
+            asesor_id=asesor_id,
+            cursor=cursor,
+            incluir_total=incluir_total
         )
         
         return result
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         import traceback
         print(f"Error in get_solicitudes: {str(e)}")
@@ -443,6 +346,18 @@ async def create_solicitud(
         )
 
 
+def _municipio_servicio(coincidencia) -> Dict[str, Any]:
+    municipio = coincidencia.municipio
+    return {
+        "id": str(municipio.id),
+        "municipio": municipio.municipio,
+        "departamento": municipio.departamento,
+        "hub_logistico": municipio.hub_logistico,
+        "coincidencia": coincidencia.tipo,
+        "puntaje": round(coincidencia.puntaje, 3)
+    }
+
+
 @router.get("/services/municipio")
 async def buscar_municipio_servicio(
     ciudad: str = Query(..., description="Nombre de la ciudad a buscar"),
@@ -450,46 +365,28 @@ async def buscar_municipio_servicio(
 ):
     """
     Buscar municipio por nombre - Endpoint para servicios autenticados
-    Retorna el primer municipio que coincida con el nombre
+    Retorna el municipio que mejor coincida con el nombre
+    
+    La búsqueda es en memoria e insensible a tildes y puntuación; acepta alias
+    ("Bogota", "Cartagena"), el departamento al final ("Bello Antioquia"),
+    prefijos y errores de digitación.
     
     Requiere autenticación de servicio mediante:
     - Header: X-Service-Name (ej: "agent-ia")
     - Header: X-Service-API-Key (API key del servicio)
     """
     try:
-        from models.geografia import Municipio
-        import logging
-        
-        logger = logging.getLogger(__name__)
-        logger.info(f"Service '{service_name}' searching for municipio: {ciudad}")
-        
-        # Normalizar búsqueda (quitar tildes y convertir a mayúsculas)
-        ciudad_norm = Municipio.normalizar_ciudad(ciudad)
-        
-        # Estrategia de búsqueda en orden de prioridad:
-        # 1. Coincidencia exacta
-        municipio = await Municipio.filter(municipio_norm=ciudad_norm).first()
-        
-        # 2. Coincidencia que empiece con el término buscado
-        if not municipio:
-            municipio = await Municipio.filter(municipio_norm__istartswith=ciudad_norm).first()
+        from services.indice_geografico_service import indice_geografico_service
         
-        # 3. Coincidencia parcial (para casos como "BOGOTA" -> "BOGOTA, D.C.")
-        if not municipio:
-            municipio = await Municipio.filter(municipio_norm__icontains=ciudad_norm).first()
+        coincidencias = await indice_geografico_service.buscar_municipios_por_nombre(ciudad, limite=1)
         
-        if not municipio:
+        if not coincidencias:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Municipio '{ciudad}' no encontrado"
             )
         
-        return {
-            "id": str(municipio.id),
-            "municipio": municipio.municipio,
-            "departamento": municipio.departamento,
-            "hub_logistico": municipio.hub_logistico
-        }
+        return _municipio_servicio(coincidencias[0])
         
     except HTTPException:
         raise
@@ -500,10 +397,46 @@ async def buscar_municipio_servicio(
         )
 
 
+@router.post("/services/municipios/buscar")
+async def buscar_municipios_servicio(
+    request: BuscarMunicipiosRequest,
+    service_name: str = Depends(verify_service_api_key)
+):
+    """
+    Buscar varios municipios en una sola llamada - Endpoint para servicios autenticados
+    Para cada ciudad retorna hasta `limite` municipios ordenados por relevancia
+    (lista vacía si no hay coincidencias)
+    
+    Requiere autenticación de servicio mediante:
+    - Header: X-Service-Name (ej: "agent-ia")
+    - Header: X-Service-API-Key (API key del servicio)
+    """
+    try:
+        from services.indice_geografico_service import indice_geografico_service
+        
+        resultados = []
+        for ciudad in request.ciudades:
+            coincidencias = await indice_geografico_service.buscar_municipios_por_nombre(
+                ciudad, limite=request.limite
+            )
+            resultados.append({
+                "ciudad": ciudad,
+                "municipios": [_municipio_servicio(c) for c in coincidencias]
+            })
+        
+        return {"resultados": resultados}
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error buscando municipios: {str(e)}"
+        )
+
+
 @router.post("/services/bot", response_model=SolicitudResponse, status_code=status.HTTP_201_CREATED)
 async def create_solicitud_from_bot(
     request: CreateSolicitudRequest,
-    service_name: str = Depends(verify_service_api_key)
+    service_name: str = Depends(rate_limit_servicio)
 ):
     """
     Crear solicitud desde bot (Telegram/WhatsApp) - Endpoint seguro para servicios
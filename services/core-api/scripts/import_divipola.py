@@ -7,33 +7,12 @@ import asyncio
 import pandas as pd
 from pathlib import Path
 import sys
-import unicodedata
 
 # Agregar el directorio padre al path para importar modelos
 sys.path.append(str(Path(__file__).parent.parent))
 
 from tortoise import Tortoise
-from models.geografia import Municipio
-
-
-def normalizar_texto(texto: str) -> str:
-    """
-    Normaliza texto: uppercase, sin tildes, trim
-    """
-    if pd.isna(texto):
-        return texto
-    
-    # Convertir a uppercase y trim
-    texto_norm = str(texto).strip().upper()
-    
-    # Remover tildes y caracteres especiales
-    texto_norm = unicodedata.normalize('NFD', texto_norm)
-    texto_norm = ''.join(
-        char for char in texto_norm 
-        if unicodedata.category(char) != 'Mn'
-    )
-    
-    return texto_norm
+from services.geografia_service import GeografiaService
 
 
 async def import_divipola_from_excel(excel_path: str):
@@ -73,59 +52,15 @@ async def import_divipola_from_excel(excel_path: str):
         print(f"   Columnas disponibles: {', '.join(df.columns)}")
         return False
     
-    # Limpiar y preparar datos
-    print("🔄 Limpiando y normalizando datos...")
-    
-    df = df.dropna(subset=required_columns)
-    df['municipio'] = df['municipio'].str.strip()
-    df['municipio_norm'] = df['municipio'].apply(normalizar_texto)
-    df['departamento'] = df['departamento'].str.strip()
-    df['hub_logistico'] = df['hub_logistico'].str.strip().str.upper()
-    
-    # Normalizar área metropolitana
-    if 'area_metropolitana' in df.columns:
-        df['area_metropolitana'] = df['area_metropolitana'].str.strip()
-        df.loc[df['area_metropolitana'].isna(), 'area_metropolitana'] = None
-    else:
-        df['area_metropolitana'] = None
-    
-    # Normalizar código DANE
-    if 'codigo_dane' in df.columns:
-        df['codigo_dane'] = df['codigo_dane'].astype(str).str.strip()
-        # Limpiar valores nan
-        df.loc[df['codigo_dane'] == 'nan', 'codigo_dane'] = None
-    else:
-        df['codigo_dane'] = None
-    
-    # Normalizar clasificación
-    if 'clasificacion' in df.columns:
-        df['clasificacion'] = df['clasificacion'].str.strip().str.upper()
-        # Convertir plural a singular
-        df['clasificacion'] = df['clasificacion'].str.replace('PRINCIPALES', 'PRINCIPAL')
-        df['clasificacion'] = df['clasificacion'].str.replace('SECUNDARIAS', 'SECUNDARIA')
-        df['clasificacion'] = df['clasificacion'].str.replace('TERCIARIAS', 'TERCIARIA')
-        # Validar valores permitidos
-        valid_classifications = ['PRINCIPAL', 'SECUNDARIA', 'TERCIARIA']
-        df.loc[~df['clasificacion'].isin(valid_classifications), 'clasificacion'] = 'TERCIARIA'
-        df['clasificacion'] = df['clasificacion'].fillna('TERCIARIA')
-    else:
-        df['clasificacion'] = 'TERCIARIA'
-    
-    # Validar duplicados por código DANE (no por nombre)
+    # Duplicados por código DANE: advertir y mantener la primera ocurrencia
     if 'codigo_dane' in df.columns and df['codigo_dane'].notna().any():
-        duplicados = df.duplicated(subset=['codigo_dane'], keep=False)
+        duplicados = df['codigo_dane'].notna() & df.duplicated(subset=['codigo_dane'], keep=False)
         if duplicados.any():
             print(f"⚠️  Advertencia: {duplicados.sum()} registros con código DANE duplicado")
             print(f"   Códigos duplicados: {df[duplicados]['codigo_dane'].unique().tolist()[:5]}")
-            df = df.drop_duplicates(subset=['codigo_dane'], keep='first')
+            df = df[~(df['codigo_dane'].notna() & df.duplicated(subset=['codigo_dane'], keep='first'))]
             print(f"   Manteniendo primera ocurrencia, total: {len(df)} registros")
     
-    # Informar sobre municipios con mismo nombre en diferentes departamentos
-    nombres_duplicados = df.duplicated(subset=['municipio_norm'], keep=False)
-    if nombres_duplicados.any():
-        print(f"ℹ️  Info: {nombres_duplicados.sum()} municipios con nombres repetidos en diferentes departamentos")
-        print(f"   Ejemplos: {df[nombres_duplicados][['municipio', 'departamento']].head(5).to_dict('records')}")
-    
     # Conectar a base de datos
     print("🔌 Conectando a base de datos...")
     
@@ -144,68 +79,40 @@ async def import_divipola_from_excel(excel_path: str):
     
     await Tortoise.generate_schemas()
     
-    # Limpiar tabla existente
-    print("🗑️  Limpiando datos existentes...")
-    await Municipio.all().delete()
-    
-    # Insertar nuevos datos
-    print(f"💾 Insertando {len(df)} municipios...")
-    
-    municipios_creados = 0
-    errores = 0
-    
-    for idx, row in df.iterrows():
-        try:
-            await Municipio.create(
-                codigo_dane=row.get('codigo_dane'),
-                municipio=row['municipio'],
-                municipio_norm=row['municipio_norm'],
-                departamento=row['departamento'],
-                area_metropolitana=row.get('area_metropolitana'),
-                hub_logistico=row['hub_logistico'],
-                clasificacion=row.get('clasificacion', 'TERCIARIA')
-            )
-            municipios_creados += 1
-            
-            if (municipios_creados % 100) == 0:
-                print(f"   Progreso: {municipios_creados}/{len(df)} municipios...")
-                
-        except Exception as e:
-            errores += 1
-            print(f"   ❌ Error en fila {idx}: {str(e)}")
+    # Limpieza, upsert por código DANE / nombre y diff (mismo flujo que el endpoint de admin)
+    print(f"💾 Sincronizando {len(df)} municipios...")
+    
+    try:
+        resultado = await GeografiaService.importar_divipola(df)
+    except ValueError as e:
+        print(f"❌ Error: {str(e)}")
+        await Tortoise.close_connections()
+        return False
+    
+    diff = resultado['diff']
+    estadisticas = resultado['estadisticas']
     
     # Estadísticas finales
     print("\n" + "="*60)
     print("📊 RESUMEN DE IMPORTACIÓN")
     print("="*60)
-    print(f"✅ Municipios importados: {municipios_creados}")
-    print(f"❌ Errores: {errores}")
-    print(f"📍 Departamentos únicos: {df['departamento'].nunique()}")
-    print(f"🏙️  Áreas metropolitanas: {df['area_metropolitana'].dropna().nunique()}")
-    print(f"📦 Hubs logísticos: {df['hub_logistico'].nunique()}")
-    print(f"🌆 Municipios con área metropolitana: {df['area_metropolitana'].notna().sum()}")
-    print(f"🏆 Clasificación - Principal: {(df['clasificacion'] == 'PRINCIPAL').sum()}")
-    print(f"🥈 Clasificación - Secundaria: {(df['clasificacion'] == 'SECUNDARIA').sum()}")
-    print(f"🥉 Clasificación - Terciaria: {(df['clasificacion'] == 'TERCIARIA').sum()}")
+    print(f"✅ Municipios en archivo: {estadisticas['total_municipios']}")
+    print(f"➕ Nuevos: {diff['agregados']}")
+    print(f"✏️  Actualizados: {diff['actualizados']}")
+    print(f"= Sin cambios: {diff['sin_cambios']}")
+    print(f"🗑️  Eliminados: {diff['eliminados']}")
+    if diff['conservados_con_referencias']:
+        print(f"📌 Conservados (con referencias): {', '.join(diff['conservados_con_referencias'][:5])}")
+    print(f"📍 Departamentos únicos: {estadisticas['total_departamentos']}")
+    print(f"🏙️  Áreas metropolitanas: {estadisticas['total_areas_metropolitanas']}")
+    print(f"📦 Hubs logísticos: {estadisticas['total_hubs_logisticos']}")
+    print(f"🌆 Municipios con área metropolitana: {estadisticas['municipios_con_area_metropolitana']}")
     print("="*60)
     
-    # Mostrar distribución por hub
-    print("\n📦 DISTRIBUCIÓN POR HUB LOGÍSTICO:")
-    print("-"*60)
-    for hub, count in df['hub_logistico'].value_counts().items():
-        print(f"   {hub}: {count} municipios")
-    
-    # Mostrar áreas metropolitanas
-    if df['area_metropolitana'].notna().any():
-        print("\n🏙️  ÁREAS METROPOLITANAS:")
-        print("-"*60)
-        for area, count in df['area_metropolitana'].value_counts().items():
-            print(f"   {area}: {count} municipios")
-    
     # Cerrar conexión
     await Tortoise.close_connections()
     
-    return municipios_creados > 0
+    return True
 
 
 async def main():
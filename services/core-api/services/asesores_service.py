@@ -69,7 +69,7 @@ class AsesoresService:
                         password = f"TeLOO{datetime.now().year}!"
                     
                     # Create user
-                    password_hash = AuthService.get_password_hash(password)
+                    password_hash = await AuthService.get_password_hash_async(password)
                     
                     usuario = await Usuario.create(
                         email=email,
@@ -1,19 +1,35 @@
 """
 Authentication Service for TeLOO V3
 Handles JWT token generation, validation, and user authentication
+
+Authenticated users are cached per process for a few seconds, so protected
+endpoints do not reload Usuario on every request. Only the columns needed for
+authorization are cached. Saving a Usuario drops its cached entry; changes to
+role, state, password or email are also published on Redis so the other
+replicas drop theirs. Password hashing runs in a bounded
+thread pool to keep bcrypt off the event loop.
 """
 
+import asyncio
+import copy
+import logging
 import os
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import jwt
 from jwt.exceptions import InvalidTokenError, ExpiredSignatureError
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+from tortoise.signals import post_save, post_delete
 from models.user import Usuario
 from models.enums import RolUsuario, EstadoUsuario
 from utils.secrets import get_jwt_config
+from utils.sincronizacion_cache import sincronizacion_cache
+
+logger = logging.getLogger(__name__)
 
 try:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
@@ -27,6 +43,23 @@ ALGORITHM = JWT_CONFIG.get("algorithm", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(JWT_CONFIG.get("access_token_expire_minutes", 15))
 REFRESH_TOKEN_EXPIRE_DAYS = int(JWT_CONFIG.get("refresh_token_expire_days", 7))
 
+# Cache of authenticated users (email -> (Usuario, expires_at))
+USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "5000"))
+CANAL_INVALIDACION_USUARIOS = "auth:usuarios:invalidacion"
+CAMPOS_SENSIBLES = {"rol", "estado", "password_hash", "email"}
+# Columns kept in the cache: what authorization and the handlers read, never the hash
+CAMPOS_CACHEADOS = (
+    "id", "email", "nombre", "apellido", "telefono", "rol", "estado",
+    "ultimo_login", "created_at", "updated_at"
+)
+
+# bcrypt is CPU bound: a small pool keeps logins from starving the event loop
+_hash_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AUTH_HASH_WORKERS", "4")),
+    thread_name_prefix="password-hash"
+)
+
 def _jwt_algorithm() -> str:
     try:
         if ALGORITHM.startswith("RS"):
@@ -41,6 +74,11 @@ def _jwt_algorithm() -> str:
 class AuthService:
     """Authentication service for handling JWT tokens and user authentication"""
     
+    _user_cache: "OrderedDict[str, Tuple[Usuario, float]]" = OrderedDict()
+    _user_cache_hits = 0
+    _user_cache_misses = 0
+    _generacion = 0
+    
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         """Verify a plain password against its hash"""
@@ -54,6 +92,18 @@ class AuthService:
             password = password[:72]
         return pwd_context.hash(password)
     
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """Verify a password in the hashing thread pool (use from request handlers)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, AuthService.verify_password, plain_password, hashed_password)
+    
+    @staticmethod
+    async def get_password_hash_async(password: str) -> str:
+        """Hash a password in the hashing thread pool (use from request handlers)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, AuthService.get_password_hash, password)
+    
     @staticmethod
     def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
         """Create JWT access token"""
@@ -107,7 +157,7 @@ class AuthService:
         """Authenticate user with email and password"""
         try:
             user = await Usuario.get(email=email)
-            if not user or not AuthService.verify_password(password, user.password_hash):
+            if not user or not await AuthService.verify_password_async(password, user.password_hash):
                 return None
             
             # Check if user is active
@@ -130,7 +180,7 @@ class AuthService:
                 detail="Could not validate credentials"
             )
         
-        user = await Usuario.get_or_none(email=email)
+        user = await AuthService._get_cached_user(email)
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -139,6 +189,72 @@ class AuthService:
         
         return user
     
+    @staticmethod
+    async def _cargar_usuario(email: str) -> Optional[Usuario]:
+        """Usuario with only the claims used by authorization (no password hash)"""
+        return await Usuario.filter(email=email).only(*CAMPOS_CACHEADOS).first()
+    
+    @staticmethod
+    async def _get_cached_user(email: str) -> Optional[Usuario]:
+        """
+        Usuario by email through the short-TTL cache
+        The user is a partial instance and each caller gets its own copy: save()
+        requires update_fields, so a handler never writes cached columns back.
+        Handlers that modify the user beyond that should re-fetch it.
+        """
+        cache = AuthService._user_cache
+        entry = cache.get(email)
+        if entry and entry[1] > time.monotonic():
+            cache.move_to_end(email)
+            AuthService._user_cache_hits += 1
+            return copy.copy(entry[0])
+        
+        AuthService._user_cache_misses += 1
+        generacion = AuthService._generacion
+        user = await AuthService._cargar_usuario(email)
+        # An invalidation during the query means the row may already be stale: serve it, don't cache it
+        if user is not None and generacion == AuthService._generacion:
+            cache[email] = (copy.copy(user), time.monotonic() + USER_CACHE_TTL_SECONDS)
+            cache.move_to_end(email)
+            while len(cache) > USER_CACHE_MAX_ENTRIES:
+                cache.popitem(last=False)
+        return user
+    
+    @staticmethod
+    def invalidar_usuario(user_id: Any = None, email: Optional[str] = None) -> None:
+        """Drop a user from the local cache by id and/or email"""
+        AuthService._generacion += 1
+        cache = AuthService._user_cache
+        if email:
+            cache.pop(email, None)
+        if user_id is not None:
+            for clave in [clave for clave, (user, _) in cache.items() if str(user.id) == str(user_id)]:
+                del cache[clave]
+    
+    @staticmethod
+    async def _publicar_invalidacion(user_id: Any, email: Optional[str]) -> None:
+        """Tell the other replicas to drop the user (best effort, TTL bounds staleness)"""
+        await sincronizacion_cache.publicar(CANAL_INVALIDACION_USUARIOS, {
+            'user_id': str(user_id),
+            'email': email
+        })
+    
+    @staticmethod
+    def _aplicar_invalidacion(datos: Dict[str, Any]) -> None:
+        """Drop a user changed by another replica from the local cache"""
+        AuthService.invalidar_usuario(datos.get('user_id'), datos.get('email'))
+    
+    @staticmethod
+    def get_estado_cache() -> Dict[str, Any]:
+        """User cache statistics"""
+        return {
+            'usuarios': len(AuthService._user_cache),
+            'hits': AuthService._user_cache_hits,
+            'misses': AuthService._user_cache_misses,
+            'ttl_segundos': USER_CACHE_TTL_SECONDS,
+            'sincronizacion_redis': sincronizacion_cache.activa
+        }
+    
     @staticmethod
     def create_token_pair(user: Usuario) -> Dict[str, str]:
         """Create access and refresh token pair for user"""
@@ -157,3 +273,22 @@ class AuthService:
             "refresh_token": refresh_token,
             "token_type": "bearer"
         }
+
+
+@post_save(Usuario)
+async def _usuario_guardado(sender, instance: Usuario, created: bool, using_db, update_fields) -> None:
+    """Drop the saved user from the cache; replicas only need to know about sensitive changes"""
+    AuthService.invalidar_usuario(instance.id, instance.email)
+    if created:
+        return
+    if update_fields is None or CAMPOS_SENSIBLES.intersection(update_fields):
+        await AuthService._publicar_invalidacion(instance.id, instance.email)
+
+
+@post_delete(Usuario)
+async def _usuario_eliminado(sender, instance: Usuario, using_db) -> None:
+    AuthService.invalidar_usuario(instance.id, instance.email)
+    await AuthService._publicar_invalidacion(instance.id, instance.email)
+
+
+sincronizacion_cache.registrar(CANAL_INVALIDACION_USUARIOS, AuthService._aplicar_invalidacion)
@@ -1,17 +1,33 @@
 """
 Configuration Service for TeLOO V3
 Manages system parameters with validation and Redis caching
+
+Las lecturas se sirven desde un snapshot en memoria por proceso (todas las filas
+de parametros_config cargadas en una sola consulta). Las escrituras actualizan el
+snapshot local (write-through) y publican la nueva versión en Redis para que las
+demás réplicas descarten el suyo (utils/sincronizacion_cache).
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Optional
 from decimal import Decimal
+import asyncio
+import copy
 import logging
+import time
 from fastapi import HTTPException
 from models.analytics import ParametroConfig
 from models.user import Usuario
+from utils.sincronizacion_cache import sincronizacion_cache
 
 logger = logging.getLogger(__name__)
 
+# Canal y contador de versión compartidos por todas las réplicas de core-api
+CANAL_INVALIDACION_CONFIG = "config:invalidacion"
+CLAVE_VERSION_CONFIG = "config:version"
+
+# Recarga de seguridad por si se pierde un mensaje de invalidación (Redis caído)
+TTL_SNAPSHOT_SEGUNDOS = 300
+
 
 class ConfiguracionService:
     """
@@ -73,6 +89,80 @@ class ConfiguracionService:
         }
     }
     
+    # Snapshot en memoria de parametros_config {clave: valor_json}
+    _snapshot: Optional[Dict[str, Any]] = None
+    _snapshot_cargado: float = 0.0
+    _snapshot_version: int = 0
+    _generacion: int = 0
+    _lock_carga: Optional[asyncio.Lock] = None
+    
+    @staticmethod
+    async def _obtener_snapshot() -> Dict[str, Any]:
+        """
+        Retorna el snapshot vigente; solo consulta la BD si fue invalidado o venció el TTL
+        """
+        snapshot = ConfiguracionService._snapshot
+        if snapshot is not None and time.monotonic() - ConfiguracionService._snapshot_cargado < TTL_SNAPSHOT_SEGUNDOS:
+            return snapshot
+        
+        if ConfiguracionService._lock_carga is None:
+            ConfiguracionService._lock_carga = asyncio.Lock()
+        
+        async with ConfiguracionService._lock_carga:
+            snapshot = ConfiguracionService._snapshot
+            if snapshot is not None and time.monotonic() - ConfiguracionService._snapshot_cargado < TTL_SNAPSHOT_SEGUNDOS:
+                return snapshot
+            
+            generacion = ConfiguracionService._generacion
+            filas = await ParametroConfig.all().values_list('clave', 'valor_json')
+            snapshot = {clave: valor for clave, valor in filas}
+            
+            # Si llegó una invalidación durante la carga, se usa para esta lectura pero no se guarda
+            if generacion == ConfiguracionService._generacion:
+                ConfiguracionService._snapshot = snapshot
+                ConfiguracionService._snapshot_cargado = time.monotonic()
+            
+            logger.debug(f"Snapshot de configuración cargado: {len(snapshot)} parámetros")
+            return snapshot
+    
+    @staticmethod
+    def invalidar_cache() -> None:
+        """Descarta el snapshot local; la siguiente lectura recarga desde la BD"""
+        ConfiguracionService._generacion += 1
+        ConfiguracionService._snapshot = None
+    
+    @staticmethod
+    async def obtener_valor(clave: str, default: Any = None) -> Any:
+        """
+        Obtiene el valor de un parámetro desde el snapshot
+        Reemplazo sin consulta de ParametroConfig.get_valor para rutas calientes
+        
+        Args:
+            clave: Clave del parámetro
+            default: Valor si el parámetro no existe
+            
+        Returns:
+            Any: Copia del valor (el llamador puede modificarla)
+        """
+        snapshot = await ConfiguracionService._obtener_snapshot()
+        if clave not in snapshot:
+            return default
+        return copy.deepcopy(snapshot[clave])
+    
+    @staticmethod
+    def _construir_config(snapshot: Dict[str, Any], categoria: str) -> Any:
+        """Arma una categoría desde el snapshot aplicando los valores por defecto"""
+        default_val = ConfiguracionService.DEFAULT_CONFIG.get(categoria, {})
+        
+        # parametros_generales se guarda como registros individuales
+        if categoria == 'parametros_generales':
+            return {
+                key: copy.deepcopy(snapshot[key]) if key in snapshot else default
+                for key, default in default_val.items()
+            }
+        
+        return copy.deepcopy(snapshot[categoria]) if categoria in snapshot else default_val
+    
     @staticmethod
     async def get_config(categoria: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -84,38 +174,74 @@ class ConfiguracionService:
         Returns:
             Dict: Configuración completa o de categoría específica
         """
+        snapshot = await ConfiguracionService._obtener_snapshot()
         
         if categoria:
-            # Para parametros_generales, construir desde registros individuales
-            if categoria == 'parametros_generales':
-                parametros = {}
-                default_params = ConfiguracionService.DEFAULT_CONFIG.get('parametros_generales', {})
-                for key in default_params.keys():
-                    valor = await ParametroConfig.get_valor(key, default_params.get(key))
-                    parametros[key] = valor
-                return parametros
-            else:
-                # Obtener configuración específica
-                config = await ParametroConfig.get_valor(
-                    categoria, 
-                    ConfiguracionService.DEFAULT_CONFIG.get(categoria, {})
-                )
-                return config
-        else:
-            # Obtener toda la configuración
-            config_completa = {}
-            for cat, default_val in ConfiguracionService.DEFAULT_CONFIG.items():
-                if cat == 'parametros_generales':
-                    # Construir parametros_generales desde registros individuales
-                    parametros = {}
-                    for key in default_val.keys():
-                        valor = await ParametroConfig.get_valor(key, default_val.get(key))
-                        parametros[key] = valor
-                    config_completa[cat] = parametros
-                else:
-                    config_completa[cat] = await ParametroConfig.get_valor(cat, default_val)
-            
-            return config_completa
+            return ConfiguracionService._construir_config(snapshot, categoria)
+        
+        # Obtener toda la configuración
+        return {
+            cat: ConfiguracionService._construir_config(snapshot, cat)
+            for cat in ConfiguracionService.DEFAULT_CONFIG
+        }
+    
+    @staticmethod
+    async def _registrar_cambio(valores: Dict[str, Any]) -> None:
+        """
+        Write-through: aplica los valores escritos al snapshot local y publica
+        la invalidación para las demás réplicas
+        
+        Args:
+            valores: {clave: valor_json} recién guardados en parametros_config
+        """
+        ConfiguracionService._generacion += 1
+        snapshot = ConfiguracionService._snapshot
+        if snapshot is not None:
+            nuevo = dict(snapshot)
+            nuevo.update(copy.deepcopy(valores))
+            ConfiguracionService._snapshot = nuevo
+        
+        await ConfiguracionService._publicar_invalidacion(valores.keys())
+    
+    @staticmethod
+    async def _publicar_invalidacion(claves: Iterable[str]) -> None:
+        """Publica en Redis la nueva versión de configuración (best effort)"""
+        redis_client = sincronizacion_cache.redis
+        if redis_client is None:
+            return
+        
+        try:
+            version = await redis_client.incr(CLAVE_VERSION_CONFIG)
+        except Exception as e:
+            logger.warning(f"No se pudo publicar invalidación de configuración (TTL {TTL_SNAPSHOT_SEGUNDOS}s): {e}")
+            return
+        
+        ConfiguracionService._snapshot_version = version
+        await sincronizacion_cache.publicar(CANAL_INVALIDACION_CONFIG, {
+            'version': version,
+            'claves': list(claves)
+        })
+    
+    @staticmethod
+    def _aplicar_invalidacion(datos: Dict[str, Any]) -> None:
+        """Descarta el snapshot local cuando otra réplica modifica la configuración"""
+        if datos.get('version', 0) > ConfiguracionService._snapshot_version:
+            ConfiguracionService._snapshot_version = datos['version']
+        ConfiguracionService.invalidar_cache()
+        logger.info(f"🔄 Configuración invalidada por otra réplica (versión {datos.get('version')}): {datos.get('claves')}")
+    
+    @staticmethod
+    def get_estado_cache() -> Dict[str, Any]:
+        """Estado del snapshot de configuración"""
+        snapshot = ConfiguracionService._snapshot
+        return {
+            'cargado': snapshot is not None,
+            'parametros': len(snapshot) if snapshot is not None else 0,
+            'version': ConfiguracionService._snapshot_version,
+            'edad_segundos': round(time.monotonic() - ConfiguracionService._snapshot_cargado, 1) if snapshot is not None else None,
+            'ttl_segundos': TTL_SNAPSHOT_SEGUNDOS,
+            'sincronizacion_redis': sincronizacion_cache.activa
+        }
     
     @staticmethod
     async def update_config(
@@ -180,6 +306,7 @@ class ConfiguracionService:
                             modificado_por=usuario,
                             using_db=conn
                         )
+            await ConfiguracionService._registrar_cambio(nuevos_valores)
             logger.info(f"Parámetros generales actualizados por {usuario.nombre_completo if usuario else 'Sistema'}")
             return nuevos_valores
         
@@ -191,8 +318,8 @@ class ConfiguracionService:
             f"Configuración de {categoria} actualizada"
         )
         
-        # TODO: Invalidar cache en Redis
-        # await redis_client.delete(f"config:{categoria}")
+        # Actualizar snapshot local e invalidar el de las demás réplicas
+        await ConfiguracionService._registrar_cambio({categoria: nuevos_valores})
         
         logger.info(f"Configuración '{categoria}' actualizada por {usuario.nombre_completo if usuario else 'Sistema'}")
         
@@ -408,6 +535,7 @@ class ConfiguracionService:
                 usuario,
                 f"Reset a valores por defecto: {categoria}"
             )
+            await ConfiguracionService._registrar_cambio({categoria: default_value})
             
             logger.info(f"Configuración '{categoria}' reseteada a valores por defecto")
             return {categoria: default_value}
@@ -424,6 +552,7 @@ class ConfiguracionService:
                 )
                 result[cat] = default_val
             
+            await ConfiguracionService._registrar_cambio(result)
             logger.info("Configuración completa reseteada a valores por defecto")
             return result
     
@@ -465,7 +594,8 @@ class ConfiguracionService:
                 'pesos_suman_1': True,
                 'umbrales_decrecientes': True,
                 'rangos_validos': True
-            }
+            },
+            'cache': ConfiguracionService.get_estado_cache()
         }
     
 
@@ -537,3 +667,6 @@ class ConfiguracionService:
         logger.info(f"Metadatos de '{categoria}' actualizados por {usuario.nombre_completo if usuario else 'Sistema'}")
         
         return nuevos_metadatos
+
+
+sincronizacion_cache.registrar(CANAL_INVALIDACION_CONFIG, ConfiguracionService._aplicar_invalidacion)
@@ -0,0 +1,321 @@
+"""
+Coordinación del scheduler entre réplicas de core-api
+Elige un líder con un lock en Redis (SET NX PX renovado por el dueño): solo el
+líder dispara los jobs programados, y si muere otra réplica toma el lock cuando
+vence su TTL. Cada ejecución toma además un lease por job, de modo que un líder
+que aún no notó que perdió el lock no repite un job en curso.
+
+Cuando el backlog de un job es grande, el líder lo reparte en shards por
+solicitud_id que se encolan en Redis. Cualquier réplica toma un shard con BLMOVE
+hacia su lista "en curso" y lo quita al terminar; si la réplica muere, el líder
+devuelve a la cola (LMOVE) los shards en curso de las réplicas sin heartbeat.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from tortoise.expressions import RawSQL
+
+from utils.datetime_utils import now_utc
+
+logger = logging.getLogger(__name__)
+
+CLAVE_LIDER = "scheduler:lider"
+CLAVE_REPLICAS = "scheduler:replicas"
+CLAVE_SHARDS = "scheduler:shards"
+PREFIJO_SHARDS_EN_CURSO = "scheduler:shards:en_curso:"
+CLAVE_CONSUMIDORES_SHARDS = "scheduler:shards:consumidores"
+PREFIJO_LEASE = "scheduler:lease:"
+
+# El líder renueva cada INTERVALO_RENOVACION; si muere, el lock vence en TTL_LIDER
+TTL_LIDER_SEGUNDOS = int(os.getenv("SCHEDULER_TTL_LIDER_SEGUNDOS", "10"))
+INTERVALO_RENOVACION_SEGUNDOS = max(1, TTL_LIDER_SEGUNDOS // 3)
+
+# Espera máxima del worker de shards entre chequeos de cancelación
+ESPERA_SHARDS_SEGUNDOS = 1
+
+# Solo el dueño puede renovar o liberar un lock
+_SCRIPT_RENOVAR = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_SCRIPT_LIBERAR = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def expresion_shard(total: int, columna: str = '"solicitudes"."id"') -> RawSQL:
+    """
+    Shard de cada solicitud calculado en Postgres: reparto estable (igual en todas
+    las réplicas) que se filtra en la query, sin traer los ids al proceso
+    """
+    return RawSQL(f"(hashtext({columna}::text) & 2147483647) % {int(total)}")
+
+
+class CoordinacionSchedulerService:
+    """
+    Elección de líder, leases por job y cola de shards (una instancia por proceso)
+    """
+
+    def __init__(self):
+        self._redis = None
+        self.replica_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._es_lider = False
+        self._tarea_eleccion: Optional[asyncio.Task] = None
+        self._tarea_shards: Optional[asyncio.Task] = None
+        self._al_ganar: Optional[Callable[[], Awaitable[Any]]] = None
+        self._al_perder: Optional[Callable[[], Awaitable[Any]]] = None
+        self._lider_desde: Optional[str] = None
+        self._cambios_liderazgo = 0
+        self._jobs_omitidos = 0
+        self._shards_procesados = 0
+        self._shards_recuperados = 0
+        self._errores_redis = 0
+
+    # ------------------------------------------------------------------
+    # Configuración
+    # ------------------------------------------------------------------
+
+    def configurar(self, redis_client) -> None:
+        """Asigna el cliente Redis (decode_responses=True) compartido por las réplicas"""
+        self._redis = redis_client
+
+    @property
+    def configurado(self) -> bool:
+        return self._redis is not None
+
+    @property
+    def es_lider(self) -> bool:
+        return self._es_lider
+
+    # ------------------------------------------------------------------
+    # Elección de líder
+    # ------------------------------------------------------------------
+
+    async def _intentar_liderazgo(self) -> bool:
+        """Renueva el lock si ya es líder, si no intenta tomarlo"""
+        ttl_ms = TTL_LIDER_SEGUNDOS * 1000
+        if self._es_lider:
+            return bool(await self._redis.eval(_SCRIPT_RENOVAR, 1, CLAVE_LIDER, self.replica_id, ttl_ms))
+        return bool(await self._redis.set(CLAVE_LIDER, self.replica_id, nx=True, px=ttl_ms))
+
+    async def _registrar_replica(self) -> None:
+        """Heartbeat de la réplica (para decidir cuántos shards repartir y recuperar los de réplicas caídas)"""
+        ahora = time.time()
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zadd(CLAVE_REPLICAS, {self.replica_id: ahora})
+        pipe.sadd(CLAVE_CONSUMIDORES_SHARDS, self.replica_id)
+        pipe.zremrangebyscore(CLAVE_REPLICAS, '-inf', ahora - TTL_LIDER_SEGUNDOS)
+        await pipe.execute()
+
+    async def _cambiar_liderazgo(self, es_lider: bool) -> None:
+        self._es_lider = es_lider
+        self._cambios_liderazgo += 1
+        self._lider_desde = now_utc().isoformat() if es_lider else None
+        callback = self._al_ganar if es_lider else self._al_perder
+        logger.info(f"👑 Réplica {self.replica_id} {'es ahora' if es_lider else 'dejó de ser'} líder del scheduler")
+        if callback:
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"Error aplicando cambio de liderazgo: {e}")
+
+    async def _bucle_eleccion(self) -> None:
+        while True:
+            try:
+                await self._registrar_replica()
+                lider = await self._intentar_liderazgo()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Sin Redis no se puede garantizar exclusividad: se cede el liderazgo
+                self._errores_redis += 1
+                logger.error(f"Error en elección de líder del scheduler: {e}")
+                lider = False
+
+            if lider != self._es_lider:
+                await self._cambiar_liderazgo(lider)
+
+            if self._es_lider:
+                try:
+                    await self.recuperar_shards()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._errores_redis += 1
+                    logger.error(f"Error recuperando shards huérfanos: {e}")
+
+            await asyncio.sleep(INTERVALO_RENOVACION_SEGUNDOS)
+
+    # ------------------------------------------------------------------
+    # Leases por job
+    # ------------------------------------------------------------------
+
+    async def ejecutar_con_lease(
+        self,
+        clave: str,
+        ttl_segundos: int,
+        ejecutar: Callable[[], Awaitable[Any]]
+    ) -> Optional[Any]:
+        """
+        Ejecuta si esta réplica toma el lease de la clave
+
+        Returns:
+            Resultado de ejecutar, None si otra réplica tiene el lease
+        """
+        lease = f"{PREFIJO_LEASE}{clave}"
+        token = uuid.uuid4().hex
+        if not await self._redis.set(lease, token, nx=True, ex=ttl_segundos):
+            self._jobs_omitidos += 1
+            logger.debug(f"Lease {clave} tomado por otra réplica, se omite")
+            return None
+        try:
+            return await ejecutar()
+        finally:
+            try:
+                await self._redis.eval(_SCRIPT_LIBERAR, 1, lease, token)
+            except Exception as e:
+                self._errores_redis += 1
+                logger.warning(f"Error liberando lease {clave} (vencerá en {ttl_segundos}s): {e}")
+
+    # ------------------------------------------------------------------
+    # Shards
+    # ------------------------------------------------------------------
+
+    async def replicas_activas(self) -> List[str]:
+        return await self._redis.zrangebyscore(CLAVE_REPLICAS, time.time() - TTL_LIDER_SEGUNDOS, '+inf')
+
+    async def repartir(self, job_id: str, total: int, vigencia_segundos: int) -> None:
+        """Encola los shards del job; los que no se tomen antes de vigencia_segundos se descartan"""
+        expira = time.time() + vigencia_segundos
+        await self._redis.rpush(CLAVE_SHARDS, *[
+            json.dumps({'job_id': job_id, 'indice': indice, 'total': total, 'expira': expira})
+            for indice in range(total)
+        ])
+        logger.info(f"🧩 Job {job_id} repartido en {total} shards")
+
+    @property
+    def _clave_en_curso(self) -> str:
+        return f"{PREFIJO_SHARDS_EN_CURSO}{self.replica_id}"
+
+    async def recuperar_shards(self) -> int:
+        """
+        Devuelve a la cola los shards en curso de réplicas sin heartbeat (murieron a mitad de shard)
+        Cada LMOVE es atómico: el shard está siempre en la cola o en una lista en curso
+        """
+        # Consumidores antes que heartbeats: una réplica que se registra entre ambas lecturas ya cuenta como activa
+        consumidores = await self._redis.smembers(CLAVE_CONSUMIDORES_SHARDS)
+        activas = set(await self.replicas_activas())
+        recuperados = 0
+        for replica_id in consumidores:
+            if replica_id in activas:
+                continue
+            clave = f"{PREFIJO_SHARDS_EN_CURSO}{replica_id}"
+            # Al frente de la cola: son los shards más antiguos
+            while await self._redis.lmove(clave, CLAVE_SHARDS, 'RIGHT', 'LEFT'):
+                recuperados += 1
+            await self._redis.srem(CLAVE_CONSUMIDORES_SHARDS, replica_id)
+
+        if recuperados:
+            self._shards_recuperados += recuperados
+            logger.warning(f"🧩 {recuperados} shards de réplicas caídas devueltos a la cola")
+        return recuperados
+
+    async def _bucle_shards(self, procesar: Callable[[str, int, int], Awaitable[Any]]) -> None:
+        while True:
+            try:
+                item = await self._redis.blmove(
+                    CLAVE_SHARDS, self._clave_en_curso, ESPERA_SHARDS_SEGUNDOS, 'LEFT', 'RIGHT'
+                )
+                if not item:
+                    continue
+                try:
+                    shard = json.loads(item)
+                    if shard['expira'] < time.time():
+                        logger.warning(f"Shard {shard['indice']}/{shard['total']} de {shard['job_id']} vencido, se descarta")
+                    else:
+                        await procesar(shard['job_id'], shard['indice'], shard['total'])
+                        self._shards_procesados += 1
+                except Exception as e:
+                    logger.error(f"Error procesando shard del scheduler: {e}")
+                # Un apagado a mitad de shard (CancelledError) no llega aquí: el shard
+                # queda en curso y el líder lo devuelve a la cola
+                await self._redis.lrem(self._clave_en_curso, 1, item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._errores_redis += 1
+                logger.error(f"Error en la cola de shards del scheduler: {e}")
+                await asyncio.sleep(ESPERA_SHARDS_SEGUNDOS)
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def iniciar(
+        self,
+        al_ganar: Callable[[], Awaitable[Any]],
+        al_perder: Callable[[], Awaitable[Any]],
+        procesar_shard: Callable[[str, int, int], Awaitable[Any]]
+    ) -> None:
+        """Arranca la elección de líder y el worker de shards en el event loop actual"""
+        if self._tarea_eleccion and not self._tarea_eleccion.done():
+            return
+        self._al_ganar, self._al_perder = al_ganar, al_perder
+        self._tarea_eleccion = asyncio.create_task(self._bucle_eleccion())
+        self._tarea_shards = asyncio.create_task(self._bucle_shards(procesar_shard))
+        logger.info(f"👑 Coordinación del scheduler iniciada (réplica {self.replica_id}, TTL líder {TTL_LIDER_SEGUNDOS}s)")
+
+    async def detener(self) -> None:
+        """Detiene los bucles y libera el liderazgo para que otra réplica lo tome de inmediato"""
+        for tarea in (self._tarea_eleccion, self._tarea_shards):
+            if tarea:
+                tarea.cancel()
+                try:
+                    await tarea
+                except asyncio.CancelledError:
+                    pass
+        self._tarea_eleccion = self._tarea_shards = None
+
+        if not self.configurado:
+            return
+        try:
+            if self._es_lider:
+                await self._redis.eval(_SCRIPT_LIBERAR, 1, CLAVE_LIDER, self.replica_id)
+            await self._redis.zrem(CLAVE_REPLICAS, self.replica_id)
+        except Exception as e:
+            logger.warning(f"Error liberando liderazgo del scheduler: {e}")
+        if self._es_lider:
+            await self._cambiar_liderazgo(False)
+
+    def get_estado(self) -> Dict[str, Any]:
+        """
+        Estado de la coordinación para el estado del scheduler
+        """
+        return {
+            'activa': self._tarea_eleccion is not None and not self._tarea_eleccion.done(),
+            'replica_id': self.replica_id,
+            'es_lider': self._es_lider,
+            'lider_desde': self._lider_desde,
+            'ttl_lider_segundos': TTL_LIDER_SEGUNDOS,
+            'cambios_liderazgo': self._cambios_liderazgo,
+            'jobs_omitidos_por_lease': self._jobs_omitidos,
+            'shards_procesados': self._shards_procesados,
+            'shards_recuperados': self._shards_recuperados,
+            'errores_redis': self._errores_redis
+        }
+
+
+# Instancia global del servicio
+coordinacion_scheduler_service = CoordinacionSchedulerService()
@@ -0,0 +1,232 @@
+"""
+Servicio del Dashboard de Asesores para TeLOO V3
+Calcula las métricas del mes del asesor (GET /v1/solicitudes/metrics) con una
+sola consulta agregada y las cachea por asesor en el proceso.
+
+Cada asesor conectado consulta el endpoint periódicamente: la cache evita
+repetir la consulta en cada sondeo. Los eventos de ofertas, adjudicaciones,
+aceptaciones y escalamiento (EventsService) invalidan la entrada del asesor y
+publican la invalidación en Redis para que las demás réplicas descarten la suya.
+"""
+
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Tuple
+
+from tortoise import connections
+from tortoise.timezone import is_naive, make_aware
+
+from utils.datetime_utils import now_utc
+from utils.sincronizacion_cache import sincronizacion_cache
+
+logger = logging.getLogger(__name__)
+
+# Cache de métricas del mes: {asesor_id: (expira_en, inicio_mes, métricas)}
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_ASESOR_CACHE_TTL_SECONDS", "60"))
+CANAL_INVALIDACION_DASHBOARD = "dashboard:asesores:invalidacion"
+
+# Las cinco métricas del dashboard en un solo viaje a la base:
+# $1 = asesor_id, $2 = inicio del mes
+SQL_METRICAS_MES = """
+    WITH asignadas AS (
+        SELECT s.id, s.estado, s.nivel_actual, e.nivel_entrega
+        FROM solicitudes s
+        JOIN evaluaciones_asesores_temp e ON e.solicitud_id = s.id
+        WHERE e.asesor_id = $1
+          AND s.created_at >= $2
+    ),
+    ofertas_mes AS (
+        SELECT o.id, o.estado, o.monto_total
+        FROM ofertas o
+        WHERE o.asesor_id = $1
+          AND o.created_at >= $2
+    )
+    SELECT
+        (SELECT COALESCE(SUM(rs.cantidad), 0)
+         FROM asignadas a
+         JOIN repuestos_solicitados rs ON rs.solicitud_id = a.id) AS repuestos_asignados,
+        (SELECT COALESCE(SUM(adj.precio_adjudicado * adj.cantidad_adjudicada), 0)
+         FROM adjudicaciones_repuesto adj
+         JOIN ofertas o ON o.id = adj.oferta_id
+         WHERE o.asesor_id = $1
+           AND o.estado = 'ACEPTADA'
+           AND adj.created_at >= $2) AS monto_total_ganado,
+        (SELECT COUNT(DISTINCT a.id)
+         FROM asignadas a
+         WHERE a.estado = 'ABIERTA'
+           AND a.nivel_actual >= a.nivel_entrega
+           AND NOT EXISTS (
+             SELECT 1 FROM ofertas o
+             WHERE o.solicitud_id = a.id
+             AND o.asesor_id = $1
+           )) AS pendientes_por_oferta,
+        (SELECT COALESCE(SUM(om.monto_total), 0) FROM ofertas_mes om) AS monto_ofertado,
+        (SELECT COALESCE(SUM(om.monto_total) FILTER (WHERE om.estado = 'ACEPTADA'), 0)
+         FROM ofertas_mes om) AS monto_aceptado,
+        (SELECT COALESCE(SUM(od.cantidad), 0)
+         FROM ofertas_mes om
+         JOIN ofertas_detalle od ON od.oferta_id = om.id) AS repuestos_ofertados
+"""
+
+# Métricas de un asesor en un rango de fechas (GET /v1/asesores/{id}/metrics):
+# $1 = asesor_id, $2 = fecha inicio, $3 = fecha fin
+SQL_METRICAS_PERIODO = """
+    SELECT
+        COUNT(*) AS total_ofertas,
+        COUNT(*) FILTER (WHERE o.estado = 'GANADORA') AS ofertas_ganadoras,
+        COALESCE(SUM(o.monto_total), 0) AS monto_total,
+        AVG(EXTRACT(EPOCH FROM (o.created_at - s.created_at)) / 3600) AS tiempo_respuesta_promedio_horas
+    FROM ofertas o
+    JOIN solicitudes s ON s.id = o.solicitud_id
+    WHERE o.asesor_id = $1
+      AND o.created_at >= $2
+      AND o.created_at <= $3
+"""
+
+METRICAS_VACIAS = {
+    "repuestos_adjudicados": 0,
+    "monto_total_ganado": 0.0,
+    "pendientes_por_oferta": 0,
+    "tasa_conversion": 0.0,
+    "tasa_oferta": 0.0
+}
+
+
+def _inicio_mes(fecha: datetime) -> datetime:
+    return datetime(fecha.year, fecha.month, 1, tzinfo=fecha.tzinfo)
+
+
+def _porcentaje(parte: float, total: float) -> float:
+    return round(parte / total * 100, 2) if total > 0 else 0.0
+
+
+class DashboardAsesorService:
+    """
+    Servicio de métricas del dashboard del asesor con cache por asesor
+    """
+
+    _cache: Dict[str, Tuple[float, datetime, Dict[str, Any]]] = {}
+    _cache_hits = 0
+    _cache_misses = 0
+
+    @staticmethod
+    async def calcular_metricas_mes(asesor_id: Any, inicio_mes: datetime) -> Dict[str, Any]:
+        """
+        Calcula las métricas del mes del asesor con una sola consulta
+
+        Returns:
+            Dict: repuestos_adjudicados, monto_total_ganado, pendientes_por_oferta,
+                  tasa_conversion, tasa_oferta
+        """
+        conn = connections.get("default")
+        filas = await conn.execute_query_dict(SQL_METRICAS_MES, [str(asesor_id), inicio_mes])
+        if not filas:
+            return dict(METRICAS_VACIAS)
+
+        fila = filas[0]
+        repuestos_asignados = int(fila["repuestos_asignados"] or 0)
+
+        return {
+            "repuestos_adjudicados": repuestos_asignados,
+            "monto_total_ganado": round(float(fila["monto_total_ganado"] or 0), 2),
+            "pendientes_por_oferta": int(fila["pendientes_por_oferta"] or 0),
+            "tasa_conversion": _porcentaje(float(fila["monto_aceptado"] or 0), float(fila["monto_ofertado"] or 0)),
+            "tasa_oferta": _porcentaje(int(fila["repuestos_ofertados"] or 0), repuestos_asignados)
+        }
+
+    @staticmethod
+    async def get_metricas_mes(asesor_id: Any) -> Dict[str, Any]:
+        """
+        Métricas del mes actual del asesor, desde la cache si siguen vigentes
+
+        Args:
+            asesor_id: ID del asesor
+
+        Returns:
+            Dict: Métricas del dashboard (ver calcular_metricas_mes)
+        """
+        clave = str(asesor_id)
+        inicio_mes = _inicio_mes(now_utc())
+
+        entrada = DashboardAsesorService._cache.get(clave)
+        if entrada and entrada[0] > time.monotonic() and entrada[1] == inicio_mes:
+            DashboardAsesorService._cache_hits += 1
+            return dict(entrada[2])
+
+        DashboardAsesorService._cache_misses += 1
+        metricas = await DashboardAsesorService.calcular_metricas_mes(clave, inicio_mes)
+        DashboardAsesorService._cache[clave] = (
+            time.monotonic() + DASHBOARD_CACHE_TTL_SECONDS, inicio_mes, metricas
+        )
+        return dict(metricas)
+
+    @staticmethod
+    async def get_metricas_periodo(asesor_id: Any, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, Any]:
+        """
+        Ofertas, ganadoras, monto y tiempo de respuesta del asesor en el rango
+
+        Returns:
+            Dict: total_ofertas, ofertas_ganadoras, monto_total, tasa_adjudicacion,
+                  tiempo_respuesta_promedio_horas
+        """
+        # Fechas sin zona se interpretan en la zona de la app, como en los filtros del ORM
+        fecha_inicio, fecha_fin = (make_aware(f) if is_naive(f) else f for f in (fecha_inicio, fecha_fin))
+
+        conn = connections.get("default")
+        filas = await conn.execute_query_dict(SQL_METRICAS_PERIODO, [str(asesor_id), fecha_inicio, fecha_fin])
+        fila = filas[0] if filas else {}
+
+        total_ofertas = int(fila.get("total_ofertas") or 0)
+        ofertas_ganadoras = int(fila.get("ofertas_ganadoras") or 0)
+
+        return {
+            "total_ofertas": total_ofertas,
+            "ofertas_ganadoras": ofertas_ganadoras,
+            "monto_total": float(fila.get("monto_total") or 0),
+            "tasa_adjudicacion": _porcentaje(ofertas_ganadoras, total_ofertas),
+            "tiempo_respuesta_promedio_horas": round(float(fila.get("tiempo_respuesta_promedio_horas") or 0), 2)
+        }
+
+    # ------------------------------------------------------------------
+    # Invalidación
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _descartar(asesor_ids: Iterable[Any]) -> None:
+        for asesor_id in asesor_ids:
+            DashboardAsesorService._cache.pop(str(asesor_id), None)
+
+    @staticmethod
+    async def invalidar(asesor_ids: Iterable[Any]) -> None:
+        """
+        Descarta las métricas cacheadas de los asesores en esta y las demás réplicas
+
+        Si Redis no está disponible las otras réplicas las recalculan al vencer el TTL.
+        """
+        ids = list(dict.fromkeys(str(asesor_id) for asesor_id in asesor_ids if asesor_id))
+        if not ids:
+            return
+
+        DashboardAsesorService._descartar(ids)
+        await sincronizacion_cache.publicar(CANAL_INVALIDACION_DASHBOARD, {'asesor_ids': ids})
+
+    @staticmethod
+    def _aplicar_invalidacion(datos: Dict[str, Any]) -> None:
+        """Descarta de la cache local los asesores invalidados por otras réplicas"""
+        DashboardAsesorService._descartar(datos.get('asesor_ids') or [])
+
+    @staticmethod
+    def get_estado_cache() -> Dict[str, Any]:
+        """Estadísticas de la cache del dashboard"""
+        return {
+            'asesores': len(DashboardAsesorService._cache),
+            'hits': DashboardAsesorService._cache_hits,
+            'misses': DashboardAsesorService._cache_misses,
+            'ttl_segundos': DASHBOARD_CACHE_TTL_SECONDS,
+            'sincronizacion_redis': sincronizacion_cache.activa
+        }
+
+
+sincronizacion_cache.registrar(CANAL_INVALIDACION_DASHBOARD, DashboardAsesorService._aplicar_invalidacion)
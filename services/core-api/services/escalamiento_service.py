@@ -6,6 +6,7 @@ Handles advisor escalation algorithm with geographic proximity, activity, perfor
 from typing import List, Dict, Tuple, Optional
 from decimal import Decimal
 from datetime import datetime, timedelta
+import json
 import logging
 from models.geografia import Municipio, EvaluacionAsesorTemp
 from models.user import Asesor
@@ -17,10 +18,23 @@ from models.analytics import (
     ParametroConfig
 )
 from models.enums import CanalNotificacion, EstadoAsesor, EstadoUsuario
+from services.configuracion_service import ConfiguracionService
+from services.dashboard_asesor_service import DashboardAsesorService
 from services.events_service import events_service
+from services.indice_geografico_service import indice_geografico_service
+from services.temporizador_escalamiento_service import temporizador_escalamiento_service
+from services.metricas_asesor_service import (
+    MetricasAsesorService,
+    PERIODO_ACTIVIDAD_DIAS,
+    PERIODO_DESEMPENO_MESES
+)
+from utils.datetime_utils import now_utc, add_days
 
 logger = logging.getLogger(__name__)
 
+# Filas por INSERT al persistir evaluaciones e historial de una solicitud
+TAMANO_LOTE_ESCALAMIENTO = 1000
+
 
 class EscalamientoService:
     """
@@ -87,7 +101,6 @@ class EscalamientoService:
             Decimal: Puntaje de actividad en escala 1-5
         """
         
-        from utils.datetime_utils import now_utc, add_days
         fecha_inicio = add_days(now_utc(), -periodo_dias)
         
         # Obtener historial de respuestas en el período
@@ -105,6 +118,14 @@ class EscalamientoService:
         total_enviadas = len(historial)
         total_respondidas = sum(1 for h in historial if h.respondio)
         
+        return EscalamientoService._normalizar_actividad(total_enviadas, total_respondidas)
+    
+    @staticmethod
+    def _normalizar_actividad(total_enviadas: int, total_respondidas: int) -> Decimal:
+        """
+        Convierte conteos de envíos/respuestas en actividad escala 1-5
+        Tasa de respuesta lineal: 0% -> 1.0, 100% -> 5.0; sin envíos -> 1.0
+        """
         if total_enviadas == 0:
             return Decimal('1.0')
         
@@ -149,22 +170,44 @@ class EscalamientoService:
             fallbacks = await EscalamientoService.aplicar_fallbacks_metricas(asesor_id)
             return fallbacks['desempeno_historico']
         
-        total_ofertas = len(ofertas_hist)
         ofertas_adjudicadas = [o for o in ofertas_hist if o.adjudicada]
         ofertas_aceptadas = [o for o in ofertas_adjudicadas if o.aceptada_cliente]
         ofertas_exitosas = [o for o in ofertas_aceptadas if o.entrega_exitosa]
+        tiempos_respuesta = [o.tiempo_respuesta_seg for o in ofertas_hist if o.tiempo_respuesta_seg]
         
+        return EscalamientoService._normalizar_desempeno(
+            total_ofertas=len(ofertas_hist),
+            total_adjudicadas=len(ofertas_adjudicadas),
+            total_aceptadas=len(ofertas_aceptadas),
+            total_exitosas=len(ofertas_exitosas),
+            suma_tiempos_seg=sum(tiempos_respuesta),
+            total_con_tiempo=len(tiempos_respuesta)
+        )
+    
+    @staticmethod
+    def _normalizar_desempeno(
+        total_ofertas: int,
+        total_adjudicadas: int,
+        total_aceptadas: int,
+        total_exitosas: int,
+        suma_tiempos_seg: int,
+        total_con_tiempo: int
+    ) -> Decimal:
+        """
+        Convierte conteos de ofertas históricas en desempeño escala 1-5
+        Pondera adjudicación (50%), cumplimiento de entregas aceptadas (30%) y
+        tiempo promedio de respuesta (20%, 0 a las 24 h)
+        """
         # 1. Tasa de adjudicación (50%)
-        tasa_adjudicacion = len(ofertas_adjudicadas) / total_ofertas if total_ofertas > 0 else 0
+        tasa_adjudicacion = total_adjudicadas / total_ofertas if total_ofertas > 0 else 0
         
         # 2. Tasa de cumplimiento (30%)
-        tasa_cumplimiento = len(ofertas_exitosas) / len(ofertas_aceptadas) if ofertas_aceptadas else 0
+        tasa_cumplimiento = total_exitosas / total_aceptadas if total_aceptadas else 0
         
         # 3. Eficiencia de respuesta (20%)
         # Normalizar tiempo de respuesta (menor tiempo = mejor puntaje)
-        tiempos_respuesta = [o.tiempo_respuesta_seg for o in ofertas_hist if o.tiempo_respuesta_seg]
-        if tiempos_respuesta:
-            tiempo_promedio_seg = sum(tiempos_respuesta) / len(tiempos_respuesta)
+        if total_con_tiempo:
+            tiempo_promedio_seg = suma_tiempos_seg / total_con_tiempo
             # Normalizar: 1 hora = 100%, 24 horas = 0%
             eficiencia_respuesta = max(0, 1 - (tiempo_promedio_seg / (24 * 3600)))
         else:
@@ -202,17 +245,25 @@ class EscalamientoService:
         # Leer directamente el campo confianza de la tabla asesores
         asesor = await Asesor.get_or_none(id=asesor_id)
         
-        if asesor and asesor.confianza:
-            return Decimal(str(asesor.confianza))
+        return EscalamientoService._normalizar_confianza(asesor.confianza if asesor else None)
+    
+    @staticmethod
+    def _normalizar_confianza(confianza: Optional[Decimal]) -> Decimal:
+        """
+        Convierte el campo confianza del asesor en Decimal escala 1-5
+        Fallback: Si no existe el asesor o no tiene confianza = 3.0
+        """
+        if confianza:
+            return Decimal(str(confianza))
         
-        # Fallback: Si no existe el asesor o no tiene confianza = 3.0
         return Decimal('3.0')
     
     @staticmethod
     async def determinar_asesores_elegibles(solicitud: Solicitud) -> List[Asesor]:
         """
         Determina asesores elegibles basado en 3 características geográficas
-        USANDO FK municipio_id - Fuente única de verdad
+        USANDO FK municipio_id - Fuente única de verdad, resuelto sobre el
+        índice geográfico en memoria (sin consultas por solicitud)
         
         Características:
         1. Asesores de misma ciudad
@@ -229,73 +280,35 @@ class EscalamientoService:
         ciudad_solicitud = solicitud.ciudad_origen
         departamento_solicitud = solicitud.departamento_origen
         
-        # Normalizar ciudad y departamento de la solicitud
-        ciudad_norm = Municipio.normalizar_ciudad(ciudad_solicitud)
-        departamento_norm = Municipio.normalizar_ciudad(departamento_solicitud)
-        
-        # Obtener municipio de la solicitud usando ciudad Y departamento
-        municipio_solicitud = await Municipio.get_or_none(
-            municipio_norm=ciudad_norm,
-            departamento=departamento_norm
+        # Obtener municipio de la solicitud usando ciudad Y departamento (índice en memoria)
+        municipio_solicitud = await indice_geografico_service.buscar_municipio(
+            ciudad_solicitud,
+            departamento_solicitud
         )
         
         if not municipio_solicitud:
             logger.warning(f"Ciudad {ciudad_solicitud}, {departamento_solicitud} no encontrada en base de datos de municipios")
-            # Fallback: buscar todos los asesores activos
-            asesores_fallback = await Asesor.filter(
-                estado=EstadoAsesor.ACTIVO,
-                usuario__estado=EstadoUsuario.ACTIVO
-            ).prefetch_related('usuario', 'municipio').all()
+            # Fallback: todos los asesores activos
+            asesores_fallback = await indice_geografico_service.asesores_activos()
             logger.info(f"Fallback: {len(asesores_fallback)} asesores activos")
             return asesores_fallback
         
         logger.info(f"📍 Municipio solicitud: {municipio_solicitud.municipio} ({municipio_solicitud.departamento})")
         logger.info(f"   Hub: {municipio_solicitud.hub_logistico}, Área Metro: {municipio_solicitud.area_metropolitana}")
         
-        asesores_elegibles = set()
-        
-        # Característica 1: Asesores de misma ciudad (JOIN directo por FK)
-        asesores_misma_ciudad = await Asesor.filter(
-            municipio_id=municipio_solicitud.id,
-            estado=EstadoAsesor.ACTIVO,
-            usuario__estado=EstadoUsuario.ACTIVO
-        ).prefetch_related('usuario', 'municipio').all()
+        elegibles = await indice_geografico_service.asesores_elegibles(municipio_solicitud)
         
-        for asesor in asesores_misma_ciudad:
-            asesores_elegibles.add(asesor.id)
-        
-        logger.info(f"✅ Característica 1 - Misma ciudad ({municipio_solicitud.municipio}): {len(asesores_misma_ciudad)} asesores")
+        # Característica 1: Asesores de misma ciudad
+        logger.info(f"✅ Característica 1 - Misma ciudad ({municipio_solicitud.municipio}): {len(elegibles['misma_ciudad'])} asesores")
         
         # Característica 2: Asesores de TODAS las áreas metropolitanas nacionales
         # IMPORTANTE: Esto se aplica SIEMPRE, sin importar si la solicitud viene de área metropolitana o no
-        asesores_areas_metro = await Asesor.filter(
-            municipio__area_metropolitana__isnull=False,
-            municipio__area_metropolitana__not='NO',
-            estado=EstadoAsesor.ACTIVO,
-            usuario__estado=EstadoUsuario.ACTIVO
-        ).prefetch_related('usuario', 'municipio').all()
-        
-        for asesor in asesores_areas_metro:
-            asesores_elegibles.add(asesor.id)
-        
-        logger.info(f"✅ Característica 2 - Áreas metropolitanas nacionales (SIEMPRE): {len(asesores_areas_metro)} asesores, {len(asesores_elegibles)} acumulados")
-        
-        # Característica 3: Asesores del hub logístico de la ciudad (JOIN directo)
-        asesores_hub = await Asesor.filter(
-            municipio__hub_logistico=municipio_solicitud.hub_logistico,
-            estado=EstadoAsesor.ACTIVO,
-            usuario__estado=EstadoUsuario.ACTIVO
-        ).prefetch_related('usuario', 'municipio').all()
-        
-        for asesor in asesores_hub:
-            asesores_elegibles.add(asesor.id)
+        logger.info(f"✅ Característica 2 - Áreas metropolitanas nacionales (SIEMPRE): {len(elegibles['areas_metropolitanas'])} asesores")
         
-        logger.info(f"✅ Característica 3 - Hub logístico ({municipio_solicitud.hub_logistico}): {len(asesores_hub)} asesores, {len(asesores_elegibles)} acumulados")
+        # Característica 3: Asesores del hub logístico de la ciudad
+        logger.info(f"✅ Característica 3 - Hub logístico ({municipio_solicitud.hub_logistico}): {len(elegibles['hub_logistico'])} asesores")
         
-        # Obtener objetos Asesor únicos con todas las relaciones
-        asesores_finales = await Asesor.filter(
-            id__in=list(asesores_elegibles)
-        ).prefetch_related('usuario', 'municipio').all()
+        asesores_finales = elegibles['asesores']
         
         logger.info(f"🎯 Total asesores elegibles (sin duplicados): {len(asesores_finales)}")
         
@@ -340,29 +353,8 @@ class EscalamientoService:
         
         # 1. Calcular proximidad geográfica (crítica - no puede fallar)
         try:
-            # Obtener municipio de la solicitud usando FK directo
-            municipio_solicitud = solicitud.municipio if hasattr(solicitud, 'municipio') and solicitud.municipio else None
-            
-            # Si no está precargado, obtenerlo por ID
-            if not municipio_solicitud and solicitud.municipio_id:
-                municipio_solicitud = await Municipio.get_or_none(id=solicitud.municipio_id)
-            
-            if not municipio_solicitud:
-                logger.warning(f"Municipio solicitud {solicitud.ciudad_origen} no encontrado")
-                variables['proximidad'] = Decimal('3.0')
-                variables['criterio_proximidad'] = "municipio_no_encontrado"
-            elif not asesor.municipio:
-                logger.warning(f"Asesor {asesor.id} sin municipio asignado")
-                variables['proximidad'] = Decimal('3.0')
-                variables['criterio_proximidad'] = "asesor_sin_municipio"
-            else:
-                # Usar objetos Municipio directamente
-                proximidad, criterio_prox = await EscalamientoService.calcular_proximidad(
-                    municipio_solicitud, 
-                    asesor.municipio
-                )
-                variables['proximidad'] = proximidad
-                variables['criterio_proximidad'] = criterio_prox
+            municipio_solicitud = await EscalamientoService._resolver_municipio_solicitud(solicitud)
+            await EscalamientoService._asignar_proximidad(asesor, solicitud, municipio_solicitud, variables)
         except Exception as e:
             logger.error(f"Error calculando proximidad para asesor {asesor.id}: {e}")
             # Fallback crítico - proximidad por defecto
@@ -397,6 +389,63 @@ class EscalamientoService:
             variables['nivel_confianza'] = Decimal('3.0')  # Fallback: confianza media
             errores_calculo.append(f"confianza: {str(e)}")
         
+        puntaje_total = EscalamientoService._ponderar_puntaje(asesor, variables, errores_calculo, pesos)
+        
+        return puntaje_total, variables
+    
+    @staticmethod
+    async def _resolver_municipio_solicitud(solicitud: Solicitud) -> Optional[Municipio]:
+        """
+        Obtiene el municipio de la solicitud usando FK directo (precargado o por ID)
+        """
+        municipio_solicitud = solicitud.municipio if hasattr(solicitud, 'municipio') and solicitud.municipio else None
+        
+        # Si no está precargado, obtenerlo del índice geográfico (o por ID si aún no está indexado)
+        if not municipio_solicitud and solicitud.municipio_id:
+            municipio_solicitud = await indice_geografico_service.obtener_municipio(solicitud.municipio_id)
+            if not municipio_solicitud:
+                municipio_solicitud = await Municipio.get_or_none(id=solicitud.municipio_id)
+        
+        return municipio_solicitud
+    
+    @staticmethod
+    async def _asignar_proximidad(
+        asesor: Asesor,
+        solicitud: Solicitud,
+        municipio_solicitud: Optional[Municipio],
+        variables: Dict
+    ) -> None:
+        """
+        Calcula la proximidad del asesor y la registra en variables
+        """
+        if not municipio_solicitud:
+            logger.warning(f"Municipio solicitud {solicitud.ciudad_origen} no encontrado")
+            variables['proximidad'] = Decimal('3.0')
+            variables['criterio_proximidad'] = "municipio_no_encontrado"
+        elif not asesor.municipio:
+            logger.warning(f"Asesor {asesor.id} sin municipio asignado")
+            variables['proximidad'] = Decimal('3.0')
+            variables['criterio_proximidad'] = "asesor_sin_municipio"
+        else:
+            # Usar objetos Municipio directamente
+            proximidad, criterio_prox = await EscalamientoService.calcular_proximidad(
+                municipio_solicitud, 
+                asesor.municipio
+            )
+            variables['proximidad'] = proximidad
+            variables['criterio_proximidad'] = criterio_prox
+    
+    @staticmethod
+    def _ponderar_puntaje(
+        asesor: Asesor,
+        variables: Dict,
+        errores_calculo: List[str],
+        pesos: Dict[str, float]
+    ) -> Decimal:
+        """
+        Combina las 4 variables en el puntaje total (rango 1.0 - 5.0)
+        Completa con fallback las variables faltantes, aplica los pesos y acota el resultado
+        """
         # Validar que todas las variables estén presentes
         required_vars = ['proximidad', 'actividad_reciente_5', 'desempeno_historico_5', 'nivel_confianza']
         for var in required_vars:
@@ -438,7 +487,220 @@ class EscalamientoService:
             variables['errores_calculo'] = errores_calculo
             logger.warning(f"Asesor {asesor.id} calculado con {len(errores_calculo)} errores: {errores_calculo}")
         
-        return Decimal(str(round(puntaje_total, 2))), variables
+        return Decimal(str(round(puntaje_total, 2)))
+    
+    @staticmethod
+    async def obtener_metricas_lote(
+        asesor_ids: List[str],
+        periodo_actividad_dias: int = PERIODO_ACTIVIDAD_DIAS,
+        periodo_desempeno_meses: int = PERIODO_DESEMPENO_MESES,
+        usar_precalculadas: bool = True
+    ) -> Dict[str, Dict]:
+        """
+        Obtiene actividad reciente y desempeño histórico de un conjunto de asesores
+        
+        Lee primero la tabla metricas_asesores (una fila por asesor, O(1)); solo los
+        asesores sin fila compactada se calculan con consultas agregadas sobre el
+        historial (GROUP BY asesor_id) en lugar de una consulta por asesor
+        
+        Args:
+            asesor_ids: IDs de los asesores candidatos
+            periodo_actividad_dias: Período de actividad (default 30 días)
+            periodo_desempeno_meses: Período de desempeño (default 6 meses)
+            usar_precalculadas: Usar metricas_asesores (solo aplica con los períodos por defecto)
+            
+        Returns:
+            Dict: {asesor_id: {'actividad_reciente_5', 'desempeno_historico_5', 'errores_calculo'}}
+        """
+        ids = [str(asesor_id) for asesor_id in asesor_ids]
+        metricas = {asesor_id: {'errores_calculo': []} for asesor_id in ids}
+        fallbacks = None
+        
+        conteos_actividad = {}
+        conteos_desempeno = {}
+        pendientes = ids
+        
+        # 0. Métricas precalculadas (ventana móvil mantenida por eventos)
+        if (usar_precalculadas and
+                periodo_actividad_dias == PERIODO_ACTIVIDAD_DIAS and
+                periodo_desempeno_meses == PERIODO_DESEMPENO_MESES):
+            try:
+                precalculadas = await MetricasAsesorService.obtener_metricas(ids)
+                for asesor_id, fila in precalculadas.items():
+                    conteos_actividad[asesor_id] = {
+                        'total_enviadas': fila.respuestas_enviadas,
+                        'total_respondidas': fila.respuestas_respondidas
+                    }
+                    conteos_desempeno[asesor_id] = {
+                        'total_ofertas': fila.ofertas_total,
+                        'total_adjudicadas': fila.ofertas_adjudicadas,
+                        'total_aceptadas': fila.ofertas_aceptadas,
+                        'total_exitosas': fila.ofertas_exitosas,
+                        'suma_tiempos_seg': fila.suma_tiempo_respuesta_seg,
+                        'total_con_tiempo': fila.ofertas_con_tiempo
+                    }
+                pendientes = [asesor_id for asesor_id in ids if asesor_id not in precalculadas]
+            except Exception as e:
+                logger.warning(f"Error leyendo métricas precalculadas, consultando historial: {e}")
+        
+        # 1. Actividad reciente: enviadas/respondidas por asesor
+        try:
+            if pendientes:
+                conteos_actividad.update(
+                    await MetricasAsesorService.agregar_actividad(pendientes, periodo_actividad_dias)
+                )
+            
+            for asesor_id in ids:
+                fila = conteos_actividad.get(asesor_id)
+                if not fila or not fila['total_enviadas']:
+                    # Fallback: Sin datos = valor configurable
+                    if fallbacks is None:
+                        fallbacks = await EscalamientoService.aplicar_fallbacks_metricas(f"lote de {len(ids)}")
+                    metricas[asesor_id]['actividad_reciente_5'] = fallbacks['actividad_reciente']
+                else:
+                    metricas[asesor_id]['actividad_reciente_5'] = EscalamientoService._normalizar_actividad(
+                        fila['total_enviadas'],
+                        fila['total_respondidas']
+                    )
+        except Exception as e:
+            logger.warning(f"Error calculando actividad reciente en lote ({len(ids)} asesores): {e}")
+            for asesor_id in ids:
+                metricas[asesor_id]['actividad_reciente_5'] = Decimal('1.0')  # Fallback: actividad neutra
+                metricas[asesor_id]['errores_calculo'].append(f"actividad: {str(e)}")
+        
+        # 2. Desempeño histórico: adjudicadas/aceptadas/exitosas y tiempos por asesor
+        try:
+            if pendientes:
+                conteos_desempeno.update(
+                    await MetricasAsesorService.agregar_desempeno(pendientes, periodo_desempeno_meses)
+                )
+            
+            for asesor_id in ids:
+                fila = conteos_desempeno.get(asesor_id)
+                if not fila or not fila['total_ofertas']:
+                    # Fallback: Sin datos = valor configurable
+                    if fallbacks is None:
+                        fallbacks = await EscalamientoService.aplicar_fallbacks_metricas(f"lote de {len(ids)}")
+                    metricas[asesor_id]['desempeno_historico_5'] = fallbacks['desempeno_historico']
+                else:
+                    metricas[asesor_id]['desempeno_historico_5'] = EscalamientoService._normalizar_desempeno(
+                        total_ofertas=fila['total_ofertas'],
+                        total_adjudicadas=fila['total_adjudicadas'],
+                        total_aceptadas=fila['total_aceptadas'],
+                        total_exitosas=fila['total_exitosas'],
+                        suma_tiempos_seg=fila['suma_tiempos_seg'],
+                        total_con_tiempo=fila['total_con_tiempo']
+                    )
+        except Exception as e:
+            logger.warning(f"Error calculando desempeño histórico en lote ({len(ids)} asesores): {e}")
+            for asesor_id in ids:
+                metricas[asesor_id]['desempeno_historico_5'] = Decimal('1.0')  # Fallback: desempeño neutro
+                metricas[asesor_id]['errores_calculo'].append(f"desempeno: {str(e)}")
+        
+        return metricas
+    
+    @staticmethod
+    async def calcular_puntajes_lote(
+        asesores: List[Asesor],
+        solicitud: Solicitud,
+        pesos: Optional[Dict[str, float]] = None
+    ) -> List[Tuple[Asesor, Decimal, Dict[str, Decimal]]]:
+        """
+        Calcula el puntaje de todos los asesores candidatos en modo lote
+        
+        Aplica las mismas fórmulas que calcular_puntaje_asesor por cada asesor,
+        pero con un número constante de consultas:
+        - Municipio de la solicitud y proximidades: índice geográfico en memoria
+        - Actividad y desempeño: tabla metricas_asesores o una consulta agregada
+          cada uno (por bloque de IDs)
+        - Confianza: se toma del objeto Asesor ya cargado
+        
+        Args:
+            asesores: Asesores candidatos (con municipio precargado)
+            solicitud: Solicitud para contexto geográfico
+            pesos: Pesos personalizados (opcional)
+        
+        Diferencia con calcular_puntaje_asesor: para los asesores con fila en
+        metricas_asesores, actividad y desempeño salen de esos contadores y no del
+        historial. Los eventos se suman al instante, pero las filas que salen de la
+        ventana (30 días / 6 meses) solo se descuentan en la compactación nocturna,
+        así que el puntaje puede diferir del individual hasta entonces. Con
+        obtener_metricas_lote(usar_precalculadas=False) ambos leen el historial.
+            
+        Returns:
+            List[Tuple]: Lista de (asesor, puntaje_total, variables) en el orden recibido
+        """
+        
+        # Pesos por defecto
+        if pesos is None:
+            pesos = {
+                'proximidad': 0.40,
+                'actividad': 0.25,
+                'desempeno': 0.20,
+                'confianza': 0.15
+            }
+        
+        if not asesores:
+            return []
+        
+        # Contexto compartido por todos los asesores
+        error_municipio = None
+        try:
+            municipio_solicitud = await EscalamientoService._resolver_municipio_solicitud(solicitud)
+        except Exception as e:
+            municipio_solicitud = None
+            error_municipio = e
+        
+        # Proximidades precalculadas sobre el índice geográfico (conjuntos por ciudad/área/hub)
+        proximidades = {}
+        if municipio_solicitud:
+            try:
+                proximidades = await indice_geografico_service.proximidades(municipio_solicitud)
+            except Exception as e:
+                logger.warning(f"Índice geográfico no disponible, calculando proximidad por asesor: {e}")
+        
+        metricas = await EscalamientoService.obtener_metricas_lote([asesor.id for asesor in asesores])
+        
+        evaluaciones = []
+        
+        for asesor in asesores:
+            variables = {}
+            metricas_asesor = metricas[str(asesor.id)]
+            errores_calculo = []
+            
+            # 1. Proximidad geográfica (sin consultas: índice o municipios ya cargados)
+            try:
+                if error_municipio:
+                    raise error_municipio
+                if str(asesor.id) in proximidades:
+                    variables['proximidad'], variables['criterio_proximidad'] = proximidades[str(asesor.id)]
+                else:
+                    await EscalamientoService._asignar_proximidad(asesor, solicitud, municipio_solicitud, variables)
+            except Exception as e:
+                logger.error(f"Error calculando proximidad para asesor {asesor.id}: {e}")
+                variables['proximidad'] = Decimal('3.0')
+                variables['criterio_proximidad'] = "error_calculo"
+                errores_calculo.append(f"proximidad: {str(e)}")
+            
+            # 2-3. Actividad y desempeño desde las consultas agregadas
+            variables['actividad_reciente_5'] = metricas_asesor['actividad_reciente_5']
+            variables['desempeno_historico_5'] = metricas_asesor['desempeno_historico_5']
+            errores_calculo.extend(metricas_asesor['errores_calculo'])
+            
+            # 4. Confianza desde el objeto cargado
+            try:
+                variables['nivel_confianza'] = EscalamientoService._normalizar_confianza(asesor.confianza)
+            except Exception as e:
+                logger.warning(f"Error obteniendo nivel de confianza para asesor {asesor.id}: {e}")
+                variables['nivel_confianza'] = Decimal('3.0')  # Fallback: confianza media
+                errores_calculo.append(f"confianza: {str(e)}")
+            
+            puntaje_total = EscalamientoService._ponderar_puntaje(asesor, variables, errores_calculo, pesos)
+            evaluaciones.append((asesor, puntaje_total, variables))
+        
+        logger.info(f"Puntajes calculados en lote para {len(evaluaciones)} asesores")
+        
+        return evaluaciones
     
     @staticmethod
     async def clasificar_por_niveles(
@@ -473,7 +735,7 @@ class EscalamientoService:
             }
         
         # Obtener configuración de canales y tiempos por nivel
-        config_canales = await ParametroConfig.get_valor('canales_por_nivel', {
+        config_canales = await ConfiguracionService.obtener_valor('canales_por_nivel', {
             1: 'WHATSAPP',
             2: 'WHATSAPP', 
             3: 'PUSH',
@@ -481,7 +743,7 @@ class EscalamientoService:
             5: 'PUSH'
         })
         
-        config_tiempos = await ParametroConfig.get_valor('tiempos_espera_nivel', {
+        config_tiempos = await ConfiguracionService.obtener_valor('tiempos_espera_nivel', {
             1: 15,  # minutos
             2: 20,
             3: 25,
@@ -531,6 +793,7 @@ class EscalamientoService:
     ) -> List[EvaluacionAsesorTemp]:
         """
         Guarda evaluaciones temporales en la base de datos
+        Inserta evaluaciones e historial_respuestas_ofertas por lotes en una sola transacción
         
         Args:
             solicitud: Solicitud para la cual se evaluaron los asesores
@@ -539,8 +802,11 @@ class EscalamientoService:
         Returns:
             List[EvaluacionAsesorTemp]: Evaluaciones creadas
         """
+        from tortoise.transactions import in_transaction
         
         evaluaciones_creadas = []
+        fecha_notificacion = datetime.now()
+        timestamp_calculo = fecha_notificacion.isoformat()
         
         for nivel, asesores_nivel in niveles.items():
             for eval_data in asesores_nivel:
@@ -548,8 +814,7 @@ class EscalamientoService:
                 variables = eval_data['variables']
                 
                 # Crear evaluación temporal con fecha_notificacion
-                fecha_notificacion = datetime.now()
-                evaluacion = await EvaluacionAsesorTemp.create(
+                evaluaciones_creadas.append(EvaluacionAsesorTemp(
                     solicitud=solicitud,
                     asesor=asesor,
                     proximidad=variables['proximidad'],
@@ -578,29 +843,47 @@ class EscalamientoService:
                             'desempeno_historico_5': float(variables['desempeno_historico_5']),
                             'nivel_confianza': float(variables['nivel_confianza'])
                         },
-                        'timestamp_calculo': datetime.now().isoformat()
+                        'timestamp_calculo': timestamp_calculo
                     }
-                )
-                
-                evaluaciones_creadas.append(evaluacion)
+                ))
+        
+        if not evaluaciones_creadas:
+            return evaluaciones_creadas
+        
+        # Historial de envíos agrupado por (nivel, canal) para métricas de actividad
+        grupos_envio: Dict[Tuple[int, str], List[Dict]] = {}
+        for evaluacion in evaluaciones_creadas:
+            grupos_envio.setdefault(
+                (evaluacion.nivel_entrega, evaluacion.canal.value), []
+            ).append({'asesor_id': evaluacion.asesor.id})
+        
+        fecha_envio = datetime.utcnow()
+        historial = []
+        for (nivel, canal), asesores_notificados in grupos_envio.items():
+            historial.extend(events_service.construir_historial_escalada(
+                solicitud.id, asesores_notificados, nivel, canal, fecha_envio
+            ))
+        
+        async with in_transaction() as conn:
+            await EvaluacionAsesorTemp.bulk_create(
+                evaluaciones_creadas, batch_size=TAMANO_LOTE_ESCALAMIENTO, using_db=conn
+            )
+            await HistorialRespuestaOferta.bulk_create(
+                historial, batch_size=TAMANO_LOTE_ESCALAMIENTO, using_db=conn
+            )
         
         logger.info(f"Guardadas {len(evaluaciones_creadas)} evaluaciones temporales para solicitud {solicitud.id}")
         
-        # Registrar en historial_respuestas_ofertas para métricas de actividad
         try:
-            fecha_asignacion = datetime.utcnow()
-            
-            for evaluacion in evaluaciones_creadas:
-                await events_service.on_solicitud_escalada(
-                    solicitud_id=solicitud.id,
-                    asesores_notificados=[{'asesor_id': evaluacion.asesor.id}],
-                    nivel=evaluacion.nivel_entrega,
-                    canal=evaluacion.canal.value
-                )
-            
-            logger.info(f"✅ Registrados {len(evaluaciones_creadas)} asesores en historial_respuestas_ofertas")
+            await MetricasAsesorService.registrar_envios(
+                evaluacion.asesor.id for evaluacion in evaluaciones_creadas
+            )
+            logger.info(f"✅ Registrados {len(historial)} asesores en historial_respuestas_ofertas")
         except Exception as e:
-            logger.error(f"❌ Error registrando historial de respuestas: {e}", exc_info=True)
+            logger.error(f"❌ Error registrando métricas de envíos: {e}", exc_info=True)
+        
+        # La solicitud entra en los repuestos asignados (y pendientes) de cada asesor evaluado
+        await DashboardAsesorService.invalidar(evaluacion.asesor.id for evaluacion in evaluaciones_creadas)
         
         return evaluaciones_creadas
     
@@ -648,6 +931,8 @@ class EscalamientoService:
         
         # Enviar notificaciones según canal
         notificados = 0
+        notificadas: List[EvaluacionAsesorTemp] = []
+        fecha_notificacion = datetime.now()
         
         # WhatsApp notifications (niveles 1-2)
         if asesores_whatsapp:
@@ -659,12 +944,12 @@ class EscalamientoService:
                     #     solicitud
                     # )
                     
-                    # Marcar como notificado
-                    evaluacion.fecha_notificacion = datetime.now()
-                    evaluacion.fecha_timeout = datetime.now() + timedelta(
+                    # Marcar como notificado (se persiste en lote al final de la oleada)
+                    evaluacion.fecha_notificacion = fecha_notificacion
+                    evaluacion.fecha_timeout = fecha_notificacion + timedelta(
                         minutes=evaluacion.tiempo_espera_min
                     )
-                    await evaluacion.save()
+                    notificadas.append(evaluacion)
                     
                     notificados += 1
                     logger.info(f"Notificado por WhatsApp: {evaluacion.asesor.usuario.nombre_completo}")
@@ -672,28 +957,39 @@ class EscalamientoService:
                 except Exception as e:
                     logger.error(f"Error notificando por WhatsApp a {evaluacion.asesor.id}: {e}")
         
-        # Push notifications (niveles 3-4)
+        # Push notifications (niveles 3-4): un solo envío en lote para toda la oleada
         if asesores_push:
+            try:
+                from services.notification_service import notification_service
+                
+                if redis_client and not notification_service.redis_client:
+                    await notification_service.initialize(redis_client)
+                await notification_service.notify_new_solicitud(
+                    solicitud, [str(evaluacion.asesor.usuario.id) for evaluacion in asesores_push]
+                )
+            except Exception as e:
+                logger.error(f"Error notificando por Push la oleada nivel {nivel}: {e}")
+            
             for evaluacion in asesores_push:
-                try:
-                    # TODO: Integrar con servicio de notificaciones push
-                    # await push_service.enviar_notificacion_solicitud(
-                    #     evaluacion.asesor.usuario.id,
-                    #     solicitud
-                    # )
-                    
-                    # Marcar como notificado
-                    evaluacion.fecha_notificacion = datetime.now()
-                    evaluacion.fecha_timeout = datetime.now() + timedelta(
-                        minutes=evaluacion.tiempo_espera_min
-                    )
-                    await evaluacion.save()
-                    
-                    notificados += 1
-                    logger.info(f"Notificado por Push: {evaluacion.asesor.usuario.nombre_completo}")
-                    
-                except Exception as e:
-                    logger.error(f"Error notificando por Push a {evaluacion.asesor.id}: {e}")
+                # Marcar como notificado (se persiste en lote al final de la oleada)
+                evaluacion.fecha_notificacion = fecha_notificacion
+                evaluacion.fecha_timeout = fecha_notificacion + timedelta(
+                    minutes=evaluacion.tiempo_espera_min
+                )
+                notificadas.append(evaluacion)
+                notificados += 1
+            logger.info(f"Notificados por Push: {len(asesores_push)} asesores")
+        
+        # Persistir fechas de la oleada: un UPDATE por tiempo de espera (normalmente uno por nivel)
+        por_tiempo_espera: Dict[int, List] = {}
+        for evaluacion in notificadas:
+            por_tiempo_espera.setdefault(evaluacion.tiempo_espera_min, []).append(evaluacion.id)
+        
+        for tiempo_espera_min, evaluacion_ids in por_tiempo_espera.items():
+            await EvaluacionAsesorTemp.filter(id__in=evaluacion_ids).update(
+                fecha_notificacion=fecha_notificacion,
+                fecha_timeout=fecha_notificacion + timedelta(minutes=tiempo_espera_min)
+            )
         
         # Registrar evento en tablas auxiliares para métricas de escalamiento
         try:
@@ -727,7 +1023,7 @@ class EscalamientoService:
                     'timestamp': datetime.now().isoformat()
                 }
                 
-                await redis_client.publish('solicitud.oleada', str(evento_data))
+                await redis_client.publish('solicitud.oleada', json.dumps(evento_data, default=str))
                 logger.info(f"Evento solicitud.oleada publicado para nivel {nivel}")
                 
             except Exception as e:
@@ -812,7 +1108,7 @@ class EscalamientoService:
             return False, f"Usuario inactivo (estado: {asesor.usuario.estado})"
         
         # Verificar confianza mínima
-        parametros_generales = await ParametroConfig.get_valor('parametros_generales', {})
+        parametros_generales = await ConfiguracionService.obtener_valor('parametros_generales', {})
         confianza_minima = parametros_generales.get('confianza_minima_operar', 2.0)
         
         if not asesor.cumple_confianza_minima(confianza_minima):
@@ -887,11 +1183,11 @@ class EscalamientoService:
         """
         # Obtener valores configurables desde BD
         try:
-            fallback_actividad = await ParametroConfig.get_valor(
+            fallback_actividad = await ConfiguracionService.obtener_valor(
                 'fallback_actividad_asesores_nuevos',
                 default=3.0
             )
-            fallback_desempeno = await ParametroConfig.get_valor(
+            fallback_desempeno = await ConfiguracionService.obtener_valor(
                 'fallback_desempeno_asesores_nuevos',
                 default=3.0
             )
@@ -911,12 +1207,14 @@ class EscalamientoService:
         return fallbacks
     
     @staticmethod
-    async def procesar_escalamiento_completo(solicitud: Solicitud) -> Dict:
+    async def procesar_escalamiento_completo(solicitud: Solicitud, usar_lote: bool = True) -> Dict:
         """
         Procesa escalamiento completo con manejo robusto de errores
         
         Args:
             solicitud: Solicitud a procesar
+            usar_lote: Calcular puntajes en modo lote (consultas agregadas); si falla,
+                se usa el cálculo individual por asesor
             
         Returns:
             Dict: Resultado completo del escalamiento
@@ -952,17 +1250,25 @@ class EscalamientoService:
             evaluaciones = []
             errores_calculo = []
             
-            for asesor in asesores_elegibles:
+            if usar_lote:
                 try:
-                    puntaje_total, variables = await EscalamientoService.calcular_puntaje_asesor(asesor, solicitud)
-                    evaluaciones.append((asesor, puntaje_total, variables))
-                    
+                    evaluaciones = await EscalamientoService.calcular_puntajes_lote(asesores_elegibles, solicitud)
                 except Exception as e:
-                    logger.error(f"Error calculando puntaje para asesor {asesor.id}: {e}")
-                    errores_calculo.append({
-                        'asesor_id': str(asesor.id),
-                        'error': str(e)
-                    })
+                    logger.error(f"Error en cálculo por lote, usando cálculo individual: {e}")
+                    usar_lote = False
+            
+            if not usar_lote:
+                for asesor in asesores_elegibles:
+                    try:
+                        puntaje_total, variables = await EscalamientoService.calcular_puntaje_asesor(asesor, solicitud)
+                        evaluaciones.append((asesor, puntaje_total, variables))
+                        
+                    except Exception as e:
+                        logger.error(f"Error calculando puntaje para asesor {asesor.id}: {e}")
+                        errores_calculo.append({
+                            'asesor_id': str(asesor.id),
+                            'error': str(e)
+                        })
             
             if not evaluaciones:
                 return {
@@ -1054,6 +1360,7 @@ class EscalamientoService:
             from utils.datetime_utils import now_utc
             solicitud.fecha_escalamiento = now_utc()
             await solicitud.save()
+            await temporizador_escalamiento_service.programar(solicitud)
             
             logger.info(f"✅ Solicitud {solicitud_id} actualizada a Nivel {nivel_inicial}")
             
@@ -22,6 +22,381 @@ logger = logging.getLogger(__name__)
 class EvaluacionService:
     """Service for evaluating offers and determining winners"""
     
+    @staticmethod
+    def _pesos_evaluacion(config: Dict[str, Any]) -> Tuple[Decimal, Decimal, Decimal]:
+        """Convierte la configuración pesos_evaluacion_ofertas en (precio, tiempo, garantía)"""
+        return (
+            Decimal(str(config['precio'])),
+            Decimal(str(config['tiempo_entrega'])),
+            Decimal(str(config['garantia']))
+        )
+    
+    @staticmethod
+    def _puntuar_candidatos(
+        repuesto: RepuestoSolicitado,
+        ofertas_con_repuesto: List[Tuple[Oferta, OfertaDetalle]],
+        pesos: Tuple[Decimal, Decimal, Decimal]
+    ) -> Dict[str, Any]:
+        """
+        Normaliza precio/tiempo/garantía de los detalles de un repuesto y elige el ganador
+        
+        Sin consultas: los puntajes se asignan en memoria a cada detalle y se
+        persisten en bloque por quien llama (evaluar_solicitud)
+        
+        Args:
+            repuesto: Repuesto evaluado
+            ofertas_con_repuesto: (oferta, detalle) en orden de evaluación
+            pesos: (peso_precio, peso_tiempo, peso_garantia)
+            
+        Returns:
+            Dict with evaluation result including winner and scores
+        """
+        peso_precio, peso_tiempo, peso_garantia = pesos
+        
+        if not ofertas_con_repuesto:
+            return {
+                'success': False,
+                'repuesto_id': str(repuesto.id),
+                'repuesto_nombre': repuesto.nombre,
+                'ofertas_evaluadas': 0,
+                'ganador': None,
+                'motivo': 'no_ofertas_disponibles',
+                'message': f'No hay ofertas disponibles para {repuesto.nombre}'
+            }
+        
+        # Calculate scores for each offer
+        evaluaciones_ofertas = []
+        
+        # Get min/max values for normalization
+        precios = [detalle.precio_unitario for _, detalle in ofertas_con_repuesto]
+        tiempos = [detalle.tiempo_entrega_dias for _, detalle in ofertas_con_repuesto]
+        garantias = [detalle.garantia_meses for _, detalle in ofertas_con_repuesto]
+        
+        precio_min, precio_max = min(precios), max(precios)
+        tiempo_min, tiempo_max = min(tiempos), max(tiempos)
+        garantia_min, garantia_max = min(garantias), max(garantias)
+        
+        for oferta, detalle in ofertas_con_repuesto:
+            # Calculate normalized scores (0-1 scale)
+            # Price: lower is better (inverted)
+            if precio_max == precio_min:
+                score_precio = Decimal('1.0')
+            else:
+                score_precio = (precio_max - detalle.precio_unitario) / (precio_max - precio_min)
+            
+            # Time: lower is better (inverted)
+            if tiempo_max == tiempo_min:
+                score_tiempo = Decimal('1.0')
+            else:
+                score_tiempo = Decimal(str((tiempo_max - detalle.tiempo_entrega_dias) / (tiempo_max - tiempo_min)))
+            
+            # Warranty: higher is better
+            if garantia_max == garantia_min:
+                score_garantia = Decimal('1.0')
+            else:
+                score_garantia = Decimal(str((detalle.garantia_meses - garantia_min) / (garantia_max - garantia_min)))
+            
+            # Calculate weighted total score
+            puntaje_total = (
+                score_precio * peso_precio +
+                score_tiempo * peso_tiempo +
+                score_garantia * peso_garantia
+            )
+            
+            # Keep individual scores on the detalle (persisted in bulk)
+            detalle.puntaje_precio = score_precio
+            detalle.puntaje_tiempo = score_tiempo
+            detalle.puntaje_garantia = score_garantia
+            detalle.puntaje_total = puntaje_total
+            
+            evaluaciones_ofertas.append({
+                'oferta': oferta,
+                'detalle': detalle,
+                'puntaje_total': puntaje_total,
+                'scores': {
+                    'precio': float(score_precio),
+                    'tiempo': float(score_tiempo),
+                    'garantia': float(score_garantia)
+                }
+            })
+        
+        # Sort by score descending (best first)
+        evaluaciones_ofertas.sort(key=lambda x: x['puntaje_total'], reverse=True)
+        
+        # The winner is the offer with the highest score
+        mejor_evaluacion = evaluaciones_ofertas[0]
+        oferta_ganadora = mejor_evaluacion['oferta']
+        detalle_ganador = mejor_evaluacion['detalle']
+        
+        logger.info(
+            f"Repuesto {repuesto.nombre} evaluado: {len(evaluaciones_ofertas)} ofertas, "
+            f"ganador: {oferta_ganadora.asesor.usuario.nombre_completo} "
+            f"con puntaje {mejor_evaluacion['puntaje_total']:.3f}"
+        )
+        
+        return {
+            'success': True,
+            'repuesto_id': str(repuesto.id),
+            'repuesto_nombre': repuesto.nombre,
+            'ofertas_evaluadas': len(evaluaciones_ofertas),
+            'ganador': {
+                'oferta_id': str(oferta_ganadora.id),
+                'detalle_id': str(detalle_ganador.id),
+                'asesor_id': str(oferta_ganadora.asesor.id),
+                'asesor_nombre': oferta_ganadora.asesor.usuario.nombre_completo,
+                'puntaje_total': float(mejor_evaluacion['puntaje_total']),
+                'precio': float(detalle_ganador.precio_unitario),
+                'tiempo_entrega': detalle_ganador.tiempo_entrega_dias,
+                'garantia': detalle_ganador.garantia_meses,
+                'scores_detallados': mejor_evaluacion['scores']
+            },
+            'todas_evaluaciones': [
+                {
+                    'oferta_id': str(eval_data['oferta'].id),
+                    'asesor_nombre': eval_data['oferta'].asesor.usuario.nombre_completo,
+                    'puntaje_total': float(eval_data['puntaje_total']),
+                    'precio': float(eval_data['detalle'].precio_unitario),
+                    'tiempo_entrega': eval_data['detalle'].tiempo_entrega_dias,
+                    'garantia': eval_data['detalle'].garantia_meses,
+                    'scores': eval_data['scores']
+                }
+                for eval_data in evaluaciones_ofertas
+            ],
+            'configuracion_usada': {
+                'peso_precio': float(peso_precio),
+                'peso_tiempo': float(peso_tiempo),
+                'peso_garantia': float(peso_garantia)
+            }
+        }
+    
+    @staticmethod
+    def _adjudicar_con_cobertura(
+        repuesto: RepuestoSolicitado,
+        con_cobertura: List[Dict[str, Any]],
+        sin_cobertura: List[Dict[str, Any]],
+        cobertura_minima_pct: Decimal,
+        pesos: Tuple[Decimal, Decimal, Decimal],
+        total_ofertas: int,
+        total_ofertas_con_cobertura: int
+    ) -> Dict[str, Any]:
+        """
+        Aplica la regla de cobertura mínima a los candidatos de un repuesto (sin consultas)
+        
+        Args:
+            repuesto: Repuesto evaluado
+            con_cobertura: [{'oferta', 'detalle', 'cobertura_pct'}] que cumplen la cobertura mínima
+            sin_cobertura: [{'oferta', 'detalle', 'cobertura_pct'}] bajo la cobertura mínima
+            cobertura_minima_pct: Cobertura mínima configurada
+            pesos: (peso_precio, peso_tiempo, peso_garantia)
+            total_ofertas: Ofertas disponibles en la solicitud
+            total_ofertas_con_cobertura: Ofertas de la solicitud que cumplen la cobertura
+            
+        Returns:
+            Dict with evaluation result including coverage analysis
+        """
+        ofertas_con_repuesto = con_cobertura
+        
+        # Si no hay ofertas con cobertura suficiente, evaluar ofertas con cobertura insuficiente
+        if not ofertas_con_repuesto:
+            # Si hay ofertas disponibles (1 o más), evaluarlas por puntaje
+            if len(sin_cobertura) > 0:
+                ofertas_con_repuesto = sin_cobertura
+                if len(sin_cobertura) == 1:
+                    logger.info(
+                        f"Aplicando excepción de único oferente para {repuesto.nombre}: "
+                        f"{sin_cobertura[0]['oferta'].asesor.usuario.nombre_completo} "
+                        f"con cobertura {sin_cobertura[0]['cobertura_pct']:.1f}%"
+                    )
+                else:
+                    logger.info(
+                        f"Evaluando {len(sin_cobertura)} ofertas con cobertura < {cobertura_minima_pct}% "
+                        f"para {repuesto.nombre} (sin ofertas con cobertura suficiente)"
+                    )
+            else:
+                return {
+                    'success': False,
+                    'repuesto_id': str(repuesto.id),
+                    'repuesto_nombre': repuesto.nombre,
+                    'ofertas_evaluadas': 0,
+                    'ganador': None,
+                    'motivo': 'no_ofertas_disponibles',
+                    'cobertura_aplicada': {
+                        'cobertura_minima_requerida': float(cobertura_minima_pct),
+                        'ofertas_totales': total_ofertas,
+                        'ofertas_con_cobertura': total_ofertas_con_cobertura,
+                        'ofertas_con_repuesto': 0
+                    },
+                    'message': f'No hay ofertas disponibles para {repuesto.nombre}'
+                }
+        
+        # Evaluar ofertas que pasaron el filtro usando la fórmula
+        evaluacion_detallada = EvaluacionService._puntuar_candidatos(
+            repuesto,
+            [(od['oferta'], od['detalle']) for od in ofertas_con_repuesto],
+            pesos
+        )
+        
+        if not evaluacion_detallada['success']:
+            return evaluacion_detallada
+        
+        # Agregar información de cobertura al ganador
+        ganador_info = evaluacion_detallada['ganador']
+        ganador_oferta_id = ganador_info['oferta_id']
+        
+        # Buscar la cobertura del ganador
+        cobertura_ganador = next(
+            (od['cobertura_pct'] for od in ofertas_con_repuesto if str(od['oferta'].id) == ganador_oferta_id),
+            Decimal('0')
+        )
+        
+        ganador_info['cobertura_pct'] = float(cobertura_ganador)
+        ganador_info['cumple_cobertura_minima'] = cobertura_ganador >= cobertura_minima_pct
+        ganador_info['es_adjudicacion_por_excepcion'] = cobertura_ganador < cobertura_minima_pct
+        
+        motivo = 'mejor_puntaje_con_cobertura'
+        if cobertura_ganador < cobertura_minima_pct:
+            if len(ofertas_con_repuesto) == 1:
+                motivo = 'unica_oferta_disponible'
+            else:
+                motivo = 'mejor_puntaje_sin_cobertura_suficiente'
+        
+        logger.info(
+            f"Repuesto {repuesto.nombre} adjudicado por {motivo}: "
+            f"cobertura {cobertura_ganador:.1f}% (mínimo {cobertura_minima_pct}%), "
+            f"asesor: {ganador_info['asesor_nombre']}, "
+            f"puntaje: {ganador_info['puntaje_total']:.3f}"
+        )
+        
+        return {
+            'success': True,
+            'repuesto_id': str(repuesto.id),
+            'repuesto_nombre': repuesto.nombre,
+            'ofertas_evaluadas': len(ofertas_con_repuesto),
+            'ganador': ganador_info,
+            'motivo': motivo,
+            'cobertura_aplicada': {
+                'cobertura_minima_requerida': float(cobertura_minima_pct),
+                'cobertura_obtenida': float(cobertura_ganador),
+                'cumple_cobertura': cobertura_ganador >= cobertura_minima_pct,
+                'es_unica_oferta': len(ofertas_con_repuesto) == 1
+            },
+            'todas_evaluaciones': evaluacion_detallada.get('todas_evaluaciones', []),
+            'todas_coberturas': [
+                {
+                    'oferta_id': str(od['oferta'].id),
+                    'asesor_nombre': od['oferta'].asesor.usuario.nombre_completo,
+                    'cobertura_pct': float(od['cobertura_pct']),
+                    'cumple_minimo': od['cobertura_pct'] >= cobertura_minima_pct
+                }
+                for od in ofertas_con_repuesto
+            ]
+        }
+    
+    @staticmethod
+    def _error_repuesto(repuesto: RepuestoSolicitado, e: Exception, contexto: str = '') -> Dict[str, Any]:
+        """Resultado de evaluación fallida para un repuesto"""
+        return {
+            'success': False,
+            'repuesto_id': str(repuesto.id),
+            'repuesto_nombre': repuesto.nombre,
+            'ofertas_evaluadas': 0,
+            'ganador': None,
+            'error': str(e),
+            'message': f'Error evaluando {repuesto.nombre}{contexto}: {str(e)}'
+        }
+    
+    @staticmethod
+    async def _guardar_puntajes(detalles: List[OfertaDetalle], using_db=None) -> None:
+        """Persiste en un solo UPDATE por lote los puntajes asignados por _puntuar_candidatos"""
+        if detalles:
+            await OfertaDetalle.bulk_update(
+                detalles,
+                fields=['puntaje_precio', 'puntaje_tiempo', 'puntaje_garantia', 'puntaje_total'],
+                batch_size=500,
+                using_db=using_db
+            )
+    
+    @staticmethod
+    def evaluar_matriz(
+        repuestos: List[RepuestoSolicitado],
+        ofertas: List[Oferta],
+        pesos: Tuple[Decimal, Decimal, Decimal],
+        cobertura_minima_pct: Decimal
+    ) -> List[Dict[str, Any]]:
+        """
+        Evalúa todos los repuestos de una solicitud en una sola pasada en memoria
+        
+        Construye la matriz ofertas × repuestos desde el grafo precargado
+        (oferta.detalles), calcula la cobertura de cada oferta una sola vez y
+        aplica la regla de cobertura y la fórmula de puntaje a cada repuesto.
+        Mismo resultado que evaluar_repuesto_con_cobertura por repuesto, sin consultas.
+        
+        Args:
+            repuestos: Repuestos de la solicitud
+            ofertas: Ofertas activas con detalles y asesor__usuario precargados
+            pesos: (peso_precio, peso_tiempo, peso_garantia)
+            cobertura_minima_pct: Cobertura mínima configurada
+            
+        Returns:
+            List[Dict]: Resultado por repuesto, en el orden recibido
+        """
+        total_repuestos = len(repuestos)
+        
+        # Matriz: repuesto_id -> [(oferta, detalle)] en el orden de las ofertas
+        matriz: Dict[str, List[Tuple[Oferta, OfertaDetalle]]] = {}
+        coberturas: Dict[Any, Decimal] = {}
+        
+        for oferta in ofertas:
+            detalles = list(oferta.detalles)
+            
+            # Cobertura: (repuestos_cubiertos / total_repuestos) * 100
+            coberturas[oferta.id] = (
+                Decimal(str((len(detalles) / total_repuestos) * 100)) if total_repuestos else Decimal('0')
+            )
+            
+            repuestos_vistos = set()
+            for detalle in detalles:
+                repuesto_id = str(detalle.repuesto_solicitado_id)
+                if repuesto_id in repuestos_vistos:
+                    continue
+                repuestos_vistos.add(repuesto_id)
+                matriz.setdefault(repuesto_id, []).append((oferta, detalle))
+        
+        total_ofertas_con_cobertura = sum(
+            1 for cobertura in coberturas.values() if cobertura >= cobertura_minima_pct
+        )
+        
+        evaluaciones = []
+        for repuesto in repuestos:
+            try:
+                con_cobertura = []
+                sin_cobertura = []
+                for oferta, detalle in matriz.get(str(repuesto.id), []):
+                    candidato = {
+                        'oferta': oferta,
+                        'detalle': detalle,
+                        'cobertura_pct': coberturas[oferta.id]
+                    }
+                    if candidato['cobertura_pct'] >= cobertura_minima_pct:
+                        con_cobertura.append(candidato)
+                    else:
+                        sin_cobertura.append(candidato)
+                
+                evaluaciones.append(EvaluacionService._adjudicar_con_cobertura(
+                    repuesto,
+                    con_cobertura,
+                    sin_cobertura,
+                    cobertura_minima_pct,
+                    pesos,
+                    total_ofertas=len(ofertas),
+                    total_ofertas_con_cobertura=total_ofertas_con_cobertura
+                ))
+            except Exception as e:
+                logger.error(f"Error evaluando repuesto con cobertura {repuesto.id}: {e}")
+                evaluaciones.append(EvaluacionService._error_repuesto(repuesto, e, ' con cobertura'))
+        
+        return evaluaciones
+    
     @staticmethod
     async def evaluar_repuesto(
         repuesto: RepuestoSolicitado,
@@ -30,6 +405,10 @@ class EvaluacionService:
         """
         Evaluate offers for a specific repuesto and determine the winner
         
+        Evaluación puntual de un repuesto (consulta el detalle de cada oferta) que
+        guarda los puntajes de los detalles evaluados. evaluar_solicitud usa
+        evaluar_matriz sobre el grafo precargado.
+        
         Args:
             repuesto: The repuesto to evaluate
             ofertas_disponibles: List of available offers
@@ -40,9 +419,7 @@ class EvaluacionService:
         try:
             # Get evaluation weights from configuration
             config = await ConfiguracionService.get_config('pesos_evaluacion_ofertas')
-            peso_precio = Decimal(str(config['precio']))
-            peso_tiempo = Decimal(str(config['tiempo_entrega']))
-            peso_garantia = Decimal(str(config['garantia']))
+            pesos = EvaluacionService._pesos_evaluacion(config)
             
             # Filter offers that include this specific repuesto
             ofertas_con_repuesto = []
@@ -55,135 +432,13 @@ class EvaluacionService:
                 if detalle:
                     ofertas_con_repuesto.append((oferta, detalle))
             
-            if not ofertas_con_repuesto:
-                return {
-                    'success': False,
-                    'repuesto_id': str(repuesto.id),
-                    'repuesto_nombre': repuesto.nombre,
-                    'ofertas_evaluadas': 0,
-                    'ganador': None,
-                    'motivo': 'no_ofertas_disponibles',
-                    'message': f'No hay ofertas disponibles para {repuesto.nombre}'
-                }
-            
-            # Calculate scores for each offer
-            evaluaciones_ofertas = []
-            
-            # Get min/max values for normalization
-            precios = [detalle.precio_unitario for _, detalle in ofertas_con_repuesto]
-            tiempos = [detalle.tiempo_entrega_dias for _, detalle in ofertas_con_repuesto]
-            garantias = [detalle.garantia_meses for _, detalle in ofertas_con_repuesto]
-            
-            precio_min, precio_max = min(precios), max(precios)
-            tiempo_min, tiempo_max = min(tiempos), max(tiempos)
-            garantia_min, garantia_max = min(garantias), max(garantias)
-            
-            for oferta, detalle in ofertas_con_repuesto:
-                # Calculate normalized scores (0-1 scale)
-                # Price: lower is better (inverted)
-                if precio_max == precio_min:
-                    score_precio = Decimal('1.0')
-                else:
-                    score_precio = (precio_max - detalle.precio_unitario) / (precio_max - precio_min)
-                
-                # Time: lower is better (inverted)
-                if tiempo_max == tiempo_min:
-                    score_tiempo = Decimal('1.0')
-                else:
-                    score_tiempo = Decimal(str((tiempo_max - detalle.tiempo_entrega_dias) / (tiempo_max - tiempo_min)))
-                
-                # Warranty: higher is better
-                if garantia_max == garantia_min:
-                    score_garantia = Decimal('1.0')
-                else:
-                    score_garantia = Decimal(str((detalle.garantia_meses - garantia_min) / (garantia_max - garantia_min)))
-                
-                # Calculate weighted total score
-                puntaje_total = (
-                    score_precio * peso_precio +
-                    score_tiempo * peso_tiempo +
-                    score_garantia * peso_garantia
-                )
-                
-                # Update detalle with individual scores
-                await detalle.update_from_dict({
-                    'puntaje_precio': score_precio,
-                    'puntaje_tiempo': score_tiempo,
-                    'puntaje_garantia': score_garantia,
-                    'puntaje_total': puntaje_total
-                })
-                
-                evaluaciones_ofertas.append({
-                    'oferta': oferta,
-                    'detalle': detalle,
-                    'puntaje_total': puntaje_total,
-                    'scores': {
-                        'precio': float(score_precio),
-                        'tiempo': float(score_tiempo),
-                        'garantia': float(score_garantia)
-                    }
-                })
-            
-            # Sort by score descending (best first)
-            evaluaciones_ofertas.sort(key=lambda x: x['puntaje_total'], reverse=True)
-            
-            # The winner is the offer with the highest score
-            mejor_evaluacion = evaluaciones_ofertas[0]
-            oferta_ganadora = mejor_evaluacion['oferta']
-            detalle_ganador = mejor_evaluacion['detalle']
-            
-            logger.info(
-                f"Repuesto {repuesto.nombre} evaluado: {len(evaluaciones_ofertas)} ofertas, "
-                f"ganador: {oferta_ganadora.asesor.usuario.nombre_completo} "
-                f"con puntaje {mejor_evaluacion['puntaje_total']:.3f}"
-            )
-            
-            return {
-                'success': True,
-                'repuesto_id': str(repuesto.id),
-                'repuesto_nombre': repuesto.nombre,
-                'ofertas_evaluadas': len(evaluaciones_ofertas),
-                'ganador': {
-                    'oferta_id': str(oferta_ganadora.id),
-                    'detalle_id': str(detalle_ganador.id),
-                    'asesor_id': str(oferta_ganadora.asesor.id),
-                    'asesor_nombre': oferta_ganadora.asesor.usuario.nombre_completo,
-                    'puntaje_total': float(mejor_evaluacion['puntaje_total']),
-                    'precio': float(detalle_ganador.precio_unitario),
-                    'tiempo_entrega': detalle_ganador.tiempo_entrega_dias,
-                    'garantia': detalle_ganador.garantia_meses,
-                    'scores_detallados': mejor_evaluacion['scores']
-                },
-                'todas_evaluaciones': [
-                    {
-                        'oferta_id': str(eval_data['oferta'].id),
-                        'asesor_nombre': eval_data['oferta'].asesor.usuario.nombre_completo,
-                        'puntaje_total': float(eval_data['puntaje_total']),
-                        'precio': float(eval_data['detalle'].precio_unitario),
-                        'tiempo_entrega': eval_data['detalle'].tiempo_entrega_dias,
-                        'garantia': eval_data['detalle'].garantia_meses,
-                        'scores': eval_data['scores']
-                    }
-                    for eval_data in evaluaciones_ofertas
-                ],
-                'configuracion_usada': {
-                    'peso_precio': float(peso_precio),
-                    'peso_tiempo': float(peso_tiempo),
-                    'peso_garantia': float(peso_garantia)
-                }
-            }
+            resultado = EvaluacionService._puntuar_candidatos(repuesto, ofertas_con_repuesto, pesos)
+            await EvaluacionService._guardar_puntajes([detalle for _, detalle in ofertas_con_repuesto])
+            return resultado
             
         except Exception as e:
             logger.error(f"Error evaluando repuesto {repuesto.id}: {e}")
-            return {
-                'success': False,
-                'repuesto_id': str(repuesto.id),
-                'repuesto_nombre': repuesto.nombre,
-                'ofertas_evaluadas': 0,
-                'ganador': None,
-                'error': str(e),
-                'message': f'Error evaluando {repuesto.nombre}: {str(e)}'
-            }
+            return EvaluacionService._error_repuesto(repuesto, e)
     
     @staticmethod
     async def evaluar_repuesto_con_cobertura(
@@ -201,6 +456,10 @@ class EvaluacionService:
         4. Adjudicar al mejor puntaje
         5. Excepción: Si solo hay un oferente, adjudicar sin importar cobertura
         
+        Evaluación puntual de un repuesto (consulta coberturas y detalles por oferta)
+        que guarda los puntajes de los detalles evaluados. evaluar_solicitud usa
+        evaluar_matriz sobre el grafo precargado.
+        
         Args:
             repuesto: The repuesto to evaluate
             ofertas_disponibles: List of available offers
@@ -210,167 +469,61 @@ class EvaluacionService:
             Dict with evaluation result including coverage analysis
         """
         try:
-            # Get minimum coverage from configuration
+            # Get minimum coverage and weights from configuration
             config = await ConfiguracionService.get_config('parametros_generales')
             cobertura_minima_pct = Decimal(str(config['cobertura_minima_porcentaje']))
+            pesos = EvaluacionService._pesos_evaluacion(
+                await ConfiguracionService.get_config('pesos_evaluacion_ofertas')
+            )
             
-            # PASO 1: Calcular cobertura de cada oferta y filtrar por cobertura mínima
-            ofertas_con_cobertura_suficiente = []
-            ofertas_con_cobertura_insuficiente = []
+            # Calcular cobertura de cada oferta y separar por cobertura mínima
+            con_cobertura = []
+            sin_cobertura = []
+            total_ofertas_con_cobertura = 0
             
             for oferta in ofertas_disponibles:
                 # Calculate coverage: (repuestos_cubiertos / total_repuestos) * 100
                 repuestos_cubiertos = await OfertaDetalle.filter(oferta=oferta).count()
                 cobertura_pct = Decimal(str((repuestos_cubiertos / total_repuestos_solicitud) * 100))
                 
-                oferta_data = {
-                    'oferta': oferta,
-                    'cobertura_pct': cobertura_pct
-                }
-                
                 if cobertura_pct >= cobertura_minima_pct:
-                    ofertas_con_cobertura_suficiente.append(oferta_data)
-                else:
-                    ofertas_con_cobertura_insuficiente.append(oferta_data)
-            
-            # PASO 2: De las ofertas con cobertura suficiente, filtrar las que tienen este repuesto
-            ofertas_con_repuesto = []
-            for oferta_data in ofertas_con_cobertura_suficiente:
-                oferta = oferta_data['oferta']
+                    total_ofertas_con_cobertura += 1
+                
                 detalle = await OfertaDetalle.get_or_none(
                     oferta=oferta,
                     repuesto_solicitado=repuesto
                 )
-                if detalle:
-                    ofertas_con_repuesto.append({
-                        'oferta': oferta,
-                        'detalle': detalle,
-                        'cobertura_pct': oferta_data['cobertura_pct']
-                    })
-            
-            # PASO 3: Si no hay ofertas con cobertura suficiente, evaluar ofertas con cobertura insuficiente
-            if not ofertas_con_repuesto:
-                # Buscar en ofertas con cobertura insuficiente
-                ofertas_excepcion = []
-                for oferta_data in ofertas_con_cobertura_insuficiente:
-                    oferta = oferta_data['oferta']
-                    detalle = await OfertaDetalle.get_or_none(
-                        oferta=oferta,
-                        repuesto_solicitado=repuesto
-                    )
-                    if detalle:
-                        ofertas_excepcion.append({
-                            'oferta': oferta,
-                            'detalle': detalle,
-                            'cobertura_pct': oferta_data['cobertura_pct']
-                        })
+                if not detalle:
+                    continue
                 
-                # Si hay ofertas disponibles (1 o más), evaluarlas por puntaje
-                if len(ofertas_excepcion) > 0:
-                    ofertas_con_repuesto = ofertas_excepcion
-                    if len(ofertas_excepcion) == 1:
-                        logger.info(
-                            f"Aplicando excepción de único oferente para {repuesto.nombre}: "
-                            f"{ofertas_excepcion[0]['oferta'].asesor.usuario.nombre_completo} "
-                            f"con cobertura {ofertas_excepcion[0]['cobertura_pct']:.1f}%"
-                        )
-                    else:
-                        logger.info(
-                            f"Evaluando {len(ofertas_excepcion)} ofertas con cobertura < {cobertura_minima_pct}% "
-                            f"para {repuesto.nombre} (sin ofertas con cobertura suficiente)"
-                        )
-                else:
-                    return {
-                        'success': False,
-                        'repuesto_id': str(repuesto.id),
-                        'repuesto_nombre': repuesto.nombre,
-                        'ofertas_evaluadas': 0,
-                        'ganador': None,
-                        'motivo': 'no_ofertas_disponibles',
-                        'cobertura_aplicada': {
-                            'cobertura_minima_requerida': float(cobertura_minima_pct),
-                            'ofertas_totales': len(ofertas_disponibles),
-                            'ofertas_con_cobertura': len(ofertas_con_cobertura_suficiente),
-                            'ofertas_con_repuesto': 0
-                        },
-                        'message': f'No hay ofertas disponibles para {repuesto.nombre}'
-                    }
-            
-            # PASO 4: Evaluar ofertas que pasaron el filtro usando la fórmula
-            # Extraer solo las ofertas para evaluar
-            ofertas_a_evaluar = [od['oferta'] for od in ofertas_con_repuesto]
-            
-            evaluacion_detallada = await EvaluacionService.evaluar_repuesto(
-                repuesto, ofertas_a_evaluar
-            )
-            
-            if not evaluacion_detallada['success']:
-                return evaluacion_detallada
-            
-            # PASO 5: Agregar información de cobertura al ganador
-            ganador_info = evaluacion_detallada['ganador']
-            ganador_oferta_id = ganador_info['oferta_id']
-            
-            # Buscar la cobertura del ganador
-            cobertura_ganador = next(
-                (od['cobertura_pct'] for od in ofertas_con_repuesto if str(od['oferta'].id) == ganador_oferta_id),
-                Decimal('0')
-            )
-            
-            ganador_info['cobertura_pct'] = float(cobertura_ganador)
-            ganador_info['cumple_cobertura_minima'] = cobertura_ganador >= cobertura_minima_pct
-            ganador_info['es_adjudicacion_por_excepcion'] = cobertura_ganador < cobertura_minima_pct
-            
-            motivo = 'mejor_puntaje_con_cobertura'
-            if cobertura_ganador < cobertura_minima_pct:
-                if len(ofertas_con_repuesto) == 1:
-                    motivo = 'unica_oferta_disponible'
+                candidato = {
+                    'oferta': oferta,
+                    'detalle': detalle,
+                    'cobertura_pct': cobertura_pct
+                }
+                if cobertura_pct >= cobertura_minima_pct:
+                    con_cobertura.append(candidato)
                 else:
-                    motivo = 'mejor_puntaje_sin_cobertura_suficiente'
-            
-            logger.info(
-                f"Repuesto {repuesto.nombre} adjudicado por {motivo}: "
-                f"cobertura {cobertura_ganador:.1f}% (mínimo {cobertura_minima_pct}%), "
-                f"asesor: {ganador_info['asesor_nombre']}, "
-                f"puntaje: {ganador_info['puntaje_total']:.3f}"
+                    sin_cobertura.append(candidato)
+            
+            resultado = EvaluacionService._adjudicar_con_cobertura(
+                repuesto,
+                con_cobertura,
+                sin_cobertura,
+                cobertura_minima_pct,
+                pesos,
+                total_ofertas=len(ofertas_disponibles),
+                total_ofertas_con_cobertura=total_ofertas_con_cobertura
             )
-            
-            return {
-                'success': True,
-                'repuesto_id': str(repuesto.id),
-                'repuesto_nombre': repuesto.nombre,
-                'ofertas_evaluadas': len(ofertas_con_repuesto),
-                'ganador': ganador_info,
-                'motivo': motivo,
-                'cobertura_aplicada': {
-                    'cobertura_minima_requerida': float(cobertura_minima_pct),
-                    'cobertura_obtenida': float(cobertura_ganador),
-                    'cumple_cobertura': cobertura_ganador >= cobertura_minima_pct,
-                    'es_unica_oferta': len(ofertas_con_repuesto) == 1
-                },
-                'todas_evaluaciones': evaluacion_detallada.get('todas_evaluaciones', []),
-                'todas_coberturas': [
-                    {
-                        'oferta_id': str(od['oferta'].id),
-                        'asesor_nombre': od['oferta'].asesor.usuario.nombre_completo,
-                        'cobertura_pct': float(od['cobertura_pct']),
-                        'cumple_minimo': od['cobertura_pct'] >= cobertura_minima_pct
-                    }
-                    for od in ofertas_con_repuesto
-                ]
-            }
+            # Solo se puntúan las de cobertura suficiente (o todas si ninguna la cumple)
+            await EvaluacionService._guardar_puntajes([
+                candidato['detalle'] for candidato in (con_cobertura or sin_cobertura)
+            ])
+            return resultado
             
         except Exception as e:
             logger.error(f"Error evaluando repuesto con cobertura {repuesto.id}: {e}")
-            return {
-                'success': False,
-                'repuesto_id': str(repuesto.id),
-                'repuesto_nombre': repuesto.nombre,
-                'ofertas_evaluadas': 0,
-                'ganador': None,
-                'error': str(e),
-                'message': f'Error evaluando {repuesto.nombre} con cobertura: {str(e)}'
-            } 
+            return EvaluacionService._error_repuesto(repuesto, e, ' con cobertura')
    
     @staticmethod
     async def evaluar_solicitud(solicitud_id: str) -> Dict[str, Any]:
@@ -380,6 +533,11 @@ class EvaluacionService:
         Uses atomic transaction to ensure all adjudications and state updates
         are committed together or rolled back on failure.
         
+        Single pass: the offers × parts matrix is built from the prefetched graph
+        (evaluar_matriz) and scores, adjudications and offer states are written
+        with bulk operations, so the number of queries does not grow with the
+        number of offers or parts.
+        
         Args:
             solicitud_id: ID of the solicitud to evaluate
             
@@ -394,7 +552,7 @@ class EvaluacionService:
             solicitud = await Solicitud.get_or_none(id=solicitud_id).prefetch_related(
                 'repuestos_solicitados',
                 'ofertas__asesor__usuario',
-                'ofertas__detalles__repuesto_solicitado'
+                'ofertas__detalles'
             )
             
             if not solicitud:
@@ -411,10 +569,11 @@ class EvaluacionService:
             
             if not ofertas_activas:
                 # No offers to evaluate - close solicitud without offers
-                await solicitud.update_from_dict({
+                solicitud.update_from_dict({
                     'estado': EstadoSolicitud.CERRADA_SIN_OFERTAS,
                     'fecha_evaluacion': now_utc()
                 })
+                await solicitud.save(update_fields=['estado', 'fecha_evaluacion'])
                 
                 return {
                     'success': False,
@@ -431,92 +590,113 @@ class EvaluacionService:
             config_evaluacion = await ConfiguracionService.get_config('pesos_evaluacion_ofertas')
             config_general = await ConfiguracionService.get_config('parametros_generales')
             
-            # Evaluate each repuesto individually
-            evaluaciones_repuestos = []
+            # Evaluate all repuestos in a single in-memory pass
+            repuestos = list(solicitud.repuestos_solicitados)
+            total_repuestos = len(repuestos)
+            
+            evaluaciones_repuestos = EvaluacionService.evaluar_matriz(
+                repuestos=repuestos,
+                ofertas=ofertas_activas,
+                pesos=EvaluacionService._pesos_evaluacion(config_evaluacion),
+                cobertura_minima_pct=Decimal(str(config_general['cobertura_minima_porcentaje']))
+            )
+            
+            # Objects already loaded, indexed for adjudication
+            repuestos_por_id = {str(repuesto.id): repuesto for repuesto in repuestos}
+            ofertas_por_id = {str(oferta.id): oferta for oferta in ofertas_activas}
+            detalles_por_id = {
+                str(detalle.id): detalle
+                for oferta in ofertas_activas
+                for detalle in oferta.detalles
+            }
+            detalles_puntuados = [
+                detalle for detalle in detalles_por_id.values()
+                if detalle.puntaje_total is not None
+            ]
+            
+            # Build adjudications for winners
             adjudicaciones_creadas = []
-            total_repuestos = len(solicitud.repuestos_solicitados)
+            for evaluacion_repuesto in evaluaciones_repuestos:
+                if evaluacion_repuesto['success'] and evaluacion_repuesto['ganador']:
+                    ganador = evaluacion_repuesto['ganador']
+                    repuesto = repuestos_por_id[evaluacion_repuesto['repuesto_id']]
+                    oferta_ganadora = ofertas_por_id[ganador['oferta_id']]
+                    detalle_ganador = detalles_por_id[ganador['detalle_id']]
+                    
+                    adjudicaciones_creadas.append(AdjudicacionRepuesto(
+                        solicitud=solicitud,
+                        oferta=oferta_ganadora,
+                        repuesto_solicitado=repuesto,
+                        oferta_detalle=detalle_ganador,
+                        puntaje_obtenido=Decimal(str(ganador['puntaje_total'])),
+                        precio_adjudicado=detalle_ganador.precio_unitario,
+                        tiempo_entrega_adjudicado=detalle_ganador.tiempo_entrega_dias,
+                        garantia_adjudicada=detalle_ganador.garantia_meses,
+                        cantidad_adjudicada=detalle_ganador.cantidad,
+                        motivo_adjudicacion=evaluacion_repuesto['motivo'],
+                        cobertura_oferta=Decimal(str(ganador.get('cobertura_pct', 0)))
+                    ))
+                    
+                    logger.info(
+                        f"Adjudicación creada: {repuesto.nombre} → "
+                        f"{oferta_ganadora.asesor.usuario.nombre_completo} "
+                        f"(${detalle_ganador.precio_unitario:,.0f})"
+                    )
             
-            for repuesto in solicitud.repuestos_solicitados:
-                evaluacion_repuesto = await EvaluacionService.evaluar_repuesto_con_cobertura(
-                    repuesto=repuesto,
-                    ofertas_disponibles=ofertas_activas,
-                    total_repuestos_solicitud=total_repuestos
-                )
-                
-                evaluaciones_repuestos.append(evaluacion_repuesto)
+            # Calculate totals
+            monto_total_adjudicado = sum(
+                adj.precio_adjudicado * adj.cantidad_adjudicada 
+                for adj in adjudicaciones_creadas
+            )
+            
+            # Offer states based on evaluation results
+            ofertas_ganadoras_ids = set(adj.oferta.id for adj in adjudicaciones_creadas)
+            
+            for oferta in ofertas_activas:
+                if oferta.id in ofertas_ganadoras_ids:
+                    oferta.estado = EstadoOferta.GANADORA
+                else:
+                    oferta.estado = EstadoOferta.NO_SELECCIONADA
+            
+            # Update solicitud state
+            nuevo_estado = EstadoSolicitud.EVALUADA
+            if len(adjudicaciones_creadas) == 0:
+                nuevo_estado = EstadoSolicitud.CERRADA_SIN_OFERTAS
             
-            # Use atomic transaction for all adjudications and state updates
+            solicitud.update_from_dict({
+                'estado': nuevo_estado,
+                'fecha_evaluacion': datetime.now(),
+                'monto_total_adjudicado': monto_total_adjudicado
+            })
+            
+            # Use atomic transaction for all adjudications and state updates (bulk writes)
             from tortoise.transactions import in_transaction
             async with in_transaction() as conn:
-                # Create adjudications for winners
-                for evaluacion_repuesto in evaluaciones_repuestos:
-                    if evaluacion_repuesto['success'] and evaluacion_repuesto['ganador']:
-                        ganador = evaluacion_repuesto['ganador']
-                        repuesto_id = evaluacion_repuesto['repuesto_id']
-                        repuesto = await RepuestoSolicitado.get(id=repuesto_id)
-                        
-                        # Get the winning offer and detail
-                        oferta_ganadora = await Oferta.get(id=ganador['oferta_id']).prefetch_related('asesor__usuario')
-                        detalle_ganador = await OfertaDetalle.get(id=ganador['detalle_id'])
-                        
-                        # Create adjudication
-                        adjudicacion = await AdjudicacionRepuesto.create(
-                            solicitud=solicitud,
-                            oferta=oferta_ganadora,
-                            repuesto_solicitado=repuesto,
-                            oferta_detalle=detalle_ganador,
-                            puntaje_obtenido=Decimal(str(ganador['puntaje_total'])),
-                            precio_adjudicado=detalle_ganador.precio_unitario,
-                            tiempo_entrega_adjudicado=detalle_ganador.tiempo_entrega_dias,
-                            garantia_adjudicada=detalle_ganador.garantia_meses,
-                            cantidad_adjudicada=detalle_ganador.cantidad,
-                            motivo_adjudicacion=evaluacion_repuesto['motivo'],
-                            cobertura_oferta=Decimal(str(ganador.get('cobertura_pct', 0))),
-                            using_db=conn
-                        )
-                        
-                        adjudicaciones_creadas.append(adjudicacion)
-                        
-                        logger.info(
-                            f"Adjudicación creada: {repuesto.nombre} → "
-                            f"{oferta_ganadora.asesor.usuario.nombre_completo} "
-                            f"(${detalle_ganador.precio_unitario:,.0f})"
-                        )
+                await EvaluacionService._guardar_puntajes(detalles_puntuados, using_db=conn)
                 
-                # Calculate totals
-                monto_total_adjudicado = sum(
-                    adj.precio_adjudicado * adj.cantidad_adjudicada 
-                    for adj in adjudicaciones_creadas
-                )
-                
-                # Update offer states based on evaluation results
-                ofertas_ganadoras_ids = set(adj.oferta.id for adj in adjudicaciones_creadas)
-                
-                for oferta in ofertas_activas:
-                    if oferta.id in ofertas_ganadoras_ids:
-                        oferta.estado = EstadoOferta.GANADORA
-                    else:
-                        oferta.estado = EstadoOferta.NO_SELECCIONADA
-                    await oferta.save(using_db=conn)
+                if adjudicaciones_creadas:
+                    await AdjudicacionRepuesto.bulk_create(
+                        adjudicaciones_creadas,
+                        batch_size=500,
+                        using_db=conn
+                    )
                 
-                # Update solicitud state
-                nuevo_estado = EstadoSolicitud.EVALUADA
-                if len(adjudicaciones_creadas) == 0:
-                    nuevo_estado = EstadoSolicitud.CERRADA_SIN_OFERTAS
+                fecha_actualizacion = now_utc()
+                for estado in (EstadoOferta.GANADORA, EstadoOferta.NO_SELECCIONADA):
+                    ids_estado = [oferta.id for oferta in ofertas_activas if oferta.estado == estado]
+                    if ids_estado:
+                        await Oferta.filter(id__in=ids_estado).using_db(conn).update(
+                            estado=estado,
+                            updated_at=fecha_actualizacion
+                        )
                 
-                await solicitud.update_from_dict({
-                    'estado': nuevo_estado,
-                    'fecha_evaluacion': datetime.now(),
-                    'monto_total_adjudicado': monto_total_adjudicado
-                })
                 await solicitud.save(using_db=conn)
             
             # Transaction committed successfully
             
             # Registrar eventos de ofertas adjudicadas
             try:
-                for oferta_id in ofertas_ganadoras_ids:
-                    await events_service.on_oferta_adjudicada(oferta_id)
+                await events_service.on_ofertas_adjudicadas(ofertas_ganadoras_ids)
             except Exception as e:
                 logger.error(f"Error registrando eventos de ofertas adjudicadas: {e}")
             
@@ -4,12 +4,18 @@ Estos eventos poblarán las tablas auxiliares para métricas de escalamiento
 """
 import logging
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List
 from uuid import UUID
+from tortoise.transactions import in_transaction
 from models.analytics import OfertaHistorica, HistorialRespuestaOferta
+from services.metricas_asesor_service import MetricasAsesorService
+from services.dashboard_asesor_service import DashboardAsesorService
 
 logger = logging.getLogger(__name__)
 
+# Filas por INSERT al registrar envíos masivos en historial_respuestas_ofertas
+TAMANO_LOTE_HISTORIAL = 1000
+
 
 class EventsService:
     """
@@ -36,6 +42,7 @@ class EventsService:
             await OfertaHistorica.create(
                 asesor_id=asesor_id,
                 solicitud_id=solicitud_id,
+                oferta_id=oferta_id,
                 fecha=datetime.utcnow().date(),
                 adjudicada=False,  # Se actualizará cuando se evalúe
                 aceptada_cliente=False,
@@ -47,6 +54,8 @@ class EventsService:
                 ciudad_asesor=ciudad_asesor,
                 metadata_oferta={'oferta_id': str(oferta_id), 'estado': estado}
             )
+            await MetricasAsesorService.registrar_oferta(asesor_id, tiempo_respuesta_seg or 0)
+            await DashboardAsesorService.invalidar([asesor_id])
             logger.info(f"✅ Evento oferta_created registrado: {oferta_id}")
         except Exception as e:
             logger.error(f"❌ Error registrando evento oferta_created: {e}", exc_info=True)
@@ -57,17 +66,65 @@ class EventsService:
         Evento: Una oferta fue adjudicada (ganadora)
         Actualiza ofertas_historicas
         """
+        await EventsService.on_ofertas_adjudicadas([oferta_id])
+    
+    @staticmethod
+    async def on_ofertas_adjudicadas(oferta_ids: Iterable[UUID]):
+        """
+        Evento: Ofertas adjudicadas en una evaluación (una o varias ganadoras)
+        Marca ofertas_historicas por oferta_id: solo cuentan en las métricas las filas
+        que este llamado pasó de no adjudicada a adjudicada
+        """
         try:
-            # Buscar por metadata_oferta que contiene el oferta_id
-            ofertas_hist = await OfertaHistorica.all()
-            for oferta_hist in ofertas_hist:
-                if oferta_hist.metadata_oferta.get('oferta_id') == str(oferta_id):
-                    oferta_hist.adjudicada = True
-                    await oferta_hist.save()
-                    logger.info(f"✅ Oferta marcada como adjudicada: {oferta_id}")
-                    break
+            ids = list(dict.fromkeys(str(oferta_id) for oferta_id in oferta_ids))
+            if not ids:
+                return
+            
+            async with in_transaction() as conn:
+                # FOR UPDATE: una evaluación concurrente espera y ya no ve estas filas como no adjudicadas
+                marcadas = await OfertaHistorica.filter(
+                    oferta_id__in=ids, adjudicada=False
+                ).select_for_update().using_db(conn).values("id", "asesor_id")
+                if marcadas:
+                    await OfertaHistorica.filter(
+                        id__in=[fila["id"] for fila in marcadas], adjudicada=False
+                    ).using_db(conn).update(adjudicada=True)
+            asesor_ids = [str(fila["asesor_id"]) for fila in marcadas]
+            
+            if asesor_ids:
+                await MetricasAsesorService.registrar_adjudicacion(asesor_ids)
+                await DashboardAsesorService.invalidar(asesor_ids)
+            
+            logger.info(f"✅ Ofertas marcadas como adjudicadas: {len(asesor_ids)}/{len(ids)}")
         except Exception as e:
-            logger.error(f"❌ Error actualizando oferta adjudicada: {e}", exc_info=True)
+            logger.error(f"❌ Error actualizando ofertas adjudicadas: {e}", exc_info=True)
+    
+    @staticmethod
+    def construir_historial_escalada(
+        solicitud_id: UUID,
+        asesores_notificados: List[Dict[str, Any]],
+        nivel: int,
+        canal: str,
+        fecha_envio: datetime = None
+    ) -> List[HistorialRespuestaOferta]:
+        """
+        Filas de historial_respuestas_ofertas (sin guardar) para un envío de escalamiento
+        Permite insertarlas con bulk_create dentro de la transacción del llamador
+        """
+        fecha_envio = fecha_envio or datetime.utcnow()
+        return [
+            HistorialRespuestaOferta(
+                asesor_id=asesor_data.get('asesor_id'),
+                solicitud_id=solicitud_id,
+                fecha_envio=fecha_envio,
+                fecha_vista=None,  # Se actualizará cuando el asesor vea la solicitud
+                respondio=False,  # Se actualizará cuando envíe oferta
+                tiempo_respuesta_seg=None,
+                nivel_escalamiento=nivel,
+                canal_notificacion=canal
+            )
+            for asesor_data in asesores_notificados
+        ]
     
     @staticmethod
     async def on_solicitud_escalada(
@@ -81,21 +138,17 @@ class EventsService:
         Pobla la tabla historial_respuestas_ofertas para cálculo de actividad
         """
         try:
-            fecha_envio = datetime.utcnow()
+            historial = EventsService.construir_historial_escalada(
+                solicitud_id, asesores_notificados, nivel, canal
+            )
+            await HistorialRespuestaOferta.bulk_create(historial, batch_size=TAMANO_LOTE_HISTORIAL)
             
-            for asesor_data in asesores_notificados:
-                asesor_id = asesor_data.get('asesor_id')
-                
-                await HistorialRespuestaOferta.create(
-                    asesor_id=asesor_id,
-                    solicitud_id=solicitud_id,
-                    fecha_envio=fecha_envio,
-                    fecha_vista=None,  # Se actualizará cuando el asesor vea la solicitud
-                    respondio=False,  # Se actualizará cuando envíe oferta
-                    tiempo_respuesta_seg=None,
-                    nivel_escalamiento=nivel,
-                    canal_notificacion=canal
-                )
+            await MetricasAsesorService.registrar_envios(
+                asesor_data.get('asesor_id') for asesor_data in asesores_notificados
+            )
+            await DashboardAsesorService.invalidar(
+                asesor_data.get('asesor_id') for asesor_data in asesores_notificados
+            )
             
             logger.info(f"✅ Evento solicitud_escalada registrado: {len(asesores_notificados)} asesores notificados")
         except Exception as e:
@@ -118,10 +171,13 @@ class EventsService:
             ).first()
             
             if historial:
+                ya_respondio = historial.respondio
                 historial.respondio = True
                 historial.tiempo_respuesta_seg = tiempo_respuesta_seg
                 historial.fecha_respuesta = datetime.utcnow()
                 await historial.save()
+                if not ya_respondio:
+                    await MetricasAsesorService.registrar_respuesta(asesor_id)
                 logger.info(f"✅ Asesor {asesor_id} marcado como respondido")
         except Exception as e:
             logger.error(f"❌ Error actualizando respuesta de asesor: {e}", exc_info=True)
@@ -133,14 +189,19 @@ class EventsService:
         Actualiza ofertas_historicas para analytics
         """
         try:
-            # Actualizar tabla histórica
-            historico = await OfertaHistorica.filter(
-                metadata_oferta__contains={'oferta_id': oferta_id}
-            ).first()
+            # Actualizar tabla histórica (solo si cambia, para no duplicar métricas)
+            historico = await OfertaHistorica.filter(oferta_id=oferta_id).first()
             
             if historico:
-                historico.aceptada_cliente = True
-                await historico.save()
+                actualizada = await OfertaHistorica.filter(
+                    id=historico.id,
+                    aceptada_cliente=False
+                ).update(aceptada_cliente=True)
+                if historico.adjudicada and actualizada:
+                    await MetricasAsesorService.registrar_aceptacion(
+                        historico.asesor_id, aceptada=True, entrega_exitosa=historico.entrega_exitosa
+                    )
+                await DashboardAsesorService.invalidar([historico.asesor_id])
                 logger.info(f"✅ Evento cliente_acepto_oferta registrado: {oferta_id}")
             else:
                 logger.warning(f"⚠️ No se encontró registro histórico para oferta {oferta_id}")
@@ -154,14 +215,19 @@ class EventsService:
         Actualiza ofertas_historicas para analytics
         """
         try:
-            # Actualizar tabla histórica
-            historico = await OfertaHistorica.filter(
-                metadata_oferta__contains={'oferta_id': oferta_id}
-            ).first()
+            # Actualizar tabla histórica (solo si cambia, para no duplicar métricas)
+            historico = await OfertaHistorica.filter(oferta_id=oferta_id).first()
             
             if historico:
-                historico.aceptada_cliente = False
-                await historico.save()
+                revertida = await OfertaHistorica.filter(
+                    id=historico.id,
+                    aceptada_cliente=True
+                ).update(aceptada_cliente=False)
+                if historico.adjudicada and revertida:
+                    await MetricasAsesorService.registrar_aceptacion(
+                        historico.asesor_id, aceptada=False, entrega_exitosa=historico.entrega_exitosa
+                    )
+                await DashboardAsesorService.invalidar([historico.asesor_id])
                 logger.info(f"✅ Evento cliente_rechazo_oferta registrado: {oferta_id}")
             else:
                 logger.warning(f"⚠️ No se encontró registro histórico para oferta {oferta_id}")
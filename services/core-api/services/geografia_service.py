@@ -7,8 +7,31 @@ import pandas as pd
 from typing import Dict
 from fastapi import UploadFile, HTTPException
 import io
+import re
 from models.geografia import Municipio
+from models.solicitud import Solicitud
+from models.user import Asesor, Cliente
+from services.indice_geografico_service import indice_geografico_service
 from tortoise.transactions import in_transaction
+from utils.busqueda_municipios import normalizar_busqueda
+
+# Columnas del Excel que se guardan en Municipio
+CAMPOS_MUNICIPIO = [
+    'codigo_dane', 'municipio', 'municipio_norm', 'departamento',
+    'area_metropolitana', 'hub_logistico', 'clasificacion'
+]
+CLASIFICACIONES = ('PRINCIPAL', 'SECUNDARIA', 'TERCIARIA')
+LOTE_MUNICIPIOS = 500
+
+
+def _normalizar_serie(serie: pd.Series) -> pd.Series:
+    """Municipio.normalizar_ciudad por columna: mayúsculas, sin tildes, sin espacios extremos"""
+    return serie.str.strip().str.upper().str.normalize('NFD').str.replace(r'[\u0300-\u036f]', '', regex=True)
+
+
+def _limpiar_codigo(codigo) -> str:
+    """Código DANE como lo guarda preparar_divipola (sin el '.0' de las celdas numéricas)"""
+    return re.sub(r'\.0$', '', str(codigo).strip())
 
 
 class GeografiaService:
@@ -27,6 +50,7 @@ class GeografiaService:
         - departamento: Departamento
         - area_metropolitana: Área metropolitana (opcional, NULL si no aplica)
         - hub_logistico: Hub logístico asignado
+        - clasificacion: PRINCIPAL, SECUNDARIA o TERCIARIA (opcional)
         """
         
         # Validar archivo
@@ -40,85 +64,10 @@ class GeografiaService:
             # Leer archivo Excel
             contents = await file.read()
             df = pd.read_excel(io.BytesIO(contents))
+            return await GeografiaService.importar_divipola(df)
             
-            # Validar columnas requeridas
-            required_columns = ['municipio', 'departamento', 'hub_logistico']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Columnas faltantes: {', '.join(missing_columns)}"
-                )
-            
-            # Limpiar y validar datos
-            df = df.dropna(subset=required_columns)
-            df['municipio'] = df['municipio'].str.strip()
-            df['municipio_norm'] = df['municipio'].str.strip().str.upper()
-            df['departamento'] = df['departamento'].str.strip()
-            df['hub_logistico'] = df['hub_logistico'].str.strip().str.upper()
-            
-            # Normalizar área metropolitana (puede ser NULL)
-            if 'area_metropolitana' in df.columns:
-                df['area_metropolitana'] = df['area_metropolitana'].str.strip()
-                df.loc[df['area_metropolitana'].isna(), 'area_metropolitana'] = None
-            else:
-                df['area_metropolitana'] = None
-            
-            # Normalizar código DANE
-            if 'codigo_dane' in df.columns:
-                df['codigo_dane'] = df['codigo_dane'].astype(str).str.strip()
-            else:
-                df['codigo_dane'] = None
-            
-            # Validar datos duplicados por municipio_norm
-            duplicados = df.duplicated(subset=['municipio_norm'])
-            if duplicados.any():
-                filas_duplicadas = df[duplicados]['municipio'].tolist()
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Municipios duplicados encontrados: {', '.join(filas_duplicadas[:5])}"
-                )
-            
-            # Importar datos en transacción
-            async with in_transaction() as conn:
-                # Limpiar datos existentes
-                await Municipio.all().using_db(conn).delete()
-                
-                # Insertar nuevos datos
-                municipios_creados = []
-                for _, row in df.iterrows():
-                    municipio = await Municipio.create(
-                        codigo_dane=row.get('codigo_dane'),
-                        municipio=row['municipio'],
-                        municipio_norm=row['municipio_norm'],
-                        departamento=row['departamento'],
-                        area_metropolitana=row.get('area_metropolitana'),
-                        hub_logistico=row['hub_logistico'],
-                        using_db=conn
-                    )
-                    municipios_creados.append(municipio)
-            
-            # Estadísticas de importación
-            total_municipios = len(municipios_creados)
-            total_departamentos = df['departamento'].nunique()
-            total_areas_metro = df['area_metropolitana'].dropna().nunique()
-            total_hubs = df['hub_logistico'].nunique()
-            municipios_con_am = df['area_metropolitana'].notna().sum()
-            
-            return {
-                "success": True,
-                "message": f"Importados {total_municipios} municipios exitosamente",
-                "estadisticas": {
-                    "total_municipios": total_municipios,
-                    "total_departamentos": total_departamentos,
-                    "total_areas_metropolitanas": total_areas_metro,
-                    "total_hubs_logisticos": total_hubs,
-                    "municipios_con_area_metropolitana": int(municipios_con_am),
-                    "municipios_sin_area_metropolitana": total_municipios - int(municipios_con_am)
-                }
-            }
-            
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except pd.errors.EmptyDataError:
             raise HTTPException(
                 status_code=400,
@@ -130,6 +79,155 @@ class GeografiaService:
                 detail=f"Error procesando archivo: {str(e)}"
             )
     
+    @staticmethod
+    def preparar_divipola(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Limpia y normaliza el DataFrame DIVIPOLA con operaciones por columna
+        
+        Returns:
+            DataFrame con las columnas de Municipio (valores nulos como None)
+            
+        Raises:
+            ValueError: Si faltan columnas requeridas o hay municipios duplicados
+        """
+        required_columns = ['municipio', 'departamento', 'hub_logistico']
+        missing_columns = [col for col in required_columns if col not in df.columns]
+        if missing_columns:
+            raise ValueError(f"Columnas faltantes: {', '.join(missing_columns)}")
+        
+        df = df.dropna(subset=required_columns).copy()
+        df['municipio'] = df['municipio'].astype(str).str.strip()
+        df['municipio_norm'] = _normalizar_serie(df['municipio'])
+        df['departamento'] = df['departamento'].astype(str).str.strip()
+        df['hub_logistico'] = df['hub_logistico'].astype(str).str.strip().str.upper()
+        
+        # Área metropolitana (puede ser NULL)
+        if 'area_metropolitana' in df.columns:
+            areas = df['area_metropolitana'].astype(str).str.strip()
+            df['area_metropolitana'] = areas.where(df['area_metropolitana'].notna() & (areas != ''))
+        else:
+            df['area_metropolitana'] = None
+        
+        # Código DANE (las celdas numéricas de Excel llegan como float: 5001.0)
+        if 'codigo_dane' in df.columns:
+            codigos = df['codigo_dane'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+            df['codigo_dane'] = codigos.where(df['codigo_dane'].notna() & (codigos != ''))
+        else:
+            df['codigo_dane'] = None
+        
+        # Clasificación (singular; valores desconocidos pasan a TERCIARIA)
+        if 'clasificacion' in df.columns:
+            clasificacion = df['clasificacion'].astype(str).str.strip().str.upper().str.replace(r'ES$|S$', '', regex=True)
+            df['clasificacion'] = clasificacion.where(clasificacion.isin(CLASIFICACIONES), 'TERCIARIA')
+        
+        # Un municipio se identifica por código DANE o por nombre dentro del departamento
+        df['_clave_nombre'] = df['municipio_norm'] + '|' + _normalizar_serie(df['departamento'])
+        for columna, datos in (('codigo_dane', df[df['codigo_dane'].notna()]), ('_clave_nombre', df)):
+            duplicados = datos.duplicated(subset=[columna])
+            if duplicados.any():
+                filas_duplicadas = datos[duplicados]['municipio'].tolist()
+                raise ValueError(f"Municipios duplicados encontrados: {', '.join(filas_duplicadas[:5])}")
+        
+        columnas = [col for col in CAMPOS_MUNICIPIO if col in df.columns] + ['_clave_nombre']
+        df = df[columnas].astype(object)
+        return df.where(df.notna(), None)
+    
+    @staticmethod
+    async def importar_divipola(df: pd.DataFrame) -> Dict:
+        """
+        Sincroniza la tabla municipios con el DataFrame DIVIPOLA
+        
+        Cada fila se empareja con el municipio existente por código DANE o por
+        (municipio_norm, departamento), conservando su id (los asesores, clientes
+        y solicitudes siguen apuntando al mismo municipio). Las filas nuevas se
+        insertan y las modificadas se actualizan por lotes en una transacción
+        corta; los municipios que ya no están en el archivo se eliminan solo si
+        nada los referencia. El índice geográfico se reconstruye una vez al final.
+        
+        Returns:
+            Dict con el diff (agregados/actualizados/eliminados) y estadísticas
+            
+        Raises:
+            ValueError: Si el archivo no es válido (ver preparar_divipola)
+        """
+        df = GeografiaService.preparar_divipola(df)
+        campos = [col for col in CAMPOS_MUNICIPIO if col in df.columns]
+        
+        # Claves de los existentes con la misma limpieza que las filas nuevas: las filas
+        # cargadas antes (p. ej. códigos "5001.0" o municipio_norm sin normalizar) se emparejan
+        existentes = await Municipio.all()
+        por_codigo = {_limpiar_codigo(m.codigo_dane): m for m in existentes if m.codigo_dane}
+        por_nombre = {
+            f"{Municipio.normalizar_ciudad(m.municipio)}|{Municipio.normalizar_ciudad(m.departamento)}": m
+            for m in existentes
+        }
+        
+        nuevos, actualizados, emparejados = [], [], set()
+        for fila in df.to_dict('records'):
+            clave_nombre = fila.pop('_clave_nombre')
+            municipio = por_codigo.get(fila['codigo_dane']) or por_nombre.get(clave_nombre)
+            
+            if municipio is None or municipio.id in emparejados:
+                nuevos.append(Municipio(**fila))
+                continue
+            
+            emparejados.add(municipio.id)
+            cambios = {campo: valor for campo, valor in fila.items() if getattr(municipio, campo) != valor}
+            if cambios:
+                municipio.update_from_dict(cambios)
+                actualizados.append(municipio)
+        
+        sobrantes = [m for m in existentes if m.id not in emparejados]
+        referenciados = set()
+        if sobrantes:
+            ids_sobrantes = [m.id for m in sobrantes]
+            for modelo in (Asesor, Cliente, Solicitud):
+                referenciados.update(
+                    await modelo.filter(municipio_id__in=ids_sobrantes).distinct().values_list('municipio_id', flat=True)
+                )
+        eliminados = [m for m in sobrantes if m.id not in referenciados]
+        conservados = [m for m in sobrantes if m.id in referenciados]
+        
+        async with in_transaction() as conn:
+            if nuevos:
+                await Municipio.bulk_create(nuevos, batch_size=LOTE_MUNICIPIOS, using_db=conn)
+            if actualizados:
+                await Municipio.bulk_update(actualizados, fields=campos, batch_size=LOTE_MUNICIPIOS, using_db=conn)
+            if eliminados:
+                await Municipio.filter(id__in=[m.id for m in eliminados]).using_db(conn).delete()
+        
+        if nuevos or actualizados or eliminados:
+            await indice_geografico_service.invalidar("importación DIVIPOLA")
+            await indice_geografico_service.obtener()
+        
+        # Estadísticas de importación
+        total_municipios = len(df)
+        municipios_con_am = int(df['area_metropolitana'].notna().sum())
+        
+        return {
+            "success": True,
+            "message": (
+                f"Importados {total_municipios} municipios: {len(nuevos)} nuevos, "
+                f"{len(actualizados)} actualizados, {len(eliminados)} eliminados"
+            ),
+            "diff": {
+                "agregados": len(nuevos),
+                "actualizados": len(actualizados),
+                "sin_cambios": len(emparejados) - len(actualizados),
+                "eliminados": len(eliminados),
+                # Ya no están en el archivo pero tienen asesores, clientes o solicitudes
+                "conservados_con_referencias": [f"{m.municipio} - {m.departamento}" for m in conservados]
+            },
+            "estadisticas": {
+                "total_municipios": total_municipios,
+                "total_departamentos": int(df['departamento'].nunique()),
+                "total_areas_metropolitanas": int(df['area_metropolitana'].dropna().nunique()),
+                "total_hubs_logisticos": int(df['hub_logistico'].nunique()),
+                "municipios_con_area_metropolitana": municipios_con_am,
+                "municipios_sin_area_metropolitana": total_municipios - municipios_con_am
+            }
+        }
+    
     @staticmethod
     async def validar_integridad_geografica() -> Dict:
         """
@@ -204,15 +302,10 @@ class GeografiaService:
         if not ciudad:
             return False
             
-        # Normalizar ciudad para búsqueda
-        ciudad_norm = Municipio.normalizar_ciudad(ciudad)
-        
-        # Buscar municipio
-        query = Municipio.filter(municipio_norm=ciudad_norm)
-        if departamento:
-            query = query.filter(departamento__icontains=departamento)
-        
-        return await query.exists()
+        coincidencias = await indice_geografico_service.buscar_municipios_por_nombre(
+            ciudad, limite=1, departamento=departamento
+        )
+        return bool(coincidencias) and coincidencias[0].tipo in ('exacta', 'alias')
     
     @staticmethod
     async def get_estadisticas_geograficas() -> Dict:
@@ -290,23 +383,32 @@ class GeografiaService:
             Lista de municipios que coinciden con los filtros
         """
         
-        filters = Municipio.all()
+        hub_norm = hub.strip().upper() if hub else None
         
+        # Búsqueda por nombre: índice en memoria, ordenado por relevancia
         if query:
-            query_norm = Municipio.normalizar_ciudad(query)
-            filters = filters.filter(municipio_norm__icontains=query_norm)
-        
-        if departamento:
-            filters = filters.filter(departamento__icontains=departamento)
-        
-        if hub:
-            hub_norm = hub.strip().upper()
-            filters = filters.filter(hub_logistico=hub_norm)
-        
-        if area_metropolitana:
-            filters = filters.filter(area_metropolitana__icontains=area_metropolitana)
-        
-        municipios = await filters.limit(limit)
+            area_norm = normalizar_busqueda(area_metropolitana)
+            coincidencias = await indice_geografico_service.buscar_municipios_por_nombre(
+                query, limite=None, departamento=departamento
+            )
+            municipios = [
+                c.municipio for c in coincidencias
+                if (not hub_norm or c.municipio.hub_logistico == hub_norm)
+                and (not area_norm or area_norm in normalizar_busqueda(c.municipio.area_metropolitana))
+            ][:limit]
+        else:
+            filters = Municipio.all()
+            
+            if departamento:
+                filters = filters.filter(departamento__icontains=departamento)
+            
+            if hub_norm:
+                filters = filters.filter(hub_logistico=hub_norm)
+            
+            if area_metropolitana:
+                filters = filters.filter(area_metropolitana__icontains=area_metropolitana)
+            
+            municipios = await filters.limit(limit)
         
         return [
             {
@@ -0,0 +1,269 @@
+"""
+Índice Geográfico en memoria para TeLOO V3
+Mantiene municipios y asesores activos indexados por municipio, área metropolitana
+y hub logístico para que la selección de candidatos y la proximidad del escalamiento
+no consulten la base de datos en cada solicitud.
+
+Se invalida al importar DIVIPOLA o al modificar asesores/usuarios (también en las
+demás réplicas, vía Redis) y se reconstruye de forma perezosa en el siguiente uso,
+con TTL de seguridad para cambios externos.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from models.enums import EstadoAsesor, EstadoUsuario
+from models.geografia import Municipio
+from models.user import Asesor
+from utils.busqueda_municipios import Coincidencia, IndiceNombresMunicipios
+from utils.datetime_utils import now_utc
+from utils.sincronizacion_cache import sincronizacion_cache
+
+logger = logging.getLogger(__name__)
+
+# Reconstrucción forzada aunque nadie invalide (cambios desde otros procesos o scripts)
+TTL_INDICE_MINUTOS = 10
+CANAL_INVALIDACION_INDICE = "geografia:indice:invalidacion"
+
+
+def _es_area_metropolitana(area: Optional[str]) -> bool:
+    """Un municipio pertenece a un área metropolitana si el campo tiene valor y no es 'NO'"""
+    return bool(area) and area != 'NO'
+
+
+class _Indice:
+    """
+    Snapshot inmutable de municipios y asesores activos
+    """
+
+    def __init__(self, municipios: List[Municipio], asesores: List[Asesor]):
+        self.municipios: Dict[str, Municipio] = {}
+        self.municipios_por_nombre: Dict[Tuple[str, str], Municipio] = {}
+        self.asesores: Dict[str, Asesor] = {}
+        self.asesores_por_municipio: Dict[str, Set[str]] = {}
+        self.asesores_por_area: Dict[str, Set[str]] = {}
+        self.asesores_por_hub: Dict[str, Set[str]] = {}
+        self.asesores_areas_metro: Set[str] = set()
+
+        for municipio in municipios:
+            self.municipios[str(municipio.id)] = municipio
+            self.municipios_por_nombre.setdefault(
+                (municipio.municipio_norm, municipio.departamento), municipio
+            )
+
+        self.nombres = IndiceNombresMunicipios(municipios)
+
+        for asesor in asesores:
+            asesor_id = str(asesor.id)
+            self.asesores[asesor_id] = asesor
+
+            municipio = asesor.municipio
+            if not municipio:
+                continue
+
+            self.asesores_por_municipio.setdefault(str(municipio.id), set()).add(asesor_id)
+            self.asesores_por_hub.setdefault(municipio.hub_logistico, set()).add(asesor_id)
+            if _es_area_metropolitana(municipio.area_metropolitana):
+                self.asesores_por_area.setdefault(municipio.area_metropolitana, set()).add(asesor_id)
+                self.asesores_areas_metro.add(asesor_id)
+
+        self.construido_en = now_utc()
+
+
+class IndiceGeograficoService:
+    """
+    Servicio del índice geográfico en memoria (un snapshot por proceso)
+    """
+
+    def __init__(self, ttl_minutos: int = TTL_INDICE_MINUTOS):
+        self.ttl = timedelta(minutes=ttl_minutos)
+        self._indice: Optional[_Indice] = None
+        self._version = 0
+        self._lock = asyncio.Lock()
+        self._reconstrucciones = 0
+        self._ultima_duracion_ms: Optional[int] = None
+        self._ultima_invalidacion: Optional[Dict[str, Any]] = None
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def _descartar(self, motivo: str) -> None:
+        self._version += 1
+        self._indice = None
+        self._ultima_invalidacion = {'motivo': motivo, 'fecha': now_utc().isoformat()}
+        logger.info(f"🗺️ Índice geográfico invalidado: {motivo}")
+
+    async def invalidar(self, motivo: str) -> None:
+        """
+        Descarta el índice actual en esta y las demás réplicas; se reconstruye en el siguiente uso
+
+        Args:
+            motivo: Descripción del cambio (para logs y estado)
+        """
+        self._descartar(motivo)
+        await sincronizacion_cache.publicar(CANAL_INVALIDACION_INDICE, {'motivo': motivo})
+
+    def _aplicar_invalidacion(self, datos: Dict[str, Any]) -> None:
+        """Descarta el índice local cuando otra réplica modifica municipios o asesores"""
+        self._descartar(f"{datos.get('motivo')} (otra réplica)")
+
+    def _vigente(self) -> bool:
+        return self._indice is not None and now_utc() - self._indice.construido_en < self.ttl
+
+    async def obtener(self) -> _Indice:
+        """
+        Retorna el índice vigente, reconstruyéndolo si fue invalidado o venció el TTL
+        """
+        if self._vigente():
+            return self._indice
+
+        async with self._lock:
+            if self._vigente():
+                return self._indice
+
+            version = self._version
+            inicio = datetime.now()
+
+            municipios = await Municipio.all()
+            asesores = await Asesor.filter(
+                estado=EstadoAsesor.ACTIVO,
+                usuario__estado=EstadoUsuario.ACTIVO
+            ).prefetch_related('usuario', 'municipio').all()
+
+            indice = _Indice(municipios, asesores)
+            self._reconstrucciones += 1
+            self._ultima_duracion_ms = int((datetime.now() - inicio).total_seconds() * 1000)
+
+            # Si hubo una invalidación durante la carga, se usa para esta llamada pero no se guarda
+            if version == self._version:
+                self._indice = indice
+
+            logger.info(
+                f"🗺️ Índice geográfico reconstruido: {len(indice.municipios)} municipios, "
+                f"{len(indice.asesores)} asesores activos en {self._ultima_duracion_ms}ms"
+            )
+            return indice
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    async def obtener_municipio(self, municipio_id: Any) -> Optional[Municipio]:
+        """Obtiene un municipio por ID"""
+        indice = await self.obtener()
+        return indice.municipios.get(str(municipio_id))
+
+    async def buscar_municipio(self, ciudad: str, departamento: str) -> Optional[Municipio]:
+        """
+        Busca un municipio por ciudad y departamento (normalizados)
+        Equivalente a Municipio.get_or_none(municipio_norm=..., departamento=...)
+        """
+        indice = await self.obtener()
+        return indice.municipios_por_nombre.get((
+            Municipio.normalizar_ciudad(ciudad),
+            Municipio.normalizar_ciudad(departamento)
+        ))
+
+    async def buscar_municipios_por_nombre(
+        self,
+        texto: str,
+        limite: Optional[int] = 10,
+        departamento: Optional[str] = None
+    ) -> List[Coincidencia]:
+        """
+        Municipios que coinciden con un nombre escrito por el usuario, de mejor a peor
+        (exacta, alias, prefijo, prefijo de palabra y con errores de digitación)
+        """
+        indice = await self.obtener()
+        return indice.nombres.buscar(texto, limite, departamento)
+
+    async def asesores_activos(self) -> List[Asesor]:
+        """Todos los asesores activos (con usuario y municipio precargados)"""
+        indice = await self.obtener()
+        return list(indice.asesores.values())
+
+    async def asesores_elegibles(self, municipio_solicitud: Municipio) -> Dict[str, Any]:
+        """
+        Asesores elegibles para un municipio según las 3 características geográficas
+
+        Returns:
+            Dict: {'misma_ciudad', 'areas_metropolitanas', 'hub_logistico': Set[str], 'asesores': List[Asesor]}
+        """
+        indice = await self.obtener()
+
+        misma_ciudad = indice.asesores_por_municipio.get(str(municipio_solicitud.id), set())
+        hub = indice.asesores_por_hub.get(municipio_solicitud.hub_logistico, set())
+        elegibles = misma_ciudad | indice.asesores_areas_metro | hub
+
+        return {
+            'misma_ciudad': misma_ciudad,
+            'areas_metropolitanas': indice.asesores_areas_metro,
+            'hub_logistico': hub,
+            'asesores': [asesor for asesor_id, asesor in indice.asesores.items() if asesor_id in elegibles]
+        }
+
+    async def proximidades(self, municipio_solicitud: Municipio) -> Dict[str, Tuple[Decimal, str]]:
+        """
+        Proximidad de todos los asesores activos con municipio respecto a la solicitud
+        Mismos niveles que EscalamientoService.calcular_proximidad, resueltos por pertenencia a conjuntos
+
+        Returns:
+            Dict: {asesor_id: (puntaje_proximidad, criterio)}
+        """
+        indice = await self.obtener()
+
+        area = municipio_solicitud.area_metropolitana
+        niveles = [
+            (indice.asesores_por_municipio.get(str(municipio_solicitud.id), set()), Decimal('5.0'), "misma_ciudad"),
+            (indice.asesores_por_area.get(area, set()) if _es_area_metropolitana(area) else set(),
+             Decimal('4.0'), "area_metropolitana"),
+            (indice.asesores_por_hub.get(municipio_solicitud.hub_logistico, set()), Decimal('3.5'), "hub_logistico"),
+        ]
+
+        resultado = {}
+        for asesor_id, asesor in indice.asesores.items():
+            if not asesor.municipio:
+                continue
+            for conjunto, puntaje, criterio in niveles:
+                if asesor_id in conjunto:
+                    resultado[asesor_id] = (puntaje, criterio)
+                    break
+            else:
+                resultado[asesor_id] = (Decimal('3.0'), "fuera_de_cobertura")
+
+        return resultado
+
+    def get_estado(self) -> Dict[str, Any]:
+        """
+        Estado del índice para el endpoint administrativo
+        """
+        indice = self._indice
+        estado = {
+            'construido': indice is not None,
+            'ttl_minutos': int(self.ttl.total_seconds() // 60),
+            'reconstrucciones': self._reconstrucciones,
+            'ultima_duracion_ms': self._ultima_duracion_ms,
+            'ultima_invalidacion': self._ultima_invalidacion
+        }
+
+        if indice is not None:
+            estado.update({
+                'construido_en': indice.construido_en.isoformat(),
+                'municipios': len(indice.municipios),
+                'asesores_activos': len(indice.asesores),
+                'municipios_con_asesores': len(indice.asesores_por_municipio),
+                'areas_metropolitanas': len(indice.asesores_por_area),
+                'hubs_logisticos': len(indice.asesores_por_hub),
+                'asesores_en_areas_metropolitanas': len(indice.asesores_areas_metro)
+            })
+
+        return estado
+
+
+# Instancia global del servicio
+indice_geografico_service = IndiceGeograficoService()
+sincronizacion_cache.registrar(CANAL_INVALIDACION_INDICE, indice_geografico_service._aplicar_invalidacion)
@@ -9,6 +9,7 @@ from models.user import Usuario, Cliente, Asesor
 from models.enums import RolUsuario, EstadoUsuario, TipoPQR, PrioridadPQR, EstadoPQR
 from models.analytics import ParametroConfig, PQR
 from models.geografia import Municipio
+from services.configuracion_service import ConfiguracionService
 
 logger = logging.getLogger(__name__)
 
@@ -62,13 +63,13 @@ class InitService:
             
             if existing_admin:
                 # Update existing admin password with proper bcrypt hash
-                password_hash = AuthService.get_password_hash(admin_password)
+                password_hash = await AuthService.get_password_hash_async(admin_password)
                 existing_admin.password_hash = password_hash
                 await existing_admin.save()
                 logger.info(f"🔄 Admin user updated: {admin_email}")
             else:
                 # Create new admin user with proper bcrypt hash
-                password_hash = AuthService.get_password_hash(admin_password)
+                password_hash = await AuthService.get_password_hash_async(admin_password)
                 await Usuario.create(
                     email=admin_email,
                     password_hash=password_hash,
@@ -142,6 +143,7 @@ class InitService:
                     logger.debug(f"⏭️ Config parameter already exists: {clave}")
             
             if params_created > 0:
+                ConfiguracionService.invalidar_cache()
                 logger.info(f"✅ Created {params_created} configuration parameters")
             else:
                 logger.info("ℹ️ All configuration parameters already exist")
@@ -174,7 +176,7 @@ class InitService:
                 if not existing_user:
                     # Create user
                     from services.auth_service import AuthService
-                    password_hash = AuthService.get_password_hash("cliente123")
+                    password_hash = await AuthService.get_password_hash_async("cliente123")
                     user = await Usuario.create(
                         email=cliente_data["email"],
                         password_hash=password_hash,
@@ -226,7 +228,7 @@ class InitService:
                 if not existing_user:
                     # Create user
                     from services.auth_service import AuthService
-                    password_hash = AuthService.get_password_hash("asesor123")
+                    password_hash = await AuthService.get_password_hash_async("asesor123")
                     user = await Usuario.create(
                         email=asesor_data["email"],
                         password_hash=password_hash,
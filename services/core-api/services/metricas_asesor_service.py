@@ -0,0 +1,320 @@
+"""
+Servicio de Métricas de Asesores para TeLOO V3
+Mantiene la tabla metricas_asesores (ventana móvil por asesor) usada por el escalamiento:
+- Incrementos atómicos desde los eventos (EventsService)
+- Compactación nocturna que recalcula la ventana desde el historial
+- Lectura O(1) por asesor para el cálculo de puntajes
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from tortoise.expressions import F, Q
+from tortoise.functions import Count, Sum
+from tortoise.transactions import in_transaction
+
+from models.analytics import HistorialRespuestaOferta, MetricaAsesor, OfertaHistorica
+from utils.datetime_utils import add_days, now_utc
+
+logger = logging.getLogger(__name__)
+
+# Ventanas de la tabla precalculada (deben coincidir con los defaults del escalamiento)
+PERIODO_ACTIVIDAD_DIAS = 30
+PERIODO_DESEMPENO_MESES = 6
+
+# Máximo de IDs por consulta (límite de parámetros en Postgres)
+TAMANO_LOTE_METRICAS = 5000
+
+
+class MetricasAsesorService:
+    """
+    Servicio para el almacén de métricas móviles por asesor
+    """
+
+    # ------------------------------------------------------------------
+    # Consultas agregadas sobre el historial (fuente de verdad)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _lotes(asesor_ids: Optional[List[str]]) -> List[Optional[List[str]]]:
+        """Divide los IDs en bloques; None = todos los asesores en una sola consulta"""
+        if asesor_ids is None:
+            return [None]
+        return [asesor_ids[i:i + TAMANO_LOTE_METRICAS] for i in range(0, len(asesor_ids), TAMANO_LOTE_METRICAS)]
+
+    @staticmethod
+    async def agregar_actividad(
+        asesor_ids: Optional[List[str]] = None,
+        periodo_dias: int = PERIODO_ACTIVIDAD_DIAS
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        Cuenta notificaciones enviadas/respondidas por asesor en la ventana
+
+        Args:
+            asesor_ids: IDs a consultar (None = todos)
+            periodo_dias: Ventana de actividad
+
+        Returns:
+            Dict: {asesor_id: {'total_enviadas', 'total_respondidas'}}
+        """
+        fecha_inicio = add_days(now_utc(), -periodo_dias)
+        conteos = {}
+
+        for lote in MetricasAsesorService._lotes(asesor_ids):
+            query = HistorialRespuestaOferta.filter(fecha_envio__gte=fecha_inicio)
+            if lote is not None:
+                query = query.filter(asesor_id__in=lote)
+
+            filas = await query.annotate(
+                total_enviadas=Count('id'),
+                total_respondidas=Count('id', _filter=Q(respondio=True))
+            ).group_by('asesor_id').values('asesor_id', 'total_enviadas', 'total_respondidas')
+
+            for fila in filas:
+                conteos[str(fila['asesor_id'])] = {
+                    'total_enviadas': fila['total_enviadas'] or 0,
+                    'total_respondidas': fila['total_respondidas'] or 0
+                }
+
+        return conteos
+
+    @staticmethod
+    async def agregar_desempeno(
+        asesor_ids: Optional[List[str]] = None,
+        periodo_meses: int = PERIODO_DESEMPENO_MESES
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        Cuenta ofertas históricas adjudicadas/aceptadas/exitosas y tiempos por asesor
+
+        Args:
+            asesor_ids: IDs a consultar (None = todos)
+            periodo_meses: Ventana de desempeño
+
+        Returns:
+            Dict: {asesor_id: {'total_ofertas', 'total_adjudicadas', 'total_aceptadas',
+                               'total_exitosas', 'suma_tiempos_seg', 'total_con_tiempo'}}
+        """
+        fecha_inicio = add_days(now_utc(), -(periodo_meses * 30)).date()
+        conteos = {}
+
+        for lote in MetricasAsesorService._lotes(asesor_ids):
+            query = OfertaHistorica.filter(fecha__gte=fecha_inicio)
+            if lote is not None:
+                query = query.filter(asesor_id__in=lote)
+
+            filas = await query.annotate(
+                total_ofertas=Count('id'),
+                total_adjudicadas=Count('id', _filter=Q(adjudicada=True)),
+                total_aceptadas=Count('id', _filter=Q(adjudicada=True, aceptada_cliente=True)),
+                total_exitosas=Count(
+                    'id',
+                    _filter=Q(adjudicada=True, aceptada_cliente=True, entrega_exitosa=True)
+                ),
+                suma_tiempos_seg=Sum('tiempo_respuesta_seg', _filter=~Q(tiempo_respuesta_seg=0)),
+                total_con_tiempo=Count('id', _filter=~Q(tiempo_respuesta_seg=0))
+            ).group_by('asesor_id').values(
+                'asesor_id', 'total_ofertas', 'total_adjudicadas', 'total_aceptadas',
+                'total_exitosas', 'suma_tiempos_seg', 'total_con_tiempo'
+            )
+
+            for fila in filas:
+                conteos[str(fila['asesor_id'])] = {
+                    'total_ofertas': fila['total_ofertas'] or 0,
+                    'total_adjudicadas': fila['total_adjudicadas'] or 0,
+                    'total_aceptadas': fila['total_aceptadas'] or 0,
+                    'total_exitosas': fila['total_exitosas'] or 0,
+                    'suma_tiempos_seg': int(fila['suma_tiempos_seg'] or 0),
+                    'total_con_tiempo': fila['total_con_tiempo'] or 0
+                }
+
+        return conteos
+
+    # ------------------------------------------------------------------
+    # Lectura del almacén precalculado
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    async def obtener_metricas(asesor_ids: List[str]) -> Dict[str, MetricaAsesor]:
+        """
+        Obtiene las filas compactadas de un conjunto de asesores
+        Los asesores sin fila compactada no se incluyen (el llamador debe consultar el historial)
+
+        Args:
+            asesor_ids: IDs de asesores
+
+        Returns:
+            Dict: {asesor_id: MetricaAsesor}
+        """
+        metricas = {}
+
+        for lote in MetricasAsesorService._lotes([str(asesor_id) for asesor_id in asesor_ids]):
+            filas = await MetricaAsesor.filter(
+                asesor_id__in=lote,
+                fecha_compactacion__isnull=False
+            ).all()
+
+            for fila in filas:
+                metricas[str(fila.asesor_id)] = fila
+
+        return metricas
+
+    # ------------------------------------------------------------------
+    # Actualización incremental desde eventos
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    async def _incrementar(asesor_ids: Iterable[Any], **deltas: int) -> None:
+        """
+        Suma deltas a las métricas de los asesores con un UPDATE atómico (col = col + n)
+        Crea las filas faltantes (sin compactar) con los deltas positivos como valor inicial.
+        Los deltas negativos (reversiones) nunca dejan un contador bajo cero: solo se
+        aplican a filas existentes con valor suficiente y la compactación corrige el resto
+        """
+        ids = list(dict.fromkeys(str(asesor_id) for asesor_id in asesor_ids))
+        positivos = {campo: delta for campo, delta in deltas.items() if delta > 0}
+        negativos = {campo: delta for campo, delta in deltas.items() if delta < 0}
+
+        if not ids or not (positivos or negativos):
+            return
+
+        for lote in MetricasAsesorService._lotes(ids):
+            for campo, delta in negativos.items():
+                await MetricaAsesor.filter(asesor_id__in=lote, **{f"{campo}__gte": -delta}).update(
+                    **{campo: F(campo) + delta}
+                )
+
+            if not positivos:
+                continue
+
+            actualizadas = await MetricaAsesor.filter(asesor_id__in=lote).update(
+                **{campo: F(campo) + delta for campo, delta in positivos.items()}
+            )
+
+            if actualizadas < len(lote):
+                existentes = {
+                    str(asesor_id) for asesor_id in
+                    await MetricaAsesor.filter(asesor_id__in=lote).values_list('asesor_id', flat=True)
+                }
+                faltantes = [asesor_id for asesor_id in lote if asesor_id not in existentes]
+                if faltantes:
+                    # Filas en cero y luego el mismo UPDATE: si otra petición creó la fila
+                    # entre medio (conflicto ignorado) su delta y el nuestro se suman
+                    await MetricaAsesor.bulk_create(
+                        [MetricaAsesor(asesor_id=asesor_id) for asesor_id in faltantes],
+                        ignore_conflicts=True
+                    )
+                    await MetricaAsesor.filter(asesor_id__in=faltantes).update(
+                        **{campo: F(campo) + delta for campo, delta in positivos.items()}
+                    )
+
+    @staticmethod
+    async def registrar_envios(asesor_ids: Iterable[Any]) -> None:
+        """Evento: se notificó una solicitud a los asesores"""
+        await MetricasAsesorService._incrementar(asesor_ids, respuestas_enviadas=1)
+
+    @staticmethod
+    async def registrar_respuesta(asesor_id: Any) -> None:
+        """Evento: el asesor respondió una notificación"""
+        await MetricasAsesorService._incrementar([asesor_id], respuestas_respondidas=1)
+
+    @staticmethod
+    async def registrar_oferta(asesor_id: Any, tiempo_respuesta_seg: Optional[int]) -> None:
+        """Evento: el asesor envió una oferta"""
+        con_tiempo = bool(tiempo_respuesta_seg)
+        await MetricasAsesorService._incrementar(
+            [asesor_id],
+            ofertas_total=1,
+            suma_tiempo_respuesta_seg=tiempo_respuesta_seg if con_tiempo else 0,
+            ofertas_con_tiempo=1 if con_tiempo else 0
+        )
+
+    @staticmethod
+    async def registrar_adjudicacion(asesor_ids: Iterable[Any]) -> None:
+        """Evento: ofertas de los asesores adjudicadas (una por asesor)"""
+        await MetricasAsesorService._incrementar(asesor_ids, ofertas_adjudicadas=1)
+
+    @staticmethod
+    async def registrar_aceptacion(asesor_id: Any, aceptada: bool, entrega_exitosa: bool = False) -> None:
+        """Evento: el cliente aceptó (+1) o revirtió la aceptación (-1) de una oferta adjudicada"""
+        delta = 1 if aceptada else -1
+        await MetricasAsesorService._incrementar(
+            [asesor_id],
+            ofertas_aceptadas=delta,
+            ofertas_exitosas=delta if entrega_exitosa else 0
+        )
+
+    # ------------------------------------------------------------------
+    # Compactación nocturna
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    async def compactar() -> Dict[str, Any]:
+        """
+        Recalcula la ventana de todos los asesores desde el historial
+        Descarta los eventos que salieron de la ventana y corrige cualquier deriva
+        de los incrementos. Se crea una fila por asesor (en cero si no tiene datos)
+        para que el escalamiento no tenga que consultar el historial.
+
+        La tabla se bloquea contra escritura antes de leer el historial: los
+        incrementos concurrentes esperan al commit y se aplican sobre las filas
+        nuevas en lugar de perderse con el reemplazo.
+
+        Returns:
+            Dict: Estadísticas de la compactación
+        """
+        from models.user import Asesor
+
+        inicio = datetime.now()
+        fecha_compactacion = now_utc()
+
+        # Reemplazo atómico: los lectores ven la versión anterior hasta el commit
+        async with in_transaction() as conn:
+            if conn.capabilities.dialect == "postgres":
+                # Choca con el ROW EXCLUSIVE de UPDATE/INSERT, no con las lecturas
+                await conn.execute_script(
+                    f"LOCK TABLE {MetricaAsesor._meta.db_table} IN SHARE ROW EXCLUSIVE MODE"
+                )
+
+            asesor_ids = [str(asesor_id) for asesor_id in await Asesor.all().values_list('id', flat=True)]
+            actividad = await MetricasAsesorService.agregar_actividad()
+            desempeno = await MetricasAsesorService.agregar_desempeno()
+
+            filas = []
+            for asesor_id in asesor_ids:
+                act = actividad.get(asesor_id, {})
+                des = desempeno.get(asesor_id, {})
+                filas.append(MetricaAsesor(
+                    asesor_id=asesor_id,
+                    respuestas_enviadas=act.get('total_enviadas', 0),
+                    respuestas_respondidas=act.get('total_respondidas', 0),
+                    ofertas_total=des.get('total_ofertas', 0),
+                    ofertas_adjudicadas=des.get('total_adjudicadas', 0),
+                    ofertas_aceptadas=des.get('total_aceptadas', 0),
+                    ofertas_exitosas=des.get('total_exitosas', 0),
+                    suma_tiempo_respuesta_seg=des.get('suma_tiempos_seg', 0),
+                    ofertas_con_tiempo=des.get('total_con_tiempo', 0),
+                    fecha_compactacion=fecha_compactacion
+                ))
+
+            await MetricaAsesor.all().using_db(conn).delete()
+            if filas:
+                await MetricaAsesor.bulk_create(filas, batch_size=1000, using_db=conn)
+
+        con_datos = len(set(actividad) | set(desempeno))
+        duracion_ms = int((datetime.now() - inicio).total_seconds() * 1000)
+        logger.info(
+            f"Métricas de asesores compactadas: {len(filas)} asesores "
+            f"({con_datos} con datos en la ventana) en {duracion_ms}ms"
+        )
+
+        return {
+            'asesores_compactados': len(filas),
+            'asesores_con_datos': con_datos,
+            'duracion_ms': duracion_ms,
+            'fecha_compactacion': fecha_compactacion.isoformat()
+        }
+
+
+# Instancia global del servicio
+metricas_asesor_service = MetricasAsesorService()
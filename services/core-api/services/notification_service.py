@@ -1,8 +1,16 @@
 """
 Notification Service - Manages push notifications with WhatsApp fallback
+
+Notifications to many users (e.g. a wave of advisors for a new solicitud) go
+through send_notifications_batch: one Redis message per wave for the Realtime
+Gateway, one query for the WhatsApp fallback recipients, and a single pooled
+HTTP client with bounded concurrency.
 """
 
+import asyncio
 import logging
+import os
+import time
 from typing import Dict, List, Optional, Any
 from uuid import UUID
 import httpx
@@ -11,12 +19,20 @@ from datetime import datetime
 import json
 
 from models.user import Usuario
-from ..models.solicitud import Solicitud
-from ..models.oferta import Oferta
-from .events_service import events_service
+from models.solicitud import Solicitud
+from models.oferta import Oferta
 
 logger = logging.getLogger(__name__)
 
+# Users per batched push message
+TAMANO_OLEADA = 500
+
+# Concurrent WhatsApp sends (also the size of the shared HTTP pool)
+MAX_ENVIOS_CONCURRENTES = int(os.getenv("NOTIFICACIONES_MAX_CONCURRENTES", "20"))
+
+# Gateway availability is checked at most once per TTL, not per notification
+TTL_ESTADO_GATEWAY_SEGUNDOS = 10
+
 
 class NotificationService:
     """
@@ -31,12 +47,55 @@ class NotificationService:
         self.redis_client: Optional[redis.Redis] = None
         self.realtime_gateway_url = "http://realtime-gateway:8003"
         self.agent_ia_url = "http://agent-ia:8002"
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._gateway_disponible: Optional[bool] = None
+        self._gateway_verificado = 0.0
     
     async def initialize(self, redis_client: redis.Redis):
         """Initialize notification service with Redis client"""
         self.redis_client = redis_client
         logger.info("Notification service initialized")
     
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._http_client:
+            await self._http_client.aclose()
+            self._http_client = None
+    
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Shared pooled HTTP client for the gateway and Agent IA"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=10.0,
+                limits=httpx.Limits(
+                    max_connections=MAX_ENVIOS_CONCURRENTES,
+                    max_keepalive_connections=MAX_ENVIOS_CONCURRENTES
+                )
+            )
+        return self._http_client
+    
+    async def _is_gateway_available(self) -> bool:
+        """Realtime Gateway health, cached for TTL_ESTADO_GATEWAY_SEGUNDOS"""
+        if self._gateway_disponible is not None and time.monotonic() - self._gateway_verificado < TTL_ESTADO_GATEWAY_SEGUNDOS:
+            return self._gateway_disponible
+        
+        try:
+            response = await self._get_http_client().get(f"{self.realtime_gateway_url}/stats", timeout=5.0)
+            self._gateway_disponible = response.status_code == 200
+        except Exception as e:
+            logger.debug(f"Realtime Gateway unavailable: {str(e)}")
+            self._gateway_disponible = False
+        self._gateway_verificado = time.monotonic()
+        return self._gateway_disponible
+    
+    async def _publish_event(self, event_type: str, data: Dict[str, Any]):
+        """Publish a notification event for analytics (best effort)"""
+        try:
+            if self.redis_client:
+                await self.redis_client.publish(f"teloo:events:{event_type}", json.dumps(data))
+        except Exception as e:
+            logger.debug(f"Error publishing event {event_type}: {str(e)}")
+    
     async def send_notification(
         self,
         user_id: str,
@@ -78,7 +137,7 @@ class NotificationService:
                 logger.info(f"Notification sent via WebSocket to user {user_id}")
                 
                 # Publish event
-                await events_service.publish_event(
+                await self._publish_event(
                     "notificacion.sent",
                     {
                         "user_id": user_id,
@@ -97,7 +156,7 @@ class NotificationService:
                 logger.info(f"Notification sent via WhatsApp to user {user_id}")
                 
                 # Publish event
-                await events_service.publish_event(
+                await self._publish_event(
                     "notificacion.sent",
                     {
                         "user_id": user_id,
@@ -118,6 +177,74 @@ class NotificationService:
             logger.error(f"Error sending notification: {str(e)}")
             return False
     
+    async def send_notifications_batch(
+        self,
+        user_ids: List[str],
+        title: str,
+        message: str,
+        notification_type: str,
+        data: Optional[Dict[str, Any]] = None,
+        priority: str = "normal"
+    ) -> int:
+        """
+        Send the same notification to many users
+        
+        Publishes one push message per wave of TAMANO_OLEADA users for the
+        Realtime Gateway. If the gateway is down, falls back to WhatsApp with all
+        phone numbers loaded in one query and bounded concurrency; failed
+        recipients are queued for retry.
+        
+        Args:
+            user_ids: Target user IDs
+            title: Notification title
+            message: Notification message
+            notification_type: Type of notification
+            data: Additional data to include
+            priority: Priority level (low, normal, high, urgent)
+            
+        Returns:
+            Number of users notified
+        """
+        user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        if not user_ids:
+            return 0
+        
+        base = {
+            "title": title,
+            "message": message,
+            "type": notification_type,
+            "data": data or {},
+            "priority": priority,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+        try:
+            if self.redis_client and await self._is_gateway_available():
+                for inicio in range(0, len(user_ids), TAMANO_OLEADA):
+                    await self.redis_client.publish(
+                        "notificacion.push_lote",
+                        json.dumps({**base, "user_ids": user_ids[inicio:inicio + TAMANO_OLEADA]})
+                    )
+                enviados, canal = len(user_ids), "websocket"
+            else:
+                logger.info(f"WebSocket unavailable, falling back to WhatsApp for {len(user_ids)} users")
+                enviados, canal = await self._send_batch_via_whatsapp(user_ids, base), "whatsapp"
+        except Exception as e:
+            logger.error(f"Error sending notification batch: {str(e)}")
+            await self._queue_notifications([{**base, "user_id": user_id} for user_id in user_ids])
+            return 0
+        
+        await self._publish_event(
+            "notificacion.sent",
+            {
+                "user_count": enviados,
+                "type": notification_type,
+                "channel": canal
+            }
+        )
+        logger.info(f"Notification {notification_type} sent to {enviados}/{len(user_ids)} users via {canal}")
+        return enviados
+    
     async def send_notification_to_role(
         self,
         role: str,
@@ -153,7 +280,7 @@ class NotificationService:
             await self._broadcast_to_role(role, notification_data)
             
             # Publish event
-            await events_service.publish_event(
+            await self._publish_event(
                 "notificacion.broadcast",
                 {
                     "role": role,
@@ -175,21 +302,20 @@ class NotificationService:
         
         Args:
             solicitud: Solicitud instance
-            asesores_ids: List of asesor IDs to notify
+            asesores_ids: Usuario IDs of the asesores to notify (one wave)
         """
-        for asesor_id in asesores_ids:
-            await self.send_notification(
-                user_id=asesor_id,
-                title="Nueva Solicitud Disponible",
-                message=f"Nueva solicitud de repuestos disponible en tu área",
-                notification_type="solicitud_nueva",
-                data={
-                    "solicitud_id": str(solicitud.id),
-                    "ciudad": solicitud.ciudad_origen,
-                    "repuestos_count": await solicitud.repuestos.all().count()
-                },
-                priority="high"
-            )
+        await self.send_notifications_batch(
+            user_ids=asesores_ids,
+            title="Nueva Solicitud Disponible",
+            message=f"Nueva solicitud de repuestos disponible en tu área",
+            notification_type="solicitud_nueva",
+            data={
+                "solicitud_id": str(solicitud.id),
+                "ciudad": solicitud.ciudad_origen,
+                "repuestos_count": await solicitud.repuestos.all().count()
+            },
+            priority="high"
+        )
     
     async def notify_oferta_result(self, oferta: Oferta, result: str):
         """
@@ -228,39 +354,29 @@ class NotificationService:
             solicitud_id: Solicitud ID
             asesores_ids: List of asesor IDs who participated
         """
-        for asesor_id in asesores_ids:
-            await self.send_notification(
-                user_id=asesor_id,
-                title="Evaluación Completada",
-                message="La evaluación de ofertas ha sido completada",
-                notification_type="evaluacion_completada",
-                data={
-                    "solicitud_id": str(solicitud_id)
-                },
-                priority="normal"
-            )
+        await self.send_notifications_batch(
+            user_ids=asesores_ids,
+            title="Evaluación Completada",
+            message="La evaluación de ofertas ha sido completada",
+            notification_type="evaluacion_completada",
+            data={
+                "solicitud_id": str(solicitud_id)
+            },
+            priority="normal"
+        )
     
     async def _send_via_websocket(self, user_id: str, notification_data: Dict) -> bool:
         """Send notification via WebSocket (Realtime Gateway)"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                # Check if user is connected
-                response = await client.get(
-                    f"{self.realtime_gateway_url}/stats"
-                )
-                
-                if response.status_code != 200:
-                    return False
-                
-                # Publish to Redis for Realtime Gateway to pick up
-                if self.redis_client:
-                    await self.redis_client.publish(
-                        "notificacion.push",
-                        json.dumps(notification_data)
-                    )
-                    return True
-                
+            if not self.redis_client or not await self._is_gateway_available():
                 return False
+            
+            # Publish to Redis for Realtime Gateway to pick up
+            await self.redis_client.publish(
+                "notificacion.push",
+                json.dumps(notification_data)
+            )
+            return True
                 
         except Exception as e:
             logger.debug(f"WebSocket send failed: {str(e)}")
@@ -270,33 +386,66 @@ class NotificationService:
         """Send notification via WhatsApp (Agent IA)"""
         try:
             # Get user's phone number
-            from ..models.user import Usuario
             user = await Usuario.get_or_none(id=user_id)
             
             if not user or not user.telefono:
                 logger.warning(f"User {user_id} has no phone number for WhatsApp fallback")
                 return False
             
-            # Format message for WhatsApp
-            whatsapp_message = f"*{notification_data['title']}*\n\n{notification_data['message']}"
-            
-            # Send via Agent IA service
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    f"{self.agent_ia_url}/v1/messages/send",
-                    json={
-                        "to": user.telefono,
-                        "message": whatsapp_message,
-                        "type": "notification"
-                    }
-                )
-                
-                return response.status_code == 200
+            return await self._post_whatsapp(user.telefono, notification_data)
                 
         except Exception as e:
             logger.error(f"WhatsApp send failed: {str(e)}")
             return False
     
+    async def _post_whatsapp(self, telefono: str, notification_data: Dict) -> bool:
+        """Send one WhatsApp message through Agent IA with the shared client"""
+        # Format message for WhatsApp
+        whatsapp_message = f"*{notification_data['title']}*\n\n{notification_data['message']}"
+        
+        response = await self._get_http_client().post(
+            f"{self.agent_ia_url}/v1/messages/send",
+            json={
+                "to": telefono,
+                "message": whatsapp_message,
+                "type": "notification"
+            }
+        )
+        return response.status_code == 200
+    
+    async def _send_batch_via_whatsapp(self, user_ids: List[str], notification_data: Dict) -> int:
+        """
+        WhatsApp fallback for many users: one query for all phone numbers and at
+        most MAX_ENVIOS_CONCURRENTES requests in flight
+        
+        Returns:
+            Number of users notified (failures are queued for retry)
+        """
+        telefonos = dict(await Usuario.filter(id__in=user_ids).values_list('id', 'telefono'))
+        telefonos = {str(user_id): telefono for user_id, telefono in telefonos.items() if telefono}
+        
+        semaforo = asyncio.Semaphore(MAX_ENVIOS_CONCURRENTES)
+        
+        async def enviar(user_id: str) -> bool:
+            async with semaforo:
+                try:
+                    return await self._post_whatsapp(telefonos[user_id], notification_data)
+                except Exception as e:
+                    logger.debug(f"WhatsApp send failed for user {user_id}: {str(e)}")
+                    return False
+        
+        destinatarios = [user_id for user_id in user_ids if user_id in telefonos]
+        resultados = await asyncio.gather(*(enviar(user_id) for user_id in destinatarios))
+        
+        sin_telefono = len(user_ids) - len(destinatarios)
+        if sin_telefono:
+            logger.warning(f"{sin_telefono} users have no phone number for WhatsApp fallback")
+        
+        fallidos = [user_id for user_id, enviado in zip(destinatarios, resultados) if not enviado]
+        await self._queue_notifications([{**notification_data, "user_id": user_id} for user_id in fallidos])
+        
+        return len(destinatarios) - len(fallidos)
+    
     async def _broadcast_to_role(self, role: str, notification_data: Dict) -> bool:
         """Broadcast notification to all users with specific role"""
         try:
@@ -325,6 +474,21 @@ class NotificationService:
         except Exception as e:
             logger.error(f"Failed to queue notification: {str(e)}")
     
+    async def _queue_notifications(self, notifications: List[Dict]):
+        """Queue several notifications for retry in one command"""
+        if not notifications:
+            return
+        try:
+            if self.redis_client:
+                await self.redis_client.lpush(
+                    "notifications:pending",
+                    *[json.dumps(notification_data) for notification_data in notifications]
+                )
+                logger.info(f"{len(notifications)} notifications queued for retry")
+                
+        except Exception as e:
+            logger.error(f"Failed to queue notifications: {str(e)}")
+    
     async def process_pending_notifications(self) -> int:
         """
         Process pending notifications from queue
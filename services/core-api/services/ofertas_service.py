@@ -6,7 +6,7 @@ Handles individual and bulk offer creation, validation, and state management
 import logging
 from typing import List, Dict, Optional, Any, Tuple
 from decimal import Decimal
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 import json
 import pandas as pd
 import io
@@ -18,6 +18,8 @@ from models.geografia import EvaluacionAsesorTemp
 from models.enums import EstadoSolicitud, EstadoOferta, OrigenOferta
 from services.concurrencia_service import ConcurrenciaService
 from services.events_service import events_service
+from services.temporizador_escalamiento_service import temporizador_escalamiento_service
+from utils.paginacion import ORDEN_KEYSET, codificar_cursor, filtro_despues_de_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -173,6 +175,16 @@ class OfertasService:
             
             # Transaction committed successfully at this point
             
+            # Update complete-offers counter (may bring the escalamiento close forward)
+            if temporizador_escalamiento_service.configurado:
+                total_repuestos = await RepuestoSolicitado.filter(solicitud_id=solicitud.id).count()
+                repuestos_cubiertos = len({detalle.repuesto_solicitado_id for detalle in detalles_creados})
+                await temporizador_escalamiento_service.registrar_oferta(
+                    solicitud,
+                    oferta.id,
+                    completa=total_repuestos > 0 and repuestos_cubiertos == total_repuestos
+                )
+            
             # Registrar evento en tablas auxiliares para métricas de escalamiento
             try:
                 # Calcular tiempo de respuesta si existe escalamiento
@@ -276,7 +288,73 @@ class OfertasService:
         except Exception as e:
             logger.error(f"Error obteniendo ofertas para solicitud {solicitud_id}: {e}")
             return []
-    
+
+    @staticmethod
+    async def listar_ofertas(
+        asesor_id: Optional[str] = None,
+        estado: Optional[EstadoOferta] = None,
+        solicitud_id: Optional[str] = None,
+        fecha_desde: Optional[datetime] = None,
+        fecha_hasta: Optional[date] = None,
+        cursor: Optional[str] = None,
+        page: int = 1,
+        limit: int = 20,
+        incluir_total: bool = True,
+        incluir_detalles: bool = False
+    ) -> Dict[str, Any]:
+        """
+        List offers with database-side filters and pagination
+
+        Offers come ordered by (created_at, id) descending. With `cursor` (the
+        `next_cursor` of the previous page) the page is read by keyset; without
+        it `page` uses OFFSET. Asesor and usuario are loaded in the same query;
+        detalles are only prefetched when `incluir_detalles` is True.
+        `fecha_hasta` is a calendar day and includes the whole day.
+
+        Returns:
+            Dict with ofertas (page of Oferta), total (None if not requested)
+            and next_cursor (None on the last page)
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        query = Oferta.all()
+
+        if asesor_id:
+            query = query.filter(asesor_id=asesor_id)
+        if estado:
+            query = query.filter(estado=estado)
+        if solicitud_id:
+            query = query.filter(solicitud_id=solicitud_id)
+        if fecha_desde:
+            query = query.filter(created_at__gte=fecha_desde)
+        if fecha_hasta:
+            # Include the entire day: up to the start of the next one
+            query = query.filter(created_at__lt=datetime.combine(fecha_hasta + timedelta(days=1), time.min))
+
+        total = await query.count() if incluir_total else None
+
+        query = query.order_by(*ORDEN_KEYSET)
+        if cursor:
+            query = query.filter(filtro_despues_de_cursor(cursor))
+        else:
+            query = query.offset((page - 1) * limit)
+
+        # One extra row tells whether there is a next page
+        query = query.limit(limit + 1).select_related('asesor__usuario')
+        if incluir_detalles:
+            query = query.prefetch_related('detalles__repuesto_solicitado')
+        ofertas = await query
+
+        hay_siguiente = len(ofertas) > limit
+        ofertas = ofertas[:limit]
+
+        return {
+            "ofertas": ofertas,
+            "total": total,
+            "next_cursor": codificar_cursor(ofertas[-1].created_at, ofertas[-1].id) if hay_siguiente else None
+        }
+
     @staticmethod
     async def validate_oferta_data(
         solicitud_id: str,
@@ -847,20 +925,6 @@ class OfertasService:
             logger.error(f"Error registrando cambio de estado en auditoría: {e}")
             # Don't raise - audit logging failure shouldn't break the main operation
     
-    @staticmethod
-    async def get_ofertas_by_estado(estado: EstadoOferta) -> List[Oferta]:
-        """Get all offers by state"""
-        try:
-            ofertas = await Oferta.filter(estado=estado).prefetch_related(
-                'solicitud',
-                'asesor__usuario',
-                'detalles__repuesto_solicitado'
-            ).order_by('-created_at')
-            return ofertas
-        except Exception as e:
-            logger.error(f"Error obteniendo ofertas por estado {estado}: {e}")
-            return []
-    
     @staticmethod
     async def marcar_ofertas_expiradas(
         horas_expiracion: int = 20,
@@ -1,35 +1,65 @@
 """
 Scheduler Service for TeLOO V3
 Handles background jobs and scheduled tasks
+
+Jobs are persisted in Redis and only the leader replica (see
+coordinacion_scheduler_service) runs them; the other replicas keep the
+scheduler paused and take over within the leader lock TTL.
 """
 
 import logging
-from typing import Optional
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
-from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.redis import RedisJobStore
 from apscheduler.executors.asyncio import AsyncIOExecutor
 import asyncio
 import redis.asyncio as redis
+from redis.connection import parse_url
 
 from services.ofertas_service import OfertasService
 from services.configuracion_service import ConfiguracionService
+from services.coordinacion_scheduler_service import coordinacion_scheduler_service
+from services.temporizador_escalamiento_service import temporizador_escalamiento_service
 from utils.datetime_utils import now_utc
 
 logger = logging.getLogger(__name__)
 
+# Lease por ejecución: evita que un líder depuesto repita un job en curso
+LEASE_JOB_SEGUNDOS = int(os.getenv("SCHEDULER_LEASE_JOB_SEGUNDOS", "900"))
+
+# Backlog a partir del cual un job se reparte en shards entre las réplicas
+SOLICITUDES_POR_SHARD = int(os.getenv("SCHEDULER_SOLICITUDES_POR_SHARD", "200"))
+VIGENCIA_SHARDS_SEGUNDOS = 300
+
+
+async def ejecutar_job_programado(job_id: str):
+    """
+    Entry point stored in the Redis job store (bound methods cannot be serialized)
+    """
+    await scheduler_service._ejecutar_job_programado(job_id)
+
 
 class SchedulerService:
     """
     Service for managing scheduled background jobs
     """
     
+    # Jobs that can be triggered manually but run in their own loop
+    JOBS_FUERA_DE_SCHEDULER = ('verificar_timeouts_escalamiento',)
+    
+    # Jobs that iterate solicitudes and can be split by solicitud_id across replicas
+    JOBS_PARTICIONABLES = ('notificar_clientes_ofertas_ganadoras', 'enviar_recordatorios_cliente')
+    
     def __init__(self):
         self.scheduler: Optional[AsyncIOScheduler] = None
         self.redis_client: Optional[redis.Redis] = None
         self._is_running = False
+        self._metodos_jobs: Dict[str, Any] = {}
     
     async def initialize(self, redis_url: str = "redis://localhost:6379"):
         """
@@ -41,10 +71,16 @@ class SchedulerService:
         try:
             # Initialize Redis client
             self.redis_client = redis.from_url(redis_url, decode_responses=True)
+            temporizador_escalamiento_service.configurar(self.redis_client)
+            coordinacion_scheduler_service.configurar(self.redis_client)
             
-            # Configure scheduler
+            # Configure scheduler (job store shared by all replicas)
             jobstores = {
-                'default': MemoryJobStore()
+                'default': RedisJobStore(
+                    jobs_key='scheduler:jobs',
+                    run_times_key='scheduler:run_times',
+                    **self._parametros_jobstore(redis_url)
+                )
             }
             
             executors = {
@@ -52,7 +88,7 @@ class SchedulerService:
             }
             
             job_defaults = {
-                'coalesce': False,
+                'coalesce': True,  # Persisted jobs: run once after a failover, not once per missed run
                 'max_instances': 1,
                 'misfire_grace_time': 300  # 5 minutes
             }
@@ -64,24 +100,42 @@ class SchedulerService:
                 timezone='America/Bogota'
             )
             
-            # Add scheduled jobs
-            await self._setup_scheduled_jobs()
-            
             logger.info("Scheduler service initialized successfully")
             
         except Exception as e:
             logger.error(f"Error initializing scheduler service: {e}")
             raise
     
+    @staticmethod
+    def _parametros_jobstore(redis_url: str) -> Dict[str, Any]:
+        """Connection kwargs for the (sync) Redis client used by RedisJobStore"""
+        parametros = parse_url(redis_url)
+        if parametros.pop('connection_class', None) is not None:
+            parametros['ssl'] = True
+        return parametros
+    
     async def start(self):
-        """Start the scheduler"""
+        """Start the scheduler (paused until this replica is elected leader)"""
         if self.scheduler and not self._is_running:
-            self.scheduler.start()
+            self.scheduler.start(paused=True)
             self._is_running = True
-            logger.info("Scheduler started")
+            logger.info("Scheduler started (waiting for leadership)")
+            
+            # Escalation timers run outside APScheduler (1-second resolution)
+            await self._sincronizar_temporizadores_escalamiento()
+            temporizador_escalamiento_service.iniciar(self._verificar_timeouts_escalamiento)
+            
+            coordinacion_scheduler_service.iniciar(
+                al_ganar=self._al_ganar_liderazgo,
+                al_perder=self._al_perder_liderazgo,
+                procesar_shard=self._ejecutar_shard
+            )
     
     async def shutdown(self):
         """Shutdown the scheduler gracefully"""
+        await coordinacion_scheduler_service.detener()
+        await temporizador_escalamiento_service.detener()
+        
         if self.scheduler and self._is_running:
             self.scheduler.shutdown(wait=True)
             self._is_running = False
@@ -90,73 +144,156 @@ class SchedulerService:
         if self.redis_client:
             await self.redis_client.close()
     
+    async def _al_ganar_liderazgo(self):
+        """Register missing jobs in the shared store and start firing them"""
+        await self._setup_scheduled_jobs()
+        self.scheduler.resume()
+        logger.info("Scheduler resumed: this replica is the leader")
+    
+    async def _al_perder_liderazgo(self):
+        if self.scheduler and self._is_running:
+            self.scheduler.pause()
+            logger.info("Scheduler paused: this replica is no longer the leader")
+    
+    def _definir_jobs(self) -> List[Dict[str, Any]]:
+        """Definition of all scheduled jobs"""
+        return [
+            # Job 1: Process offer expiration every hour
+            {
+                'id': 'procesar_expiracion_ofertas',
+                'metodo': self._procesar_expiracion_ofertas,
+                'trigger': CronTrigger(minute=0),  # Every hour at minute 0
+                'name': 'Procesar expiración de ofertas'
+            },
+            # Job 2: Send expiration warnings every 30 minutes
+            {
+                'id': 'advertencias_expiracion',
+                'metodo': self._enviar_advertencias_expiracion,
+                'trigger': IntervalTrigger(minutes=30),
+                'name': 'Enviar advertencias de expiración'
+            },
+            # Job 3: Cleanup expired notifications daily at 2 AM
+            {
+                'id': 'limpiar_notificaciones',
+                'metodo': self._limpiar_notificaciones_expiradas,
+                'trigger': CronTrigger(hour=2, minute=0),
+                'name': 'Limpiar notificaciones expiradas'
+            },
+            # Job 4: Rebuild escalamiento timer schedule every 5 minutes
+            # (timeouts are processed by the timer loop as soon as they expire)
+            {
+                'id': 'sincronizar_temporizadores_escalamiento',
+                'metodo': self._sincronizar_temporizadores_escalamiento,
+                'trigger': IntervalTrigger(minutes=5),
+                'name': 'Sincronizar temporizadores de escalamiento'
+            },
+            # Job 5: Notify clients about winning offers every 5 minutes
+            {
+                'id': 'notificar_clientes_ofertas_ganadoras',
+                'metodo': self._notificar_clientes_ofertas_ganadoras,
+                'trigger': IntervalTrigger(minutes=5),
+                'name': 'Notificar clientes sobre ofertas ganadoras'
+            },
+            # Job 6: Send reminders to clients every hour
+            {
+                'id': 'enviar_recordatorios_cliente',
+                'metodo': self._enviar_recordatorios_cliente,
+                'trigger': IntervalTrigger(hours=1),
+                'name': 'Enviar recordatorios a clientes'
+            },
+            # Job 7: Process pending notifications every 5 minutes
+            {
+                'id': 'procesar_notificaciones_pendientes',
+                'metodo': self._procesar_notificaciones_pendientes,
+                'trigger': IntervalTrigger(minutes=5),
+                'name': 'Procesar notificaciones pendientes'
+            },
+            # Job 8: Compact advisor rolling metrics daily at 3 AM
+            {
+                'id': 'compactar_metricas_asesores',
+                'metodo': self._compactar_metricas_asesores,
+                'trigger': CronTrigger(hour=3, minute=0),
+                'name': 'Compactar métricas de asesores'
+            },
+        ]
+    
     async def _setup_scheduled_jobs(self):
-        """Setup all scheduled jobs"""
+        """
+        Setup all scheduled jobs in the shared job store
+        Jobs already persisted with the same trigger keep their next run time,
+        so a failover does not reset interval jobs.
+        """
+        definiciones = self._definir_jobs()
+        self._metodos_jobs = {definicion['id']: definicion['metodo'] for definicion in definiciones}
         
-        # Job 1: Process offer expiration every hour
-        self.scheduler.add_job(
-            func=self._procesar_expiracion_ofertas,
-            trigger=CronTrigger(minute=0),  # Every hour at minute 0
-            id='procesar_expiracion_ofertas',
-            name='Procesar expiración de ofertas',
-            replace_existing=True
-        )
+        for definicion in definiciones:
+            existente = self.scheduler.get_job(definicion['id'])
+            if existente and str(existente.trigger) == str(definicion['trigger']):
+                continue
+            
+            self.scheduler.add_job(
+                func=ejecutar_job_programado,
+                trigger=definicion['trigger'],
+                args=[definicion['id']],
+                id=definicion['id'],
+                name=definicion['name'],
+                replace_existing=True
+            )
         
-        # Job 2: Send expiration warnings every 30 minutes
-        self.scheduler.add_job(
-            func=self._enviar_advertencias_expiracion,
-            trigger=IntervalTrigger(minutes=30),
-            id='advertencias_expiracion',
-            name='Enviar advertencias de expiración',
-            replace_existing=True
-        )
+        # Drop jobs persisted by older versions that are no longer defined
+        for job in self.scheduler.get_jobs():
+            if job.id not in self._metodos_jobs:
+                self.scheduler.remove_job(job.id)
         
-        # Job 3: Cleanup expired notifications daily at 2 AM
-        self.scheduler.add_job(
-            func=self._limpiar_notificaciones_expiradas,
-            trigger=CronTrigger(hour=2, minute=0),
-            id='limpiar_notificaciones',
-            name='Limpiar notificaciones expiradas',
-            replace_existing=True
-        )
+        logger.info("Scheduled jobs configured")
+    
+    async def _ejecutar_job_programado(self, job_id: str):
+        """
+        Run a scheduled job under its cluster-wide lease
+        Partitionable jobs with a large backlog are split into shards instead
+        """
+        metodo = self._metodos_jobs.get(job_id)
+        if not metodo:
+            logger.error(f"Scheduled job {job_id} has no definition")
+            return
         
-        # Job 4: Verify escalamiento timeouts every minute
-        self.scheduler.add_job(
-            func=self._verificar_timeouts_escalamiento,
-            trigger=IntervalTrigger(minutes=1),
-            id='verificar_timeouts_escalamiento',
-            name='Verificar timeouts de escalamiento',
-            replace_existing=True
-        )
+        async def ejecutar():
+            if job_id in self.JOBS_PARTICIONABLES and await self._repartir_si_backlog(job_id):
+                return
+            await metodo()
         
-        # Job 5: Notify clients about winning offers every 5 minutes
-        self.scheduler.add_job(
-            func=self._notificar_clientes_ofertas_ganadoras,
-            trigger=IntervalTrigger(minutes=5),
-            id='notificar_clientes_ofertas_ganadoras',
-            name='Notificar clientes sobre ofertas ganadoras',
-            replace_existing=True
-        )
+        await coordinacion_scheduler_service.ejecutar_con_lease(job_id, LEASE_JOB_SEGUNDOS, ejecutar)
+    
+    async def _repartir_si_backlog(self, job_id: str) -> bool:
+        """
+        Split the job into shards by solicitud_id when the backlog is large
         
-        # Job 6: Send reminders to clients every hour
-        self.scheduler.add_job(
-            func=self._enviar_recordatorios_cliente,
-            trigger=IntervalTrigger(hours=1),
-            id='enviar_recordatorios_cliente',
-            name='Enviar recordatorios a clientes',
-            replace_existing=True
-        )
+        Returns:
+            bool: True if the work was queued as shards for all replicas
+        """
+        from jobs.scheduled_jobs import contar_backlog
         
-        # Job 7: Process pending notifications every 5 minutes
-        self.scheduler.add_job(
-            func=self._procesar_notificaciones_pendientes,
-            trigger=IntervalTrigger(minutes=5),
-            id='procesar_notificaciones_pendientes',
-            name='Procesar notificaciones pendientes',
-            replace_existing=True
-        )
+        backlog = await contar_backlog(job_id)
+        replicas = await coordinacion_scheduler_service.replicas_activas()
+        total = min(len(replicas), math.ceil(backlog / SOLICITUDES_POR_SHARD))
+        if total <= 1:
+            return False
         
-        logger.info("Scheduled jobs configured")
+        await coordinacion_scheduler_service.repartir(job_id, total, VIGENCIA_SHARDS_SEGUNDOS)
+        return True
+    
+    async def _ejecutar_shard(self, job_id: str, indice: int, total: int):
+        """Run one shard of a partitioned job (any replica, under the shard lease)"""
+        if job_id not in self.JOBS_PARTICIONABLES:
+            logger.error(f"Job {job_id} is not partitionable")
+            return
+        
+        metodo = getattr(self, f"_{job_id}")
+        await coordinacion_scheduler_service.ejecutar_con_lease(
+            f"{job_id}:{indice}/{total}",
+            LEASE_JOB_SEGUNDOS,
+            lambda: metodo(shard=(indice, total))
+        )
     
     async def _procesar_expiracion_ofertas(self):
         """
@@ -211,10 +348,27 @@ class SchedulerService:
         except Exception as e:
             logger.error(f"Error ejecutando job de limpieza: {e}")
     
+    async def _compactar_metricas_asesores(self):
+        """
+        Rebuild advisor rolling metrics from history
+        Runs daily at 3 AM to drop events outside the window
+        """
+        try:
+            from jobs.scheduled_jobs import compactar_metricas_asesores
+            result = await compactar_metricas_asesores()
+            
+            if result['success']:
+                logger.info(f"Job compactación métricas completado: {result['asesores_compactados']} asesores")
+            else:
+                logger.error(f"Job compactación métricas falló: {result.get('error', 'Error desconocido')}")
+            
+        except Exception as e:
+            logger.error(f"Error ejecutando job de compactación de métricas: {e}")
+    
     async def _verificar_timeouts_escalamiento(self):
         """
-        Verify escalamiento timeouts and escalate to next level if needed
-        Runs every minute to check for expired timeouts
+        Process solicitudes whose escalamiento timeout expired
+        Called by the timer loop every second or when a deadline is brought forward
         """
         try:
             from jobs.scheduled_jobs import verificar_timeouts_escalamiento
@@ -229,14 +383,29 @@ class SchedulerService:
         except Exception as e:
             logger.error(f"Error ejecutando job de escalamiento: {e}")
     
-    async def _notificar_clientes_ofertas_ganadoras(self):
+    async def _sincronizar_temporizadores_escalamiento(self):
+        """
+        Rebuild the escalamiento timer schedule from the database
+        Runs every 5 minutes as a safety net for missed events and config changes
+        """
+        try:
+            from jobs.scheduled_jobs import sincronizar_temporizadores_escalamiento
+            result = await sincronizar_temporizadores_escalamiento(redis_client=self.redis_client)
+            
+            if not result['success']:
+                logger.error(f"Job sincronización temporizadores falló: {result.get('error', result.get('message'))}")
+        
+        except Exception as e:
+            logger.error(f"Error ejecutando job de sincronización de temporizadores: {e}")
+    
+    async def _notificar_clientes_ofertas_ganadoras(self, shard: Optional[Tuple[int, int]] = None):
         """
         Notify clients about winning offers after evaluation
         Runs every 5 minutes to check for evaluated solicitudes without notification
         """
         try:
             from jobs.scheduled_jobs import notificar_clientes_ofertas_ganadoras
-            result = await notificar_clientes_ofertas_ganadoras(redis_client=self.redis_client)
+            result = await notificar_clientes_ofertas_ganadoras(redis_client=self.redis_client, shard=shard)
             
             if result['success']:
                 if result['notificaciones_enviadas'] > 0:
@@ -247,14 +416,14 @@ class SchedulerService:
         except Exception as e:
             logger.error(f"Error ejecutando job de notificación clientes: {e}")
     
-    async def _enviar_recordatorios_cliente(self):
+    async def _enviar_recordatorios_cliente(self, shard: Optional[Tuple[int, int]] = None):
         """
         Send reminders to clients about pending responses
         Runs every hour to check for pending responses and send reminders
         """
         try:
             from jobs.scheduled_jobs import enviar_recordatorios_cliente
-            result = await enviar_recordatorios_cliente(redis_client=self.redis_client)
+            result = await enviar_recordatorios_cliente(redis_client=self.redis_client, shard=shard)
             
             if result['success']:
                 if result['recordatorios_intermedios'] > 0 or result['recordatorios_finales'] > 0 or result['solicitudes_cerradas_timeout'] > 0:
@@ -286,7 +455,9 @@ class SchedulerService:
         
         return {
             'status': 'running' if self._is_running else 'stopped',
-            'jobs': jobs
+            'jobs': jobs,
+            'temporizador_escalamiento': temporizador_escalamiento_service.get_estado(),
+            'coordinacion': coordinacion_scheduler_service.get_estado()
         }
     
     async def trigger_job_manually(self, job_id: str) -> dict:
@@ -304,7 +475,7 @@ class SchedulerService:
         
         try:
             job = self.scheduler.get_job(job_id)
-            if not job:
+            if not job and job_id not in self.JOBS_FUERA_DE_SCHEDULER:
                 raise ValueError(f"Job {job_id} not found")
             
             # Import and run the job function directly
@@ -315,7 +486,9 @@ class SchedulerService:
                 'procesar_expiracion_ofertas': 'procesar_expiracion_ofertas',
                 'advertencias_expiracion': 'enviar_notificaciones_expiracion',
                 'limpiar_notificaciones': 'limpiar_datos_temporales',
-                'verificar_timeouts_escalamiento': 'verificar_timeouts_escalamiento'
+                'verificar_timeouts_escalamiento': 'verificar_timeouts_escalamiento',
+                'sincronizar_temporizadores_escalamiento': 'sincronizar_temporizadores_escalamiento',
+                'compactar_metricas_asesores': 'compactar_metricas_asesores'
             }
             
             if job_id not in job_mapping:
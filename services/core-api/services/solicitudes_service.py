@@ -3,22 +3,87 @@ Solicitudes Service
 Business logic for solicitudes management
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from decimal import Decimal
+import os
+import time
 import uuid
 import logging
 
-from tortoise.expressions import Q
+from tortoise import connections
+from tortoise.expressions import Q, RawSQL, Subquery
 from tortoise.queryset import QuerySet
 
 from models.solicitud import Solicitud, RepuestoSolicitado
-from models.user import Cliente
+from models.oferta import Oferta
+from models.user import Cliente, Usuario
 from models.enums import EstadoSolicitud
 from services.geografia_service import GeografiaService
+from utils.paginacion import ORDEN_KEYSET, codificar_cursor, filtro_despues_de_cursor
 
 logger = logging.getLogger(__name__)
 
+# Cache del total del listado paginado: {filtros: (expira_en, total)}
+TOTAL_CACHE_TTL_SECONDS = float(os.getenv("SOLICITUDES_TOTAL_CACHE_TTL_SECONDS", "30"))
+TOTAL_CACHE_MAX_ENTRIES = 1000
+# Por debajo de este tamaño count() es barato y más exacto que la estimación
+ESTIMACION_MINIMA_FILAS = 10000
+_total_cache: "OrderedDict[tuple, Tuple[float, int]]" = OrderedDict()
+
+
+def _solicitudes_por_nivel_del_asesor(asesor_id: uuid.UUID) -> RawSQL:
+    """
+    Subconsulta de solicitudes ABIERTAS donde nivel_actual >= nivel_entrega del asesor
+    (compara columnas de dos tablas, que el ORM no expresa en un filtro)
+    """
+    return RawSQL(f"""(
+        SELECT e.solicitud_id
+        FROM evaluaciones_asesores_temp e
+        INNER JOIN solicitudes sn ON sn.id = e.solicitud_id
+        WHERE e.asesor_id = '{uuid.UUID(str(asesor_id))}'
+        AND sn.nivel_actual >= e.nivel_entrega
+        AND sn.estado = 'ABIERTA'
+    )""")
+
+
+async def _estimar_total_solicitudes() -> Optional[int]:
+    """Filas de solicitudes según las estadísticas de Postgres (None si no hay)"""
+    try:
+        conn = connections.get("default")
+        filas = await conn.execute_query_dict(
+            "SELECT reltuples::bigint AS total FROM pg_class WHERE relname = 'solicitudes'"
+        )
+    except Exception:
+        return None
+    if not filas or filas[0]["total"] < 0:
+        return None
+    return int(filas[0]["total"])
+
+
+async def _contar_solicitudes(query: QuerySet, filtros: tuple, estimar: bool = False) -> int:
+    """
+    Total del listado, cacheado TOTAL_CACHE_TTL_SECONDS por combinación de filtros
+
+    Sin filtros (estimar=True) usa la estimación del planificador, que no recorre
+    la tabla; con filtros ejecuta count() sobre los índices del listado.
+    """
+    ahora = time.monotonic()
+    entrada = _total_cache.get(filtros)
+    if entrada and entrada[0] > ahora:
+        return entrada[1]
+
+    total = await _estimar_total_solicitudes() if estimar else None
+    if total is None or total < ESTIMACION_MINIMA_FILAS:
+        total = await query.count()
+
+    _total_cache[filtros] = (ahora + TOTAL_CACHE_TTL_SECONDS, total)
+    _total_cache.move_to_end(filtros)
+    while len(_total_cache) > TOTAL_CACHE_MAX_ENTRIES:
+        _total_cache.popitem(last=False)
+    return total
+
 
 class SolicitudesService:
     """Service for managing solicitudes"""
@@ -34,13 +99,24 @@ class SolicitudesService:
         ciudad: Optional[str] = None,
         departamento: Optional[str] = None,
         user_rol: Optional[str] = None,
-        asesor_id: Optional[uuid.UUID] = None
+        asesor_id: Optional[uuid.UUID] = None,
+        cursor: Optional[str] = None,
+        incluir_total: bool = True
     ) -> Dict[str, Any]:
         """
         Get paginated solicitudes with filters
         
         For ASESORES: Only show solicitudes where they were evaluated/notified OR made an offer
         For ADMIN: Show all solicitudes
+        
+        With `cursor` (the `next_cursor` of the previous page) the page is read by
+        keyset on (created_at, id) and its cost does not grow with the page number;
+        without it `page` keeps working with OFFSET. `total` is cached for a few
+        seconds (estimated from the table statistics when there are no filters)
+        and skipped when `incluir_total` is False.
+        
+        Raises:
+            ValueError: If the cursor is invalid
         """
         # Build query
         query = Solicitud.all()
@@ -50,44 +126,28 @@ class SolicitudesService:
             # Only show OPEN solicitudes where:
             # 1. The asesor was evaluated AND solicitud.nivel_actual >= evaluacion.nivel_entrega (acumulativo)
             # 2. OR the asesor made an offer (can still see it even if level changed)
-            
-            # Get IDs of solicitudes where nivel matches
-            from tortoise import connections
-            conn = connections.get("default")
-            
-            # Query to get solicitudes where nivel_actual >= asesor's nivel_entrega (acumulativo)
-            nivel_match_ids = await conn.execute_query_dict("""
-                SELECT DISTINCT s.id 
-                FROM solicitudes s
-                INNER JOIN evaluaciones_asesores_temp e ON e.solicitud_id = s.id
-                WHERE e.asesor_id = $1
-                AND s.nivel_actual >= e.nivel_entrega
-                AND s.estado = 'ABIERTA'
-            """, [str(asesor_id)])
-            
-            nivel_match_uuids = [row['id'] for row in nivel_match_ids]
-            
-            # Filter: solicitudes with matching nivel OR where asesor made an offer
-            if nivel_match_uuids:
-                query = query.filter(
-                    Q(id__in=nivel_match_uuids) |
-                    Q(ofertas__asesor_id=asesor_id)  # Sin filtro de estado - mostrar todas donde hizo oferta
-                ).distinct()
-            else:
-                # Only show solicitudes where they made an offer (sin importar estado)
-                query = query.filter(
-                    ofertas__asesor_id=asesor_id
-                ).distinct()
+            # Both are subqueries of the same statement (no id pre-query, no join + DISTINCT)
+            query = query.filter(
+                Q(id__in=_solicitudes_por_nivel_del_asesor(asesor_id)) |
+                Q(id__in=Subquery(Oferta.filter(asesor_id=asesor_id).values("solicitud_id")))
+            )
         
         # Apply filters
         if estado:
             query = query.filter(estado=estado)
         
         if search:
+            # Matching clientes are a nested subquery (trigram indexes on usuarios
+            # nombre/apellido/telefono) so the OR below is two index scans on
+            # solicitudes in the same statement, without loading the ids first
+            usuarios = Usuario.filter(
+                Q(nombre__icontains=search) |
+                Q(apellido__icontains=search) |
+                Q(telefono__icontains=search)
+            ).values("id")
+            clientes = Cliente.filter(usuario_id__in=Subquery(usuarios)).values("id")
             query = query.filter(
-                Q(cliente__usuario__nombre__icontains=search) |
-                Q(cliente__usuario__apellido__icontains=search) |
-                Q(cliente__usuario__telefono__icontains=search) |
+                Q(cliente_id__in=Subquery(clientes)) |
                 Q(ciudad_origen__icontains=search)
             )
         
@@ -105,57 +165,73 @@ class SolicitudesService:
         if departamento:
             query = query.filter(departamento_origen__iexact=departamento)
         
-        # Order by creation date (newest first)
-        query = query.order_by("-created_at")
-        
-        # Get total count
-        total = await query.count()
+        # Get total count (before the cursor filter, it counts the whole listing)
+        total = None
+        if incluir_total:
+            sin_filtros = not any([
+                user_rol == "ADVISOR" and asesor_id, estado, search,
+                fecha_desde, fecha_hasta, ciudad, departamento
+            ])
+            total = await _contar_solicitudes(query, (
+                user_rol, str(asesor_id), estado, search, fecha_desde, fecha_hasta, ciudad, departamento
+            ), estimar=sin_filtros)
+        
+        # Order by creation date (newest first), id breaks ties for the keyset
+        query = query.order_by(*ORDEN_KEYSET)
+        
+        if cursor:
+            query = query.filter(filtro_despues_de_cursor(cursor))
+        else:
+            query = query.offset((page - 1) * page_size)
         
-        # Calculate pagination
-        total_pages = (total + page_size - 1) // page_size
-        offset = (page - 1) * page_size
+        # Get paginated results (one extra row tells whether there is a next page)
+        solicitudes = await query.limit(page_size + 1).select_related(
+            "cliente__usuario"
+        ).prefetch_related("repuestos_solicitados")
         
-        # Get paginated results
-        solicitudes = await query.offset(offset).limit(page_size).prefetch_related(
-            "cliente",
-            "cliente__usuario",
-            "repuestos_solicitados",
-            "ofertas"
+        hay_siguiente = len(solicitudes) > page_size
+        solicitudes = solicitudes[:page_size]
+        next_cursor = (
+            codificar_cursor(solicitudes[-1].created_at, solicitudes[-1].id) if hay_siguiente else None
         )
         
+        # The asesor's own offers for the whole page, with their detalles
+        mis_ofertas = {}
+        if asesor_id and solicitudes:
+            ofertas = await Oferta.filter(
+                asesor_id=asesor_id,
+                solicitud_id__in=[sol.id for sol in solicitudes]
+            ).prefetch_related("detalles")
+            mis_ofertas = {oferta.solicitud_id: oferta for oferta in ofertas}
+        
         # Format response
         items = []
         for sol in solicitudes:
-            # Find mi_oferta if asesor_id is provided
             mi_oferta = None
-            if asesor_id and hasattr(sol, 'ofertas'):
-                for oferta in sol.ofertas:
-                    if str(oferta.asesor_id) == str(asesor_id):
-                        # Load detalles for the oferta
-                        await oferta.fetch_related('detalles')
-                        mi_oferta = {
-                            "id": str(oferta.id),
-                            "solicitud_id": str(oferta.solicitud_id),
-                            "asesor_id": str(oferta.asesor_id),
-                            "tiempo_entrega_dias": oferta.tiempo_entrega_dias,
-                            "observaciones": oferta.observaciones,
-                            "estado": oferta.estado.value,
-                            "created_at": oferta.created_at.isoformat(),
-                            "updated_at": oferta.updated_at.isoformat(),
-                            "detalles": [
-                                {
-                                    "id": str(det.id),
-                                    "oferta_id": str(det.oferta_id),
-                                    "repuesto_solicitado_id": str(det.repuesto_solicitado_id),
-                                    "precio_unitario": float(det.precio_unitario),
-                                    "cantidad": det.cantidad,
-                                    "garantia_meses": det.garantia_meses,
-                                    "tiempo_entrega_dias": det.tiempo_entrega_dias
-                                }
-                                for det in oferta.detalles
-                            ] if hasattr(oferta, 'detalles') else []
+            oferta = mis_ofertas.get(sol.id)
+            if oferta:
+                mi_oferta = {
+                    "id": str(oferta.id),
+                    "solicitud_id": str(oferta.solicitud_id),
+                    "asesor_id": str(oferta.asesor_id),
+                    "tiempo_entrega_dias": oferta.tiempo_entrega_dias,
+                    "observaciones": oferta.observaciones,
+                    "estado": oferta.estado.value,
+                    "created_at": oferta.created_at.isoformat(),
+                    "updated_at": oferta.updated_at.isoformat(),
+                    "detalles": [
+                        {
+                            "id": str(det.id),
+                            "oferta_id": str(det.oferta_id),
+                            "repuesto_solicitado_id": str(det.repuesto_solicitado_id),
+                            "precio_unitario": float(det.precio_unitario),
+                            "cantidad": det.cantidad,
+                            "garantia_meses": det.garantia_meses,
+                            "tiempo_entrega_dias": det.tiempo_entrega_dias
                         }
-                        break
+                        for det in oferta.detalles
+                    ]
+                }
             
             items.append({
                 "id": str(sol.id),
@@ -189,7 +265,7 @@ class SolicitudesService:
                         "es_urgente": rep.es_urgente
                     }
                     for rep in sol.repuestos_solicitados
-                ] if hasattr(sol, 'repuestos_solicitados') else []
+                ]
             })
         
         return {
@@ -197,7 +273,8 @@ class SolicitudesService:
             "total": total,
             "page": page,
             "page_size": page_size,
-            "total_pages": total_pages
+            "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+            "next_cursor": next_cursor
         }
 
     
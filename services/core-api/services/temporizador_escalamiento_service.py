@@ -0,0 +1,411 @@
+"""
+Temporizadores de escalamiento para TeLOO V3
+Agenda los vencimientos de cada solicitud abierta en un sorted set de Redis
+(score = fecha_escalamiento + tiempo de espera del nivel) para que
+verificar_timeouts_escalamiento procese solo las solicitudes vencidas, y mantiene
+por solicitud el conjunto de ofertas completas (100% de cobertura) a medida que
+llegan, adelantando el vencimiento cuando se alcanza el mínimo de ofertas.
+
+Redis es solo la agenda: la base de datos sigue siendo la fuente de verdad. La
+sincronización periódica reconstruye la agenda y cada solicitud se revalida antes
+de escalarla o cerrarla. Sin Redis los vencimientos se calculan desde la base, con
+la frecuencia del antiguo job (cada minuto) y solo en el líder del scheduler.
+
+El bucle corre en todas las réplicas: una solicitud vencida se mueve de forma
+atómica de la agenda a un sorted set de solicitudes en proceso (score = fin del
+lease), y la sincronización no vuelve a agendar las que alguna réplica tiene en
+proceso. Si la réplica muere, el lease vence y la siguiente sincronización la
+devuelve a la agenda.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from models.enums import EstadoSolicitud
+from models.solicitud import Solicitud
+from services.coordinacion_scheduler_service import coordinacion_scheduler_service
+from utils.datetime_utils import now_utc
+
+logger = logging.getLogger(__name__)
+
+CLAVE_VENCIMIENTOS = "escalamiento:vencimientos"
+CLAVE_EN_PROCESO = "escalamiento:en_proceso"
+PREFIJO_OFERTAS_COMPLETAS = "escalamiento:completas:"
+
+# Los conjuntos de ofertas completas se descartan solos si la solicitud nunca se cierra
+TTL_OFERTAS_COMPLETAS_SEGUNDOS = 7 * 24 * 3600
+
+# Resolución del temporizador y reintento tras un error procesando una solicitud
+INTERVALO_TICK_SEGUNDOS = 1
+REINTENTO_SEGUNDOS = 60
+MAX_VENCIDAS_POR_TICK = 100
+
+# Frecuencia del cálculo de vencimientos desde la base cuando la agenda no está disponible
+INTERVALO_RESPALDO_BD_SEGUNDOS = 60
+
+# Tiempo máximo que una réplica retiene una solicitud reclamada (incluye la evaluación)
+LEASE_PROCESO_SEGUNDOS = 600
+
+# Solicitudes por llamada al script de sincronización
+LOTE_AGENDA = 1000
+
+# Saca de la agenda las vencidas y las registra en proceso en un solo paso
+_SCRIPT_RECLAMAR = """
+local ids = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[3]))
+for _, id in ipairs(ids) do
+    redis.call('zrem', KEYS[1], id)
+    redis.call('zadd', KEYS[2], ARGV[2], id)
+end
+return ids
+"""
+
+# Agenda (id, score) por pares, omitiendo las que otra réplica tiene en proceso
+_SCRIPT_AGENDAR = """
+redis.call('zremrangebyscore', KEYS[2], '-inf', ARGV[1])
+local agendadas = 0
+for i = 2, #ARGV, 2 do
+    if not redis.call('zscore', KEYS[2], ARGV[i]) then
+        redis.call('zadd', KEYS[1], ARGV[i + 1], ARGV[i])
+        agendadas = agendadas + 1
+    end
+end
+return agendadas
+"""
+
+TIEMPOS_NIVEL_DEFAULT = {1: 15, 2: 20, 3: 25, 4: 30, 5: 35}
+TIEMPO_NIVEL_FALLBACK_MIN = 30
+
+
+class TemporizadorEscalamientoService:
+    """
+    Agenda de vencimientos de escalamiento (una instancia por proceso)
+    """
+
+    def __init__(self):
+        self._redis = None
+        self._despertar = asyncio.Event()
+        self._tarea: Optional[asyncio.Task] = None
+        self._en_proceso: Set[str] = set()
+        self._ultima_sincronizacion: Optional[Dict[str, Any]] = None
+        self._ultimo_respaldo_bd = 0.0
+        self._ticks = 0
+        self._procesadas = 0
+        self._errores_redis = 0
+
+    # ------------------------------------------------------------------
+    # Configuración
+    # ------------------------------------------------------------------
+
+    def configurar(self, redis_client) -> None:
+        """Asigna el cliente Redis (decode_responses=True) usado para la agenda"""
+        self._redis = redis_client
+
+    @property
+    def configurado(self) -> bool:
+        return self._redis is not None
+
+    @staticmethod
+    async def obtener_tiempos_nivel() -> Dict[int, int]:
+        """
+        Tiempos de espera (minutos) por nivel desde la configuración
+
+        Returns:
+            Dict: {nivel: minutos}
+        """
+        from services.configuracion_service import ConfiguracionService
+
+        config = await ConfiguracionService.get_config('tiempos_espera_nivel')
+        if config and isinstance(config, dict):
+            return {int(nivel): minutos for nivel, minutos in config.items()}
+
+        logger.warning(f"⚠️ Usando tiempos por defecto: {TIEMPOS_NIVEL_DEFAULT}")
+        return dict(TIEMPOS_NIVEL_DEFAULT)
+
+    @staticmethod
+    def calcular_vencimiento(
+        fecha_escalamiento: datetime,
+        nivel: int,
+        tiempos_nivel: Dict[int, int]
+    ) -> datetime:
+        """Momento en que vence la espera del nivel actual"""
+        minutos = tiempos_nivel.get(nivel, TIEMPO_NIVEL_FALLBACK_MIN)
+        return fecha_escalamiento + timedelta(minutes=minutos)
+
+    # ------------------------------------------------------------------
+    # Agenda
+    # ------------------------------------------------------------------
+
+    async def programar(
+        self,
+        solicitud: Solicitud,
+        tiempos_nivel: Optional[Dict[int, int]] = None
+    ) -> Optional[datetime]:
+        """
+        Agenda (o reagenda) el vencimiento del nivel actual de la solicitud
+
+        Returns:
+            datetime: Vencimiento agendado, None si no aplica o no hay Redis
+        """
+        if not self.configurado or not solicitud.fecha_escalamiento:
+            return None
+
+        if tiempos_nivel is None:
+            tiempos_nivel = await self.obtener_tiempos_nivel()
+
+        vencimiento = self.calcular_vencimiento(
+            solicitud.fecha_escalamiento, solicitud.nivel_actual, tiempos_nivel
+        )
+        try:
+            await self._redis.zadd(CLAVE_VENCIMIENTOS, {str(solicitud.id): vencimiento.timestamp()})
+            self._despertar.set()
+            logger.debug(f"⏱️ Solicitud {solicitud.id} agendada para {vencimiento.isoformat()}")
+        except Exception as e:
+            self._errores_redis += 1
+            logger.error(f"Error agendando vencimiento de solicitud {solicitud.id}: {e}")
+        return vencimiento
+
+    async def reintentar(self, solicitud_id: Any, segundos: int = REINTENTO_SEGUNDOS) -> None:
+        """Vuelve a agendar una solicitud cuyo procesamiento falló"""
+        if not self.configurado:
+            return
+        try:
+            await self._redis.zadd(CLAVE_VENCIMIENTOS, {str(solicitud_id): now_utc().timestamp() + segundos})
+        except Exception as e:
+            self._errores_redis += 1
+            logger.error(f"Error reagendando solicitud {solicitud_id}: {e}")
+
+    async def cancelar(self, solicitud_id: Any) -> None:
+        """Saca la solicitud de la agenda y descarta su contador de ofertas completas"""
+        if not self.configurado:
+            return
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.zrem(CLAVE_VENCIMIENTOS, str(solicitud_id))
+            pipe.delete(f"{PREFIJO_OFERTAS_COMPLETAS}{solicitud_id}")
+            await pipe.execute()
+        except Exception as e:
+            self._errores_redis += 1
+            logger.error(f"Error cancelando temporizador de solicitud {solicitud_id}: {e}")
+
+    async def registrar_oferta(self, solicitud: Solicitud, oferta_id: Any, completa: bool) -> Optional[int]:
+        """
+        Evento: llegó (o se reemplazó) una oferta para la solicitud
+        Actualiza el conjunto de ofertas completas y, si se alcanzó el mínimo deseado,
+        adelanta el vencimiento a ahora para que el cierre se procese en el siguiente tick.
+
+        Returns:
+            int: Ofertas completas de la solicitud, None si no hay Redis
+        """
+        if not self.configurado:
+            return None
+
+        clave = f"{PREFIJO_OFERTAS_COMPLETAS}{solicitud.id}"
+        try:
+            pipe = self._redis.pipeline(transaction=True)
+            if completa:
+                pipe.sadd(clave, str(oferta_id))
+            else:
+                pipe.srem(clave, str(oferta_id))
+            pipe.expire(clave, TTL_OFERTAS_COMPLETAS_SEGUNDOS)
+            pipe.scard(clave)
+            resultados = await pipe.execute()
+            ofertas_completas = int(resultados[-1])
+
+            if ofertas_completas >= solicitud.ofertas_minimas_deseadas:
+                # xx: solo solicitudes ya agendadas (con escalamiento iniciado)
+                adelantada = await self._redis.zadd(
+                    CLAVE_VENCIMIENTOS, {str(solicitud.id): now_utc().timestamp()}, xx=True, ch=True
+                )
+                if adelantada:
+                    self._despertar.set()
+                    logger.info(
+                        f"⏩ Solicitud {solicitud.id}: {ofertas_completas} ofertas completas "
+                        f">= {solicitud.ofertas_minimas_deseadas}, cierre adelantado"
+                    )
+            return ofertas_completas
+        except Exception as e:
+            self._errores_redis += 1
+            logger.error(f"Error registrando oferta completa para solicitud {solicitud.id}: {e}")
+            return None
+
+    async def reclamar_vencidas(self, limite: int = MAX_VENCIDAS_POR_TICK) -> List[str]:
+        """
+        Toma las solicitudes vencidas de la agenda
+        Un script las mueve a CLAVE_EN_PROCESO con un lease: solo la réplica que las
+        mueve las procesa, y la sincronización no las vuelve a agendar mientras tanto.
+
+        Returns:
+            List[str]: IDs de solicitudes a procesar (liberar() al terminar)
+        """
+        ahora = now_utc().timestamp()
+        return await self._redis.eval(
+            _SCRIPT_RECLAMAR, 2, CLAVE_VENCIMIENTOS, CLAVE_EN_PROCESO,
+            ahora, ahora + LEASE_PROCESO_SEGUNDOS, limite
+        )
+
+    def respaldo_bd_disponible(self) -> bool:
+        """
+        Si este tick puede calcular los vencimientos desde la base
+        Recorre todas las solicitudes abiertas, así que corre a lo sumo cada
+        INTERVALO_RESPALDO_BD_SEGUNDOS. Sin reclamo compartido todas las réplicas
+        escalarían las mismas solicitudes: con coordinación configurada solo el líder
+        lo usa (si Redis cae nadie es líder y los vencimientos esperan a que vuelva).
+        """
+        if coordinacion_scheduler_service.configurado and not coordinacion_scheduler_service.es_lider:
+            return False
+        if time.monotonic() - self._ultimo_respaldo_bd < INTERVALO_RESPALDO_BD_SEGUNDOS:
+            return False
+        self._ultimo_respaldo_bd = time.monotonic()
+        return True
+
+    async def vencidas_desde_bd(self, tiempos_nivel: Dict[int, int]) -> List[str]:
+        """
+        Respaldo sin Redis: calcula los vencimientos desde la base (sin precargar ofertas)
+        Llamar solo si respaldo_bd_disponible(); se omiten las que este proceso tiene en curso.
+        """
+        ahora = now_utc()
+        filas = await Solicitud.filter(
+            estado=EstadoSolicitud.ABIERTA,
+            fecha_escalamiento__isnull=False
+        ).values_list('id', 'nivel_actual', 'fecha_escalamiento')
+
+        return [
+            str(solicitud_id) for solicitud_id, nivel, fecha_escalamiento in filas
+            if str(solicitud_id) not in self._en_proceso
+            and self.calcular_vencimiento(fecha_escalamiento, nivel, tiempos_nivel) <= ahora
+        ]
+
+    async def sincronizar(self) -> Dict[str, Any]:
+        """
+        Reconstruye la agenda desde la base (arranque y respaldo periódico)
+        Agrega las solicitudes abiertas que falten, recalcula vencimientos tras cambios
+        de configuración (conservando los adelantados) y quita las que ya no están abiertas.
+        Las que alguna réplica tiene en proceso (lease vigente) no se agendan.
+
+        Returns:
+            Dict: Estadísticas de la sincronización
+        """
+        if not self.configurado:
+            return {'success': False, 'message': 'Temporizador sin Redis configurado'}
+
+        inicio = datetime.now()
+        tiempos_nivel = await self.obtener_tiempos_nivel()
+
+        filas = await Solicitud.filter(
+            estado=EstadoSolicitud.ABIERTA,
+            fecha_escalamiento__isnull=False
+        ).values_list('id', 'nivel_actual', 'fecha_escalamiento')
+
+        actuales = dict(await self._redis.zrange(CLAVE_VENCIMIENTOS, 0, -1, withscores=True))
+
+        vencimientos = {}
+        for solicitud_id, nivel, fecha_escalamiento in filas:
+            solicitud_id = str(solicitud_id)
+            score = self.calcular_vencimiento(fecha_escalamiento, nivel, tiempos_nivel).timestamp()
+            vencimientos[solicitud_id] = min(score, actuales.get(solicitud_id, score))
+
+        sobrantes = [solicitud_id for solicitud_id in actuales if solicitud_id not in vencimientos]
+
+        # Revisión contra CLAVE_EN_PROCESO dentro del script: un reclamo concurrente no se reagenda
+        agendadas = 0
+        pares = [valor for solicitud_id, score in vencimientos.items() for valor in (solicitud_id, score)]
+        for i in range(0, len(pares), 2 * LOTE_AGENDA):
+            agendadas += await self._redis.eval(
+                _SCRIPT_AGENDAR, 2, CLAVE_VENCIMIENTOS, CLAVE_EN_PROCESO,
+                now_utc().timestamp(), *pares[i:i + 2 * LOTE_AGENDA]
+            )
+        if sobrantes:
+            await self._redis.zrem(CLAVE_VENCIMIENTOS, *sobrantes)
+        self._despertar.set()
+
+        self._ultima_sincronizacion = {
+            'fecha': now_utc().isoformat(),
+            'agendadas': agendadas,
+            'nuevas': len(set(vencimientos) - set(actuales)),
+            'en_proceso': len(vencimientos) - agendadas,
+            'removidas': len(sobrantes),
+            'duracion_ms': int((datetime.now() - inicio).total_seconds() * 1000)
+        }
+        logger.info(
+            f"⏱️ Agenda de escalamiento sincronizada: {agendadas} solicitudes "
+            f"({self._ultima_sincronizacion['nuevas']} nuevas, {len(sobrantes)} removidas)"
+        )
+        return {'success': True, **self._ultima_sincronizacion}
+
+    # ------------------------------------------------------------------
+    # Bucle del temporizador
+    # ------------------------------------------------------------------
+
+    def marcar_en_proceso(self, solicitud_ids: List[str]) -> None:
+        self._en_proceso.update(solicitud_ids)
+
+    async def liberar(self, solicitud_ids: List[str]) -> None:
+        """Termina el lease de las solicitudes procesadas (ya reagendadas o canceladas)"""
+        self._en_proceso.difference_update(solicitud_ids)
+        self._procesadas += len(solicitud_ids)
+        if not self.configurado or not solicitud_ids:
+            return
+        try:
+            await self._redis.zrem(CLAVE_EN_PROCESO, *solicitud_ids)
+        except Exception as e:
+            # El lease vence solo y la sincronización las recupera si siguen abiertas
+            self._errores_redis += 1
+            logger.error(f"Error liberando solicitudes en proceso: {e}")
+
+    async def _bucle(self, procesar: Callable[[], Awaitable[Any]]) -> None:
+        """Despierta cada tick (o al adelantarse un vencimiento) y procesa las vencidas"""
+        while True:
+            try:
+                await asyncio.wait_for(self._despertar.wait(), timeout=INTERVALO_TICK_SEGUNDOS)
+            except asyncio.TimeoutError:
+                pass
+            self._despertar.clear()
+            self._ticks += 1
+
+            try:
+                await procesar()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error en temporizador de escalamiento: {e}")
+
+    def iniciar(self, procesar: Callable[[], Awaitable[Any]]) -> None:
+        """Arranca el bucle del temporizador en el event loop actual"""
+        if self._tarea and not self._tarea.done():
+            return
+        self._despertar = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle(procesar))
+        logger.info(f"⏱️ Temporizador de escalamiento iniciado (tick {INTERVALO_TICK_SEGUNDOS}s)")
+
+    async def detener(self) -> None:
+        """Detiene el bucle del temporizador"""
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+            logger.info("⏱️ Temporizador de escalamiento detenido")
+
+    def get_estado(self) -> Dict[str, Any]:
+        """
+        Estado del temporizador para el estado del scheduler
+        """
+        return {
+            'activo': self._tarea is not None and not self._tarea.done(),
+            'redis_configurado': self.configurado,
+            'tick_segundos': INTERVALO_TICK_SEGUNDOS,
+            'ticks': self._ticks,
+            'solicitudes_procesadas': self._procesadas,
+            'en_proceso': len(self._en_proceso),
+            'errores_redis': self._errores_redis,
+            'ultima_sincronizacion': self._ultima_sincronizacion
+        }
+
+
+# Instancia global del servicio
+temporizador_escalamiento_service = TemporizadorEscalamientoService()
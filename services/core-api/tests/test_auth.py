@@ -226,7 +226,7 @@ class TestAuthService:
         token_data = {"sub": "test@teloo.com", "user_id": 1}
         token = AuthService.create_access_token(token_data, expires_delta=timedelta(hours=1))
         
-        with patch('services.auth_service.Usuario.get_or_none', new_callable=AsyncMock, return_value=mock_user):
+        with patch.object(AuthService, '_cargar_usuario', new_callable=AsyncMock, return_value=mock_user):
             result = await AuthService.get_current_user(token)
             assert result == mock_user
     
@@ -245,13 +245,60 @@ class TestAuthService:
         token_data = {"sub": "nonexistent@teloo.com", "user_id": 999}
         token = AuthService.create_access_token(token_data, expires_delta=timedelta(hours=1))
         
-        with patch('services.auth_service.Usuario.get_or_none', new_callable=AsyncMock, return_value=None):
+        with patch.object(AuthService, '_cargar_usuario', new_callable=AsyncMock, return_value=None):
             with pytest.raises(HTTPException) as exc_info:
                 await AuthService.get_current_user(token)
             
             assert exc_info.value.status_code == 401
             assert "User not found" in str(exc_info.value.detail)
-    
+
+    @pytest.mark.asyncio
+    async def test_get_current_user_cached(self):
+        """Test that repeated requests with the same token reuse the cached user"""
+        AuthService._user_cache.clear()
+        mock_user = MagicMock()
+        mock_user.email = "cache@teloo.com"
+        mock_user.id = 7
+
+        token = AuthService.create_access_token({"sub": "cache@teloo.com"}, expires_delta=timedelta(hours=1))
+
+        with patch.object(AuthService, '_cargar_usuario', new_callable=AsyncMock, return_value=mock_user) as cargar_usuario:
+            await AuthService.get_current_user(token)
+            cached = await AuthService.get_current_user(token)
+
+            cargar_usuario.assert_awaited_once()
+            assert cached.id == 7
+
+            # Saving the user (role, state, password) drops it from the cache
+            AuthService.invalidar_usuario(user_id=7)
+            await AuthService.get_current_user(token)
+            assert cargar_usuario.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_get_current_user_invalidated_during_load_not_cached(self):
+        """Test that a row loaded while the user is being invalidated is served but not cached"""
+        AuthService._user_cache.clear()
+        mock_user = MagicMock()
+        mock_user.email = "stale@teloo.com"
+        mock_user.id = 8
+
+        async def cargar_e_invalidar(email):
+            AuthService.invalidar_usuario(user_id=8, email=email)
+            return mock_user
+
+        with patch.object(AuthService, '_cargar_usuario', side_effect=cargar_e_invalidar):
+            assert await AuthService._get_cached_user("stale@teloo.com") is mock_user
+
+        assert "stale@teloo.com" not in AuthService._user_cache
+
+    @pytest.mark.asyncio
+    async def test_verify_password_async(self):
+        """Test password verification in the hashing thread pool"""
+        hashed = await AuthService.get_password_hash_async("async_password")
+
+        assert await AuthService.verify_password_async("async_password", hashed) is True
+        assert await AuthService.verify_password_async("wrong_password", hashed) is False
+
     def test_create_token_pair(self):
         """Test creating access and refresh token pair"""
         # Mock user
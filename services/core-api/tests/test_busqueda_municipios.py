@@ -0,0 +1,88 @@
+"""
+Municipio Name Search Tests for TeLOO V3
+Tests for the in-memory accent-insensitive, alias-aware and typo-tolerant index
+"""
+
+import uuid
+
+import pytest
+
+from models.geografia import Municipio
+from utils.busqueda_municipios import IndiceNombresMunicipios, normalizar_busqueda
+
+
+MUNICIPIOS = [
+    ("BOGOTÁ, D.C.", "Bogotá, D.C.", "PRINCIPAL"),
+    ("MEDELLÍN", "Antioquia", "PRINCIPAL"),
+    ("BELLO", "Antioquia", "SECUNDARIA"),
+    ("CARTAGENA DE INDIAS", "Bolívar", "PRINCIPAL"),
+    ("CALI", "Valle del Cauca", "PRINCIPAL"),
+    ("BARBOSA", "Santander", "TERCIARIA"),
+    ("BARBOSA", "Antioquia", "SECUNDARIA"),
+    ("SANTA FE DE ANTIOQUIA", "Antioquia", "TERCIARIA"),
+    ("SANTA CRUZ DE MOMPOX", "Bolívar", "TERCIARIA"),
+]
+
+
+@pytest.fixture(scope="module")
+def indice():
+    return IndiceNombresMunicipios([
+        Municipio(
+            id=uuid.uuid4(),
+            municipio=nombre.title(),
+            municipio_norm=Municipio.normalizar_ciudad(nombre),
+            departamento=departamento,
+            hub_logistico="HUB",
+            clasificacion=clasificacion
+        )
+        for nombre, departamento, clasificacion in MUNICIPIOS
+    ])
+
+
+def _primero(indice, texto, **kwargs):
+    coincidencias = indice.buscar(texto, **kwargs)
+    assert coincidencias, texto
+    return coincidencias[0].municipio.municipio_norm, coincidencias[0].tipo
+
+
+def test_normalizar_busqueda():
+    """Test that accents, case and punctuation are ignored"""
+    assert normalizar_busqueda("  Bogotá, D.C. ") == "BOGOTA D C"
+
+
+@pytest.mark.parametrize("texto,esperado", [
+    ("medellin", ("MEDELLIN", "exacta")),
+    ("Bogotá D.C.", ("BOGOTA, D.C.", "exacta")),
+    ("Bogota", ("BOGOTA, D.C.", "alias")),
+    ("bogota dc", ("BOGOTA, D.C.", "alias")),
+    ("Cartagena", ("CARTAGENA DE INDIAS", "alias")),
+    ("Mompox", ("SANTA CRUZ DE MOMPOX", "alias")),
+    ("Med", ("MEDELLIN", "prefijo")),
+    ("Medelin", ("MEDELLIN", "aproximada")),
+])
+def test_coincidencias_ordenadas(indice, texto, esperado):
+    """Test exact, alias, prefix and typo-tolerant matches"""
+    assert _primero(indice, texto) == esperado
+
+
+@pytest.mark.parametrize("texto", ["Bello Antioquia", "Medellin - ANTIOQUIA", "Cali Valle"])
+def test_departamento_al_final(indice, texto):
+    """Test that a trailing department name is stripped like limpiar_ciudad did"""
+    assert _primero(indice, texto)[1] == "exacta"
+
+
+def test_municipio_que_termina_en_departamento(indice):
+    """Test that a real name ending in a department is not cut"""
+    assert _primero(indice, "Santa Fe de Antioquia") == ("SANTA FE DE ANTIOQUIA", "exacta")
+
+
+def test_homonimos_por_clasificacion_y_departamento(indice):
+    """Test that homonyms rank by classification and can be filtered by department"""
+    assert [c.municipio.departamento for c in indice.buscar("barbosa")] == ["Antioquia", "Santander"]
+    assert [c.municipio.departamento for c in indice.buscar("barbosa", departamento="santander")] == ["Santander"]
+
+
+def test_sin_coincidencias(indice):
+    """Test that unrelated text returns nothing"""
+    assert indice.buscar("xyz") == []
+    assert indice.buscar("") == []
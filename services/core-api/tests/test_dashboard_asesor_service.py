@@ -0,0 +1,143 @@
+"""
+Advisor Dashboard Tests for TeLOO V3
+Tests for the single-query monthly metrics and their per-advisor cache
+"""
+
+import json
+import pytest
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from services import dashboard_asesor_service as modulo
+from services.dashboard_asesor_service import DashboardAsesorService
+
+
+def _conexion(fila: dict):
+    conn = MagicMock()
+    conn.execute_query_dict = AsyncMock(return_value=[fila])
+    return conn
+
+
+FILA_MES = {
+    "repuestos_asignados": 40,
+    "monto_total_ganado": Decimal("1250000.50"),
+    "pendientes_por_oferta": 3,
+    "monto_ofertado": Decimal("4000000"),
+    "monto_aceptado": Decimal("1000000"),
+    "repuestos_ofertados": 10,
+}
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia():
+    DashboardAsesorService._cache.clear()
+    yield
+    DashboardAsesorService._cache.clear()
+
+
+class TestMetricasMes:
+    """Test the monthly dashboard metrics"""
+
+    @pytest.mark.asyncio
+    async def test_una_consulta_con_las_cinco_metricas(self):
+        """Test that the five numbers come from a single aggregate query"""
+        conn = _conexion(FILA_MES)
+
+        with patch.object(modulo.connections, "get", return_value=conn):
+            metricas = await DashboardAsesorService.get_metricas_mes("asesor-1")
+
+        assert conn.execute_query_dict.await_count == 1
+        assert metricas == {
+            "repuestos_adjudicados": 40,
+            "monto_total_ganado": 1250000.5,
+            "pendientes_por_oferta": 3,
+            "tasa_conversion": 25.0,
+            "tasa_oferta": 25.0
+        }
+
+    @pytest.mark.asyncio
+    async def test_cache_por_asesor_e_invalidacion(self):
+        """Test that polling reuses the cached metrics until an event invalidates them"""
+        conn = _conexion(FILA_MES)
+
+        with patch.object(modulo.connections, "get", return_value=conn):
+            await DashboardAsesorService.get_metricas_mes("asesor-1")
+            await DashboardAsesorService.get_metricas_mes("asesor-1")
+            assert conn.execute_query_dict.await_count == 1
+
+            await DashboardAsesorService.get_metricas_mes("asesor-2")
+            assert conn.execute_query_dict.await_count == 2
+
+            await DashboardAsesorService.invalidar(["asesor-1"])
+            await DashboardAsesorService.get_metricas_mes("asesor-1")
+            assert conn.execute_query_dict.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_invalidacion_publicada_a_otras_replicas(self):
+        """Test that invalidations are published and messages from other replicas drop entries"""
+        DashboardAsesorService._cache["asesor-1"] = (float("inf"), None, {})
+        DashboardAsesorService._cache["asesor-2"] = (float("inf"), None, {})
+
+        with patch.object(modulo.sincronizacion_cache, "publicar", AsyncMock()) as publicar:
+            await DashboardAsesorService.invalidar(["asesor-1"])
+
+        publicar.assert_awaited_once_with(modulo.CANAL_INVALIDACION_DASHBOARD, {"asesor_ids": ["asesor-1"]})
+        assert "asesor-1" not in DashboardAsesorService._cache
+
+        modulo.sincronizacion_cache._despachar({
+            "type": "message",
+            "channel": modulo.CANAL_INVALIDACION_DASHBOARD,
+            "data": json.dumps({"origen": "otra-replica", "asesor_ids": ["asesor-2"]})
+        })
+        assert "asesor-2" not in DashboardAsesorService._cache
+
+
+class TestInvalidacionPorEscalamiento:
+    """Test that assigning and escalating solicitudes invalidates the advisors' dashboards"""
+
+    @pytest.mark.asyncio
+    async def test_guardar_evaluaciones_invalida_asesores_evaluados(self):
+        """Test that every evaluated advisor gets the new solicitud in repuestos_asignados"""
+        from services.escalamiento_service import EscalamientoService
+
+        variables = {
+            'proximidad': Decimal('5'), 'actividad_reciente_5': Decimal('3'),
+            'desempeno_historico_5': Decimal('3'), 'nivel_confianza': Decimal('3'),
+            'criterio_proximidad': 'misma_ciudad'
+        }
+        niveles = {
+            nivel: [{
+                'asesor': MagicMock(id=f"asesor-{nivel}", ciudad="Medellín"), 'variables': variables,
+                'puntaje_total': Decimal('4'), 'nivel_entrega': nivel,
+                'canal': MagicMock(value='PUSH'), 'tiempo_espera_min': 10
+            }]
+            for nivel in (1, 3)
+        }
+        transaccion = MagicMock()
+        transaccion.__aenter__ = AsyncMock()
+        transaccion.__aexit__ = AsyncMock(return_value=False)
+
+        with patch('services.escalamiento_service.EvaluacionAsesorTemp', side_effect=lambda **campos: MagicMock(**campos)) as modelo, \
+             patch('services.escalamiento_service.HistorialRespuestaOferta.bulk_create', AsyncMock()), \
+             patch('services.escalamiento_service.MetricasAsesorService.registrar_envios', AsyncMock()), \
+             patch('tortoise.transactions.in_transaction', return_value=transaccion), \
+             patch.object(DashboardAsesorService, 'invalidar', AsyncMock()) as invalidar:
+            modelo.bulk_create = AsyncMock()
+            await EscalamientoService.guardar_evaluaciones_temp(MagicMock(id="sol-1"), niveles)
+
+        assert list(invalidar.await_args.args[0]) == ["asesor-1", "asesor-3"]
+
+    @pytest.mark.asyncio
+    async def test_escalar_nivel_invalida_asesores_del_nivel(self):
+        """Test that advisors of the new level see the solicitud as pending"""
+        from jobs.scheduled_jobs import _invalidar_dashboard_nivel
+
+        consulta = MagicMock()
+        consulta.values_list = AsyncMock(return_value=["asesor-1", "asesor-2"])
+
+        with patch('models.geografia.EvaluacionAsesorTemp.filter', return_value=consulta) as filtro, \
+             patch.object(DashboardAsesorService, 'invalidar', AsyncMock()) as invalidar:
+            await _invalidar_dashboard_nivel("sol-1", 3)
+
+        filtro.assert_called_once_with(solicitud_id="sol-1", nivel_entrega=3)
+        invalidar.assert_awaited_once_with(["asesor-1", "asesor-2"])
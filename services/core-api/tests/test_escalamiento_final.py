@@ -4,10 +4,12 @@ Cubre todos los aspectos requeridos en la tarea 4.13
 """
 
 import pytest
+import pytest_asyncio
 import asyncio
 from decimal import Decimal
 from datetime import datetime, timedelta
 from unittest.mock import AsyncMock, patch, MagicMock
+from tortoise import Tortoise
 
 # Tests de cálculo de proximidad con diferentes escenarios
 class TestCalculoProximidad:
@@ -325,5 +327,320 @@ class TestCasosEdge:
         assert cumple_confianza(asesor_confiable, confianza_minima) is True
         assert cumple_confianza(asesor_no_confiable, confianza_minima) is False
 
+
+# Tests del modo lote de cálculo de puntajes
+class TestCalculoPuntajesLote:
+    
+    def _asesor(self, asesor_id, municipio, confianza):
+        asesor = MagicMock()
+        asesor.id = asesor_id
+        asesor.municipio = municipio
+        asesor.confianza = confianza
+        return asesor
+    
+    def _municipio(self, municipio_id, area_metropolitana, hub):
+        municipio = MagicMock()
+        municipio.id = municipio_id
+        municipio.area_metropolitana = area_metropolitana
+        municipio.hub_logistico = hub
+        return municipio
+    
+    def test_normalizacion_compartida(self):
+        """Test que los normalizadores reproducen las fórmulas del cálculo individual"""
+        from services.escalamiento_service import EscalamientoService
+        
+        assert EscalamientoService._normalizar_actividad(0, 0) == Decimal('1.0')
+        assert EscalamientoService._normalizar_actividad(4, 3) == Decimal('4.0')
+        
+        # 2/4 adjudicadas, 1/2 exitosas, 2h promedio de respuesta
+        desempeno = EscalamientoService._normalizar_desempeno(4, 2, 2, 1, 2 * 7200, 2)
+        esperado = 1 + 4 * (0.5 * 0.5 + 0.5 * 0.3 + (1 - 7200 / 86400) * 0.2)
+        assert desempeno == Decimal(str(round(esperado, 2)))
+        
+        assert EscalamientoService._normalizar_confianza(None) == Decimal('3.0')
+        assert EscalamientoService._normalizar_confianza(Decimal('4.5')) == Decimal('4.5')
+    
+    @pytest.mark.asyncio
+    async def test_lote_igual_a_individual(self):
+        """Test que el modo lote produce los mismos puntajes y variables que el individual"""
+        from services.escalamiento_service import EscalamientoService
+        
+        bogota = self._municipio('m1', 'AM BOGOTA', 'HUB CENTRO')
+        soacha = self._municipio('m2', 'AM BOGOTA', 'HUB CENTRO')
+        tunja = self._municipio('m3', None, 'HUB CENTRO')
+        cali = self._municipio('m4', None, 'HUB OCCIDENTE')
+        
+        solicitud = MagicMock()
+        solicitud.municipio = bogota
+        
+        asesores = [
+            self._asesor('a1', bogota, Decimal('4.5')),
+            self._asesor('a2', soacha, Decimal('3.0')),
+            self._asesor('a3', tunja, None),
+            self._asesor('a4', cali, Decimal('2.5')),
+        ]
+        metricas = {
+            'a1': (Decimal('5.0'), Decimal('4.2')),
+            'a2': (Decimal('3.4'), Decimal('2.87')),
+            'a3': (Decimal('3.0'), Decimal('3.0')),
+            'a4': (Decimal('1.0'), Decimal('1.55')),
+        }
+        
+        async def actividad(asesor_id):
+            return metricas[asesor_id][0]
+        
+        async def desempeno(asesor_id):
+            return metricas[asesor_id][1]
+        
+        async def confianza(asesor_id):
+            asesor = next(a for a in asesores if a.id == asesor_id)
+            return EscalamientoService._normalizar_confianza(asesor.confianza)
+        
+        metricas_lote = {
+            asesor_id: {
+                'actividad_reciente_5': act,
+                'desempeno_historico_5': des,
+                'errores_calculo': []
+            }
+            for asesor_id, (act, des) in metricas.items()
+        }
+        
+        with patch.object(EscalamientoService, 'calcular_actividad_reciente', side_effect=actividad), \
+             patch.object(EscalamientoService, 'calcular_desempeno_historico', side_effect=desempeno), \
+             patch.object(EscalamientoService, 'obtener_nivel_confianza', side_effect=confianza):
+            individual = [
+                (asesor, *await EscalamientoService.calcular_puntaje_asesor(asesor, solicitud))
+                for asesor in asesores
+            ]
+        
+        with patch.object(EscalamientoService, 'obtener_metricas_lote', AsyncMock(return_value=metricas_lote)) as mock_lote:
+            lote = await EscalamientoService.calcular_puntajes_lote(asesores, solicitud)
+        
+        mock_lote.assert_awaited_once()
+        assert lote == individual
+        assert [variables['criterio_proximidad'] for _, _, variables in lote] == [
+            'misma_ciudad', 'area_metropolitana', 'hub_logistico', 'fuera_de_cobertura'
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_lote_sin_asesores(self):
+        """Test que el modo lote no consulta la base de datos sin asesores"""
+        from services.escalamiento_service import EscalamientoService
+        
+        with patch.object(EscalamientoService, 'obtener_metricas_lote', AsyncMock()) as mock_lote:
+            assert await EscalamientoService.calcular_puntajes_lote([], MagicMock()) == []
+        
+        mock_lote.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_lote_usa_metricas_precalculadas(self):
+        """Test que solo los asesores sin fila compactada consultan el historial"""
+        from services.escalamiento_service import EscalamientoService
+        from services.metricas_asesor_service import MetricasAsesorService
+        
+        fila = MagicMock(
+            respuestas_enviadas=10, respuestas_respondidas=8,
+            ofertas_total=4, ofertas_adjudicadas=2, ofertas_aceptadas=2, ofertas_exitosas=1,
+            suma_tiempo_respuesta_seg=3600, ofertas_con_tiempo=2
+        )
+        
+        with patch.object(MetricasAsesorService, 'obtener_metricas', AsyncMock(return_value={'a1': fila})), \
+             patch.object(MetricasAsesorService, 'agregar_actividad', AsyncMock(return_value={})) as mock_act, \
+             patch.object(MetricasAsesorService, 'agregar_desempeno', AsyncMock(return_value={})) as mock_des, \
+             patch.object(EscalamientoService, 'aplicar_fallbacks_metricas', AsyncMock(return_value={
+                 'actividad_reciente': Decimal('1.0'), 'desempeno_historico': Decimal('2.0')
+             })):
+            metricas = await EscalamientoService.obtener_metricas_lote(['a1', 'a2'])
+        
+        mock_act.assert_awaited_once_with(['a2'], 30)
+        mock_des.assert_awaited_once_with(['a2'], 6)
+        assert metricas['a1']['actividad_reciente_5'] == EscalamientoService._normalizar_actividad(10, 8)
+        assert metricas['a1']['desempeno_historico_5'] == EscalamientoService._normalizar_desempeno(4, 2, 2, 1, 3600, 2)
+        assert metricas['a2']['actividad_reciente_5'] == Decimal('1.0')
+        assert metricas['a2']['desempeno_historico_5'] == Decimal('2.0')
+
+
+MODULOS_BD = {
+    "models": [
+        "models.user",
+        "models.solicitud",
+        "models.oferta",
+        "models.geografia",
+        "models.analytics"
+    ]
+}
+
+
+@pytest_asyncio.fixture
+async def historico_ofertas():
+    """Dos ofertas de asesores distintos con su fila en ofertas_historicas (SQLite en memoria)"""
+    from models.analytics import OfertaHistorica
+    from models.geografia import Municipio
+    from models.oferta import Oferta
+    from models.solicitud import Solicitud
+    from models.user import Asesor, Cliente, Usuario
+    
+    await Tortoise.init(db_url="sqlite://:memory:", modules=MODULOS_BD, use_tz=True)
+    await Tortoise.generate_schemas()
+    try:
+        municipio = await Municipio.create(
+            codigo_dane="05001", municipio="Medellín", municipio_norm="MEDELLIN",
+            departamento="ANTIOQUIA", hub_logistico="MEDELLIN"
+        )
+        usuario_cliente = await Usuario.create(
+            email="cliente@adjudicacion.co", password_hash="x", nombre="Cliente", apellido="Prueba",
+            telefono="+573000000000", rol="CLIENT"
+        )
+        cliente = await Cliente.create(
+            usuario=usuario_cliente, municipio=municipio, ciudad="Medellín", departamento="ANTIOQUIA"
+        )
+        solicitud = await Solicitud.create(
+            cliente=cliente, municipio=municipio, ciudad_origen="Medellín", departamento_origen="ANTIOQUIA"
+        )
+        ofertas = []
+        for i in range(2):
+            usuario = await Usuario.create(
+                email=f"asesor{i}@adjudicacion.co", password_hash="x", nombre="Asesor", apellido=str(i),
+                telefono=f"+57300000000{i + 1}", rol="ADVISOR"
+            )
+            asesor = await Asesor.create(
+                usuario=usuario, municipio=municipio, ciudad="Medellín",
+                departamento="ANTIOQUIA", punto_venta=f"Punto {i}"
+            )
+            oferta = await Oferta.create(
+                solicitud=solicitud, asesor=asesor, tiempo_entrega_dias=2, monto_total=Decimal("100000")
+            )
+            await OfertaHistorica.create(
+                asesor=asesor, solicitud=solicitud, oferta=oferta, fecha=datetime.utcnow().date(),
+                monto_total=Decimal("100000"), cantidad_repuestos=1, tiempo_respuesta_seg=60,
+                ciudad_solicitud="Medellín", ciudad_asesor="Medellín"
+            )
+            ofertas.append(oferta)
+        yield ofertas
+    finally:
+        await Tortoise._drop_databases()
+
+
+class TestAdjudicacionHistorico:
+    """Marcado de ofertas_historicas al adjudicar, sobre una base real"""
+    
+    @pytest.mark.asyncio
+    async def test_adjudicacion_por_lote_marca_por_oferta_id(self, historico_ofertas):
+        """Test que la adjudicación marca el histórico de cada oferta y cuenta una vez por asesor"""
+        from models.analytics import OfertaHistorica
+        from services.events_service import EventsService
+        from services.metricas_asesor_service import MetricasAsesorService
+        from services.dashboard_asesor_service import DashboardAsesorService
+        
+        ganadora, perdedora = historico_ofertas
+        
+        with patch.object(MetricasAsesorService, 'registrar_adjudicacion', AsyncMock()) as mock_registrar, \
+             patch.object(DashboardAsesorService, 'invalidar', AsyncMock()) as mock_invalidar:
+            await EventsService.on_ofertas_adjudicadas([ganadora.id, ganadora.id])
+        
+        assert await OfertaHistorica.filter(oferta_id=ganadora.id).values_list('adjudicada', flat=True) == [True]
+        assert await OfertaHistorica.filter(oferta_id=perdedora.id).values_list('adjudicada', flat=True) == [False]
+        mock_registrar.assert_awaited_once_with([str(ganadora.asesor_id)])
+        mock_invalidar.assert_awaited_once_with([str(ganadora.asesor_id)])
+    
+    @pytest.mark.asyncio
+    async def test_adjudicacion_ya_marcada_no_cuenta(self, historico_ofertas):
+        """Test que las ofertas que otra evaluación ya marcó no suman adjudicaciones otra vez"""
+        from services.events_service import EventsService
+        from services.metricas_asesor_service import MetricasAsesorService
+        from services.dashboard_asesor_service import DashboardAsesorService
+        
+        ganadora, otra = historico_ofertas
+        
+        with patch.object(MetricasAsesorService, 'registrar_adjudicacion', AsyncMock()) as mock_registrar, \
+             patch.object(DashboardAsesorService, 'invalidar', AsyncMock()):
+            await EventsService.on_ofertas_adjudicadas([ganadora.id])
+            await EventsService.on_ofertas_adjudicadas([ganadora.id, otra.id])
+        
+        assert [c.args[0] for c in mock_registrar.await_args_list] == [
+            [str(ganadora.asesor_id)], [str(otra.asesor_id)]
+        ]
+
+
+class TestIndiceGeografico:
+    
+    def _indice(self):
+        from services.indice_geografico_service import IndiceGeograficoService, _Indice
+        
+        municipios = []
+        for i, (area, hub) in enumerate([('AM 1', 'HUB A'), ('AM 1', 'HUB B'), (None, 'HUB A'), ('NO', 'HUB B'), (None, 'HUB C')]):
+            municipio = MagicMock()
+            municipio.id = f"m{i}"
+            municipio.municipio_norm = f"CIUDAD {i}"
+            municipio.departamento = "DEPTO"
+            municipio.area_metropolitana = area
+            municipio.hub_logistico = hub
+            municipios.append(municipio)
+        
+        asesores = []
+        for i, municipio in enumerate(municipios * 2 + [None]):
+            asesor = MagicMock()
+            asesor.id = f"a{i}"
+            asesor.municipio = municipio
+            asesores.append(asesor)
+        
+        servicio = IndiceGeograficoService()
+        servicio._indice = _Indice(municipios, asesores)
+        return servicio, municipios, asesores
+    
+    @pytest.mark.asyncio
+    async def test_proximidades_igual_a_calcular_proximidad(self):
+        """Test que el índice reproduce calcular_proximidad para todos los pares"""
+        from services.escalamiento_service import EscalamientoService
+        
+        servicio, municipios, asesores = self._indice()
+        
+        for municipio_solicitud in municipios:
+            proximidades = await servicio.proximidades(municipio_solicitud)
+            for asesor in asesores:
+                if asesor.municipio is None:
+                    assert asesor.id not in proximidades
+                    continue
+                esperado = await EscalamientoService.calcular_proximidad(municipio_solicitud, asesor.municipio)
+                assert proximidades[asesor.id] == esperado
+    
+    @pytest.mark.asyncio
+    async def test_asesores_elegibles(self):
+        """Test misma ciudad + todas las áreas metropolitanas + hub, sin duplicados"""
+        servicio, municipios, _ = self._indice()
+        
+        elegibles = await servicio.asesores_elegibles(municipios[4])
+        
+        assert elegibles['misma_ciudad'] == {'a4', 'a9'}
+        assert elegibles['areas_metropolitanas'] == {'a0', 'a1', 'a5', 'a6'}
+        assert {a.id for a in elegibles['asesores']} == {'a0', 'a1', 'a4', 'a5', 'a6', 'a9'}
+        assert await servicio.buscar_municipio('Ciudad 2', 'depto') is municipios[2]
+    
+    @pytest.mark.asyncio
+    async def test_invalidar(self):
+        """Test que invalidar descarta el snapshot, registra el motivo y avisa a las demás réplicas"""
+        from services.indice_geografico_service import CANAL_INVALIDACION_INDICE, sincronizacion_cache
+        
+        servicio, _, _ = self._indice()
+        assert servicio.get_estado()['asesores_activos'] == 11
+        
+        with patch.object(sincronizacion_cache, 'publicar', AsyncMock()) as publicar:
+            await servicio.invalidar("importación DIVIPOLA")
+        
+        estado = servicio.get_estado()
+        assert estado['construido'] is False
+        assert estado['ultima_invalidacion']['motivo'] == "importación DIVIPOLA"
+        publicar.assert_awaited_once_with(CANAL_INVALIDACION_INDICE, {'motivo': "importación DIVIPOLA"})
+    
+    def test_invalidacion_de_otra_replica(self):
+        """Test que un mensaje de otra réplica descarta el snapshot local"""
+        servicio, _, _ = self._indice()
+        
+        servicio._aplicar_invalidacion({'motivo': "asesor a1 actualizado", 'origen': "otra-replica"})
+        
+        estado = servicio.get_estado()
+        assert estado['construido'] is False
+        assert estado['ultima_invalidacion']['motivo'] == "asesor a1 actualizado (otra réplica)"
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -7,6 +7,7 @@ evaluación completa, timeout, concurrencia y expiración de ofertas
 import pytest
 import pytest_asyncio
 import asyncio
+from contextlib import contextmanager
 from decimal import Decimal
 from datetime import datetime, timedelta
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -21,6 +22,84 @@ from models.user import Usuario, Asesor, Cliente
 from models.enums import EstadoSolicitud, EstadoOferta
 
 
+@pytest_asyncio.fixture
+async def sample_repuesto():
+    """Sample repuesto for testing"""
+    repuesto = MagicMock()
+    repuesto.id = "rep-123"
+    repuesto.nombre = "Filtro de Aceite"
+    return repuesto
+
+
+def _oferta_con_detalle(oferta_id, asesor, precio='50000', tiempo=5, garantia=12):
+    """Oferta y detalle con valores numéricos para puntuar"""
+    oferta = MagicMock()
+    oferta.id = oferta_id
+    oferta.asesor.usuario.nombre_completo = asesor
+    detalle = MagicMock()
+    detalle.id = f"detalle-{oferta_id}"
+    detalle.precio_unitario = Decimal(precio)
+    detalle.tiempo_entrega_dias = tiempo
+    detalle.garantia_meses = garantia
+    return oferta, detalle
+
+
+def _oferta_evaluable(oferta_id, asesor, detalles):
+    """Oferta ENVIADA con detalles precargados: (repuesto_id, precio, tiempo, garantia)"""
+    oferta = MagicMock()
+    oferta.id = oferta_id
+    oferta.estado = EstadoOferta.ENVIADA
+    oferta.asesor.id = f"asesor-{asesor}"
+    oferta.asesor.usuario.nombre_completo = f"Asesor {asesor}"
+    oferta.detalles = []
+    for repuesto_id, precio, tiempo, garantia in detalles:
+        detalle = MagicMock()
+        detalle.id = f"{oferta_id}-{repuesto_id}"
+        detalle.repuesto_solicitado_id = repuesto_id
+        detalle.precio_unitario = Decimal(precio)
+        detalle.tiempo_entrega_dias = tiempo
+        detalle.garantia_meses = garantia
+        detalle.cantidad = 1
+        detalle.puntaje_total = None
+        oferta.detalles.append(detalle)
+    return oferta
+
+
+def _solicitud_evaluable(solicitud_id, repuesto_ids, ofertas):
+    solicitud = MagicMock()
+    solicitud.id = solicitud_id
+    solicitud.codigo_solicitud = f"SOL-{solicitud_id}"
+    solicitud.is_evaluable.return_value = True
+    solicitud.save = AsyncMock()
+    solicitud.repuestos_solicitados = []
+    for repuesto_id in repuesto_ids:
+        repuesto = MagicMock()
+        repuesto.id = repuesto_id
+        repuesto.nombre = f"Repuesto {repuesto_id}"
+        solicitud.repuestos_solicitados.append(repuesto)
+    solicitud.ofertas = ofertas
+    return solicitud
+
+
+@contextmanager
+def _persistencia_en_bloque():
+    """Patch the bulk writes of evaluar_solicitud and yield their mocks"""
+    oferta_query = MagicMock()
+    oferta_query.using_db.return_value.update = AsyncMock()
+    with patch('tortoise.transactions.in_transaction'), \
+            patch('models.oferta.OfertaDetalle.bulk_update', new_callable=AsyncMock) as bulk_update, \
+            patch('models.oferta.AdjudicacionRepuesto.bulk_create', new_callable=AsyncMock) as bulk_create, \
+            patch('models.oferta.Oferta.filter', return_value=oferta_query), \
+            patch('models.oferta.Evaluacion.create', new_callable=AsyncMock) as evaluacion_create, \
+            patch('services.evaluacion_service.events_service.on_ofertas_adjudicadas', new_callable=AsyncMock):
+        yield {
+            'bulk_update': bulk_update,
+            'bulk_create': bulk_create,
+            'oferta_update': oferta_query.using_db.return_value.update,
+            'evaluacion_create': evaluacion_create
+        }
+
+
 class TestEvaluacionPuntajes:
     """Tests para cálculo de puntajes de ofertas"""
     
@@ -33,14 +112,6 @@ class TestEvaluacionPuntajes:
             'garantia': 0.15
         }
     
-    @pytest_asyncio.fixture
-    async def sample_repuesto(self):
-        """Sample repuesto for testing"""
-        repuesto = MagicMock()
-        repuesto.id = "rep-123"
-        repuesto.nombre = "Filtro de Aceite"
-        return repuesto
-    
     @pytest_asyncio.fixture
     async def sample_ofertas_data(self):
         """Sample offers data for testing scoring"""
@@ -98,7 +169,8 @@ class TestEvaluacionPuntajes:
             mock_detalles.append(detalle)
         
         # Mock OfertaDetalle.get_or_none to return details sequentially
-        with patch('models.oferta.OfertaDetalle.get_or_none') as mock_get_detalle:
+        with patch('models.oferta.OfertaDetalle.get_or_none') as mock_get_detalle, \
+                patch('models.oferta.OfertaDetalle.bulk_update', new_callable=AsyncMock) as mock_bulk_update:
             # Create async side effect function
             async def async_side_effect(*args, **kwargs):
                 # Return the next detail in sequence
@@ -127,6 +199,12 @@ class TestEvaluacionPuntajes:
             ganador = resultado['ganador']
             assert ganador['asesor_nombre'] in ['Asesor A', 'Asesor B', 'Asesor C']
             assert ganador['puntaje_total'] > 0
+            
+            # Scores of every evaluated detail are persisted in one bulk update
+            mock_bulk_update.assert_awaited_once()
+            assert mock_bulk_update.call_args[0][0] == mock_detalles
+            assert 'puntaje_total' in mock_bulk_update.call_args[1]['fields']
+            assert all(detalle.puntaje_total is not None for detalle in mock_detalles)
         
         # Verify all offers were scored
         todas_eval = resultado['todas_evaluaciones']
@@ -159,7 +237,8 @@ class TestEvaluacionPuntajes:
                 ofertas_identicas.append(oferta)
             
             # Mock identical details
-            with patch('models.oferta.OfertaDetalle.get_or_none') as mock_get_detalle:
+            with patch('models.oferta.OfertaDetalle.get_or_none') as mock_get_detalle, \
+                    patch('models.oferta.OfertaDetalle.bulk_update', new_callable=AsyncMock):
                 mock_detalles = []
                 for i in range(3):
                     detalle = MagicMock()
@@ -204,9 +283,12 @@ class TestEvaluacionPuntajes:
                 'garantia': 0.15
             }
             
-            with patch('models.oferta.OfertaDetalle.get_or_none', return_value=None):
+            with patch('models.oferta.OfertaDetalle.get_or_none', return_value=None), \
+                    patch('models.oferta.OfertaDetalle.bulk_update', new_callable=AsyncMock) as mock_bulk_update:
                 resultado = await EvaluacionService.evaluar_repuesto(sample_repuesto, [])
                 
+                mock_bulk_update.assert_not_awaited()
+                
                 assert resultado['success'] is False
                 assert resultado['motivo'] == 'no_ofertas_disponibles'
                 assert resultado['ofertas_evaluadas'] == 0
@@ -218,10 +300,11 @@ class TestCoberturaMinima:
     
     @pytest_asyncio.fixture
     async def mock_config_cobertura(self):
-        """Mock configuration with minimum coverage"""
-        return {
-            'cobertura_minima_pct': 50.0
-        }
+        """Mock configuration: general params (minimum coverage) and evaluation weights"""
+        return [
+            {'cobertura_minima_porcentaje': 50.0},
+            {'precio': 0.50, 'tiempo_entrega': 0.35, 'garantia': 0.15}
+        ]
     
     @pytest_asyncio.fixture
     async def sample_solicitud_data(self):
@@ -232,42 +315,24 @@ class TestCoberturaMinima:
         }    
 
     @patch('services.evaluacion_service.ConfiguracionService.get_config')
+    @patch('models.oferta.OfertaDetalle.bulk_update', new_callable=AsyncMock)
     @patch('models.oferta.OfertaDetalle.filter')
-    @patch('models.oferta.OfertaDetalle.get_or_none')
-    @patch('services.evaluacion_service.EvaluacionService.evaluar_repuesto')
+    @patch('models.oferta.OfertaDetalle.get_or_none', new_callable=AsyncMock)
     @pytest.mark.asyncio
-    async def test_cobertura_suficiente_gana(self, mock_evaluar, mock_get_detalle, 
-                                           mock_filter, mock_config, sample_repuesto, 
+    async def test_cobertura_suficiente_gana(self, mock_get_detalle, mock_filter, mock_bulk_update,
+                                           mock_config, sample_repuesto,
                                            mock_config_cobertura, sample_solicitud_data):
-        """Test that offer with sufficient coverage wins"""
-        
-        mock_config.return_value = mock_config_cobertura
+        """Test that offer with sufficient coverage wins and its scores are saved"""
         
-        # Create offer with good coverage (3/4 = 75% > 50%)
-        oferta_buena_cobertura = MagicMock()
-        oferta_buena_cobertura.id = "oferta-1"
-        oferta_buena_cobertura.asesor.usuario.nombre_completo = "Asesor Cobertura Alta"
+        mock_config.side_effect = mock_config_cobertura
         
-        detalle = MagicMock()
-        detalle.precio_unitario = Decimal('50000')
-        detalle.tiempo_entrega_dias = 5
-        detalle.garantia_meses = 12
+        # Create offer with good coverage (3/4 = 75%)
+        oferta_buena_cobertura, detalle = _oferta_con_detalle("oferta-1", "Asesor Cobertura Alta")
         
         # Mock coverage calculation (3 repuestos covered out of 4)
         mock_filter.return_value.count = AsyncMock(return_value=3)
         mock_get_detalle.return_value = detalle
         
-        # Mock detailed evaluation
-        mock_evaluar.return_value = {
-            'success': True,
-            'ganador': {
-                'oferta_id': 'oferta-1',
-                'asesor_nombre': 'Asesor Cobertura Alta',
-                'puntaje_total': 0.85,
-                'precio': 50000
-            }
-        }
-        
         resultado = await EvaluacionService.evaluar_repuesto_con_cobertura(
             sample_repuesto, [oferta_buena_cobertura], sample_solicitud_data['total_repuestos']
         )
@@ -277,80 +342,68 @@ class TestCoberturaMinima:
         assert resultado['ganador']['asesor_nombre'] == 'Asesor Cobertura Alta'
         assert resultado['cobertura_aplicada']['cumple_cobertura'] is True
         assert resultado['cobertura_aplicada']['cobertura_obtenida'] == 75.0
+        
+        mock_bulk_update.assert_awaited_once()
+        assert mock_bulk_update.call_args[0][0] == [detalle]
+        assert detalle.puntaje_total == Decimal('1.0')
     
     @patch('services.evaluacion_service.ConfiguracionService.get_config')
+    @patch('models.oferta.OfertaDetalle.bulk_update', new_callable=AsyncMock)
     @patch('models.oferta.OfertaDetalle.filter')
-    @patch('models.oferta.OfertaDetalle.get_or_none')
+    @patch('models.oferta.OfertaDetalle.get_or_none', new_callable=AsyncMock)
     @pytest.mark.asyncio
-    async def test_cobertura_insuficiente_rechaza(self, mock_get_detalle, mock_filter, 
-                                                 mock_config, sample_repuesto, 
+    async def test_cobertura_insuficiente_rechaza(self, mock_get_detalle, mock_filter, mock_bulk_update,
+                                                 mock_config, sample_repuesto,
                                                  mock_config_cobertura, sample_solicitud_data):
-        """Test that offer with insufficient coverage is rejected"""
-        
-        mock_config.return_value = mock_config_cobertura
+        """Test that a cheaper offer with insufficient coverage loses to one that meets it"""
         
-        # Create offer with poor coverage (1/4 = 25% < 50%)
-        oferta_mala_cobertura = MagicMock()
-        oferta_mala_cobertura.id = "oferta-1"
-        oferta_mala_cobertura.asesor.usuario.nombre_completo = "Asesor Cobertura Baja"
-        
-        detalle = MagicMock()
-        mock_get_detalle.return_value = detalle
+        mock_config.side_effect = mock_config_cobertura
         
-        # Mock coverage calculation (1 repuesto covered out of 4)
-        mock_filter.return_value.count = AsyncMock(return_value=1)
+        # Poor coverage (1/4 = 25% < 50%) but the best price
+        oferta_mala_cobertura, detalle_malo = _oferta_con_detalle("oferta-1", "Asesor Cobertura Baja", precio='30000')
+        oferta_buena_cobertura, detalle_bueno = _oferta_con_detalle("oferta-2", "Asesor Cobertura Alta")
+        mock_get_detalle.side_effect = [detalle_malo, detalle_bueno]
+        mock_filter.return_value.count = AsyncMock(side_effect=[1, 3])
         
         resultado = await EvaluacionService.evaluar_repuesto_con_cobertura(
-            sample_repuesto, [oferta_mala_cobertura], sample_solicitud_data['total_repuestos']
+            sample_repuesto, [oferta_mala_cobertura, oferta_buena_cobertura], sample_solicitud_data['total_repuestos']
         )
         
-        assert resultado['success'] is False
-        assert resultado['motivo'] == 'ninguna_oferta_cumple_cobertura'
-        assert resultado['cobertura_aplicada']['cumple_cobertura'] is False
-        assert resultado['cobertura_aplicada']['mejor_cobertura_disponible'] == 25.0
+        assert resultado['success'] is True
+        assert resultado['ganador']['oferta_id'] == 'oferta-2'
+        assert resultado['ofertas_evaluadas'] == 1
+        assert resultado['cobertura_aplicada']['cumple_cobertura'] is True
+        assert [c['oferta_id'] for c in resultado['todas_coberturas']] == ['oferta-2']
 
 
 class TestCascadaCobertura:
     """Tests para cascada cuando mejor oferta no cumple 50%"""
     
     @patch('services.evaluacion_service.ConfiguracionService.get_config')
+    @patch('models.oferta.OfertaDetalle.bulk_update', new_callable=AsyncMock)
     @patch('models.oferta.OfertaDetalle.filter')
-    @patch('models.oferta.OfertaDetalle.get_or_none')
-    @patch('services.evaluacion_service.EvaluacionService.evaluar_repuesto')
+    @patch('models.oferta.OfertaDetalle.get_or_none', new_callable=AsyncMock)
     @pytest.mark.asyncio
-    async def test_cascada_encuentra_cobertura_suficiente(self, mock_evaluar, mock_get_detalle, 
-                                                        mock_filter, mock_config, sample_repuesto):
+    async def test_cascada_encuentra_cobertura_suficiente(self, mock_get_detalle, mock_filter,
+                                                        mock_bulk_update, mock_config, sample_repuesto):
         """Test cascade logic finds offer with sufficient coverage after rejecting others"""
         
-        mock_config.return_value = {'cobertura_minima_pct': 50.0}
+        mock_config.side_effect = [
+            {'cobertura_minima_porcentaje': 50.0},
+            {'precio': 0.50, 'tiempo_entrega': 0.35, 'garantia': 0.15}
+        ]
         
-        # Create multiple offers with different coverage levels
+        # Create multiple offers with different coverage levels; only the third meets 50%
         ofertas = []
-        coberturas = [25, 40, 60]  # Only third one meets 50% minimum
-        
-        for i, cobertura_pct in enumerate(coberturas):
-            oferta = MagicMock()
-            oferta.id = f"oferta-{i+1}"
-            oferta.asesor.usuario.nombre_completo = f"Asesor {i+1}"
+        detalles = []
+        for i in range(3):
+            oferta, detalle = _oferta_con_detalle(f"oferta-{i+1}", f"Asesor {i+1}", precio=str(40000 + i * 5000))
             ofertas.append(oferta)
+            detalles.append(detalle)
+        mock_get_detalle.side_effect = detalles
         
-        # Mock details
-        mock_get_detalle.side_effect = [MagicMock() for _ in range(3)]
-        
-        # Mock coverage calculations - return coverage in descending order
-        coverage_counts = [1, 2, 3]  # Out of 4 total repuestos
-        mock_filter.return_value.count = AsyncMock()
-        mock_filter.return_value.count.side_effect = coverage_counts
-        
-        # Mock detailed evaluation for winning offer
-        mock_evaluar.return_value = {
-            'success': True,
-            'ganador': {
-                'oferta_id': 'oferta-3',
-                'asesor_nombre': 'Asesor 3',
-                'puntaje_total': 0.80
-            }
-        }
+        # Coverage: 1/4, 1/4 and 3/4 repuestos
+        mock_filter.return_value.count = AsyncMock(side_effect=[1, 1, 3])
         
         resultado = await EvaluacionService.evaluar_repuesto_con_cobertura(
             sample_repuesto, ofertas, 4
@@ -358,42 +411,33 @@ class TestCascadaCobertura:
         
         assert resultado['success'] is True
         assert resultado['ganador']['asesor_nombre'] == 'Asesor 3'
-        assert resultado['ofertas_descartadas_por_cobertura'] == 2  # First two rejected
+        assert resultado['ofertas_evaluadas'] == 1  # First two rejected
         assert resultado['cobertura_aplicada']['cobertura_obtenida'] == 75.0  # 3/4 = 75%
+        assert mock_bulk_update.call_args[0][0] == [detalles[2]]
 
 
 class TestAdjudicacionExcepcion:
     """Tests para adjudicación por excepción (única oferta)"""
     
     @patch('services.evaluacion_service.ConfiguracionService.get_config')
+    @patch('models.oferta.OfertaDetalle.bulk_update', new_callable=AsyncMock)
     @patch('models.oferta.OfertaDetalle.filter')
-    @patch('models.oferta.OfertaDetalle.get_or_none')
-    @patch('services.evaluacion_service.EvaluacionService.evaluar_repuesto')
+    @patch('models.oferta.OfertaDetalle.get_or_none', new_callable=AsyncMock)
     @pytest.mark.asyncio
-    async def test_unica_oferta_gana_sin_cobertura(self, mock_evaluar, mock_get_detalle, 
-                                                  mock_filter, mock_config, sample_repuesto):
+    async def test_unica_oferta_gana_sin_cobertura(self, mock_get_detalle, mock_filter,
+                                                  mock_bulk_update, mock_config, sample_repuesto):
         """Test that single offer wins even without meeting coverage requirement"""
         
-        mock_config.return_value = {'cobertura_minima_pct': 50.0}
+        mock_config.side_effect = [
+            {'cobertura_minima_porcentaje': 50.0},
+            {'precio': 0.50, 'tiempo_entrega': 0.35, 'garantia': 0.15}
+        ]
         
         # Single offer with insufficient coverage (1/4 = 25% < 50%)
-        oferta_unica = MagicMock()
-        oferta_unica.id = "oferta-unica"
-        oferta_unica.asesor.usuario.nombre_completo = "Único Asesor"
-        
-        mock_get_detalle.return_value = MagicMock()
+        oferta_unica, detalle = _oferta_con_detalle("oferta-unica", "Único Asesor")
+        mock_get_detalle.return_value = detalle
         mock_filter.return_value.count = AsyncMock(return_value=1)  # 1/4 = 25%
         
-        # Mock detailed evaluation
-        mock_evaluar.return_value = {
-            'success': True,
-            'ganador': {
-                'oferta_id': 'oferta-unica',
-                'asesor_nombre': 'Único Asesor',
-                'puntaje_total': 0.70
-            }
-        }
-        
         resultado = await EvaluacionService.evaluar_repuesto_con_cobertura(
             sample_repuesto, [oferta_unica], 4
         )
@@ -403,6 +447,7 @@ class TestAdjudicacionExcepcion:
         assert resultado['ganador']['es_adjudicacion_por_excepcion'] is True
         assert resultado['cobertura_aplicada']['cumple_cobertura'] is False
         assert resultado['cobertura_aplicada']['es_unica_oferta'] is True
+        mock_bulk_update.assert_awaited_once()
 
 
 class TestEvaluacionCompleta:
@@ -410,98 +455,31 @@ class TestEvaluacionCompleta:
     
     @pytest_asyncio.fixture
     async def mock_solicitud_completa(self):
-        """Mock complete solicitud with multiple repuestos and offers"""
-        solicitud = MagicMock()
-        solicitud.id = "sol-123"
-        solicitud.codigo_solicitud = "SOL-2024-001"
-        solicitud.is_evaluable.return_value = True
-        
-        # Multiple repuestos
-        repuestos = []
-        for i in range(3):
-            repuesto = MagicMock()
-            repuesto.id = f"rep-{i+1}"
-            repuesto.nombre = f"Repuesto {i+1}"
-            repuestos.append(repuesto)
-        
-        solicitud.repuestos_solicitados = repuestos
-        
-        # Multiple offers
-        ofertas = []
-        for i in range(2):
-            oferta = MagicMock()
-            oferta.id = f"oferta-{i+1}"
-            oferta.estado = EstadoOferta.ENVIADA
-            oferta.asesor.id = f"asesor-{i+1}"
-            oferta.asesor.usuario.nombre_completo = f"Asesor {i+1}"
-            ofertas.append(oferta)
-        
-        solicitud.ofertas = ofertas
-        return solicitud
+        """Mock complete solicitud with multiple repuestos and offers (prefetched graph)"""
+        ofertas = [
+            # 100% coverage
+            _oferta_evaluable('oferta-1', 1, [
+                ('rep-1', '50000', 5, 12), ('rep-2', '30000', 3, 6), ('rep-3', '10000', 2, 3)
+            ]),
+            # 66% coverage, cheapest for rep-1
+            _oferta_evaluable('oferta-2', 2, [('rep-1', '40000', 5, 12), ('rep-2', '35000', 4, 6)]),
+        ]
+        return _solicitud_evaluable('sol-123', ['rep-1', 'rep-2', 'rep-3'], ofertas)
     
     @patch('models.solicitud.Solicitud.get_or_none')
-    @patch('services.evaluacion_service.EvaluacionService.evaluar_repuesto_con_cobertura')
-    @patch('models.oferta.AdjudicacionRepuesto.create')
-    @patch('models.evaluacion.Evaluacion.create')
     @patch('services.evaluacion_service.ConfiguracionService.get_config')
     @pytest.mark.asyncio
-    async def test_evaluacion_solicitud_exitosa(self, mock_config, mock_eval_create, 
-                                               mock_adj_create, mock_evaluar_repuesto, 
-                                               mock_get_solicitud, mock_solicitud_completa):
-        """Test successful complete solicitud evaluation"""
+    async def test_evaluacion_solicitud_exitosa(self, mock_config, mock_get_solicitud, mock_solicitud_completa):
+        """Test successful complete solicitud evaluation with bulk writes"""
         
-        # Setup mocks
-        mock_get_solicitud.return_value = mock_solicitud_completa
+        mock_get_solicitud.return_value.prefetch_related = AsyncMock(return_value=mock_solicitud_completa)
         mock_config.side_effect = [
             {'precio': 0.5, 'tiempo_entrega': 0.35, 'garantia': 0.15},  # evaluation weights
-            {'cobertura_minima_pct': 50.0}  # general params
+            {'cobertura_minima_porcentaje': 50.0}  # general params
         ]
         
-        # Mock successful evaluations for all repuestos
-        evaluaciones_exitosas = []
-        adjudicaciones_mock = []
-        
-        for i in range(3):
-            evaluacion = {
-                'success': True,
-                'ganador': {
-                    'oferta_id': f'oferta-{(i % 2) + 1}',
-                    'detalle_id': f'detalle-{i+1}',
-                    'asesor_nombre': f'Asesor {(i % 2) + 1}',
-                    'puntaje_total': 0.8 + (i * 0.05),
-                    'cobertura_pct': 60.0
-                },
-                'motivo': 'mejor_puntaje_con_cobertura'
-            }
-            evaluaciones_exitosas.append(evaluacion)
-            
-            # Mock adjudication creation
-            adj_mock = MagicMock()
-            adj_mock.id = f"adj-{i+1}"
-            adj_mock.precio_adjudicado = Decimal('50000')
-            adj_mock.cantidad_adjudicada = 1
-            adj_mock.oferta.asesor.id = f"asesor-{(i % 2) + 1}"
-            adj_mock.oferta.asesor.usuario.nombre_completo = f'Asesor {(i % 2) + 1}'
-            adj_mock.repuesto_solicitado.nombre = f'Repuesto {i+1}'
-            adjudicaciones_mock.append(adj_mock)
-        
-        mock_evaluar_repuesto.side_effect = evaluaciones_exitosas
-        mock_adj_create.side_effect = adjudicaciones_mock
-        
-        # Mock evaluation record creation
-        eval_record = MagicMock()
-        eval_record.id = "eval-123"
-        mock_eval_create.return_value = eval_record
-        
-        # Mock offer updates
-        for oferta in mock_solicitud_completa.ofertas:
-            oferta.update_from_dict = AsyncMock()
-        
-        # Mock solicitud update
-        mock_solicitud_completa.update_from_dict = AsyncMock()
-        
-        # Execute evaluation
-        resultado = await EvaluacionService.evaluar_solicitud("sol-123")
+        with _persistencia_en_bloque() as mocks:
+            resultado = await EvaluacionService.evaluar_solicitud("sol-123")
         
         # Verify results
         assert resultado['success'] is True
@@ -512,11 +490,21 @@ class TestEvaluacionCompleta:
         assert resultado['asesores_ganadores'] == 2
         assert len(resultado['adjudicaciones']) == 3
         
-        # Verify adjudications were created
-        assert mock_adj_create.call_count == 3
+        # Every scored detail is written in one bulk update
+        mocks['bulk_update'].assert_awaited_once()
+        detalles_guardados = mocks['bulk_update'].call_args[0][0]
+        assert len(detalles_guardados) == 5
+        assert all(detalle.puntaje_total is not None for detalle in detalles_guardados)
+        
+        # Adjudications are created in one bulk insert from the loaded objects
+        mocks['bulk_create'].assert_awaited_once()
+        adjudicaciones = mocks['bulk_create'].call_args[0][0]
+        ganadores = {adj.repuesto_solicitado.id: adj.oferta.id for adj in adjudicaciones}
+        assert ganadores == {'rep-1': 'oferta-2', 'rep-2': 'oferta-1', 'rep-3': 'oferta-1'}
         
         # Verify evaluation record was created
-        mock_eval_create.assert_called_once()
+        mocks['evaluacion_create'].assert_awaited_once()
+        mock_solicitud_completa.save.assert_awaited_once()
     
     @patch('models.solicitud.Solicitud.get_or_none')
     @pytest.mark.asyncio
@@ -894,102 +882,27 @@ class TestEvaluacionIntegracion:
     """Integration tests combining multiple evaluation scenarios"""
     
     @patch('models.solicitud.Solicitud.get_or_none')
-    @patch('services.evaluacion_service.EvaluacionService.evaluar_repuesto_con_cobertura')
-    @patch('models.oferta.AdjudicacionRepuesto.create')
-    @patch('models.evaluacion.Evaluacion.create')
     @patch('services.evaluacion_service.ConfiguracionService.get_config')
     @pytest.mark.asyncio
-    async def test_evaluacion_mixta_con_excepcion(self, mock_config, mock_eval_create, 
-                                                 mock_adj_create, mock_evaluar_repuesto, 
-                                                 mock_get_solicitud):
+    async def test_evaluacion_mixta_con_excepcion(self, mock_config, mock_get_solicitud):
         """Test mixed adjudication with exception case (unique offer)"""
         
-        # Setup complex solicitud
-        solicitud = MagicMock()
-        solicitud.id = "sol-mixta"
-        solicitud.codigo_solicitud = "SOL-MIXTA-001"
-        solicitud.is_evaluable.return_value = True
-        
-        # 3 repuestos
-        repuestos = [MagicMock() for _ in range(3)]
-        for i, rep in enumerate(repuestos):
-            rep.id = f"rep-{i+1}"
-            rep.nombre = f"Repuesto {i+1}"
-        solicitud.repuestos_solicitados = repuestos
-        
-        # 2 offers
-        ofertas = [MagicMock() for _ in range(2)]
-        for i, oferta in enumerate(ofertas):
-            oferta.id = f"oferta-{i+1}"
-            oferta.estado = EstadoOferta.ENVIADA
-            oferta.asesor.id = f"asesor-{i+1}"
-            oferta.asesor.usuario.nombre_completo = f"Asesor {i+1}"
-            oferta.update_from_dict = AsyncMock()
-        solicitud.ofertas = ofertas
+        ofertas = [
+            # 66% coverage: wins rep-1 and rep-2
+            _oferta_evaluable('oferta-1', 1, [('rep-1', '50000', 5, 12), ('rep-2', '30000', 3, 6)]),
+            # 33% coverage: only offer for rep-3
+            _oferta_evaluable('oferta-2', 2, [('rep-3', '20000', 1, 1)]),
+        ]
+        solicitud = _solicitud_evaluable('sol-mixta', ['rep-1', 'rep-2', 'rep-3'], ofertas)
         
-        mock_get_solicitud.return_value = solicitud
+        mock_get_solicitud.return_value.prefetch_related = AsyncMock(return_value=solicitud)
         mock_config.side_effect = [
             {'precio': 0.5, 'tiempo_entrega': 0.35, 'garantia': 0.15},
-            {'cobertura_minima_pct': 50.0}
-        ]
-        
-        # Mock evaluations: 2 normal wins, 1 exception case
-        evaluaciones = [
-            {  # Repuesto 1: Asesor 1 wins with good coverage
-                'success': True,
-                'ganador': {
-                    'oferta_id': 'oferta-1', 'detalle_id': 'det-1',
-                    'asesor_nombre': 'Asesor 1', 'puntaje_total': 0.85,
-                    'cobertura_pct': 75.0, 'es_adjudicacion_por_excepcion': False
-                },
-                'motivo': 'mejor_puntaje_con_cobertura'
-            },
-            {  # Repuesto 2: Asesor 2 wins with good coverage
-                'success': True,
-                'ganador': {
-                    'oferta_id': 'oferta-2', 'detalle_id': 'det-2',
-                    'asesor_nombre': 'Asesor 2', 'puntaje_total': 0.80,
-                    'cobertura_pct': 60.0, 'es_adjudicacion_por_excepcion': False
-                },
-                'motivo': 'mejor_puntaje_con_cobertura'
-            },
-            {  # Repuesto 3: Asesor 1 wins by exception (unique offer)
-                'success': True,
-                'ganador': {
-                    'oferta_id': 'oferta-1', 'detalle_id': 'det-3',
-                    'asesor_nombre': 'Asesor 1', 'puntaje_total': 0.70,
-                    'cobertura_pct': 25.0, 'es_adjudicacion_por_excepcion': True
-                },
-                'motivo': 'unica_oferta_disponible'
-            }
+            {'cobertura_minima_porcentaje': 50.0}
         ]
         
-        mock_evaluar_repuesto.side_effect = evaluaciones
-        
-        # Mock adjudication creation
-        adjudicaciones = []
-        for i in range(3):
-            adj = MagicMock()
-            adj.id = f"adj-{i+1}"
-            adj.precio_adjudicado = Decimal('50000')
-            adj.cantidad_adjudicada = 1
-            adj.oferta.asesor.id = f"asesor-{(i % 2) + 1}"
-            adj.oferta.asesor.usuario.nombre_completo = f"Asesor {(i % 2) + 1}"
-            adj.repuesto_solicitado.nombre = f"Repuesto {i+1}"
-            adjudicaciones.append(adj)
-        
-        mock_adj_create.side_effect = adjudicaciones
-        
-        # Mock evaluation record
-        eval_record = MagicMock()
-        eval_record.id = "eval-mixta"
-        mock_eval_create.return_value = eval_record
-        
-        # Mock solicitud update
-        solicitud.update_from_dict = AsyncMock()
-        
-        # Execute evaluation
-        resultado = await EvaluacionService.evaluar_solicitud("sol-mixta")
+        with _persistencia_en_bloque() as mocks:
+            resultado = await EvaluacionService.evaluar_solicitud("sol-mixta")
         
         # Verify mixed adjudication results
         assert resultado['success'] is True
@@ -998,11 +911,84 @@ class TestEvaluacionIntegracion:
         assert resultado['asesores_ganadores'] == 2
         
         # Verify adjudications include both normal and exception cases
-        adjudicaciones_resultado = resultado['adjudicaciones']
-        motivos = [adj['motivo'] for adj in adjudicaciones_resultado]
-        assert 'mejor_puntaje_con_cobertura' in motivos
-        assert 'unica_oferta_disponible' in motivos
+        adjudicaciones = mocks['bulk_create'].call_args[0][0]
+        motivos = {adj.repuesto_solicitado.id: adj.motivo_adjudicacion for adj in adjudicaciones}
+        assert motivos == {
+            'rep-1': 'mejor_puntaje_con_cobertura',
+            'rep-2': 'mejor_puntaje_con_cobertura',
+            'rep-3': 'unica_oferta_disponible'
+        }
+        mocks['bulk_update'].assert_awaited_once()
 
 
+class TestEvaluacionMatriz:
+    """Tests para la evaluación en una sola pasada (matriz ofertas × repuestos)"""
+    
+    def _repuesto(self, repuesto_id):
+        repuesto = MagicMock()
+        repuesto.id = repuesto_id
+        repuesto.nombre = f"Repuesto {repuesto_id}"
+        return repuesto
+    
+    def _oferta(self, oferta_id, asesor, detalles):
+        oferta = MagicMock()
+        oferta.id = oferta_id
+        oferta.asesor.id = f"asesor-{asesor}"
+        oferta.asesor.usuario.nombre_completo = f"Asesor {asesor}"
+        oferta.detalles = []
+        for repuesto_id, precio, tiempo, garantia in detalles:
+            detalle = MagicMock()
+            detalle.id = f"{oferta_id}-{repuesto_id}"
+            detalle.repuesto_solicitado_id = repuesto_id
+            detalle.precio_unitario = Decimal(precio)
+            detalle.tiempo_entrega_dias = tiempo
+            detalle.garantia_meses = garantia
+            oferta.detalles.append(detalle)
+        return oferta
+    
+    def test_matriz_cobertura_y_excepcion(self):
+        """Test cobertura por oferta, filtro de cobertura mínima y único oferente sin consultas"""
+        
+        repuestos = [self._repuesto(r) for r in ('r1', 'r2', 'r3', 'r4')]
+        ofertas = [
+            # 75% de cobertura
+            self._oferta('o1', 'A', [('r1', '50000', 5, 12), ('r2', '30000', 3, 6), ('r3', '10000', 2, 3)]),
+            # 50% de cobertura
+            self._oferta('o2', 'B', [('r1', '40000', 5, 12), ('r2', '35000', 4, 6)]),
+            # 25% de cobertura: único oferente de r4
+            self._oferta('o3', 'C', [('r4', '20000', 1, 1)]),
+        ]
+        pesos = (Decimal('0.50'), Decimal('0.35'), Decimal('0.15'))
+        
+        resultados = EvaluacionService.evaluar_matriz(repuestos, ofertas, pesos, Decimal('50'))
+        
+        assert [r['repuesto_id'] for r in resultados] == ['r1', 'r2', 'r3', 'r4']
+        assert resultados[0]['ganador']['oferta_id'] == 'o2'
+        assert resultados[0]['motivo'] == 'mejor_puntaje_con_cobertura'
+        assert resultados[1]['ganador']['oferta_id'] == 'o1'
+        assert resultados[2]['ofertas_evaluadas'] == 1
+        assert resultados[3]['ganador']['oferta_id'] == 'o3'
+        assert resultados[3]['motivo'] == 'unica_oferta_disponible'
+        assert resultados[3]['ganador']['cobertura_pct'] == 25.0
+        
+        # Puntajes asignados en memoria a los detalles para persistirlos en bloque
+        detalle_ganador = ofertas[1].detalles[0]
+        assert detalle_ganador.puntaje_total == Decimal(str(resultados[0]['ganador']['puntaje_total']))
+        assert detalle_ganador.puntaje_precio == Decimal('1')
+    
+    def test_matriz_sin_ofertas_para_repuesto(self):
+        """Test repuesto sin ninguna oferta"""
+        
+        repuestos = [self._repuesto('r1'), self._repuesto('r2')]
+        ofertas = [self._oferta('o1', 'A', [('r1', '50000', 5, 12)])]
+        pesos = (Decimal('0.50'), Decimal('0.35'), Decimal('0.15'))
+        
+        resultados = EvaluacionService.evaluar_matriz(repuestos, ofertas, pesos, Decimal('50'))
+        
+        assert resultados[0]['success'] is True
+        assert resultados[1]['success'] is False
+        assert resultados[1]['motivo'] == 'no_ofertas_disponibles'
+        assert resultados[1]['cobertura_aplicada']['ofertas_con_cobertura'] == 1
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
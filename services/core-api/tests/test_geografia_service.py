@@ -0,0 +1,145 @@
+"""
+Geography Service Tests for TeLOO V3
+Tests for the DIVIPOLA cleaning step and the incremental import
+"""
+
+import pandas as pd
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, patch
+from tortoise import Tortoise
+
+from models.geografia import Municipio
+from models.user import Asesor, Usuario
+from services.geografia_service import GeografiaService
+
+MODULES = {
+    "models": [
+        "models.user",
+        "models.solicitud",
+        "models.oferta",
+        "models.geografia",
+        "models.analytics"
+    ]
+}
+
+
+def _divipola(**columnas):
+    base = {
+        "municipio": [" Medellín ", "Bello"],
+        "departamento": ["Antioquia", "Antioquia"],
+        "hub_logistico": ["medellin", "medellin"],
+    }
+    base.update(columnas)
+    return pd.DataFrame(base)
+
+
+class TestPrepararDivipola:
+    """Test the vectorized DIVIPOLA cleaning"""
+
+    def test_normaliza_como_el_modelo(self):
+        """Test that names, DANE codes and classifications are normalized per column"""
+        df = GeografiaService.preparar_divipola(_divipola(
+            codigo_dane=[5001.0, None],
+            area_metropolitana=["Valle de Aburrá", None],
+            clasificacion=["Principales", "desconocida"]
+        ))
+
+        filas = df.to_dict("records")
+        assert filas[0]["municipio"] == "Medellín"
+        assert filas[0]["municipio_norm"] == "MEDELLIN"
+        assert filas[0]["hub_logistico"] == "MEDELLIN"
+        assert filas[0]["codigo_dane"] == "5001"
+        assert filas[0]["clasificacion"] == "PRINCIPAL"
+        assert filas[1]["codigo_dane"] is None
+        assert filas[1]["area_metropolitana"] is None
+        assert filas[1]["clasificacion"] == "TERCIARIA"
+
+    def test_mismo_nombre_en_otro_departamento_no_es_duplicado(self):
+        """Test that homonyms in different departments are imported as separate rows"""
+        df = GeografiaService.preparar_divipola(_divipola(
+            municipio=["Barbosa", "Barbosa"],
+            departamento=["Antioquia", "Santander"]
+        ))
+
+        assert len(df) == 2
+
+    @pytest.mark.parametrize("columnas", [
+        {"municipio": ["Bello", "BELLO"]},
+        {"codigo_dane": ["5088", "5088"]},
+    ])
+    def test_rechaza_duplicados(self, columnas):
+        """Test that duplicate DANE codes or names in a department are rejected"""
+        with pytest.raises(ValueError, match="duplicados"):
+            GeografiaService.preparar_divipola(_divipola(**columnas))
+
+    def test_rechaza_columnas_faltantes(self):
+        """Test that the required columns are validated"""
+        with pytest.raises(ValueError, match="hub_logistico"):
+            GeografiaService.preparar_divipola(pd.DataFrame({"municipio": ["Bello"], "departamento": ["Antioquia"]}))
+
+
+@pytest_asyncio.fixture
+async def municipios():
+    await Tortoise.init(db_url="sqlite://:memory:", modules=MODULES, use_tz=True)
+    await Tortoise.generate_schemas()
+    try:
+        # Filas de una carga anterior: código con ".0" y municipio_norm sin normalizar
+        medellin = await Municipio.create(
+            codigo_dane="5001.0", municipio="Medellín", municipio_norm="Medellín",
+            departamento="Antioquia", hub_logistico="MEDELLIN"
+        )
+        bello = await Municipio.create(
+            municipio="Bello", municipio_norm="bello", departamento="Antioquia", hub_logistico="MEDELLIN"
+        )
+        con_asesor = await Municipio.create(
+            municipio="Envigado", municipio_norm="ENVIGADO", departamento="Antioquia", hub_logistico="MEDELLIN"
+        )
+        sin_referencias = await Municipio.create(
+            municipio="Itagüí", municipio_norm="ITAGUI", departamento="Antioquia", hub_logistico="MEDELLIN"
+        )
+        usuario = await Usuario.create(
+            email="asesor@divipola.co", password_hash="x", nombre="Asesor", apellido="Divipola",
+            telefono="+573001234567", rol="ADVISOR"
+        )
+        await Asesor.create(
+            usuario=usuario, municipio=con_asesor, ciudad="Envigado",
+            departamento="Antioquia", punto_venta="Divipola"
+        )
+        yield {"medellin": medellin, "bello": bello, "con_asesor": con_asesor, "sin_referencias": sin_referencias}
+    finally:
+        await Tortoise._drop_databases()
+
+
+class TestImportarDivipola:
+    """Test the incremental DIVIPOLA import against the database"""
+
+    @pytest.mark.asyncio
+    async def test_conserva_ids_y_reporta_diff(self, municipios):
+        """Test that rows loaded earlier keep their id and only real changes are reported"""
+        df = _divipola(
+            municipio=["Medellín", "Bello", "Sabaneta"],
+            departamento=["Antioquia", "Antioquia", "Antioquia"],
+            hub_logistico=["medellin", "medellin", "medellin"],
+            codigo_dane=[5001.0, 5088.0, 5631.0]
+        )
+
+        with patch("services.geografia_service.indice_geografico_service.invalidar", AsyncMock()), \
+             patch("services.geografia_service.indice_geografico_service.obtener", AsyncMock()):
+            resultado = await GeografiaService.importar_divipola(df)
+
+        assert resultado["diff"] == {
+            "agregados": 1,
+            "actualizados": 2,
+            "sin_cambios": 0,
+            "eliminados": 1,
+            "conservados_con_referencias": ["Envigado - Antioquia"]
+        }
+
+        medellin = await Municipio.get(id=municipios["medellin"].id)
+        assert (medellin.codigo_dane, medellin.municipio_norm) == ("5001", "MEDELLIN")
+        bello = await Municipio.get(id=municipios["bello"].id)
+        assert (bello.codigo_dane, bello.municipio_norm) == ("5088", "BELLO")
+        assert await Municipio.filter(id=municipios["con_asesor"].id).exists()
+        assert not await Municipio.filter(id=municipios["sin_referencias"].id).exists()
+        assert await Municipio.all().count() == 4
@@ -0,0 +1,91 @@
+"""
+Advisor Metrics Store Tests for TeLOO V3
+Incremental updates of metricas_asesores on an in-memory SQLite database
+"""
+
+import pytest
+import pytest_asyncio
+from unittest.mock import patch
+from tortoise import Tortoise
+
+from models.analytics import MetricaAsesor
+from models.geografia import Municipio
+from models.user import Asesor, Usuario
+from services.metricas_asesor_service import MetricasAsesorService
+
+MODULES = {
+    "models": [
+        "models.user",
+        "models.solicitud",
+        "models.oferta",
+        "models.geografia",
+        "models.analytics"
+    ]
+}
+
+
+@pytest_asyncio.fixture
+async def asesor():
+    await Tortoise.init(db_url="sqlite://:memory:", modules=MODULES, use_tz=True)
+    await Tortoise.generate_schemas()
+    try:
+        municipio = await Municipio.create(
+            codigo_dane="05001", municipio="Medellín", municipio_norm="MEDELLIN",
+            departamento="ANTIOQUIA", hub_logistico="MEDELLIN"
+        )
+        usuario = await Usuario.create(
+            email="asesor@metricas.co", password_hash="x", nombre="Asesor", apellido="Metricas",
+            telefono="+573001234567", rol="ADVISOR"
+        )
+        yield await Asesor.create(
+            usuario=usuario, municipio=municipio, ciudad="Medellín",
+            departamento="ANTIOQUIA", punto_venta="Metricas"
+        )
+    finally:
+        await Tortoise._drop_databases()
+
+
+class TestIncrementos:
+    """Test the atomic increments applied from events"""
+
+    @pytest.mark.asyncio
+    async def test_incrementa_fila_existente(self, asesor):
+        """Test that repeated events add up on the same row"""
+        await MetricasAsesorService.registrar_envios([asesor.id])
+        await MetricasAsesorService.registrar_envios([asesor.id])
+
+        fila = await MetricaAsesor.get(asesor_id=asesor.id)
+        assert fila.respuestas_enviadas == 2
+        assert fila.fecha_compactacion is None
+
+    @pytest.mark.asyncio
+    async def test_creacion_concurrente_no_pierde_deltas(self, asesor):
+        """Test that a row created by another request between the check and the insert keeps both deltas"""
+        bulk_create = MetricaAsesor.bulk_create
+
+        async def otra_peticion_crea_la_fila(objetos, **kwargs):
+            await MetricaAsesor.create(asesor_id=asesor.id, respuestas_enviadas=1)
+            return await bulk_create(objetos, **kwargs)
+
+        with patch.object(MetricaAsesor, "bulk_create", otra_peticion_crea_la_fila):
+            await MetricasAsesorService.registrar_envios([asesor.id])
+
+        fila = await MetricaAsesor.get(asesor_id=asesor.id)
+        assert fila.respuestas_enviadas == 2
+
+    @pytest.mark.asyncio
+    async def test_reversion_sin_fila_no_crea_negativos(self, asesor):
+        """Test that reverting an acceptance for an advisor without a row leaves no row behind"""
+        await MetricasAsesorService.registrar_aceptacion(asesor.id, aceptada=False, entrega_exitosa=True)
+
+        assert not await MetricaAsesor.exists(asesor_id=asesor.id)
+
+    @pytest.mark.asyncio
+    async def test_reversion_no_baja_de_cero(self, asesor):
+        """Test that a reversion stops at zero on an existing row"""
+        await MetricasAsesorService.registrar_aceptacion(asesor.id, aceptada=True)
+        await MetricasAsesorService.registrar_aceptacion(asesor.id, aceptada=False, entrega_exitosa=True)
+        await MetricasAsesorService.registrar_aceptacion(asesor.id, aceptada=False)
+
+        fila = await MetricaAsesor.get(asesor_id=asesor.id)
+        assert (fila.ofertas_aceptadas, fila.ofertas_exitosas) == (0, 0)
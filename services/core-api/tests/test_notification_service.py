@@ -0,0 +1,88 @@
+"""
+Tests for NotificationService batched fan-out
+"""
+
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from services.notification_service import NotificationService, TAMANO_OLEADA
+
+
+class TestNotificationBatch:
+    """Test cases for send_notifications_batch"""
+
+    @pytest.mark.asyncio
+    async def test_oleada_un_mensaje_por_lote(self):
+        """Test that a wave is published as one Redis message per TAMANO_OLEADA users"""
+        service = NotificationService()
+        service.redis_client = AsyncMock()
+        user_ids = [f"asesor-{i}" for i in range(TAMANO_OLEADA + 10)]
+
+        with patch.object(service, '_is_gateway_available', AsyncMock(return_value=True)):
+            enviados = await service.send_notifications_batch(user_ids, "Titulo", "Mensaje", "solicitud_nueva")
+
+        assert enviados == len(user_ids)
+        push = [call for call in service.redis_client.publish.await_args_list
+                if call.args[0] == "notificacion.push_lote"]
+        assert len(push) == 2
+        assert len(json.loads(push[0].args[1])["user_ids"]) == TAMANO_OLEADA
+
+    @pytest.mark.asyncio
+    async def test_fallback_whatsapp_una_consulta(self):
+        """Test that the WhatsApp fallback loads all phones at once and queues failures"""
+        service = NotificationService()
+        service.redis_client = AsyncMock()
+
+        query = MagicMock()
+        query.values_list = AsyncMock(return_value=[("u1", "+573001"), ("u2", "+573002"), ("u3", None)])
+        enviar = AsyncMock(side_effect=lambda telefono, datos: telefono == "+573001")
+
+        with patch.object(service, '_is_gateway_available', AsyncMock(return_value=False)), \
+             patch('services.notification_service.Usuario.filter', return_value=query) as filtro, \
+             patch.object(service, '_post_whatsapp', enviar):
+            enviados = await service.send_notifications_batch(["u1", "u2", "u3"], "Titulo", "Mensaje", "evaluacion_completada")
+
+        assert enviados == 1
+        filtro.assert_called_once()
+        assert enviar.await_count == 2
+
+        # u2 failed and is queued for retry in a single LPUSH
+        service.redis_client.lpush.assert_awaited_once()
+        assert json.loads(service.redis_client.lpush.await_args.args[1])["user_id"] == "u2"
+
+
+class TestOleadaEscalamiento:
+    """Test that escalation waves use the batched fan-out"""
+
+    @pytest.mark.asyncio
+    async def test_oleada_push_un_envio_por_lote(self):
+        """Test that a push wave sends one batch and publishes solicitud.oleada as JSON"""
+        from models.enums import CanalNotificacion
+        from services.escalamiento_service import EscalamientoService
+        from services.notification_service import notification_service
+
+        evaluaciones = []
+        for i in range(3):
+            evaluacion = MagicMock(id=f"ev-{i}", canal=CanalNotificacion.PUSH, tiempo_espera_min=10)
+            evaluacion.asesor.usuario.id = f"usuario-{i}"
+            evaluaciones.append(evaluacion)
+
+        consulta = MagicMock()
+        consulta.prefetch_related.return_value.all = AsyncMock(return_value=evaluaciones)
+        actualizacion = MagicMock()
+        actualizacion.update = AsyncMock()
+        solicitud = MagicMock(id="sol-1")
+        redis_client = AsyncMock()
+
+        with patch('services.escalamiento_service.EvaluacionAsesorTemp.filter', side_effect=[consulta, actualizacion]), \
+             patch('services.escalamiento_service.events_service.on_solicitud_escalada', AsyncMock()), \
+             patch.object(notification_service, 'redis_client', redis_client), \
+             patch.object(notification_service, 'notify_new_solicitud', AsyncMock()) as notificar:
+            resultado = await EscalamientoService.ejecutar_oleada(solicitud, 3, redis_client)
+
+        assert resultado['asesores_notificados'] == 3
+        notificar.assert_awaited_once_with(solicitud, ["usuario-0", "usuario-1", "usuario-2"])
+        canal, mensaje = redis_client.publish.await_args.args
+        assert canal == 'solicitud.oleada'
+        assert json.loads(mensaje)['canal_push'] == 3
@@ -5,7 +5,7 @@ Tests de validación de rangos, formatos, carga masiva Excel y transiciones de e
 
 import pytest
 import asyncio
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 import io
 import pandas as pd
@@ -568,5 +568,88 @@ class TestOfertaDetalleValidation:
             assert result == expected
 
 
+class TestPermisosListadoOfertas:
+    """Tests de permisos del listado de ofertas"""
+    
+    @staticmethod
+    def _usuario(rol):
+        return MagicMock(id="usuario-cliente", rol=rol)
+    
+    @pytest.mark.asyncio
+    async def test_cliente_sin_solicitud_recibe_403(self):
+        """Un CLIENT no puede listar ofertas sin indicar una solicitud propia"""
+        from fastapi import HTTPException
+        from routers.ofertas import get_ofertas
+        
+        with patch.object(OfertasService, 'listar_ofertas', AsyncMock()) as listar:
+            with pytest.raises(HTTPException) as exc:
+                await get_ofertas(
+                    solicitud_id=None, asesor_id=None, estado=None, fecha_desde=None, fecha_hasta=None,
+                    cursor=None, page=1, limit=20, incluir_total=True,
+                    current_user=self._usuario(RolUsuario.CLIENT)
+                )
+        
+        assert exc.value.status_code == 403
+        listar.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_cliente_solicitud_ajena_recibe_403(self):
+        """Un CLIENT no puede ver las ofertas de una solicitud de otro cliente"""
+        from fastapi import HTTPException
+        from routers.ofertas import get_ofertas
+        
+        consulta = MagicMock()
+        consulta.exists = AsyncMock(return_value=False)
+        
+        with patch('routers.ofertas.Solicitud.filter', return_value=consulta) as filtro, \
+             patch.object(OfertasService, 'listar_ofertas', AsyncMock()) as listar:
+            with pytest.raises(HTTPException) as exc:
+                await get_ofertas(
+                    solicitud_id="sol-ajena", asesor_id=None, estado=None, fecha_desde=None, fecha_hasta=None,
+                    cursor=None, page=1, limit=20, incluir_total=True,
+                    current_user=self._usuario(RolUsuario.CLIENT)
+                )
+        
+        assert exc.value.status_code == 403
+        filtro.assert_called_once_with(id="sol-ajena", cliente__usuario_id="usuario-cliente")
+        listar.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_cliente_por_estado_recibe_403(self):
+        """Un CLIENT no puede listar ofertas por estado"""
+        from fastapi import HTTPException
+        from routers.ofertas import get_ofertas_by_estado
+        
+        with pytest.raises(HTTPException) as exc:
+            await get_ofertas_by_estado(
+                estado=EstadoOferta.ENVIADA, cursor=None, limit=100,
+                current_user=self._usuario(RolUsuario.CLIENT)
+            )
+        
+        assert exc.value.status_code == 403
+
+
+
+class TestListadoOfertas:
+    """Tests de los filtros del listado de ofertas"""
+    
+    @pytest.mark.asyncio
+    async def test_fecha_hasta_incluye_el_dia_completo(self):
+        """fecha_hasta es un día: se filtra hasta el inicio del día siguiente"""
+        consulta = MagicMock()
+        for metodo in ('filter', 'order_by', 'offset', 'limit'):
+            getattr(consulta, metodo).return_value = consulta
+        consulta.select_related.return_value = asyncio.sleep(0, result=[])
+        
+        with patch('services.ofertas_service.Oferta.all', return_value=consulta):
+            resultado = await OfertasService.listar_ofertas(
+                fecha_desde=datetime(2026, 3, 1, 8, 30), fecha_hasta=date(2026, 3, 31), incluir_total=False
+            )
+        
+        consulta.filter.assert_any_call(created_at__gte=datetime(2026, 3, 1, 8, 30))
+        consulta.filter.assert_any_call(created_at__lt=datetime(2026, 4, 1))
+        assert resultado == {"ofertas": [], "total": None, "next_cursor": None}
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
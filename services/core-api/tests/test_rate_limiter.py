@@ -0,0 +1,93 @@
+"""
+Rate Limiter Tests for TeLOO V3
+Tests for the shared Redis limiter, its in-memory fallback and per-service quotas
+"""
+
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from middleware import rate_limiter as modulo
+from middleware.rate_limiter import (
+    InMemoryRateLimiter, RedisRateLimiter, check_rate_limit, rate_limit_servicio
+)
+
+
+def _request(path: str = "/v1/solicitudes/services/bot", host: str = "10.0.0.1"):
+    request = MagicMock()
+    request.scope = {"route": MagicMock(path=path)}
+    request.client.host = host
+    return request
+
+
+class TestInMemoryRateLimiter:
+    """Test the per-process fallback limiter"""
+
+    def test_limite_por_clave(self):
+        """Test that each key has its own window and quota"""
+        limiter = InMemoryRateLimiter()
+
+        assert all(limiter.is_allowed("a", max_requests=3, window_seconds=60) for _ in range(3))
+        assert limiter.is_allowed("a", max_requests=3, window_seconds=60) is False
+        assert limiter.is_allowed("b", max_requests=3, window_seconds=60) is True
+
+    def test_limpieza_no_en_cada_peticion(self):
+        """Test that old entries are cleaned at most once per window"""
+        limiter = InMemoryRateLimiter()
+        limiter.is_allowed("a")
+
+        with patch.object(limiter, "_cleanup_old_entries") as cleanup:
+            for _ in range(10):
+                limiter.is_allowed("a")
+            cleanup.assert_not_called()
+
+
+class TestCheckRateLimit:
+    """Test check_rate_limit with the Redis limiter"""
+
+    @pytest.mark.asyncio
+    async def test_excedido_usa_retry_after_de_redis(self):
+        """Test that a rejected request returns 429 with the wait computed by the script"""
+        redis_limiter = RedisRateLimiter()
+        redis_client = MagicMock()
+        redis_client.register_script.return_value = AsyncMock(return_value=[0, 12500])
+        redis_limiter.configurar(redis_client)
+
+        with patch.object(modulo, "redis_rate_limiter", redis_limiter):
+            with pytest.raises(HTTPException) as exc:
+                await check_rate_limit(_request(), identifier="service:agent-ia")
+
+        assert exc.value.status_code == 429
+        assert exc.value.headers["Retry-After"] == "13"
+
+    @pytest.mark.asyncio
+    async def test_redis_caido_usa_memoria(self):
+        """Test that a Redis failure falls back to the in-memory limiter and backs off"""
+        redis_limiter = RedisRateLimiter()
+        script = AsyncMock(side_effect=ConnectionError("redis down"))
+        redis_client = MagicMock()
+        redis_client.register_script.return_value = script
+        redis_limiter.configurar(redis_client)
+
+        with patch.object(modulo, "redis_rate_limiter", redis_limiter), \
+             patch.object(modulo, "rate_limiter", InMemoryRateLimiter()):
+            await check_rate_limit(_request())
+            await check_rate_limit(_request())
+
+        # The second check skipped Redis while it is marked unavailable
+        assert script.await_count == 1
+        assert redis_limiter.disponible is False
+
+    @pytest.mark.asyncio
+    async def test_cuota_por_servicio(self):
+        """Test that internal services use their own quota on the bot route"""
+        redis_limiter = AsyncMock()
+        redis_limiter.disponible = True
+        redis_limiter.is_allowed.return_value = (True, 0)
+
+        with patch.object(modulo, "redis_rate_limiter", redis_limiter):
+            assert await rate_limit_servicio(_request(), service_name="agent-ia") == "agent-ia"
+
+        key, max_requests, window_seconds = redis_limiter.is_allowed.call_args[0]
+        assert key == "/v1/solicitudes/services/bot:service:agent-ia"
+        assert (max_requests, window_seconds) == modulo.CUOTAS_POR_SERVICIO["agent-ia"]
@@ -2,6 +2,9 @@
 Tests for Scheduler Service and Background Jobs
 """
 
+import asyncio
+import json
+import time
 import pytest
 from datetime import datetime, timedelta
 from unittest.mock import AsyncMock, patch, MagicMock
@@ -150,6 +153,337 @@ class TestConfigurationIntegration:
         
         with pytest.raises(HTTPException):
             ConfiguracionService._validar_parametros_generales(invalid_params)
+    
+    @pytest.mark.asyncio
+    async def test_config_snapshot_single_query(self):
+        """Test that configuration reads load parametros_config once and write through on update"""
+        
+        from services.configuracion_service import ConfiguracionService
+        
+        queryset = MagicMock()
+        queryset.values_list = AsyncMock(return_value=[
+            ('timeout_ofertas_horas', 24),
+            ('pesos_escalamiento', {'proximidad': 0.4, 'actividad': 0.3, 'desempeno': 0.2, 'confianza': 0.1})
+        ])
+        redis_client = AsyncMock()
+        redis_client.incr.return_value = 7
+        
+        ConfiguracionService.invalidar_cache()
+        try:
+            with patch('services.configuracion_service.ParametroConfig.all', return_value=queryset), \
+                 patch('services.configuracion_service.sincronizacion_cache._redis', redis_client):
+                generales = await ConfiguracionService.get_config('parametros_generales')
+                config = await ConfiguracionService.get_config()
+                
+                assert generales['timeout_ofertas_horas'] == 24
+                assert generales['ofertas_minimas_deseadas'] == 2  # default
+                assert config['pesos_escalamiento']['actividad'] == 0.3
+                queryset.values_list.assert_awaited_once()
+                
+                # Modifying a returned value must not alter the snapshot
+                generales['timeout_ofertas_horas'] = 1
+                assert await ConfiguracionService.obtener_valor('timeout_ofertas_horas') == 24
+                
+                await ConfiguracionService._registrar_cambio({'timeout_ofertas_horas': 48})
+                
+                assert await ConfiguracionService.obtener_valor('timeout_ofertas_horas') == 48
+                queryset.values_list.assert_awaited_once()
+                redis_client.publish.assert_awaited_once()
+                assert ConfiguracionService.get_estado_cache()['version'] == 7
+        finally:
+            ConfiguracionService.invalidar_cache()
+    
+    @pytest.mark.asyncio
+    async def test_config_invalidation_from_other_replica(self):
+        """Test that invalidation messages from other replicas drop the local snapshot"""
+        
+        import json
+        from services.configuracion_service import ConfiguracionService, CANAL_INVALIDACION_CONFIG
+        from utils.sincronizacion_cache import INSTANCIA_ID, SincronizacionCache
+        
+        async def listen():
+            yield {'type': 'subscribe', 'channel': CANAL_INVALIDACION_CONFIG, 'data': 1}
+            yield {'type': 'message', 'channel': CANAL_INVALIDACION_CONFIG,
+                   'data': json.dumps({'version': 3, 'origen': INSTANCIA_ID, 'claves': ['a']})}
+            assert ConfiguracionService._snapshot is not None
+            yield {'type': 'message', 'channel': CANAL_INVALIDACION_CONFIG,
+                   'data': json.dumps({'version': 4, 'origen': 'otra-replica', 'claves': ['a']})}
+        
+        pubsub = MagicMock()
+        pubsub.listen = listen
+        pubsub.close = AsyncMock()
+        
+        sincronizacion = SincronizacionCache()
+        sincronizacion.registrar(CANAL_INVALIDACION_CONFIG, ConfiguracionService._aplicar_invalidacion)
+        
+        ConfiguracionService._snapshot = {'a': 1}
+        ConfiguracionService._snapshot_version = 0
+        try:
+            await sincronizacion._escuchar(pubsub)
+            
+            assert ConfiguracionService._snapshot is None
+            assert ConfiguracionService._snapshot_version == 4
+            pubsub.close.assert_awaited_once()
+        finally:
+            ConfiguracionService.invalidar_cache()
+
+
+class TestTemporizadorEscalamiento:
+    """Test cases for the escalamiento timer schedule"""
+    
+    @staticmethod
+    def _redis_con_pipeline(resultados):
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=resultados)
+        redis_client = AsyncMock()
+        redis_client.pipeline = MagicMock(return_value=pipe)
+        return redis_client, pipe
+    
+    @pytest.mark.asyncio
+    async def test_oferta_completa_adelanta_vencimiento(self):
+        """Test that reaching the minimum complete offers brings the deadline forward"""
+        
+        from services.temporizador_escalamiento_service import (
+            TemporizadorEscalamientoService, CLAVE_VENCIMIENTOS
+        )
+        
+        solicitud = MagicMock(id='sol-1', ofertas_minimas_deseadas=2)
+        temporizador = TemporizadorEscalamientoService()
+        
+        # First complete offer: below the minimum, deadline untouched
+        redis_client, pipe = self._redis_con_pipeline([1, True, 1])
+        temporizador.configurar(redis_client)
+        assert await temporizador.registrar_oferta(solicitud, 'oferta-1', completa=True) == 1
+        pipe.sadd.assert_called_once()
+        redis_client.zadd.assert_not_awaited()
+        
+        # Second complete offer: minimum reached, only an already scheduled solicitud is moved
+        redis_client, pipe = self._redis_con_pipeline([1, True, 2])
+        redis_client.zadd.return_value = 1
+        temporizador.configurar(redis_client)
+        assert await temporizador.registrar_oferta(solicitud, 'oferta-2', completa=True) == 2
+        
+        args, kwargs = redis_client.zadd.call_args
+        assert args[0] == CLAVE_VENCIMIENTOS
+        assert 'sol-1' in args[1]
+        assert kwargs['xx'] is True
+        assert temporizador._despertar.is_set()
+    
+    @pytest.mark.asyncio
+    async def test_reclamar_vencidas_registra_lease(self):
+        """Test that due solicitudes are moved to the shared in-process set in one script call"""
+        
+        from services.temporizador_escalamiento_service import (
+            TemporizadorEscalamientoService, CLAVE_VENCIMIENTOS, CLAVE_EN_PROCESO, LEASE_PROCESO_SEGUNDOS
+        )
+        
+        redis_client = AsyncMock()
+        redis_client.eval.return_value = ['sol-1']
+        
+        temporizador = TemporizadorEscalamientoService()
+        temporizador.configurar(redis_client)
+        
+        vencidas = await temporizador.reclamar_vencidas(limite=10)
+        
+        assert vencidas == ['sol-1']
+        args = redis_client.eval.call_args[0]
+        assert args[1:4] == (2, CLAVE_VENCIMIENTOS, CLAVE_EN_PROCESO)
+        assert args[5] - args[4] == LEASE_PROCESO_SEGUNDOS
+        assert args[6] == 10
+        
+        # Al terminar se libera el lease para todas las réplicas
+        await temporizador.liberar(vencidas)
+        redis_client.zrem.assert_awaited_once_with(CLAVE_EN_PROCESO, 'sol-1')
+    
+    @pytest.mark.asyncio
+    async def test_sincronizar_no_reagenda_en_proceso(self):
+        """Test that the rebuild goes through the script that skips solicitudes claimed by any replica"""
+        
+        from services.temporizador_escalamiento_service import (
+            TemporizadorEscalamientoService, CLAVE_VENCIMIENTOS, CLAVE_EN_PROCESO
+        )
+        
+        fecha = datetime(2025, 1, 1, 10, 0, 0)
+        redis_client = AsyncMock()
+        redis_client.zrange.return_value = [('sol-viejo', 1.0)]
+        # sol-2 is being processed by another replica
+        redis_client.eval.return_value = 1
+        
+        temporizador = TemporizadorEscalamientoService()
+        temporizador.configurar(redis_client)
+        temporizador.obtener_tiempos_nivel = AsyncMock(return_value={1: 15})
+        
+        with patch('services.temporizador_escalamiento_service.Solicitud') as solicitud_model:
+            solicitud_model.filter.return_value.values_list = AsyncMock(
+                return_value=[('sol-1', 1, fecha), ('sol-2', 1, fecha)]
+            )
+            resultado = await temporizador.sincronizar()
+        
+        args = redis_client.eval.call_args[0]
+        assert args[1:4] == (2, CLAVE_VENCIMIENTOS, CLAVE_EN_PROCESO)
+        assert args[5::2] == ('sol-1', 'sol-2')
+        redis_client.zadd.assert_not_awaited()
+        redis_client.zrem.assert_awaited_once_with(CLAVE_VENCIMIENTOS, 'sol-viejo')
+        assert resultado['agendadas'] == 1
+        assert resultado['en_proceso'] == 1
+    
+    def test_respaldo_bd_limitado_al_lider_y_al_intervalo(self):
+        """Test that the database fallback runs once per interval and only on the scheduler leader"""
+        
+        from services.temporizador_escalamiento_service import TemporizadorEscalamientoService
+        
+        temporizador = TemporizadorEscalamientoService()
+        coordinacion = 'services.temporizador_escalamiento_service.coordinacion_scheduler_service'
+        
+        with patch(coordinacion, MagicMock(configurado=True, es_lider=False)):
+            assert temporizador.respaldo_bd_disponible() is False
+        
+        with patch(coordinacion, MagicMock(configurado=True, es_lider=True)):
+            assert temporizador.respaldo_bd_disponible() is True
+            # Next tick within the interval: no second full scan
+            assert temporizador.respaldo_bd_disponible() is False
+    
+    def test_calcular_vencimiento(self):
+        """Test deadline calculation per level with fallback for unknown levels"""
+        
+        from services.temporizador_escalamiento_service import TemporizadorEscalamientoService
+        
+        fecha = datetime(2025, 1, 1, 10, 0, 0)
+        tiempos = {1: 15, 2: 20}
+        
+        assert TemporizadorEscalamientoService.calcular_vencimiento(fecha, 2, tiempos) == fecha + timedelta(minutes=20)
+        assert TemporizadorEscalamientoService.calcular_vencimiento(fecha, 9, tiempos) == fecha + timedelta(minutes=30)
+
+
+class TestCoordinacionScheduler:
+    """Test cases for leader election, job leases and shards across replicas"""
+
+    @pytest.mark.asyncio
+    async def test_lider_renueva_solo_su_lock(self):
+        """Test that a follower tries SET NX and the leader renews with an ownership check"""
+
+        from services.coordinacion_scheduler_service import CoordinacionSchedulerService, CLAVE_LIDER
+
+        redis_client = AsyncMock()
+        redis_client.set.return_value = True
+        coordinacion = CoordinacionSchedulerService()
+        coordinacion.configurar(redis_client)
+
+        assert await coordinacion._intentar_liderazgo() is True
+        args, kwargs = redis_client.set.call_args
+        assert args == (CLAVE_LIDER, coordinacion.replica_id)
+        assert kwargs['nx'] is True
+
+        # Leader: renewal fails if another replica took the lock after it expired
+        coordinacion._es_lider = True
+        redis_client.eval.return_value = 0
+        assert await coordinacion._intentar_liderazgo() is False
+        assert redis_client.eval.call_args[0][3] == coordinacion.replica_id
+
+    @pytest.mark.asyncio
+    async def test_lease_tomado_omite_job(self):
+        """Test that a job is skipped while another replica holds its lease"""
+
+        from services.coordinacion_scheduler_service import CoordinacionSchedulerService
+
+        redis_client = AsyncMock()
+        redis_client.set.return_value = None
+        coordinacion = CoordinacionSchedulerService()
+        coordinacion.configurar(redis_client)
+        job = AsyncMock(return_value='ok')
+
+        assert await coordinacion.ejecutar_con_lease('job', 60, job) is None
+        job.assert_not_awaited()
+
+        # Lease free: the job runs and the lease is released afterwards
+        redis_client.set.return_value = True
+        assert await coordinacion.ejecutar_con_lease('job', 60, job) == 'ok'
+        redis_client.eval.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_shard_en_curso_hasta_terminar(self):
+        """Test that a shard is moved to the replica's in-progress list and removed only once processed"""
+
+        from services.coordinacion_scheduler_service import CoordinacionSchedulerService, CLAVE_SHARDS
+
+        shard = json.dumps({'job_id': 'job', 'indice': 1, 'total': 3, 'expira': time.time() + 60})
+        redis_client = AsyncMock()
+        redis_client.blmove.side_effect = [shard, asyncio.CancelledError()]
+        coordinacion = CoordinacionSchedulerService()
+        coordinacion.configurar(redis_client)
+        procesar = AsyncMock()
+
+        with pytest.raises(asyncio.CancelledError):
+            await coordinacion._bucle_shards(procesar)
+
+        assert redis_client.blmove.call_args_list[0][0] == (
+            CLAVE_SHARDS, coordinacion._clave_en_curso, 1, 'LEFT', 'RIGHT'
+        )
+        procesar.assert_awaited_once_with('job', 1, 3)
+        redis_client.lrem.assert_awaited_once_with(coordinacion._clave_en_curso, 1, shard)
+
+        # Shutdown in the middle of a shard: it stays in progress for the leader to requeue
+        redis_client.blmove.side_effect = [shard]
+        redis_client.lrem.reset_mock()
+        procesar.side_effect = asyncio.CancelledError()
+        with pytest.raises(asyncio.CancelledError):
+            await coordinacion._bucle_shards(procesar)
+        redis_client.lrem.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_lider_recupera_shards_de_replica_caida(self):
+        """Test that in-progress shards of a replica without heartbeat go back to the queue"""
+
+        from services.coordinacion_scheduler_service import (
+            CoordinacionSchedulerService, CLAVE_CONSUMIDORES_SHARDS, CLAVE_SHARDS, PREFIJO_SHARDS_EN_CURSO
+        )
+
+        redis_client = AsyncMock()
+        redis_client.smembers.return_value = {'viva', 'caida'}
+        redis_client.zrangebyscore.return_value = ['viva']
+        redis_client.lmove.side_effect = ['s1', 's2', None]
+        coordinacion = CoordinacionSchedulerService()
+        coordinacion.configurar(redis_client)
+
+        assert await coordinacion.recuperar_shards() == 2
+        for llamada in redis_client.lmove.call_args_list:
+            assert llamada[0] == (f"{PREFIJO_SHARDS_EN_CURSO}caida", CLAVE_SHARDS, 'RIGHT', 'LEFT')
+        redis_client.srem.assert_awaited_once_with(CLAVE_CONSUMIDORES_SHARDS, 'caida')
+        assert coordinacion.get_estado()['shards_recuperados'] == 2
+
+    def test_shard_se_filtra_en_sql(self):
+        """Test that the shard condition is part of the query instead of a list of ids"""
+
+        from jobs.scheduled_jobs import _filtrar_shard
+
+        query = MagicMock()
+        assert _filtrar_shard(query, None) is query
+
+        _filtrar_shard(query, (1, 4))
+        expresion = query.annotate.call_args.kwargs['shard']
+        assert expresion.sql == '(hashtext("solicitudes"."id"::text) & 2147483647) % 4'
+        query.annotate.return_value.filter.assert_called_once_with(shard=1)
+
+    @pytest.mark.asyncio
+    async def test_backlog_grande_se_reparte(self):
+        """Test that a partitionable job with a large backlog is queued as shards"""
+
+        from services import scheduler_service as modulo
+
+        service = SchedulerService()
+        with patch('jobs.scheduled_jobs.contar_backlog', AsyncMock(return_value=1000)), \
+             patch.object(modulo.coordinacion_scheduler_service, 'replicas_activas',
+                          AsyncMock(return_value=['r1', 'r2', 'r3'])), \
+             patch.object(modulo.coordinacion_scheduler_service, 'repartir', AsyncMock()) as repartir:
+
+            assert await service._repartir_si_backlog('notificar_clientes_ofertas_ganadoras') is True
+            assert repartir.call_args[0][:2] == ('notificar_clientes_ofertas_ganadoras', 3)
+
+        with patch('jobs.scheduled_jobs.contar_backlog', AsyncMock(return_value=10)), \
+             patch.object(modulo.coordinacion_scheduler_service, 'replicas_activas',
+                          AsyncMock(return_value=['r1', 'r2', 'r3'])):
+
+            assert await service._repartir_si_backlog('notificar_clientes_ofertas_ganadoras') is False
 
 
 class TestJobExecution:
@@ -0,0 +1,209 @@
+"""
+Búsqueda de municipios por nombre en memoria
+Normaliza el texto como Municipio.normalizar_ciudad (además sin puntuación),
+resuelve alias conocidos ("Bogota" -> "BOGOTA, D.C.") y el departamento que las
+personas agregan al final ("Bello Antioquia"), y ordena coincidencias exactas,
+por prefijo, por prefijo de palabra y con errores de digitación (trigramas).
+"""
+
+import re
+from bisect import bisect_left
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from models.geografia import Municipio
+
+# Alias frecuentes -> nombre normalizado en DIVIPOLA (se ignoran si el destino no existe)
+ALIAS_MUNICIPIOS: Dict[str, str] = {
+    "BOGOTA": "BOGOTA D C",
+    "SANTAFE DE BOGOTA": "BOGOTA D C",
+    "SANTA FE DE BOGOTA": "BOGOTA D C",
+    "CARTAGENA": "CARTAGENA DE INDIAS",
+    "CALI": "SANTIAGO DE CALI",
+    "SANTIAGO DE CALI": "CALI",
+    "CUCUTA": "SAN JOSE DE CUCUTA",
+    "SAN JOSE DE CUCUTA": "CUCUTA",
+    "TUMACO": "SAN ANDRES DE TUMACO",
+    "MOMPOS": "SANTA CRUZ DE MOMPOX",
+    "MOMPOX": "SANTA CRUZ DE MOMPOX",
+}
+
+ALIAS_DEPARTAMENTOS: Dict[str, str] = {
+    "VALLE": "VALLE DEL CAUCA",
+    "GUAJIRA": "LA GUAJIRA",
+    "NORTE SANTANDER": "NORTE DE SANTANDER",
+}
+
+# A igual puntaje se prefieren las ciudades principales (ej. homónimos en varios departamentos)
+PRIORIDAD_CLASIFICACION = {"PRINCIPAL": 0, "SECUNDARIA": 1, "TERCIARIA": 2}
+
+# Similitud mínima (difflib) para aceptar una coincidencia con errores de digitación
+UMBRAL_APROXIMADA = 0.8
+# Fracción mínima de trigramas compartidos para evaluar un candidato aproximado
+UMBRAL_TRIGRAMAS = 0.4
+LONGITUD_MINIMA_APROXIMADA = 4
+
+
+class Coincidencia(NamedTuple):
+    municipio: Municipio
+    puntaje: float
+    tipo: str  # exacta | alias | prefijo | palabra | aproximada
+
+
+def normalizar_busqueda(texto: Optional[str]) -> str:
+    """
+    Normaliza texto para búsqueda: mayúsculas, sin tildes ni puntuación, espacios simples
+    "Bogotá, D.C." -> "BOGOTA D C"
+    """
+    if not texto:
+        return ""
+    texto = Municipio.normalizar_ciudad(str(texto))
+    return " ".join(re.sub(r"[^A-Z0-9Ñ]+", " ", texto).split())
+
+
+def _trigramas(clave: str) -> Set[str]:
+    relleno = f" {clave} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class IndiceNombresMunicipios:
+    """
+    Índice inmutable de nombres de municipios (se reconstruye con el índice geográfico)
+    """
+
+    def __init__(self, municipios: Iterable[Municipio]):
+        self._claves: Dict[str, List[Tuple[Municipio, str]]] = {}
+        self._departamentos: Dict[str, str] = {}
+
+        for municipio in municipios:
+            clave = normalizar_busqueda(municipio.municipio_norm)
+            self._agregar(clave, municipio, "exacta")
+            self._departamentos[str(municipio.id)] = normalizar_busqueda(municipio.departamento)
+            # "BOGOTA D C" también se encuentra como "BOGOTA DC"
+            if clave.endswith(" D C"):
+                self._agregar(clave[:-4] + " DC", municipio, "alias")
+
+        for alias, destino in ALIAS_MUNICIPIOS.items():
+            for municipio, tipo in list(self._claves.get(destino, [])):
+                if tipo == "exacta":
+                    self._agregar(alias, municipio, "alias")
+
+        # Prefijos: la clave completa y cada sufijo que empieza en una palabra
+        self._prefijos: List[Tuple[str, str]] = sorted(
+            (clave[inicio:], clave)
+            for clave in self._claves
+            for inicio in [0] + [i + 1 for i, c in enumerate(clave) if c == " "]
+        )
+        self._textos_prefijo = [texto for texto, _ in self._prefijos]
+
+        self._trigramas_clave: Dict[str, int] = {}
+        self._por_trigrama: Dict[str, List[str]] = {}
+        for clave in self._claves:
+            trigramas = _trigramas(clave)
+            self._trigramas_clave[clave] = len(trigramas)
+            for trigrama in trigramas:
+                self._por_trigrama.setdefault(trigrama, []).append(clave)
+
+        departamentos = set(self._departamentos.values())
+        self._sufijos_departamento: List[Tuple[str, str]] = sorted(
+            [(d, d) for d in departamentos]
+            + [(alias, d) for alias, d in ALIAS_DEPARTAMENTOS.items() if d in departamentos],
+            key=lambda par: len(par[0]),
+            reverse=True
+        )
+
+    def _agregar(self, clave: str, municipio: Municipio, tipo: str) -> None:
+        if clave:
+            self._claves.setdefault(clave, []).append((municipio, tipo))
+
+    def _en_departamento(self, municipio_id: str, departamento: str, contiene: bool) -> bool:
+        departamento_municipio = self._departamentos[municipio_id]
+        return departamento in departamento_municipio if contiene else departamento == departamento_municipio
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def buscar(
+        self,
+        texto: str,
+        limite: Optional[int] = 10,
+        departamento: Optional[str] = None
+    ) -> List[Coincidencia]:
+        """
+        Municipios que coinciden con el texto, de mejor a peor
+
+        Args:
+            texto: Nombre escrito por el usuario (con o sin tildes, alias o departamento al final)
+            limite: Máximo de resultados (None para todos)
+            departamento: Filtra por departamento (contiene, insensible a tildes)
+        """
+        consulta = normalizar_busqueda(texto)
+        if not consulta:
+            return []
+
+        departamento_norm = normalizar_busqueda(departamento) or None
+        coincidencias = self._buscar(consulta, departamento_norm, contiene=True)
+
+        # "Bello Antioquia": sin coincidencia exacta, se intenta sin el departamento final
+        if not departamento_norm and not (coincidencias and coincidencias[0].tipo in ("exacta", "alias")):
+            for sufijo, nombre_departamento in self._sufijos_departamento:
+                if consulta.endswith(" " + sufijo):
+                    sin_departamento = self._buscar(consulta[:-len(sufijo) - 1], nombre_departamento)
+                    if sin_departamento:
+                        coincidencias = sin_departamento
+                    break
+
+        return coincidencias if limite is None else coincidencias[:limite]
+
+    def _buscar(self, consulta: str, departamento: Optional[str], contiene: bool = False) -> List[Coincidencia]:
+        mejores: Dict[str, Coincidencia] = {}
+
+        def agregar(clave: str, puntaje: float, tipo: str) -> None:
+            for municipio, tipo_clave in self._claves[clave]:
+                municipio_id = str(municipio.id)
+                if departamento and not self._en_departamento(municipio_id, departamento, contiene):
+                    continue
+                actual = mejores.get(municipio_id)
+                if actual is None or puntaje > actual.puntaje:
+                    tipo_coincidencia = "alias" if tipo == "exacta" and tipo_clave == "alias" else tipo
+                    mejores[municipio_id] = Coincidencia(municipio, puntaje, tipo_coincidencia)
+
+        if consulta in self._claves:
+            agregar(consulta, 1.0, "exacta")
+
+        # Prefijo de la clave completa (0.80-0.95) o de una de sus palabras (0.65-0.75)
+        i = bisect_left(self._textos_prefijo, consulta)
+        while i < len(self._prefijos) and self._textos_prefijo[i].startswith(consulta):
+            texto, clave = self._prefijos[i]
+            i += 1
+            if clave == consulta:
+                continue
+            cobertura = len(consulta) / len(clave)
+            if texto == clave:
+                agregar(clave, 0.8 + 0.15 * cobertura, "prefijo")
+            else:
+                agregar(clave, 0.65 + 0.1 * cobertura, "palabra")
+
+        # Errores de digitación: candidatos por trigramas compartidos, verificados con difflib
+        if len(consulta) >= LONGITUD_MINIMA_APROXIMADA:
+            trigramas = _trigramas(consulta)
+            compartidos = Counter(
+                clave for trigrama in trigramas for clave in self._por_trigrama.get(trigrama, ())
+            )
+            for clave, comunes in compartidos.items():
+                if 2 * comunes / (len(trigramas) + self._trigramas_clave[clave]) < UMBRAL_TRIGRAMAS:
+                    continue
+                similitud = SequenceMatcher(None, consulta, clave).ratio()
+                if similitud >= UMBRAL_APROXIMADA:
+                    agregar(clave, 0.6 * similitud, "aproximada")
+
+        return sorted(
+            mejores.values(),
+            key=lambda c: (
+                -c.puntaje,
+                PRIORIDAD_CLASIFICACION.get(c.municipio.clasificacion, len(PRIORIDAD_CLASIFICACION)),
+                c.municipio.municipio_norm
+            )
+        )
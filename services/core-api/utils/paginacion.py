@@ -0,0 +1,53 @@
+"""
+Utilidades de paginación por cursor (keyset)
+Los listados se ordenan por (created_at, id) descendente y el cursor es la
+posición de la última fila entregada; la página siguiente se lee por índice
+sin OFFSET, con costo constante aunque crezca la tabla.
+"""
+
+import base64
+import uuid
+from datetime import datetime
+from typing import Tuple
+
+from tortoise.expressions import Q
+
+# Orden estable de los listados paginados por cursor
+ORDEN_KEYSET = ("-created_at", "-id")
+
+
+def codificar_cursor(created_at: datetime, id: uuid.UUID) -> str:
+    """
+    Cursor opaco con la posición (created_at, id) de la última fila de la página
+
+    Returns:
+        str: Cursor en base64 url-safe
+    """
+    valor = f"{created_at.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """
+    Posición (created_at, id) codificada en el cursor
+
+    Raises:
+        ValueError: Si el cursor no fue generado por codificar_cursor
+    """
+    try:
+        valor = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, id = valor.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(id)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def filtro_despues_de_cursor(cursor: str) -> Q:
+    """
+    Filtro de las filas posteriores al cursor en ORDEN_KEYSET
+
+    Raises:
+        ValueError: Si el cursor es inválido
+    """
+    created_at, id = decodificar_cursor(cursor)
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=id)
@@ -0,0 +1,144 @@
+"""
+Invalidación de caches en proceso entre réplicas de core-api
+Una sola conexión a Redis y una sola suscripción por proceso para todas las
+caches locales (configuración, usuarios autenticados, dashboard de asesores,
+índice geográfico). Cada cache registra su canal y un manejador; los mensajes
+publicados por este mismo proceso no se le entregan.
+
+Si Redis no está disponible publicar() no hace nada y cada cache se refresca
+al vencer su TTL.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Identifica los mensajes publicados por este proceso
+INSTANCIA_ID = uuid.uuid4().hex
+
+Manejador = Callable[[Dict[str, Any]], None]
+
+
+class SincronizacionCache:
+    """
+    Suscriptor compartido de los canales de invalidación
+    """
+
+    def __init__(self):
+        self._manejadores: Dict[str, Manejador] = {}
+        self._redis = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    @property
+    def redis(self):
+        """Cliente Redis compartido (None si la sincronización no está activa)"""
+        return self._redis
+
+    @property
+    def activa(self) -> bool:
+        return self._tarea is not None and not self._tarea.done()
+
+    def registrar(self, canal: str, manejador: Manejador) -> None:
+        """
+        Asocia un canal a la función que descarta la cache local
+        Debe llamarse antes de iniciar() (al importar el servicio)
+
+        Args:
+            canal: Canal Redis de la cache
+            manejador: Recibe el mensaje (dict) publicado por otra réplica
+        """
+        self._manejadores[canal] = manejador
+
+    async def publicar(self, canal: str, datos: Dict[str, Any]) -> bool:
+        """
+        Publica una invalidación para las demás réplicas (best effort)
+
+        Returns:
+            bool: False si no se pudo publicar (las réplicas esperan al TTL)
+        """
+        if self._redis is None:
+            return False
+        try:
+            await self._redis.publish(canal, json.dumps({**datos, 'origen': INSTANCIA_ID}, default=str))
+            return True
+        except Exception as e:
+            logger.warning(f"No se pudo publicar invalidación en {canal}: {e}")
+            return False
+
+    def _despachar(self, mensaje: Dict[str, Any]) -> None:
+        if mensaje.get('type') != 'message':
+            return
+        manejador = self._manejadores.get(mensaje.get('channel'))
+        if manejador is None:
+            return
+        try:
+            datos = json.loads(mensaje['data'])
+        except (TypeError, ValueError):
+            return
+        if datos.get('origen') == INSTANCIA_ID:
+            return
+        try:
+            manejador(datos)
+        except Exception as e:
+            logger.error(f"Error aplicando invalidación de {mensaje.get('channel')}: {e}")
+
+    async def _escuchar(self, pubsub) -> None:
+        try:
+            async for mensaje in pubsub.listen():
+                self._despachar(mensaje)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Sin suscripción las caches se refrescan por TTL
+            logger.error(f"Suscripción de invalidación de caches terminada: {e}")
+        finally:
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
+
+    async def iniciar(self, redis_url: Optional[str] = None) -> None:
+        """
+        Conecta a Redis y se suscribe a los canales registrados
+
+        Args:
+            redis_url: URL de Redis (default REDIS_URL)
+        """
+        import redis.asyncio as redis
+
+        if not self._manejadores:
+            return
+        try:
+            redis_client = redis.from_url(redis_url or os.getenv("REDIS_URL", "redis://localhost:6379"), decode_responses=True)
+            pubsub = redis_client.pubsub()
+            await pubsub.subscribe(*self._manejadores)
+
+            self._redis = redis_client
+            self._tarea = asyncio.create_task(self._escuchar(pubsub))
+            logger.info(f"Sincronización de caches activa: {', '.join(self._manejadores)}")
+        except Exception as e:
+            logger.warning(f"Sincronización de caches no disponible, se usan los TTL: {e}")
+
+    async def detener(self) -> None:
+        """Cancela la suscripción y cierra la conexión a Redis"""
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except (asyncio.CancelledError, Exception):
+                pass
+
+        if self._redis:
+            await self._redis.close()
+
+        self._tarea = None
+        self._redis = None
+
+
+# Instancia global compartida por todas las caches del proceso
+sincronizacion_cache = SincronizacionCache()
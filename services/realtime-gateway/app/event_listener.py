@@ -27,13 +27,13 @@ class EventListener:
         
         self.running = True
         
-        # Subscribe to relevant channels
+        # Only the channels core-api publishes for the gateway: domain events
+        # (solicitud.oleada, oferta.created, ...) carry customer data and are
+        # not meant to be fanned out to every advisor
         await redis_client.subscribe(
-            'solicitud.*',
-            'oferta.*',
-            'evaluacion.*',
-            'cliente.*',
-            'notificacion.*'
+            'notificacion.push',
+            'notificacion.push_lote',
+            'notificacion.broadcast'
         )
         
         # Start listening task
@@ -161,8 +161,12 @@ class EventListener:
         user_id = data.get('user_id')
         role = data.get('role')
         
+        # Batched push from core-api: one message for a whole wave of users
+        if event_type == 'push_lote':
+            user_ids = data.pop('user_ids', [])
+            await socket_manager.broadcast_to_users(user_ids, 'notificacion_push', data)
         # If targeted to specific user
-        if user_id:
+        elif user_id:
             await socket_manager.broadcast_to_user(user_id, f'notificacion_{event_type}', data)
         # If targeted to role
         elif role:
@@ -188,6 +188,14 @@ class SocketManager:
         await self.sio.emit(event, data, room=room)
         logger.debug(f"Broadcasted {event} to user {user_id}")
     
+    async def broadcast_to_users(self, user_ids: list, event: str, data: dict):
+        """Broadcast the same message to several users in a single emit"""
+        if not user_ids:
+            return
+        rooms = [f"user_{user_id}" for user_id in user_ids]
+        await self.sio.emit(event, data, room=rooms)
+        logger.debug(f"Broadcasted {event} to {len(rooms)} users")
+    
     async def broadcast_to_solicitud(self, solicitud_id: str, event: str, data: dict):
         """Broadcast message to all users subscribed to a solicitud"""
         room = f"solicitud_{solicitud_id}"